@@ -0,0 +1,117 @@
+"""In-process MPR frame engine backed by the NumPy reslicer (no VTK subprocess per frame).
+
+Requires the Python backend to be importable (`pip install -e python`).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from DICOM_reencoder.mpr import PLANES, Reslicer, orient_plane, window_to_uint8
+from DICOM_reencoder.projection import SlabProjector, normalize_mode
+from interface.state.frames import Frame, FrameRequest
+
+
+@dataclass
+class ObliquePlane:
+    """A named oblique plane; slice_index steps along its normal through the volume."""
+
+    normal: Tuple[float, float, float]
+    up: Optional[Tuple[float, float, float]] = None
+    spacing: Optional[float] = None
+    center: Optional[Tuple[float, float, float]] = None
+
+
+class MPREngine:
+    """FrameEngine that reslices a volume on demand for the render loop.
+
+    Orthogonal planes are NumPy views, so scrolling them costs one window/level pass per frame.
+    Thick slabs (``slab`` planes, combined with ``projection`` = mean/mip/minip) on orthogonal
+    planes go through a SlabProjector per plane, so scrolling only reads the entering plane.
+    Requests without a plane (scroll, zoom, W/L) reuse the plane last rendered for that viewer.
+    """
+
+    def __init__(self, reslicer: Reslicer, *, default_plane: str = "axial", slab: int = 1,
+                 projection: str = "mean", order: str = "linear", series_uid: Optional[str] = None) -> None:
+        self.reslicer = reslicer
+        self.default_plane = default_plane
+        self.slab = max(1, int(slab))
+        self.projection = normalize_mode(projection)
+        self.order = order
+        self.series_uid = series_uid or reslicer.metadata.get("series_uid")
+        self.oblique_planes: Dict[str, ObliquePlane] = {}
+        self._planes: Dict[str, str] = {}
+        self._projectors: Dict[Tuple[str, int, str], SlabProjector] = {}
+
+    @classmethod
+    def from_directory(cls, dicom_dir, *, cache=None, **kwargs) -> "MPREngine":
+        """
+        Build the series volume and wrap it.
+
+        ``cache`` (a VolumeCache, a directory, or True for ``~/.cache/dicom-tools``) opts into the
+        persistent volume cache; nothing is written to disk by default.
+        """
+        return cls(Reslicer.from_directory(dicom_dir, cache=cache), **kwargs)
+
+    def define_plane(self, name: str, normal: Sequence[float], *, up: Optional[Sequence[float]] = None,
+                     spacing: Optional[float] = None, center: Optional[Sequence[float]] = None) -> None:
+        self.oblique_planes[name] = ObliquePlane(
+            tuple(normal), tuple(up) if up is not None else None, spacing, tuple(center) if center is not None else None
+        )
+
+    def _projector(self, plane: str) -> SlabProjector:
+        key = (plane, self.slab, self.projection)
+        if key not in self._projectors:
+            self._projectors[key] = SlabProjector(self.reslicer.volume, plane, self.slab, self.projection)
+        return self._projectors[key]
+
+    def frame_count(self, plane: str) -> int:
+        oblique = self.oblique_planes.get(plane)
+        if oblique is not None:
+            return self.reslicer.oblique_count(oblique.normal, oblique.spacing)
+        return self.reslicer.plane_count(plane)
+
+    def render(self, request: FrameRequest) -> Frame:
+        plane = request.plane or self._planes.get(request.viewer, self.default_plane)
+        if plane not in PLANES and plane not in self.oblique_planes:
+            raise ValueError(f"Unknown MPR plane '{plane}'")
+        self._planes[request.viewer] = plane
+
+        count = self.frame_count(plane)
+        index = min(max(int(request.slice_index), 0), count - 1)
+        oblique = self.oblique_planes.get(plane)
+        if oblique is None:
+            if self.slab > 1:
+                image = orient_plane(self._projector(plane).slab(index), plane)
+            else:
+                image = self.reslicer.orthogonal(plane, index)
+            location = self.reslicer.location_mm(plane, index)
+            spacing = self.reslicer.plane_spacing(plane)
+        else:
+            spacing = oblique.spacing or float(self.reslicer.spacing.min())
+            offset = (index - (count - 1) / 2.0) * spacing
+            image = self.reslicer.oblique(oblique.normal, center=oblique.center, up=oblique.up, offset_mm=offset,
+                                          spacing=spacing, order=self.order, slab_mm=spacing * self.slab,
+                                          slab_mode=self.projection)
+            location = offset
+
+        pixels = window_to_uint8(image, request.window_center, request.window_width)
+        return Frame(
+            viewer=request.viewer,
+            slice_index=index,
+            width=int(pixels.shape[1]),
+            height=int(pixels.shape[0]),
+            buffer=pixels.tobytes(),
+            metadata={
+                "plane": plane,
+                "frame_count": count,
+                "location_mm": location,
+                "thickness_mm": spacing * self.slab,
+                "projection": self.projection if self.slab > 1 else None,
+                "series_name": self.series_uid or request.series_uid,
+            },
+            histogram=np.bincount(pixels.ravel(), minlength=256).tolist(),
+        )
@@ -0,0 +1,84 @@
+import pytest
+
+from interface.config import ROOT_DIR
+from interface.components.render_loop import RenderLoop
+from interface.input.event_bus import Event, EventBus
+from interface.state.frames import FrameRequest
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.syspath_prepend(str(ROOT_DIR / "python"))
+    pytest.importorskip("pydicom")
+    from DICOM_reencoder.mpr import Reslicer
+    from interface.components.mpr_engine import MPREngine
+
+    volume = np.arange(6 * 5 * 4, dtype=np.float32).reshape(6, 5, 4)
+    return MPREngine(Reslicer(volume, np.diag([1.0, 1.0, 2.0, 1.0]), {"series_uid": "1.2.3"}))
+
+
+def _request(slice_index=0, plane=None, width=0.0):
+    return FrameRequest(viewer="mpr", slice_index=slice_index, zoom=1.0, pan=(0.0, 0.0), window_center=0.0,
+                        window_width=width, frame_count=1, plane=plane)
+
+
+def test_orthogonal_frames_follow_requested_plane(engine):
+    frame = engine.render(_request(2, plane="coronal"))
+
+    assert (frame.width, frame.height) == (6, 4)
+    assert len(frame.buffer) == frame.width * frame.height
+    assert sum(frame.histogram) == frame.width * frame.height
+    assert frame.metadata["plane"] == "coronal"
+    assert frame.metadata["frame_count"] == 5
+    assert frame.metadata["series_name"] == "1.2.3"
+
+    scrolled = engine.render(_request(99))
+    assert scrolled.metadata["plane"] == "coronal"
+    assert scrolled.slice_index == 4
+
+
+def test_oblique_plane_and_slab(engine):
+    engine.define_plane("oblique", normal=(0.0, 0.7071, 0.7071))
+    engine.slab = 3
+
+    frame = engine.render(_request(0, plane="oblique"))
+
+    assert frame.metadata["frame_count"] > 1
+    assert frame.metadata["thickness_mm"] == pytest.approx(3.0)
+    assert len(frame.buffer) == frame.width * frame.height
+
+
+def test_render_loop_drives_engine(engine):
+    bus = EventBus()
+    ready = []
+    bus.subscribe("frame_ready", ready.append)
+    RenderLoop(bus, engine)
+
+    bus.emit(Event("frame_requested", {"request": _request(1, plane="axial", width=40.0)}))
+
+    frame = ready[0].payload["frame"]
+    assert (frame.width, frame.height) == (6, 5)
+    assert frame.metadata["location_mm"] == pytest.approx(2.0)
+
+
+def test_unknown_plane_rejected(engine):
+    with pytest.raises(ValueError):
+        engine.render(_request(plane="curved"))
+
+
+def test_mip_slab_scroll_reuses_projector(engine):
+    engine.slab = 3
+    engine.projection = "max"
+    volume = engine.reslicer.volume
+
+    frames = [engine.render(_request(index, plane="axial")) for index in range(4)]
+
+    projector = engine._projectors[("axial", 3, "max")]
+    assert projector.planes_read == 4
+    expected = volume[:, :, 1:4].max(axis=2).T
+    pixels = np.frombuffer(frames[2].buffer, dtype=np.uint8).reshape(frames[2].height, frames[2].width)
+    scale = 255.0 / (expected.max() - expected.min())
+    assert np.array_equal(pixels, np.clip((expected - expected.min()) * scale, 0, 255).astype(np.uint8))
+    assert frames[2].metadata["projection"] == "max"
@@ -19,10 +19,90 @@ import os
 from datetime import datetime, timedelta
 import hashlib
 
+# Patient Information - Remove or replace (PatientID is filled in per patient)
+PATIENT_TAGS_TO_ANONYMIZE = {
+    'PatientName': 'ANONYMOUS^PATIENT',
+    'PatientID': '',
+    'PatientBirthDate': '',
+    'PatientSex': '',
+    'PatientAge': '',
+    'PatientWeight': '',
+    'PatientSize': '',
+    'PatientAddress': '',
+    'PatientTelephoneNumbers': '',
+    'PatientMotherBirthName': '',
+    'MilitaryRank': '',
+    'EthnicGroup': '',
+    'Occupation': '',
+    'AdditionalPatientHistory': '',
+    'PatientComments': '',
+    'ResponsiblePerson': '',
+    'ResponsibleOrganization': '',
+}
+
+# Study Information - referring physician and other identifiable info (None drops the element)
+STUDY_TAGS_TO_ANONYMIZE = {
+    'ReferringPhysicianName': 'ANONYMIZED',
+    'ReferringPhysicianAddress': '',
+    'ReferringPhysicianTelephoneNumbers': '',
+    'ReferringPhysicianIdentificationSequence': None,
+    'PhysiciansOfRecord': 'ANONYMIZED',
+    'PerformingPhysicianName': 'ANONYMIZED',
+    'OperatorsName': 'ANONYMIZED',
+    'InstitutionName': 'ANONYMIZED',
+    'InstitutionAddress': '',
+    'InstitutionalDepartmentName': '',
+    'StationName': '',
+}
+
+DATE_TAGS = [
+    'StudyDate', 'SeriesDate', 'AcquisitionDate', 'ContentDate',
+    'InstanceCreationDate', 'PerformedProcedureStepStartDate'
+]
+
+# UIDs regenerated per patient so references inside a study stay linked
+UID_TAGS_TO_REGENERATE = [
+    'StudyInstanceUID',
+    'SeriesInstanceUID',
+    'SOPInstanceUID',
+]
+
+# Other potentially identifying tags that are dropped entirely
+TAGS_TO_REMOVE = [
+    'AccessionNumber',
+    'IssuerOfPatientID',
+    'OtherPatientIDs',
+    'OtherPatientNames',
+    'PatientBirthName',
+    'PatientInsurancePlanCodeSequence',
+    'PatientPrimaryLanguageCodeSequence',
+    'RequestingPhysician',
+    'RequestingService',
+    'RequestAttributesSequence',
+    'ScheduledProcedureStepDescription',
+    'PerformedProcedureStepDescription',
+]
+
+ANONYMOUS_UID_ROOT = "1.2.826.0.1.3680043.8.498."
+
+
 def generate_anonymous_id(original_id):
     """Generate a consistent anonymous ID using hash."""
     return hashlib.sha256(str(original_id).encode()).hexdigest()[:16].upper()
 
+
+def stable_date_offset(original_id):
+    """Return a 1-365 day offset derived from the patient ID, stable across processes."""
+    # Python's built-in hash() is salted per process, so use a digest instead
+    digest = hashlib.sha256(f"date-offset:{original_id}".encode()).hexdigest()
+    return int(digest, 16) % 365 + 1
+
+
+def derive_uid(anonymous_id, original_uid):
+    """Generate new UID based on original UID + anonymous ID for consistency."""
+    return f"{ANONYMOUS_UID_ROOT}{generate_anonymous_id(f'{anonymous_id}_{original_uid}')}"
+
+
 def anonymize_dicom(input_file, output_file=None, patient_prefix="ANON"):
     """
     Anonymize a DICOM file by removing or replacing patient information.
@@ -48,26 +128,7 @@ def anonymize_dicom(input_file, output_file=None, patient_prefix="ANON"):
         anonymous_id = f"{patient_prefix}_{generate_anonymous_id(original_patient_id)}"
 
         # Patient Information - Remove or replace
-        patient_tags_to_anonymize = {
-            'PatientName': 'ANONYMOUS^PATIENT',
-            'PatientID': anonymous_id,
-            'PatientBirthDate': '',
-            'PatientSex': '',
-            'PatientAge': '',
-            'PatientWeight': '',
-            'PatientSize': '',
-            'PatientAddress': '',
-            'PatientTelephoneNumbers': '',
-            'PatientMotherBirthName': '',
-            'MilitaryRank': '',
-            'EthnicGroup': '',
-            'Occupation': '',
-            'AdditionalPatientHistory': '',
-            'PatientComments': '',
-            'ResponsiblePerson': '',
-            'ResponsibleOrganization': '',
-        }
-
+        patient_tags_to_anonymize = dict(PATIENT_TAGS_TO_ANONYMIZE, PatientID=anonymous_id)
         for tag, value in patient_tags_to_anonymize.items():
             if tag in dataset:
                 # Replace sensitive tag values with neutral placeholders
@@ -85,21 +146,7 @@ def anonymize_dicom(input_file, output_file=None, patient_prefix="ANON"):
                 pass
 
         # Study Information - Anonymize referring physician and other identifiable info
-        study_tags_to_anonymize = {
-            'ReferringPhysicianName': 'ANONYMIZED',
-            'ReferringPhysicianAddress': '',
-            'ReferringPhysicianTelephoneNumbers': '',
-            'ReferringPhysicianIdentificationSequence': None,
-            'PhysiciansOfRecord': 'ANONYMIZED',
-            'PerformingPhysicianName': 'ANONYMIZED',
-            'OperatorsName': 'ANONYMIZED',
-            'InstitutionName': 'ANONYMIZED',
-            'InstitutionAddress': '',
-            'InstitutionalDepartmentName': '',
-            'StationName': '',
-        }
-
-        for tag, value in study_tags_to_anonymize.items():
+        for tag, value in STUDY_TAGS_TO_ANONYMIZE.items():
             if tag in dataset:
                 if value is None:
                     # Some tags are sequences that are safer to drop entirely
@@ -110,14 +157,9 @@ def anonymize_dicom(input_file, output_file=None, patient_prefix="ANON"):
 
         # Remove or anonymize dates (shift by random offset for consistency)
         # We'll shift all dates by the same offset to maintain temporal relationships
-        date_offset_days = hash(original_patient_id) % 365  # Consistent offset based on patient ID
+        date_offset_days = stable_date_offset(original_patient_id)  # Consistent offset based on patient ID
 
-        date_tags = [
-            'StudyDate', 'SeriesDate', 'AcquisitionDate', 'ContentDate',
-            'InstanceCreationDate', 'PerformedProcedureStepStartDate'
-        ]
-
-        for tag in date_tags:
+        for tag in DATE_TAGS:
             if tag in dataset and dataset.get(tag):
                 try:
                     original_date = datetime.strptime(dataset.data_element(tag).value, '%Y%m%d')
@@ -129,41 +171,16 @@ def anonymize_dicom(input_file, output_file=None, patient_prefix="ANON"):
 
         # Remove UIDs that might contain identifiable information
         # But keep critical UIDs for DICOM integrity
-        uid_tags_to_regenerate = [
-            'StudyInstanceUID',
-            'SeriesInstanceUID',
-            'SOPInstanceUID',
-        ]
-
         print(f"\n  Generating new UIDs...")
-        for tag in uid_tags_to_regenerate:
+        for tag in UID_TAGS_TO_REGENERATE:
             if tag in dataset:
                 # Generate new UID based on original UID + anonymous ID for consistency
                 original_uid = dataset.get(tag, '')
-                seed = f"{anonymous_id}_{original_uid}"
-                new_uid_suffix = generate_anonymous_id(seed)
-                # Use pydicom's UID generation with our seed
-                new_uid = f"1.2.826.0.1.3680043.8.498.{new_uid_suffix}"
-                dataset.data_element(tag).value = new_uid
+                dataset.data_element(tag).value = derive_uid(anonymous_id, original_uid)
                 print(f"  ✓ Regenerated: {tag}")
 
         # Remove other potentially identifying tags
-        tags_to_remove = [
-            'AccessionNumber',
-            'IssuerOfPatientID',
-            'OtherPatientIDs',
-            'OtherPatientNames',
-            'PatientBirthName',
-            'PatientInsurancePlanCodeSequence',
-            'PatientPrimaryLanguageCodeSequence',
-            'RequestingPhysician',
-            'RequestingService',
-            'RequestAttributesSequence',
-            'ScheduledProcedureStepDescription',
-            'PerformedProcedureStepDescription',
-        ]
-
-        for tag in tags_to_remove:
+        for tag in TAGS_TO_REMOVE:
             if tag in dataset:
                 delattr(dataset, tag)
                 print(f"  ✓ Removed: {tag}")
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+#
+# batch_anonymize.py
+# Dicom-Tools-py
+#
+# Anonymizes large batches of DICOM files in parallel with a compiled profile and a persistent mapping table.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Batch anonymization for research exports.
+
+The de-identification profile from ``anonymize_dicom`` is compiled once into
+tag lookups and applied to every file. Replacement UIDs, patient IDs, and
+date offsets are drawn at random and stored in a SQLite mapping table, so a
+study split across several jobs (or several runs) is remapped consistently as
+long as the jobs share the same mapping file. Single-file ``anonymize_stream``
+calls without a mapping use ``DerivedMapping`` instead, which hashes the
+originals like ``anonymize_dicom`` so separately processed slices of one
+series still agree. Progress is reported through
+``logging`` and an optional JSON-lines report instead of per-file prints.
+
+In streaming mode only the header is parsed and rewritten; the Pixel Data
+element is copied byte-for-byte from the source file, so memory use does not
+grow with object size.
+"""
+
+import argparse
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import pydicom
+from pydicom.datadict import tag_for_keyword
+from pydicom.tag import BaseTag, Tag
+from pydicom.uid import generate_uid
+
+from .anonymize_dicom import (
+    ANONYMOUS_UID_ROOT,
+    DATE_TAGS,
+    PATIENT_TAGS_TO_ANONYMIZE,
+    STUDY_TAGS_TO_ANONYMIZE,
+    TAGS_TO_REMOVE,
+    UID_TAGS_TO_REGENERATE,
+    derive_uid,
+    generate_anonymous_id,
+    stable_date_offset,
+)
+from .batch_process import find_dicom_files
+from .core.streaming import can_splice, read_header, tail_holds_only_pixel_data, write_spliced
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+
+def _compile_tags(keywords: Iterable[str]) -> Tuple[BaseTag, ...]:
+    tags = []
+    for keyword in keywords:
+        tag = tag_for_keyword(keyword)
+        if tag is None:
+            raise ValueError(f"Unknown DICOM keyword in anonymization profile: {keyword}")
+        tags.append(Tag(tag))
+    return tuple(tags)
+
+
+@dataclass(frozen=True)
+class AnonymizationProfile:
+    """De-identification rules resolved to tags once and reused for every dataset."""
+
+    replace: Tuple[Tuple[BaseTag, str], ...]
+    delete: Tuple[BaseTag, ...]
+    dates: Tuple[BaseTag, ...]
+    uids: Tuple[BaseTag, ...]
+    patient_id: BaseTag
+    remove_private: bool = True
+
+    @classmethod
+    def default(cls) -> "AnonymizationProfile":
+        """Compile the same rules applied by ``anonymize_dicom``."""
+        replacements = {key: value for key, value in PATIENT_TAGS_TO_ANONYMIZE.items() if key != "PatientID"}
+        replacements.update({key: value for key, value in STUDY_TAGS_TO_ANONYMIZE.items() if value is not None})
+        dropped = [key for key, value in STUDY_TAGS_TO_ANONYMIZE.items() if value is None] + list(TAGS_TO_REMOVE)
+
+        return cls(
+            replace=tuple(zip(_compile_tags(replacements), replacements.values())),
+            delete=_compile_tags(dropped),
+            dates=_compile_tags(DATE_TAGS),
+            uids=_compile_tags(UID_TAGS_TO_REGENERATE),
+            patient_id=_compile_tags(["PatientID"])[0],
+        )
+
+    def apply(self, dataset: pydicom.Dataset, mapping: "MappingTable", *, patient_prefix: str = "ANON") -> str:
+        """Anonymize ``dataset`` in place and return the pseudonymous patient ID."""
+        original_patient_id = str(dataset.get(self.patient_id).value if self.patient_id in dataset else "UNKNOWN")
+        anonymous_id = mapping.patient_id(original_patient_id, prefix=patient_prefix)
+        if self.patient_id in dataset:
+            dataset[self.patient_id].value = anonymous_id
+
+        for tag, value in self.replace:
+            if tag in dataset:
+                dataset[tag].value = value
+
+        for tag in self.delete:
+            if tag in dataset:
+                del dataset[tag]
+
+        # One offset per patient keeps intervals between studies intact
+        offset = timedelta(days=mapping.date_offset(original_patient_id))
+        for tag in self.dates:
+            if tag in dataset and dataset[tag].value:
+                try:
+                    shifted = datetime.strptime(str(dataset[tag].value), "%Y%m%d") - offset
+                    dataset[tag].value = shifted.strftime("%Y%m%d")
+                except ValueError:
+                    dataset[tag].value = ""
+
+        for tag in self.uids:
+            if tag in dataset and dataset[tag].value:
+                dataset[tag].value = mapping.uid(str(dataset[tag].value), anonymous_id)
+
+        # Keep the file meta consistent with the remapped SOP Instance UID
+        file_meta = getattr(dataset, "file_meta", None)
+        if file_meta is not None and "SOPInstanceUID" in dataset:
+            file_meta.MediaStorageSOPInstanceUID = dataset.SOPInstanceUID
+
+        if self.remove_private:
+            dataset.remove_private_tags()
+        return anonymous_id
+
+
+class MappingTable:
+    """Thread-safe original → replacement table persisted in SQLite.
+
+    Workers in other processes or later runs pointing at the same file see the
+    same replacements: the first writer wins and everyone else reads its value.
+    Without a path the table lives in memory for the lifetime of the object.
+    """
+
+    def __init__(self, path: Optional[PathLike] = None):
+        self.path = Path(path) if path else None
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._cache: Dict[Tuple[str, str], str] = {}
+        # Autocommit mode: each INSERT OR IGNORE is visible to concurrent jobs immediately
+        self._conn = sqlite3.connect(str(self.path) if self.path else ":memory:", timeout=30,
+                                     isolation_level=None, check_same_thread=False)
+        if self.path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS mappings ("
+            "kind TEXT NOT NULL, original TEXT NOT NULL, replacement TEXT NOT NULL, "
+            "PRIMARY KEY (kind, original))"
+        )
+
+    def lookup(self, kind: str, original: str, factory: Callable[[], str]) -> str:
+        """Return the stored replacement for ``original``, creating it with ``factory`` if missing."""
+        key = (kind, original)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+            self._conn.execute("INSERT OR IGNORE INTO mappings VALUES (?, ?, ?)", (kind, original, factory()))
+            row = self._conn.execute(
+                "SELECT replacement FROM mappings WHERE kind = ? AND original = ?", key
+            ).fetchone()
+            self._cache[key] = row[0]
+            return row[0]
+
+    def uid(self, original: str, anonymous_id: Optional[str] = None) -> str:
+        # Random UIDs are unique per original already; the patient's pseudonym is not needed
+        return self.lookup("uid", original, lambda: generate_uid(prefix=ANONYMOUS_UID_ROOT))
+
+    def patient_id(self, original: str, *, prefix: str = "ANON") -> str:
+        return self.lookup(f"patient_id:{prefix}", original, lambda: f"{prefix}_{secrets.token_hex(8).upper()}")
+
+    def date_offset(self, original_patient_id: str) -> int:
+        return int(self.lookup("date_offset", original_patient_id, lambda: str(secrets.randbelow(365) + 1)))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM mappings").fetchone()[0])
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class DerivedMapping:
+    """Replacements hashed from the originals, identical to those ``anonymize_dicom`` writes.
+
+    Nothing is stored, so separate runs over files of one study agree without sharing a
+    mapping file. Anyone holding an original identifier can recompute its replacement.
+    """
+
+    path = None
+
+    def uid(self, original: str, anonymous_id: Optional[str] = None) -> str:
+        return derive_uid(anonymous_id or "", original)
+
+    def patient_id(self, original: str, *, prefix: str = "ANON") -> str:
+        return f"{prefix}_{generate_anonymous_id(original)}"
+
+    def date_offset(self, original_patient_id: str) -> int:
+        return stable_date_offset(original_patient_id)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class BatchAnonymizer:
+    """Apply a compiled profile to many files, sharing one mapping table across workers."""
+
+    def __init__(self, mapping: Optional[Union[MappingTable, DerivedMapping]] = None, *,
+                 profile: Optional[AnonymizationProfile] = None, patient_prefix: str = "ANON",
+                 streaming: bool = False):
+        self.mapping = mapping if mapping is not None else MappingTable()
+        self.profile = profile or AnonymizationProfile.default()
+        self.patient_prefix = patient_prefix
+        self.streaming = streaming
+
+    def anonymize_file(self, input_path: PathLike, output_path: PathLike) -> dict:
+        """Anonymize a single file and return a structured result record."""
+        started = time.perf_counter()
+        record = {"input": str(input_path), "output": str(output_path), "status": "ok", "error": None}
+        try:
+            if self.streaming and self._anonymize_streaming(input_path, output_path, record):
+                record["mode"] = "stream"
+            else:
+                dataset = pydicom.dcmread(str(input_path), force=True)
+                record["patient_id"] = self.profile.apply(dataset, self.mapping, patient_prefix=self.patient_prefix)
+                Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+                dataset.save_as(str(output_path))
+                record["mode"] = "full"
+        except Exception as exc:  # noqa: BLE001
+            record["status"] = "error"
+            record["error"] = str(exc)
+        record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        logger.debug("anonymize %s", record["status"], extra={"record": record})
+        return record
+
+    def _anonymize_streaming(self, input_path: PathLike, output_path: PathLike, record: dict) -> bool:
+        """Rewrite the header and splice the original Pixel Data bytes; False if not possible."""
+        header, offset = read_header(input_path)
+        # Elements after Pixel Data would be copied unfiltered, so those files take the full path
+        if not can_splice(header) or not tail_holds_only_pixel_data(input_path, header, offset):
+            return False
+        record["patient_id"] = self.profile.apply(header, self.mapping, patient_prefix=self.patient_prefix)
+        write_spliced(header, input_path, offset, output_path)
+        return True
+
+    def run(self, files: Iterable[PathLike], output_dir: PathLike, *, root: Optional[PathLike] = None,
+            workers: Optional[int] = None, use_processes: bool = False) -> dict:
+        """Anonymize ``files`` into ``output_dir``, mirroring their layout below ``root``.
+
+        Threads share this instance's mapping table. With ``use_processes`` each worker
+        process opens the same SQLite file, which must therefore be persistent.
+        """
+        jobs = _plan_outputs(files, Path(output_dir), Path(root) if root else None)
+        started = time.perf_counter()
+
+        if use_processes:
+            if self.mapping.path is None:
+                raise ValueError("Process workers need a persistent mapping table (pass a mapping path)")
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(str(self.mapping.path), self.profile, self.patient_prefix,
+                                               self.streaming)) as pool:
+                records = list(pool.map(_worker_anonymize, jobs, chunksize=16))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                records = list(pool.map(lambda job: self.anonymize_file(*job), jobs))
+
+        elapsed = time.perf_counter() - started
+        failed = sum(1 for record in records if record["status"] != "ok")
+        summary = {
+            "total": len(records),
+            "succeeded": len(records) - failed,
+            "failed": failed,
+            "elapsed_s": round(elapsed, 3),
+            "files_per_s": round(len(records) / elapsed, 2) if elapsed > 0 else None,
+            "records": records,
+        }
+        logger.info("anonymized %d/%d files in %.2fs", summary["succeeded"], summary["total"], elapsed)
+        return summary
+
+
+def anonymize_stream(input_path: PathLike, output_path: PathLike, *, mapping: Optional[MappingTable] = None,
+                     patient_prefix: str = "ANON") -> dict:
+    """
+    Anonymize one file header-only, copying Pixel Data straight from the source.
+
+    Without ``mapping`` the replacements are derived (``DerivedMapping``), so files of one
+    series anonymized by separate calls keep their shared Study/Series UIDs and patient ID.
+    """
+    mapping = mapping if mapping is not None else DerivedMapping()
+    anonymizer = BatchAnonymizer(mapping, patient_prefix=patient_prefix, streaming=True)
+    return anonymizer.anonymize_file(input_path, output_path)
+
+
+def _plan_outputs(files: Iterable[PathLike], output_dir: Path, root: Optional[Path]) -> List[Tuple[Path, Path]]:
+    paths = [Path(p) for p in files]
+    if root is None and paths:
+        root = Path(os.path.commonpath([str(p.parent.resolve()) for p in paths]))
+    jobs = []
+    for path in paths:
+        try:
+            relative = path.resolve().relative_to(root.resolve())
+        except ValueError:
+            relative = Path(path.name)
+        jobs.append((path, output_dir / relative))
+    return jobs
+
+
+_WORKER: Optional[BatchAnonymizer] = None
+
+
+def _init_worker(mapping_path: str, profile: AnonymizationProfile, patient_prefix: str, streaming: bool) -> None:
+    global _WORKER
+    _WORKER = BatchAnonymizer(MappingTable(mapping_path), profile=profile, patient_prefix=patient_prefix,
+                              streaming=streaming)
+
+
+def _worker_anonymize(job: Tuple[Path, Path]) -> dict:
+    assert _WORKER is not None
+    return _WORKER.anonymize_file(*job)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Anonymize a directory of DICOM files in parallel")
+    parser.add_argument("-d", "--directory", required=True, help="Directory containing DICOM files")
+    parser.add_argument("-o", "--output-dir", required=True, help="Destination directory (layout is mirrored)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Search for DICOM files recursively")
+    parser.add_argument("--mapping", help="SQLite mapping table shared across jobs (default: in-memory)")
+    parser.add_argument("--prefix", default="ANON", help="Prefix for pseudonymous patient IDs (default: ANON)")
+    parser.add_argument("--workers", type=int, help="Number of parallel workers")
+    parser.add_argument("--processes", action="store_true", help="Use worker processes (requires --mapping)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Rewrite headers only and copy Pixel Data bytes without decoding them")
+    parser.add_argument("--report", help="Optional JSON-lines file with one record per input file")
+    args = parser.parse_args()
+
+    files = find_dicom_files(args.directory, args.recursive)
+    if not files:
+        print("No DICOM files found.")
+        return 1
+
+    with MappingTable(args.mapping) as mapping:
+        anonymizer = BatchAnonymizer(mapping, patient_prefix=args.prefix, streaming=args.stream)
+        summary = anonymizer.run(files, args.output_dir, root=args.directory, workers=args.workers,
+                                 use_processes=args.processes)
+
+    if args.report:
+        Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report, "w", encoding="utf-8") as handle:
+            for record in summary["records"]:
+                handle.write(json.dumps(record) + "\n")
+
+    print(json.dumps({key: value for key, value in summary.items() if key != "records"}))
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -196,17 +196,17 @@ def convert_batch(files, output_dir=None, output_format='png'):
     print(f"Conversion complete: {success_count} successful, {error_count} errors")
     print(f"{'='*80}\n")
 
-def validate_batch(files):
-    """Validate multiple DICOM files."""
-    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    from validate_dicom import DicomValidator
+def validate_batch(files, fast=False):
+    """Validate multiple DICOM files; ``fast`` checks Pixel Data structure without decoding it."""
+    # validate_dicom uses package-relative imports, so it cannot go through the sys.path shim
+    from .validate_dicom import DicomValidator
 
     print(f"\nValidating {len(files)} files...")
     print(f"{'='*80}\n")
 
     valid_count = 0
     invalid_count = 0
-    validator = DicomValidator()
+    validator = DicomValidator(level="header" if fast else "full")
 
     for i, file_path in enumerate(files, 1):
         print(f"[{i}/{len(files)}] Validating: {os.path.basename(file_path)}")
@@ -257,6 +257,7 @@ Examples:
   %(prog)s -d /path/to/dicoms -o anonymize -r
   %(prog)s -d /path/to/dicoms -o convert --format png
   %(prog)s -d /path/to/dicoms -o validate
+  %(prog)s -d /path/to/dicoms -o validate -r --fast
         '''
     )
 
@@ -270,6 +271,8 @@ Examples:
     parser.add_argument('--output-dir', help='Output directory for processed files')
     parser.add_argument('--format', default='png', choices=['png', 'jpeg'],
                         help='Output format for image conversion (default: png)')
+    parser.add_argument('--fast', action='store_true',
+                        help='Validate headers and Pixel Data layout without decoding pixels')
 
     args = parser.parse_args()
 
@@ -294,7 +297,7 @@ Examples:
     elif args.operation == 'convert':
         convert_batch(files, args.output_dir, args.format)
     elif args.operation == 'validate':
-        validate_batch(files)
+        validate_batch(files, fast=args.fast)
 
     return 0
 
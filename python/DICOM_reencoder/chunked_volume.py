@@ -0,0 +1,266 @@
+#
+# chunked_volume.py
+# Dicom-Tools-py
+#
+# Chunked, compressed on-disk volume store with random block reads and an in-process chunk cache.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Store volumes as fixed-size compressed chunks.
+
+A chunked volume is a directory holding ``index.json`` (shape, dtype, chunk
+shape, codec and the metadata produced by ``build_volume``) and one
+zlib- or lzma-compressed file per chunk under ``chunks/``. Writers compress
+chunks in parallel; readers decompress only the chunks a block touches and
+keep recently used chunks in an LRU cache.
+
+    from DICOM_reencoder.chunked_volume import open_chunked
+    volume = open_chunked("output/ct.chunks")
+    block = volume[100:164, 100:164, 40:48]
+"""
+
+import json
+import lzma
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+PathLike = Union[str, Path]
+
+FORMAT_NAME = "dicom-tools-chunked"
+FORMAT_VERSION = 1
+INDEX_NAME = "index.json"
+CHUNK_DIR = "chunks"
+CODECS = ("zlib", "lzma")
+DEFAULT_CHUNK_SHAPE = (64, 64, 64)
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def _compress(data: bytes, codec: str, level: int) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(data, level)
+    return lzma.compress(data, preset=level)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    return lzma.decompress(data)
+
+
+def _chunk_name(index: Tuple[int, ...]) -> str:
+    return ".".join(str(i) for i in index)
+
+
+def _grid(shape: Sequence[int], chunk_shape: Sequence[int]) -> Tuple[int, ...]:
+    return tuple(-(-dim // chunk) for dim, chunk in zip(shape, chunk_shape))
+
+
+def _chunk_bounds(index: Tuple[int, ...], shape: Sequence[int], chunk_shape: Sequence[int]):
+    starts = [i * c for i, c in zip(index, chunk_shape)]
+    stops = [min(start + c, dim) for start, c, dim in zip(starts, chunk_shape, shape)]
+    return starts, stops
+
+
+def _json_default(value):
+    # Metadata may carry NumPy scalars or pydicom MultiValue/DSfloat entries
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def write_chunked(volume: np.ndarray, path: PathLike, *, chunk_shape: Optional[Sequence[int]] = None,
+                  codec: str = "zlib", level: int = 6, metadata: Optional[dict] = None,
+                  workers: Optional[int] = None) -> Path:
+    """Write ``volume`` (any array-like, including memmaps) as a chunked store at ``path``.
+
+    Chunks are compressed by a thread pool; zlib and lzma release the GIL while compressing.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec '{codec}'. Choose from: {', '.join(CODECS)}")
+    chunk_shape = tuple(int(c) for c in (chunk_shape or DEFAULT_CHUNK_SHAPE[:volume.ndim]))
+    if len(chunk_shape) != volume.ndim or any(c < 1 for c in chunk_shape):
+        raise ValueError(f"Chunk shape {chunk_shape} does not fit a {volume.ndim}D volume")
+
+    path = Path(path)
+    chunk_dir = path / CHUNK_DIR
+    chunk_dir.mkdir(parents=True, exist_ok=True)
+
+    def write_chunk(index: Tuple[int, ...]) -> int:
+        starts, stops = _chunk_bounds(index, volume.shape, chunk_shape)
+        block = np.ascontiguousarray(volume[tuple(slice(a, b) for a, b in zip(starts, stops))])
+        payload = _compress(block.tobytes(), codec, level)
+        (chunk_dir / _chunk_name(index)).write_bytes(payload)
+        return len(payload)
+
+    grid = _grid(volume.shape, chunk_shape)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        compressed = sum(pool.map(write_chunk, product(*(range(n) for n in grid))))
+
+    index = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "shape": list(volume.shape),
+        "dtype": np.dtype(volume.dtype).str,
+        "chunk_shape": list(chunk_shape),
+        "codec": codec,
+        "compressed_bytes": int(compressed),
+        "metadata": metadata or {},
+    }
+    # Written last so a reader never sees an index without its chunks
+    (path / INDEX_NAME).write_text(json.dumps(index, indent=2, default=_json_default), encoding="utf-8")
+    return path
+
+
+class ChunkCache:
+    """Thread-safe LRU cache of decompressed chunks bounded by total bytes."""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Tuple[int, ...], np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[int, ...]) -> Optional[np.ndarray]:
+        with self._lock:
+            chunk = self._items.get(key)
+            if chunk is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return chunk
+
+    def put(self, key: Tuple[int, ...], chunk: np.ndarray) -> None:
+        if chunk.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = chunk
+            self._bytes += chunk.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class ChunkedVolume:
+    """Read-only view over a chunked store; supports basic slicing like an ndarray."""
+
+    def __init__(self, path: PathLike, *, cache_bytes: int = DEFAULT_CACHE_BYTES, workers: Optional[int] = None):
+        self.path = Path(path)
+        index = json.loads((self.path / INDEX_NAME).read_text(encoding="utf-8"))
+        if index.get("format") != FORMAT_NAME:
+            raise ValueError(f"{self.path} is not a chunked volume store")
+        self.shape: Tuple[int, ...] = tuple(index["shape"])
+        self.dtype = np.dtype(index["dtype"])
+        self.chunk_shape: Tuple[int, ...] = tuple(index["chunk_shape"])
+        self.codec: str = index["codec"]
+        self.metadata: Dict = index.get("metadata", {})
+        self.cache = ChunkCache(cache_bytes)
+        self.workers = workers
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def affine(self) -> Optional[np.ndarray]:
+        affine = self.metadata.get("affine")
+        return np.asarray(affine, dtype=np.float32) if affine is not None else None
+
+    def _load_chunk(self, index: Tuple[int, ...]) -> np.ndarray:
+        chunk = self.cache.get(index)
+        if chunk is not None:
+            return chunk
+        starts, stops = _chunk_bounds(index, self.shape, self.chunk_shape)
+        raw = _decompress((self.path / CHUNK_DIR / _chunk_name(index)).read_bytes(), self.codec)
+        chunk = np.frombuffer(raw, dtype=self.dtype).reshape([b - a for a, b in zip(starts, stops)])
+        self.cache.put(index, chunk)
+        return chunk
+
+    def _chunks_for(self, lo: Sequence[int], hi: Sequence[int]) -> Iterator[Tuple[int, ...]]:
+        ranges = [range(a // c, (b - 1) // c + 1) for a, b, c in zip(lo, hi, self.chunk_shape)]
+        return product(*ranges)
+
+    def read_block(self, lo: Sequence[int], hi: Sequence[int]) -> np.ndarray:
+        """Return ``volume[lo[0]:hi[0], lo[1]:hi[1], ...]`` decompressing only the chunks it touches."""
+        lo = [int(v) for v in lo]
+        hi = [int(v) for v in hi]
+        if any(a < 0 or b > dim or a > b for a, b, dim in zip(lo, hi, self.shape)):
+            raise IndexError(f"Block {lo}-{hi} is outside volume of shape {self.shape}")
+        out = np.empty([b - a for a, b in zip(lo, hi)], dtype=self.dtype)
+        if out.size == 0:
+            return out
+
+        indices = list(self._chunks_for(lo, hi))
+        if self.workers and self.workers > 1 and len(indices) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                chunks = list(pool.map(self._load_chunk, indices))
+        else:
+            chunks = [self._load_chunk(index) for index in indices]
+
+        for index, chunk in zip(indices, chunks):
+            starts, stops = _chunk_bounds(index, self.shape, self.chunk_shape)
+            src = tuple(slice(max(a, l) - a, min(b, h) - a) for a, b, l, h in zip(starts, stops, lo, hi))
+            dst = tuple(slice(max(a, l) - l, min(b, h) - l) for a, b, l, h in zip(starts, stops, lo, hi))
+            out[dst] = chunk[src]
+        return out
+
+    def __getitem__(self, key) -> np.ndarray:
+        if not isinstance(key, tuple):
+            key = (key,)
+        if any(k is Ellipsis for k in key):
+            position = key.index(Ellipsis)
+            key = key[:position] + (slice(None),) * (self.ndim - len(key) + 1) + key[position + 1:]
+        key = key + (slice(None),) * (self.ndim - len(key))
+        if len(key) != self.ndim:
+            raise IndexError(f"Too many indices for a {self.ndim}D volume")
+
+        lo, hi, strides = [], [], []
+        for axis, (item, dim) in enumerate(zip(key, self.shape)):
+            if isinstance(item, slice):
+                start, stop, step = item.indices(dim)
+                if step < 0:
+                    raise IndexError("Negative steps are not supported")
+                stop = max(start, stop)
+                lo.append(start)
+                hi.append(stop)
+                strides.append(slice(None, None, step))
+            else:
+                position = int(item)
+                position = position + dim if position < 0 else position
+                if not 0 <= position < dim:
+                    raise IndexError(f"Index {item} is out of bounds for axis {axis} with size {dim}")
+                lo.append(position)
+                hi.append(position + 1)
+                # Integer indices drop their axis, as with ndarray indexing
+                strides.append(0)
+        block = self.read_block(lo, hi)
+        return block[tuple(s if isinstance(s, slice) else 0 for s in strides)]
+
+    def __array__(self, dtype=None, copy=None):
+        data = self.read_block([0] * self.ndim, self.shape)
+        return data.astype(dtype) if dtype is not None else data
+
+
+def open_chunked(path: PathLike, **kwargs) -> ChunkedVolume:
+    """Open a chunked volume store for reading."""
+    return ChunkedVolume(path, **kwargs)
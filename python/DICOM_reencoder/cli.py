@@ -19,6 +19,8 @@ from .anonymize_dicom import anonymize_dicom
 from .core import calculate_statistics, frame_to_png_bytes, load_dataset, save_dataset, summarize_metadata
 from .core.network import send_c_echo
 from .validate_dicom import DicomValidator
+from .validation_rules import load_profile
+from .volume_builder import parse_size
 
 
 def cmd_summary(args: argparse.Namespace) -> None:
@@ -70,7 +72,14 @@ def cmd_png(args: argparse.Namespace) -> None:
 
 def cmd_anonymize(args: argparse.Namespace) -> None:
     inferred_output = args.output or str(Path(args.file).with_name(f"{Path(args.file).stem}_anonymized{Path(args.file).suffix}"))
-    anonymize_dicom(args.file, inferred_output)
+    if getattr(args, "stream", False):
+        from .batch_anonymize import anonymize_stream
+
+        record = anonymize_stream(args.file, inferred_output)
+        if record["status"] != "ok":
+            raise SystemExit(f"Anonymization failed: {record['error']}")
+    else:
+        anonymize_dicom(args.file, inferred_output)
     print(f"Anonymized file written to {inferred_output}")
 
 
@@ -79,30 +88,101 @@ def cmd_echo(args: argparse.Namespace) -> None:
     print(f"C-ECHO status: 0x{status:04x}")
 
 
+def cmd_send(args: argparse.Namespace) -> None:
+    from .dicom_send import DicomSender, enable_chunked_send, summarize
+
+    enable_chunked_send()
+    sender = DicomSender(
+        args.host,
+        args.port,
+        calling_aet=getattr(args, "aet", "DICOMTOOLS_SCU"),
+        called_aet=getattr(args, "aec", "ANY-SCP"),
+        associations=getattr(args, "associations", 4),
+        retries=getattr(args, "retries", 2),
+    )
+    results = sender.send(args.paths)
+    print(json.dumps(summarize(results, sender.elapsed), indent=2))
+
+
+def cmd_storescp(args: argparse.Namespace) -> None:
+    from .storage_scp import StorageSCP, command_hook
+
+    scp = StorageSCP(
+        args.output_dir,
+        host=args.host,
+        port=args.port,
+        ae_title=args.aet,
+        transfer_syntaxes=getattr(args, "transfer_syntaxes", "uncompressed"),
+        max_associations=getattr(args, "max_associations", 10),
+        queue_size=getattr(args, "queue_size", 256),
+        layout=getattr(args, "layout", "series"),
+        fsync=getattr(args, "fsync", "batch"),
+        hooks=[command_hook(command) for command in getattr(args, "commands", None) or []],
+    )
+    print(f"Storage SCP {args.aet} listening on {args.host}:{scp.port}, writing to {args.output_dir}")
+    try:
+        scp.start(block=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scp.stop()
+        print(json.dumps(scp.stats(), indent=2))
+
+
 def cmd_web(args: argparse.Namespace) -> None:
     web_interface.app.run(host=args.host, port=args.port, debug=args.debug)
 
 
-def cmd_volume(args: argparse.Namespace) -> None:
-    from .volume_builder import build_volume
+def _volume_cache(args: argparse.Namespace):
+    from .volume_cache import VolumeCache
 
-    directory = Path(args.directory)
-    volume, _, metadata = build_volume(directory)
+    if not getattr(args, "cache", False):
+        return None
+    return VolumeCache(getattr(args, "cache_dir", None), max_bytes=getattr(args, "cache_size", None))
 
-    if args.preview:
-        print(json.dumps(metadata, indent=2))
-        return
 
-    output_path = Path(args.output) if args.output else Path("output") / f"{directory.name}_volume.npy"
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    np.save(output_path, volume)
+def _add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse and store results in the persistent volume cache (off by default; LRU, 10G budget)")
+    parser.add_argument("--no-cache", dest="cache", action="store_false", help="Do not use the volume cache (default)")
+    parser.add_argument("--refresh", action="store_true", help="Rebuild and replace the cached entry")
+    parser.add_argument("--cache-dir", help="Volume cache directory (default: $DICOM_TOOLS_CACHE_DIR or ~/.cache)")
+    parser.add_argument("--cache-size", type=parse_size, help="Volume cache budget, e.g. 20G (default: 10G)")
 
-    meta_path = Path(args.metadata) if args.metadata else output_path.with_suffix(".json")
-    meta_path.parent.mkdir(parents=True, exist_ok=True)
-    meta_path.write_text(json.dumps(metadata, indent=2), encoding="utf-8")
 
-    print(f"Volume saved to {output_path} (shape={metadata['shape']}, dtype={metadata['dtype']})")
-    print(f"Metadata written to {meta_path}")
+def cmd_volume(args: argparse.Namespace) -> None:
+    from .volume_builder import export_volume, print_export
+
+    try:
+        result = export_volume(
+            Path(args.directory),
+            output=args.output,
+            metadata_path=args.metadata,
+            fmt=getattr(args, "format", "npy"),
+            preview=args.preview,
+            preflight=getattr(args, "preflight", False),
+            engine=getattr(args, "engine", "native"),
+            workers=getattr(args, "workers", None),
+            out_of_core=getattr(args, "out_of_core", False),
+            max_memory=getattr(args, "max_memory", None),
+            chunk_size=getattr(args, "chunk_size", None) or 64,
+            codec=getattr(args, "codec", None) or "zlib",
+            frames=_frame_selection(args),
+            resample=getattr(args, "resample", None),
+            pyramid=getattr(args, "pyramid", None) or 1,
+            cache=_volume_cache(args),
+            refresh=getattr(args, "refresh", False),
+        )
+    except ValueError as exc:
+        raise SystemExit(f"Volume export failed: {exc}")
+    print_export(result)
+
+
+def _frame_selection(args: argparse.Namespace) -> dict:
+    """Multi-frame selection options of the volume command (empty when none were given)."""
+    selection = {"stack_id": getattr(args, "stack_id", None),
+                 "temporal_position": getattr(args, "temporal_position", None)}
+    return {key: value for key, value in selection.items() if value is not None}
 
 
 def cmd_nifti(args: argparse.Namespace) -> None:
@@ -114,11 +194,77 @@ def cmd_nifti(args: argparse.Namespace) -> None:
         output=args.output,
         compress=not args.no_compress,
         metadata_path=args.metadata,
+        preflight=getattr(args, "preflight", False),
+        cache=_volume_cache(args),
+        refresh=getattr(args, "refresh", False),
+        backend=getattr(args, "backend", "native"),
+        version=getattr(args, "nifti_version", 1),
+        workers=getattr(args, "workers", None),
     )
     print(f"NIfTI saved to {output_path}")
     print(json.dumps(meta, indent=2))
 
 
+def cmd_export(args: argparse.Namespace) -> None:
+    from .series_export import export_series, print_manifest
+
+    manifest = export_series(
+        args.directory,
+        args.output,
+        fmt=args.format,
+        recursive=not getattr(args, "no_recursive", False),
+        series_uids=getattr(args, "series_uid", None),
+        modalities=getattr(args, "modality", None),
+        match=getattr(args, "match", None),
+        min_instances=getattr(args, "min_instances", 1),
+        compress=not getattr(args, "no_compress", False),
+        jobs=getattr(args, "jobs", None),
+        workers=getattr(args, "workers", None),
+    )
+    print_manifest(manifest, args.output)
+    if manifest["failed"]:
+        raise SystemExit(1)
+
+
+def cmd_project(args: argparse.Namespace) -> None:
+    from PIL import Image
+
+    from .mpr import orient_plane, window_to_uint8
+    from .projection import load_volume, normalize_mode, project, project_slabs, resolve_axis, volume_order_view
+
+    source = Path(args.source)
+    mode = normalize_mode(args.mode)
+    plane = getattr(args, "plane", "axial")
+    workers = getattr(args, "workers", None)
+    slab = getattr(args, "slab", None)
+    volume, _ = load_volume(source, cache=_volume_cache(args))
+
+    if slab:
+        # Sliding slabs go to a display-ordered .npy stack written in place through a memmap
+        output_path = Path(args.output) if args.output else Path("output") / f"{source.stem}_{mode}_{plane}_slab{slab}.npy"
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        step = getattr(args, "step", 1) or 1
+        axis = resolve_axis(plane)
+        # Display planes are the transposed remaining axes (see mpr.orient_plane)
+        display_shape = tuple(dim for i, dim in enumerate(volume.shape) if i != axis)[::-1]
+        positions = len(range(0, volume.shape[axis], step))
+        stack = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float32 if mode == "mean" else volume.dtype,
+                                          shape=(positions,) + display_shape)
+        project_slabs(volume, plane, slab, mode, step=step, out=volume_order_view(stack, plane), workers=workers)
+        stack.flush()
+        print(f"{stack.shape[0]} {mode} slabs of {slab} planes saved to {output_path} (shape={list(stack.shape)})")
+        return
+
+    image = orient_plane(project(volume, plane, mode, workers=workers), plane)
+    output_path = Path(args.output) if args.output else Path("output") / f"{source.stem}_{mode}_{plane}.png"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if output_path.suffix == ".npy":
+        np.save(output_path, image)
+    else:
+        Image.fromarray(window_to_uint8(image, args.window_center, args.window_width)).save(output_path)
+    print(f"{mode} projection saved to {output_path} (shape={list(image.shape)})")
+
+
 def cmd_transcode(args: argparse.Namespace) -> None:
     from .transcode_dicom import transcode
 
@@ -127,14 +273,19 @@ def cmd_transcode(args: argparse.Namespace) -> None:
 
 
 def cmd_validate(args: argparse.Namespace) -> None:
-    validator = DicomValidator()
+    profile = getattr(args, "profile", None)
+    rules = load_profile(profile) if profile else None
+    validator = DicomValidator(level="header" if getattr(args, "fast", False) else "full", rules=rules)
     ok = validator.validate_file(args.file, display=False)
     result = {
         "ok": bool(ok),
         "errors": validator.errors,
         "warnings": validator.warnings,
         "info": validator.info,
+        "findings": validator.to_dict()["findings"],
     }
+    if getattr(args, "rule_stats", False):
+        result["rule_stats"] = validator.engine.stats_dict()
 
     if args.json:
         print(json.dumps(result, indent=2))
@@ -175,6 +326,8 @@ def main() -> None:
     anonymize = sub.add_parser("anonymize", help="Anonymize a DICOM file")
     anonymize.add_argument("file")
     anonymize.add_argument("-o", "--output", help="Output path")
+    anonymize.add_argument("--stream", action="store_true",
+                           help="Rewrite the header only and copy Pixel Data bytes untouched")
     anonymize.set_defaults(func=cmd_anonymize)
 
     echo = sub.add_parser("echo", help="Send a C-ECHO to a remote host")
@@ -182,6 +335,32 @@ def main() -> None:
     echo.add_argument("--port", type=int, default=11112)
     echo.set_defaults(func=cmd_echo)
 
+    send = sub.add_parser("send", help="Send files or folders to a Storage SCP over parallel associations")
+    send.add_argument("host")
+    send.add_argument("port", type=int)
+    send.add_argument("paths", nargs="+")
+    send.add_argument("--aet", default="DICOMTOOLS_SCU")
+    send.add_argument("--aec", default="ANY-SCP")
+    send.add_argument("-j", "--associations", type=int, default=4)
+    send.add_argument("--retries", type=int, default=2)
+    send.set_defaults(func=cmd_send)
+
+    storescp = sub.add_parser("storescp", help="Run a Storage SCP writing received instances by study/series")
+    storescp.add_argument("-o", "--output-dir", default="./dicom_received")
+    storescp.add_argument("--host", default="0.0.0.0")
+    storescp.add_argument("--port", type=int, default=11112)
+    storescp.add_argument("--aet", default="DICOMTOOLS_SCP")
+    storescp.add_argument("--transfer-syntaxes", default="uncompressed",
+                          help="uncompressed, all, native, lossless, lossy, or comma-separated transfer syntax UIDs")
+    storescp.add_argument("--max-associations", type=int, default=10)
+    storescp.add_argument("--queue-size", type=int, default=256,
+                          help="Instances buffered for the disk before senders are slowed")
+    storescp.add_argument("--layout", choices=["flat", "series"], default="series")
+    storescp.add_argument("--fsync", choices=["none", "batch", "always"], default="batch")
+    storescp.add_argument("--exec", dest="commands", action="append",
+                          help="Command run for each written file ({} is replaced by the path)")
+    storescp.set_defaults(func=cmd_storescp)
+
     web = sub.add_parser("web", help="Launch the web interface")
     web.add_argument("--host", default="127.0.0.1")
     web.add_argument("--port", type=int, default=5000)
@@ -189,20 +368,72 @@ def main() -> None:
     web.set_defaults(func=cmd_web)
 
     volume = sub.add_parser("volume", help="Build a 3D volume from a DICOM directory")
-    volume.add_argument("directory", help="Directory containing DICOM slices")
-    volume.add_argument("-o", "--output", help="Output .npy path (default: output/<dir>_volume.npy)")
+    volume.add_argument("directory", help="Directory containing DICOM slices, or an enhanced multi-frame file")
+    volume.add_argument("-o", "--output",
+                        help="Output .npy path, or store directory for --format chunked (default: output/<dir>_volume.*)")
     volume.add_argument("--metadata", help="Optional metadata JSON path (default: alongside .npy)")
     volume.add_argument("--preview", action="store_true", help="Only print metadata without writing files")
+    volume.add_argument("--preflight", action="store_true", help="Validate series headers before loading pixels")
+    volume.add_argument("--engine", choices=["native", "dicom-numpy"], default="native", help="Slice assembler")
+    volume.add_argument("--workers", type=int, help="Parallel slice decoders for the native engine")
+    volume.add_argument("--out-of-core", action="store_true", help="Stream slices into a memory-mapped .npy")
+    volume.add_argument("--max-memory", type=parse_size, help="In-flight slice budget, e.g. 2G (implies --out-of-core)")
+    volume.add_argument("--format", choices=["npy", "chunked"], default="npy",
+                        help="Output format: single .npy or a directory of compressed chunks with a JSON index")
+    volume.add_argument("--chunk-size", type=int, default=64, help="Chunk edge length for --format chunked")
+    volume.add_argument("--codec", choices=["zlib", "lzma"], default="zlib", help="Chunk compression codec")
+    volume.add_argument("--stack-id", help="Multi-frame input: build only frames of this StackID")
+    volume.add_argument("--temporal-position", type=int, help="Multi-frame input: TemporalPositionIndex to build")
+    volume.add_argument("--resample", type=float, metavar="MM", help="Resample to isotropic voxels of this size")
+    volume.add_argument("--pyramid", type=int, default=1, metavar="LEVELS",
+                        help="Pyramid levels including the base; each level halves the resolution (block mean)")
+    _add_cache_arguments(volume)
     volume.set_defaults(func=cmd_volume)
 
-    nifti = sub.add_parser("nifti", help="Export a DICOM series to NIfTI using SimpleITK")
+    nifti = sub.add_parser("nifti", help="Export a DICOM series to NIfTI")
     nifti.add_argument("directory", help="Directory containing the DICOM series")
     nifti.add_argument("-o", "--output", help="Output .nii/.nii.gz path")
     nifti.add_argument("--series-uid", help="SeriesInstanceUID to export when multiple series exist")
     nifti.add_argument("--no-compress", action="store_true", help="Disable gzip compression")
     nifti.add_argument("--metadata", help="Optional metadata JSON path")
+    nifti.add_argument("--preflight", action="store_true", help="Validate series headers before reading pixels")
+    nifti.add_argument("--backend", choices=("native", "simpleitk"), default="native",
+                       help="native streaming writer (default) or SimpleITK")
+    nifti.add_argument("--nifti-version", type=int, choices=(1, 2), default=1, help="NIfTI format version (native)")
+    nifti.add_argument("--workers", type=int, help="Slice decoding and gzip threads (native)")
+    _add_cache_arguments(nifti)
     nifti.set_defaults(func=cmd_nifti)
 
+    export = sub.add_parser("export", help="Export every series/stack of a directory with a manifest")
+    export.add_argument("directory", help="Study directory (scanned recursively)")
+    export.add_argument("-o", "--output", default="output/series", help="Output directory")
+    export.add_argument("--format", choices=["nifti", "npy"], default="nifti", help="Volume format")
+    export.add_argument("--no-recursive", action="store_true", help="Only scan the top-level directory")
+    export.add_argument("--series-uid", action="append", help="Export only this SeriesInstanceUID (repeatable)")
+    export.add_argument("--modality", action="append", help="Export only this modality (repeatable)")
+    export.add_argument("--match", help="Case-insensitive glob on SeriesDescription")
+    export.add_argument("--min-instances", type=int, default=1, help="Skip stacks with fewer instances")
+    export.add_argument("--no-compress", action="store_true", help="Write .nii instead of .nii.gz")
+    export.add_argument("--jobs", type=int, help="Stacks exported concurrently")
+    export.add_argument("--workers", type=int, help="Decoder threads per stack")
+    export.set_defaults(func=cmd_export)
+
+    projection = sub.add_parser("project", help="Maximum/minimum/average intensity projection of a volume")
+    projection.add_argument("source", help="DICOM series directory, volume .npy or chunked volume store")
+    projection.add_argument("-o", "--output",
+                            help="Output .png/.npy (default: output/<source>_<mode>_<plane>.png; slabs: .npy stack)")
+    projection.add_argument("--mode", default="mip", choices=["mip", "minip", "avgip", "max", "min", "mean"],
+                            help="Projection type")
+    projection.add_argument("--plane", choices=["axial", "coronal", "sagittal"], default="axial",
+                            help="Projection plane (projects along its normal)")
+    projection.add_argument("--slab", type=int, help="Sliding slab thickness in planes (writes one slab per position)")
+    projection.add_argument("--step", type=int, default=1, help="Positions between consecutive slabs")
+    projection.add_argument("--workers", type=int, help="Worker threads for the reduction")
+    projection.add_argument("--window-center", type=float, help="Window center for PNG output (default: full range)")
+    projection.add_argument("--window-width", type=float, help="Window width for PNG output")
+    _add_cache_arguments(projection)
+    projection.set_defaults(func=cmd_project)
+
     transcode = sub.add_parser("transcode", help="Transcode a DICOM file to a different transfer syntax using GDCM")
     transcode.add_argument("file", help="Input DICOM file")
     transcode.add_argument("-o", "--output", help="Output file (default: <stem>_<syntax>.dcm)")
@@ -214,6 +445,13 @@ def main() -> None:
     validate.add_argument("file", help="Input DICOM file")
     validate.add_argument("--json", action="store_true", help="Emit structured validation results")
     validate.add_argument("--include-info", action="store_true", help="Print informational checks in text mode")
+    validate.add_argument(
+        "--fast",
+        action="store_true",
+        help="Header-only validation: check Pixel Data length/fragments without decoding",
+    )
+    validate.add_argument("--profile", help="JSON site profile with extra declarative rules")
+    validate.add_argument("--rule-stats", action="store_true", help="Include per-rule timing and hit counts in --json")
     validate.set_defaults(func=cmd_validate)
 
     args = parser.parse_args()
@@ -12,6 +12,7 @@ This module centralizes reusable helpers so both the CLI and web layers
 can rely on the same implementations.
 """
 
+from .association_pool import AssociationPool, open_association
 from .datasets import dataset_from_dicom_json, dataset_to_dicom_json, ensure_pixel_data, load_dataset, save_dataset
 from .factories import (
     build_basic_text_sr,
@@ -24,7 +25,7 @@ from .factories import (
 )
 from .images import calculate_statistics, frame_to_png_bytes, get_frame, window_frame
 from .metadata import summarize_metadata
-from .network import VerificationServer, send_c_echo
+from .network import VerificationServer, pick_free_port, send_c_echo
 
 # Re-export common helpers so callers can import from a single namespace
 __all__ = [
@@ -43,6 +44,9 @@ __all__ = [
     "summarize_metadata",
     "VerificationServer",
     "send_c_echo",
+    "pick_free_port",
+    "AssociationPool",
+    "open_association",
     "dataset_to_dicom_json",
     "dataset_from_dicom_json",
     "build_special_vr_dataset",
@@ -0,0 +1,298 @@
+#
+# association_pool.py
+# Dicom-Tools-py
+#
+# Keeps established pynetdicom associations alive so batches of SCU requests can reuse them.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Association pooling for SCU operations.
+
+Negotiating an association costs a TCP handshake plus an A-ASSOCIATE round
+trip, which dominates short requests such as a single C-FIND. An
+``AssociationPool`` keeps released associations open, keyed by peer address,
+AE titles, requested presentation contexts and role selections, and hands them
+back to later requests with the same key:
+
+    pool = AssociationPool(max_size=4, idle_timeout=60)
+    with pool:
+        for query in queries:
+            results = query_pacs(host, port, aet, aec, query, pool=pool)
+
+Idle associations are released after ``idle_timeout`` seconds. One that sat
+idle longer than ``health_check_interval`` is verified with a C-ECHO before it
+is reused, and one the peer aborted (or that failed mid-request) is dropped so
+the next request re-associates transparently.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from pynetdicom import AE
+from pynetdicom.association import Association
+from pynetdicom.presentation import PresentationContext, build_context, build_role
+from pynetdicom.sop_class import Verification
+
+# The A-ASSOCIATE-RQ carries at most 128 presentation contexts
+MAX_CONTEXTS = 128
+
+ContextSpec = Union[str, PresentationContext]
+RoleSpec = Tuple[str, bool, bool]
+
+
+def _contexts(contexts: Sequence[ContextSpec]) -> List[PresentationContext]:
+    """Normalise SOP class UIDs and PresentationContexts into a fresh list of contexts."""
+    built = []
+    for context in contexts:
+        if isinstance(context, PresentationContext):
+            built.append(build_context(context.abstract_syntax, context.transfer_syntax))
+        else:
+            built.append(build_context(context))
+    return built
+
+
+def _with_verification(contexts: List[PresentationContext]) -> List[PresentationContext]:
+    """Append Verification so idle associations can be health checked, when there is room."""
+    if len(contexts) < MAX_CONTEXTS and all(cx.abstract_syntax != Verification for cx in contexts):
+        contexts = contexts + [build_context(Verification)]
+    return contexts
+
+
+def _associate(ae: AE, host: str, port: int, contexts: List[PresentationContext], called_aet: str,
+               roles: Sequence[RoleSpec], evt_handlers) -> Association:
+    ext_neg = [build_role(uid, scu_role=scu, scp_role=scp) for uid, scu, scp in roles] or None
+    return ae.associate(host, port, contexts=contexts, ae_title=called_aet, ext_neg=ext_neg,
+                        evt_handlers=evt_handlers)
+
+
+def _make_ae(calling_aet: str, timeout: Optional[float]) -> AE:
+    ae = AE(ae_title=calling_aet)
+    ae.acse_timeout = timeout
+    ae.dimse_timeout = timeout
+    ae.network_timeout = timeout
+    return ae
+
+
+class AssociationPool:
+    """Thread-safe pool of established associations shared by the SCU helpers."""
+
+    def __init__(self, max_size: int = 4, idle_timeout: float = 60.0, health_check_interval: Optional[float] = 30.0,
+                 timeout: Optional[float] = 30):
+        """
+        Args:
+            max_size: Most live associations (idle plus leased) per key; further requests wait.
+            idle_timeout: Seconds an unused association stays open before it is released.
+            health_check_interval: Idle seconds after which a C-ECHO verifies the association
+                before reuse (None disables the check).
+            timeout: ACSE, DIMSE and network timeout for new associations.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._idle: Dict[tuple, List[Tuple[Association, float]]] = {}
+        self._live: Dict[tuple, int] = {}
+        self._aes: Dict[str, AE] = {}
+        self._closed = False
+        self.stats = {"created": 0, "reused": 0, "expired": 0, "failed_checks": 0, "dropped": 0}
+
+    def __enter__(self) -> "AssociationPool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    @staticmethod
+    def key(host: str, port: int, contexts: Sequence[PresentationContext], *, calling_aet: str, called_aet: str,
+            roles: Sequence[RoleSpec] = ()) -> tuple:
+        """Pool key: associations are only shared between requests that would negotiate the same thing."""
+        negotiated = tuple((str(cx.abstract_syntax), tuple(str(ts) for ts in cx.transfer_syntax)) for cx in contexts)
+        return (host, int(port), called_aet, calling_aet, negotiated, tuple(roles))
+
+    def _ae(self, calling_aet: str) -> AE:
+        with self._cond:
+            if calling_aet not in self._aes:
+                self._aes[calling_aet] = _make_ae(calling_aet, self.timeout)
+            return self._aes[calling_aet]
+
+    def _expire_locked(self, now: float) -> List[Association]:
+        """Detach idle associations past the idle timeout; the caller releases them outside the lock."""
+        expired = []
+        for key, idle in self._idle.items():
+            keep = []
+            for assoc, last_used in idle:
+                if now - last_used >= self.idle_timeout or not assoc.is_established:
+                    expired.append(assoc)
+                    self._live[key] -= 1
+                else:
+                    keep.append((assoc, last_used))
+            idle[:] = keep
+        if expired:
+            self.stats["expired"] += len(expired)
+            self._cond.notify_all()
+        return expired
+
+    def _healthy(self, assoc: Association, last_used: float) -> bool:
+        if not assoc.is_established:
+            return False
+        if self.health_check_interval is None or time.monotonic() - last_used < self.health_check_interval:
+            return True
+        if all(cx.abstract_syntax != Verification for cx in assoc.accepted_contexts):
+            return True
+        try:
+            status = assoc.send_c_echo()
+        except Exception:  # noqa: BLE001 - any failure means the association is unusable
+            return False
+        return bool(status) and status.Status == 0x0000 and assoc.is_established
+
+    @staticmethod
+    def _close(assoc: Association) -> None:
+        try:
+            if assoc.is_established:
+                assoc.release()
+        except Exception:  # noqa: BLE001 - the peer may already be gone
+            assoc.abort()
+
+    @contextmanager
+    def acquire(self, host: str, port: int, contexts: Sequence[ContextSpec], *, calling_aet: str = "DICOMTOOLS_SCU",
+                called_aet: str = "ANY-SCP", roles: Sequence[RoleSpec] = (), evt_handlers=None,
+                wait: Optional[float] = None) -> Iterator[Association]:
+        """
+        Lease an association for the duration of the ``with`` block.
+
+        The yielded association may not be established when the peer rejected it; callers check
+        ``is_established`` exactly as with ``AE.associate``. ``evt_handlers`` (e.g. a C-STORE
+        handler for C-GET) are bound for the lease only. An exception inside the block aborts the
+        association instead of returning it to the pool. Raises ``TimeoutError`` when ``max_size``
+        associations stay leased for more than ``wait`` seconds.
+        """
+        requested = _with_verification(_contexts(contexts))
+        key = self.key(host, port, requested, calling_aet=calling_aet, called_aet=called_aet, roles=roles)
+        deadline = None if wait is None else time.monotonic() + wait
+        assoc = None
+        last_used = 0.0
+        expired: List[Association] = []
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Association pool is closed")
+                expired += self._expire_locked(time.monotonic())
+                idle = self._idle.setdefault(key, [])
+                if idle:
+                    # Most recently used first: it is the least likely to have been dropped by the peer
+                    assoc, last_used = idle.pop()
+                    break
+                if self._live.get(key, 0) < self.max_size:
+                    self._live[key] = self._live.get(key, 0) + 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No pooled association to {host}:{port} became available")
+                self._cond.wait(remaining)
+        for stale in expired:
+            self._close(stale)
+
+        try:
+            if assoc is not None and not self._healthy(assoc, last_used):
+                with self._cond:
+                    self.stats["failed_checks"] += 1
+                assoc.abort()
+                assoc = None
+            if assoc is None:
+                assoc = _associate(self._ae(calling_aet), host, port, requested, called_aet, roles, None)
+                with self._cond:
+                    self.stats["created"] += 1
+            else:
+                with self._cond:
+                    self.stats["reused"] += 1
+        except BaseException:
+            self._return(key, assoc if assoc is not None and assoc.is_established else None)
+            raise
+
+        bound = list(evt_handlers or [])
+        for event, handler in bound:
+            assoc.bind(event, handler)
+        try:
+            yield assoc
+        except BaseException:
+            if assoc.is_established:
+                assoc.abort()
+            raise
+        finally:
+            for event, handler in bound:
+                assoc.unbind(event, handler)
+            self._return(key, assoc)
+
+    def _return(self, key: tuple, assoc: Optional[Association]) -> None:
+        with self._cond:
+            if assoc is not None and assoc.is_established and not self._closed:
+                self._idle.setdefault(key, []).append((assoc, time.monotonic()))
+            else:
+                if assoc is not None:
+                    self.stats["dropped"] += 1
+                self._live[key] -= 1
+            self._cond.notify_all()
+            closed = self._closed
+        if closed and assoc is not None:
+            self._close(assoc)
+
+    def prune(self) -> int:
+        """Release idle associations past the idle timeout now; returns how many were released."""
+        with self._cond:
+            expired = self._expire_locked(time.monotonic())
+        for assoc in expired:
+            self._close(assoc)
+        return len(expired)
+
+    @property
+    def idle_count(self) -> int:
+        with self._cond:
+            return sum(len(idle) for idle in self._idle.values())
+
+    def close(self) -> None:
+        """Release every idle association; leased ones are released when they are returned."""
+        with self._cond:
+            self._closed = True
+            idle = [assoc for entries in self._idle.values() for assoc, _ in entries]
+            for key, entries in self._idle.items():
+                self._live[key] -= len(entries)
+            self._idle.clear()
+            self._cond.notify_all()
+        for assoc in idle:
+            self._close(assoc)
+        for ae in list(self._aes.values()):
+            ae.shutdown()
+
+
+@contextmanager
+def open_association(host: str, port: int, contexts: Sequence[ContextSpec], *, calling_aet: str = "DICOMTOOLS_SCU",
+                     called_aet: str = "ANY-SCP", roles: Sequence[RoleSpec] = (), evt_handlers=None,
+                     pool: Optional[AssociationPool] = None, timeout: Optional[float] = None) -> Iterator[Association]:
+    """
+    Yield an association for one SCU operation, pooled when ``pool`` is given.
+
+    Without a pool a dedicated association is negotiated and released afterwards, which is
+    what the SCU helpers did before pooling existed. ``timeout`` only applies to unpooled
+    associations; pooled ones use the pool's timeout.
+    """
+    if pool is not None:
+        with pool.acquire(host, port, contexts, calling_aet=calling_aet, called_aet=called_aet, roles=roles,
+                          evt_handlers=evt_handlers) as assoc:
+            yield assoc
+        return
+
+    ae = _make_ae(calling_aet, timeout)
+    assoc = _associate(ae, host, port, _contexts(contexts), called_aet, roles, evt_handlers)
+    try:
+        yield assoc
+    finally:
+        if assoc.is_established:
+            # Ensure network resources are cleaned up even when exceptions occur
+            assoc.release()
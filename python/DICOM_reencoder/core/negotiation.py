@@ -0,0 +1,123 @@
+#
+# negotiation.py
+# Dicom-Tools-py
+#
+# Transfer syntax negotiation policies for storage contexts and statistics on what was negotiated.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Transfer syntax negotiation policies.
+
+The storage contexts proposed (as SCU) or supported (as SCP) decide what a peer
+may send. pynetdicom's defaults only cover the uncompressed syntaxes. A PACS
+holding JPEG 2000 studies then has to decompress them and send several times
+the bytes. A policy names the accepted syntaxes in order of preference:
+
+* ``native``: uncompressed only. Every consumer can decode it.
+* ``lossless``: compressed lossless first (JPEG 2000, JPEG-LS, JPEG Lossless,
+  RLE, Deflate), then uncompressed.
+* ``lossy``: like ``lossless``, followed by the lossy JPEG family, so lossy
+  studies are accepted as stored instead of being transcoded or rejected.
+
+An acceptor picks the first of its own syntaxes that the requestor offered,
+so the order matters most on the SCP side. Received instances are written in
+whatever syntax was negotiated (see ``StorageWriter``).
+``TransferSyntaxStats`` counts what was actually negotiated and received.
+"""
+
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from pydicom.uid import (
+    UID,
+    DeflatedExplicitVRLittleEndian,
+    ExplicitVRLittleEndian,
+    ImplicitVRLittleEndian,
+    JPEG2000,
+    JPEG2000Lossless,
+    JPEGBaseline8Bit,
+    JPEGExtended12Bit,
+    JPEGLossless,
+    JPEGLosslessSV1,
+    JPEGLSLossless,
+    JPEGLSNearLossless,
+    RLELossless,
+)
+from pynetdicom import StoragePresentationContexts
+from pynetdicom.presentation import PresentationContext, build_context
+
+NATIVE = [ExplicitVRLittleEndian, ImplicitVRLittleEndian]
+LOSSLESS = [JPEG2000Lossless, JPEGLSLossless, JPEGLosslessSV1, JPEGLossless, RLELossless,
+            DeflatedExplicitVRLittleEndian] + NATIVE
+LOSSY = LOSSLESS + [JPEG2000, JPEGLSNearLossless, JPEGBaseline8Bit, JPEGExtended12Bit]
+
+POLICIES: Dict[str, List[str]] = {"native": NATIVE, "lossless": LOSSLESS, "lossy": LOSSY}
+
+
+def policy_syntaxes(policy: str) -> List[str]:
+    """Transfer syntaxes of ``policy`` in order of preference."""
+    try:
+        return list(POLICIES[policy])
+    except KeyError:
+        raise ValueError(f"Unknown transfer syntax policy: {policy!r} (expected one of {', '.join(POLICIES)})")
+
+
+def storage_contexts(policy: str = "native", sop_classes: Optional[Iterable[str]] = None,
+                     limit: Optional[int] = None) -> List[PresentationContext]:
+    """
+    One storage context per SOP class carrying the policy's transfer syntaxes.
+
+    ``sop_classes`` defaults to pynetdicom's storage classes; ``limit`` caps how many are
+    proposed (an association request carries at most 128 contexts in total).
+    """
+    syntaxes = policy_syntaxes(policy)
+    if sop_classes is None:
+        sop_classes = [context.abstract_syntax for context in StoragePresentationContexts]
+    classes = list(sop_classes)[:limit]
+    return [build_context(sop_class, syntaxes) for sop_class in classes]
+
+
+def syntax_name(uid: str) -> str:
+    name = UID(uid).name
+    return name if name else str(uid)
+
+
+class TransferSyntaxStats:
+    """Thread-safe counts of negotiated storage contexts and received instances per transfer syntax."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contexts: Counter = Counter()
+        self._instances: Counter = Counter()
+        self._bytes: Counter = Counter()
+
+    def record_association(self, assoc) -> None:
+        """Count the transfer syntax accepted for every storage context of an association."""
+        with self._lock:
+            for context in assoc.accepted_contexts:
+                if context.abstract_syntax in _STORAGE_CLASSES:
+                    self._contexts[str(context.transfer_syntax[0])] += 1
+
+    def record(self, transfer_syntax: str, nbytes: int) -> None:
+        with self._lock:
+            self._instances[str(transfer_syntax)] += 1
+            self._bytes[str(transfer_syntax)] += nbytes
+
+    def summary(self) -> Dict[str, dict]:
+        """Per transfer syntax name: accepted contexts, instances received and bytes."""
+        with self._lock:
+            syntaxes = set(self._contexts) | set(self._instances)
+            return {syntax_name(uid): {"uid": uid, "contexts": self._contexts[uid],
+                                       "instances": self._instances[uid], "bytes": self._bytes[uid]}
+                    for uid in sorted(syntaxes)}
+
+    def log(self, logger: logging.Logger, level: int = logging.INFO) -> None:
+        for name, entry in self.summary().items():
+            logger.log(level, "Transfer syntax %s: %d context(s) accepted, %d instance(s), %.1f MB", name,
+                       entry["contexts"], entry["instances"], entry["bytes"] / 1e6)
+
+
+_STORAGE_CLASSES = {context.abstract_syntax for context in StoragePresentationContexts}
@@ -14,8 +14,11 @@ from typing import Optional
 from pynetdicom import AE, evt
 from pynetdicom.sop_class import Verification
 
+from .association_pool import AssociationPool, open_association
 
-def _pick_free_port() -> int:
+
+def pick_free_port() -> int:
+    """A free ephemeral TCP port on the loopback interface, chosen by the OS."""
     # Bind to port 0 to let the OS choose a free ephemeral port
     sock = socket.socket()
     sock.bind(("127.0.0.1", 0))
@@ -27,11 +30,13 @@ def _pick_free_port() -> int:
 class VerificationServer:
     """Context manager that spins up a verification (C-ECHO) SCP."""
 
-    def __init__(self, host: str = "127.0.0.1", port: Optional[int] = None, ae_title: str = "DICOMTOOLS_SCP"):
+    def __init__(self, host: str = "127.0.0.1", port: Optional[int] = None, ae_title: str = "DICOMTOOLS_SCP",
+                 max_associations: int = 10):
         self.host = host
-        self.port = port or _pick_free_port()
+        self.port = port or pick_free_port()
         self.ae_title = ae_title
         self._ae = AE(ae_title=ae_title)
+        self._ae.maximum_associations = max_associations
         self._ae.add_supported_context(Verification)
         self._scp = None
 
@@ -51,27 +56,13 @@ class VerificationServer:
 
 
 def send_c_echo(host: str, port: int, *, calling_aet: str = "DICOMTOOLS_SCU", called_aet: str = "DICOMTOOLS_SCP",
-                timeout: int = 5) -> int:
-    """Send a C-ECHO request and return the Status code."""
-    ae = AE(ae_title=calling_aet)
-    ae.add_requested_context(Verification)
-
-    ae.acse_timeout = timeout
-    ae.dimse_timeout = timeout
-    ae.network_timeout = timeout
-
-    assoc = ae.associate(host, port, ae_title=called_aet, ext_neg=None, max_pdu=16382)
-    if assoc is None:
-        raise RuntimeError("Association was not established")
-
-    try:
+                timeout: int = 5, pool: Optional[AssociationPool] = None) -> int:
+    """Send a C-ECHO request and return the Status code (reusing a pooled association when ``pool`` is given)."""
+    with open_association(host, port, [Verification], calling_aet=calling_aet, called_aet=called_aet, pool=pool,
+                          timeout=timeout) as assoc:
         if not assoc.is_established:
             raise RuntimeError("Association was not established")
         status = assoc.send_c_echo()
         if status is None:
             raise RuntimeError("No status returned from C-ECHO")
         return int(status.Status)
-    finally:
-        if assoc and assoc.is_established:
-            # Ensure network resources are cleaned up even when exceptions occur
-            assoc.release()
@@ -0,0 +1,35 @@
+#
+# parallel.py
+# Dicom-Tools-py
+#
+# Worker-count default and strip splitting shared by the thread-pooled volume operations.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Helpers shared by the modules that fan work out over a thread pool.
+
+Pools that only need a size should pass ``max_workers=workers`` straight to the
+executor: ``None`` already selects the standard library default. Code that splits
+work into pieces needs the count itself, which :func:`default_workers` provides.
+"""
+
+import os
+from typing import List, Optional
+
+
+def default_workers(workers: Optional[int] = None) -> int:
+    """``workers`` when given, otherwise the ``ThreadPoolExecutor`` default (CPU count + 4, at most 32)."""
+    return workers or min(32, (os.cpu_count() or 1) + 4)
+
+
+def strip_ranges(length: int, unit_bytes: int, chunk_bytes: int, workers: Optional[int] = None) -> List[slice]:
+    """
+    Split ``length`` units of ``unit_bytes`` each into strips of at most ``chunk_bytes``.
+
+    Strips are also small enough that every worker gets at least one.
+    """
+    step = max(1, min(length, chunk_bytes // max(1, unit_bytes)))
+    # Keep every worker busy even when one strip would fit the budget
+    step = min(step, max(1, -(-length // default_workers(workers))))
+    return [slice(start, min(length, start + step)) for start in range(0, length, step)]
@@ -0,0 +1,207 @@
+#
+# streaming.py
+# Dicom-Tools-py
+#
+# Splits DICOM files into header and bulk tail so headers can be rewritten while pixel bytes are copied verbatim.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""Header/bulk-data splitting helpers for streaming rewrites.
+
+Rewriting a handful of header elements should not require decoding (or even
+reading into Python) a multi-hundred-MB Pixel Data element. These helpers
+parse the header only, remember the file offset where Pixel Data starts, and
+splice a rewritten header in front of the untouched tail using kernel copies
+where the platform offers them.
+"""
+
+import os
+import struct
+from pathlib import Path
+from typing import BinaryIO, Iterator, Tuple, Union
+
+import pydicom
+from pydicom.dataset import Dataset
+from pydicom.uid import DeflatedExplicitVRLittleEndian
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+UNDEFINED_LENGTH = 0xFFFFFFFF
+PIXEL_DATA_TAG = (0x7FE0, 0x0010)
+ITEM_TAG = (0xFFFE, 0xE000)
+SEQUENCE_DELIMITER_TAG = (0xFFFE, 0xE0DD)
+TRAILING_PADDING_TAG = (0xFFFC, 0xFFFC)
+_LONG_LENGTH_VRS = {b"OB", b"OD", b"OF", b"OL", b"OV", b"OW", b"SQ", b"SV", b"UC", b"UN", b"UR", b"UT", b"UV"}
+
+PathLike = Union[str, Path]
+
+
+def read_header(path: PathLike) -> Tuple[Dataset, int]:
+    """Parse everything before Pixel Data and return it with the offset of the bulk tail.
+
+    The offset points at the (7FE0,0010) tag itself, so the tail holds the Pixel
+    Data element (header and value) plus anything that follows it. Files without
+    Pixel Data return the file size as the offset.
+    """
+    with open(path, "rb") as fp:
+        # pydicom rewinds to the start of the Pixel Data tag when it stops
+        dataset = pydicom.dcmread(fp, stop_before_pixels=True, force=True)
+        return dataset, fp.tell()
+
+
+def can_splice(dataset: Dataset) -> bool:
+    """Return True if a rewritten header can be placed in front of the original tail."""
+    file_meta = getattr(dataset, "file_meta", None)
+    transfer_syntax = file_meta.get("TransferSyntaxUID") if file_meta is not None else None
+    # Deflated datasets compress the whole body, so there is no raw tail to reuse
+    return transfer_syntax is not None and transfer_syntax != DeflatedExplicitVRLittleEndian
+
+
+def _encoding(dataset: Dataset) -> Tuple[bool, bool]:
+    transfer_syntax = dataset.file_meta.TransferSyntaxUID
+    return bool(transfer_syntax.is_implicit_VR), bool(transfer_syntax.is_little_endian)
+
+
+def read_element_header(fp: BinaryIO, *, implicit_vr: bool, little_endian: bool) -> Tuple[Tuple[int, int], int, int]:
+    """Read one element header at the current position.
+
+    Returns ``((group, element), value_length, header_length)``.
+    """
+    endian = "<" if little_endian else ">"
+    raw = fp.read(8)
+    if len(raw) < 8:
+        raise EOFError("Truncated element header")
+    group, element = struct.unpack(f"{endian}HH", raw[:4])
+    # Items and delimiters never carry a VR, even in explicit VR transfer syntaxes
+    if implicit_vr or group == 0xFFFE:
+        return (group, element), struct.unpack(f"{endian}L", raw[4:])[0], 8
+    vr = raw[4:6]
+    if vr in _LONG_LENGTH_VRS:
+        extra = fp.read(4)
+        if len(extra) < 4:
+            raise EOFError("Truncated element header")
+        return (group, element), struct.unpack(f"{endian}L", extra)[0], 12
+    return (group, element), struct.unpack(f"{endian}H", raw[6:])[0], 8
+
+
+def iter_fragments(fp: BinaryIO, offset: int, *, little_endian: bool = True) -> Iterator[Tuple[int, int]]:
+    """Yield ``(value_offset, length)`` for each item of encapsulated Pixel Data.
+
+    ``offset`` is the first byte after the Pixel Data element header. The first item
+    is the Basic Offset Table. Only item headers are read; fragment bytes are skipped.
+    """
+    fp.seek(offset)
+    while True:
+        tag, length, header_length = read_element_header(fp, implicit_vr=True, little_endian=little_endian)
+        if tag == SEQUENCE_DELIMITER_TAG:
+            return
+        if tag != ITEM_TAG:
+            raise ValueError(f"Unexpected tag ({tag[0]:04X},{tag[1]:04X}) inside encapsulated Pixel Data")
+        if length == UNDEFINED_LENGTH:
+            raise ValueError("Encapsulated Pixel Data item has undefined length")
+        value_offset = fp.tell()
+        yield value_offset, length
+        fp.seek(value_offset + length)
+
+
+def tail_holds_only_pixel_data(path: PathLike, dataset: Dataset, offset: int) -> bool:
+    """Return True if the bytes from ``offset`` hold Pixel Data plus optional trailing padding."""
+    size = os.path.getsize(path)
+    if offset >= size:
+        return True
+    implicit_vr, little_endian = _encoding(dataset)
+    with open(path, "rb") as fp:
+        fp.seek(offset)
+        tag, length, header_length = read_element_header(fp, implicit_vr=implicit_vr, little_endian=little_endian)
+        if tag != PIXEL_DATA_TAG:
+            return False
+        if length == UNDEFINED_LENGTH:
+            # Walking the item headers leaves the file positioned after the sequence delimiter
+            for _ in iter_fragments(fp, offset + header_length, little_endian=little_endian):
+                pass
+            end = fp.tell()
+        else:
+            end = offset + header_length + length
+        if end >= size:
+            return True
+        fp.seek(end)
+        tag, _, _ = read_element_header(fp, implicit_vr=implicit_vr, little_endian=little_endian)
+        return tag == TRAILING_PADDING_TAG
+
+
+def copy_range(src: BinaryIO, dst: BinaryIO, offset: int, count: int) -> int:
+    """Copy ``count`` bytes from ``src`` at ``offset`` to the current position of ``dst``.
+
+    Uses ``os.copy_file_range`` or ``os.sendfile`` when available so the bytes never
+    pass through Python, and falls back to buffered chunked copies otherwise.
+    """
+    dst.flush()
+    copied = 0
+    try:
+        src_fd, dst_fd = src.fileno(), dst.fileno()
+        kernel_copies = (getattr(os, "copy_file_range", None), getattr(os, "sendfile", None))
+    except (OSError, ValueError):
+        # In-memory buffers have no descriptor to hand to the kernel
+        kernel_copies = ()
+
+    for kernel_copy in kernel_copies:
+        if kernel_copy is None:
+            continue
+        try:
+            while copied < count:
+                if kernel_copy is os.sendfile:
+                    sent = os.sendfile(dst_fd, src_fd, offset + copied, min(count - copied, COPY_CHUNK_SIZE))
+                else:
+                    sent = kernel_copy(src_fd, dst_fd, min(count - copied, COPY_CHUNK_SIZE), offset + copied)
+                if sent == 0:
+                    break
+                copied += sent
+        except OSError:
+            # Cross-device or unsupported filesystem; retry with the next strategy
+            dst.seek(0, os.SEEK_END)
+            continue
+        # Kernel copies write through the descriptor; keep the Python file object in sync
+        dst.seek(0, os.SEEK_END)
+        if copied == count:
+            return copied
+        # A kernel copy that stops early hands over to buffered reads, which stop only at EOF
+        break
+
+    src.seek(offset + copied)
+    remaining = count - copied
+    while remaining > 0:
+        chunk = src.read(min(remaining, COPY_CHUNK_SIZE))
+        if not chunk:
+            break
+        dst.write(chunk)
+        remaining -= len(chunk)
+        copied += len(chunk)
+    return copied
+
+
+def write_spliced(header: Dataset, source: PathLike, offset: int, destination: PathLike) -> Path:
+    """Write ``header`` followed by the bytes of ``source`` from ``offset`` to EOF.
+
+    Raises ``OSError`` (and removes ``destination``) when fewer bytes than expected could be
+    copied, for example because ``source`` shrank while it was being read.
+    """
+    if not can_splice(header):
+        raise ValueError("Transfer syntax does not allow splicing a rewritten header onto the original data")
+
+    # Group lengths would no longer match the rewritten header
+    for elem in list(header):
+        if elem.tag.element == 0x0000:
+            del header[elem.tag]
+
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    total = os.path.getsize(source)
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            pydicom.dcmwrite(dst, header, enforce_file_format=True)
+        except TypeError:  # pydicom < 3.0
+            pydicom.dcmwrite(dst, header, write_like_original=False)
+        copied = copy_range(src, dst, offset, total - offset)
+    if copied != total - offset:
+        destination.unlink(missing_ok=True)
+        raise OSError(f"Short copy from {source}: {copied} of {total - offset} bytes after offset {offset}")
+    return destination
@@ -14,8 +14,15 @@ This script allows querying PACS servers using the DICOM C-FIND protocol.
 
 import sys
 import argparse
+import copy
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime
-from pynetdicom import AE, debug_logger
+from typing import List, Optional, Tuple
+from pynetdicom import debug_logger
 from pynetdicom.sop_class import (
     PatientRootQueryRetrieveInformationModelFind,
     StudyRootQueryRetrieveInformationModelFind,
@@ -23,8 +30,20 @@ from pynetdicom.sop_class import (
 )
 from pydicom.dataset import Dataset
 
+from .core.association_pool import open_association
+
 REDACTED = "<redacted>"
 
+PENDING = (0xFF00, 0xFF01)
+QUERY_MODELS = {
+    'PatientRoot': PatientRootQueryRetrieveInformationModelFind,
+    'StudyRoot': StudyRootQueryRetrieveInformationModelFind,
+    'Worklist': ModalityWorklistInformationFind,
+}
+
+# Message IDs identify the request a C-CANCEL refers to
+_message_ids = itertools.cycle(range(1, 65536))
+
 # Optional: Enable debug logging
 # debug_logger()
 
@@ -98,7 +117,193 @@ def create_series_query(study_instance_uid, modality=None, series_description=No
     return ds
 
 
-def query_pacs(host, port, aet, aec, query_dataset, query_model='StudyRoot'):
+def create_image_query(study_instance_uid, series_instance_uid):
+    """Create an image-level C-FIND query."""
+    ds = Dataset()
+
+    # Query/Retrieve Level
+    ds.QueryRetrieveLevel = 'IMAGE'
+
+    # Parent keys (unique keys of the higher levels)
+    ds.StudyInstanceUID = study_instance_uid
+    ds.SeriesInstanceUID = series_instance_uid
+
+    # Instance Information
+    ds.SOPInstanceUID = ''
+    ds.SOPClassUID = ''
+    ds.InstanceNumber = ''
+
+    return ds
+
+
+class QueryCache:
+    """
+    Thread-safe TTL cache of complete C-FIND result lists.
+
+    Entries are keyed by peer, query model and the normalized query dataset, so
+    repeated identical worklist/study lookups are answered without contacting the
+    PACS until ``ttl`` seconds have passed.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0}
+        self._entries: "OrderedDict[tuple, Tuple[float, List[Dataset]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(host, port, aec, model, query_dataset) -> tuple:
+        return (host, int(port), aec, str(model), normalize_query(query_dataset))
+
+    def get(self, key: tuple) -> Optional[List[Dataset]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return [copy.deepcopy(ds) for ds in entry[1]]
+
+    def put(self, key: tuple, results: List[Dataset]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, [copy.deepcopy(ds) for ds in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+@dataclass
+class QueryStats:
+    """Latency and match counts of one C-FIND."""
+
+    level: str = ""
+    matches: int = 0
+    status: Optional[int] = None
+    first_response_s: Optional[float] = None
+    elapsed_s: float = 0.0
+    cancelled: bool = False
+    cached: bool = False
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "level": self.level,
+            "matches": self.matches,
+            "status": None if self.status is None else f"0x{self.status:04X}",
+            "first_response_s": None if self.first_response_s is None else round(self.first_response_s, 4),
+            "elapsed_s": round(self.elapsed_s, 4),
+            "cancelled": self.cancelled,
+            "cached": self.cached,
+            "error": self.error,
+        }
+
+
+def normalize_query(query_dataset) -> tuple:
+    """Hashable, order-independent form of a query dataset (sequences included)."""
+    items = []
+    for elem in query_dataset:
+        if elem.VR == 'SQ':
+            value = tuple(normalize_query(item) for item in elem.value)
+        elif elem.VM > 1:
+            value = tuple(str(v).strip() for v in elem.value)
+        else:
+            value = '' if elem.value is None else str(elem.value).strip()
+        items.append((int(elem.tag), value))
+    return tuple(sorted(items))
+
+
+def find_model(query_model):
+    """C-FIND SOP class for 'PatientRoot', 'StudyRoot' or 'Worklist' (UIDs pass through)."""
+    return QUERY_MODELS.get(query_model, query_model if query_model not in (None, '') else
+                            StudyRootQueryRetrieveInformationModelFind)
+
+
+def iter_query(host, port, aet, aec, query_dataset, query_model='StudyRoot', pool=None, limit=None,
+               cache=None, report=None):
+    """
+    Yield C-FIND matches as the PACS returns them.
+
+    Args:
+        host, port, aet, aec: Peer address and AE titles
+        query_dataset: Query dataset
+        query_model: 'PatientRoot', 'StudyRoot', 'Worklist' or a C-FIND SOP Class UID
+        pool: Optional AssociationPool
+        limit: Stop after this many matches (at least 1); the PACS is sent a C-CANCEL
+        cache: Optional QueryCache; complete result lists are served from it until they expire
+        report: Called with a QueryStats when the query finishes
+
+    Closing the generator early (``break``, ``islice``) also cancels the request, so the
+    association can be reused.
+    """
+    if limit is not None and limit < 1:
+        raise ValueError(f"limit must be at least 1, got {limit}")
+    model = find_model(query_model)
+    stats = QueryStats(level=str(query_dataset.get('QueryRetrieveLevel', '')))
+    started = time.monotonic()
+    key = cache.key(host, port, aec, model, query_dataset) if cache is not None else None
+    cached = cache.get(key) if cache is not None else None
+
+    try:
+        if cached is not None:
+            stats.cached = True
+            stats.status = 0x0000
+            stats.first_response_s = time.monotonic() - started
+            for identifier in cached[:limit]:
+                stats.matches += 1
+                yield identifier
+            return
+
+        with open_association(host, port, [model], calling_aet=aet, called_aet=aec, pool=pool) as assoc:
+            if not assoc.is_established:
+                stats.error = "Association rejected, aborted or never connected"
+                return
+
+            results = []
+            msg_id = next(_message_ids)
+            responses = assoc.send_c_find(query_dataset, msg_id=msg_id, query_model=model)
+            for status, identifier in responses:
+                if stats.first_response_s is None:
+                    stats.first_response_s = time.monotonic() - started
+                if not status:
+                    stats.error = "No response status (timeout or aborted association)"
+                    break
+                if status.Status not in PENDING:
+                    stats.status = int(status.Status)
+                    continue
+                if stats.cancelled:
+                    # Matches already in flight when the C-CANCEL went out
+                    continue
+                stats.matches += 1
+                if cache is not None:
+                    results.append(identifier)
+                try:
+                    yield identifier
+                except GeneratorExit:
+                    # The caller stopped early; cancel like a reached limit instead of aborting
+                    stats.cancelled = True
+                if limit is not None and stats.matches >= limit:
+                    stats.cancelled = True
+                if stats.cancelled:
+                    # Keep reading until the final status so the association stays usable
+                    assoc.send_c_cancel(msg_id, query_model=model)
+
+            if cache is not None and stats.status == 0x0000 and not stats.cancelled:
+                cache.put(key, results)
+    finally:
+        stats.elapsed_s = time.monotonic() - started
+        if report:
+            report(stats)
+
+
+def query_pacs(host, port, aet, aec, query_dataset, query_model='StudyRoot', pool=None, limit=None,
+               cache=None, report=None):
     """
     Query a PACS server using C-FIND.
 
@@ -108,22 +313,15 @@ def query_pacs(host, port, aet, aec, query_dataset, query_model='StudyRoot'):
         aet: Calling AE Title (this application)
         aec: Called AE Title (PACS server)
         query_dataset: Query dataset
-        query_model: Query model ('PatientRoot' or 'StudyRoot')
+        query_model: Query model ('PatientRoot', 'StudyRoot' or 'Worklist')
+        pool: Optional AssociationPool; batches of queries then reuse live associations
+        limit: Optional maximum number of matches (the rest of the query is cancelled)
+        cache: Optional QueryCache for repeated identical queries
+        report: Optional callback receiving the QueryStats
 
     Returns:
-        List of matching datasets
+        List of matching datasets (use iter_query to stream them instead)
     """
-    # Initialize Application Entity
-    ae = AE(ae_title=aet)
-
-    # Add requested presentation context
-    if query_model == 'PatientRoot':
-        ae.add_requested_context(PatientRootQueryRetrieveInformationModelFind)
-    else:  # StudyRoot
-        ae.add_requested_context(StudyRootQueryRetrieveInformationModelFind)
-
-    results = []
-
     # Associate with peer AE
     print(f"\nConnecting to PACS server...")
     print(f"  Host: {host}:{port}")
@@ -131,38 +329,34 @@ def query_pacs(host, port, aet, aec, query_dataset, query_model='StudyRoot'):
     print(f"  Calling AE: {aet}")
     print(f"{'='*80}\n")
 
-    assoc = ae.associate(host, port, ae_title=aec)
+    collected = []
 
-    if assoc.is_established:
-        print("✓ Association established\n")
-        print(f"Sending C-FIND query...")
-        print(f"  Query Level: {query_dataset.QueryRetrieveLevel}")
-        print(f"{'─'*80}\n")
+    def record(stats):
+        collected.append(stats)
+        if report:
+            report(stats)
 
-        # Send C-FIND request
-        responses = assoc.send_c_find(query_dataset, query_model=query_model)
+    results = list(iter_query(host, port, aet, aec, query_dataset, query_model, pool=pool, limit=limit,
+                              cache=cache, report=record))
+    stats = collected[0]
 
-        for (status, identifier) in responses:
-            if status:
-                # If status is pending, identifier contains the match
-                if status.Status in (0xFF00, 0xFF01):
-                    results.append(identifier)
-                else:
-                    # Final status
-                    if status.Status == 0x0000:
-                        print(f"\n✓ Query successful")
-                    else:
-                        print(f"\n⚠ Query completed with status: 0x{status.Status:04X}")
-
-        # Release the association
-        assoc.release()
-        print(f"✓ Association released\n")
-
-    else:
-        print(f"✗ Association rejected, aborted or never connected")
+    if stats.error and not results:
+        print(f"✗ {stats.error}")
         print(f"{'='*80}\n")
         return []
 
+    if stats.cached:
+        print("✓ Served from cache")
+    elif stats.cancelled:
+        print(f"✓ Query cancelled after {stats.matches} match(es)")
+    elif stats.status == 0x0000:
+        print(f"✓ Query successful")
+    elif stats.status is not None:
+        print(f"⚠ Query completed with status: 0x{stats.status:04X}")
+    print(f"  {stats.matches} match(es) in {stats.elapsed_s * 1000:.1f} ms")
+    if not stats.cached:
+        print("✓ Association released\n" if pool is None else "✓ Association returned to pool\n")
+
     return results
 
 
@@ -276,11 +470,16 @@ Date Formats:
                         default='StudyRoot',
                         help='Query model (default: StudyRoot)')
 
+    parser.add_argument('--limit', type=int,
+                        help='Stop after this many matches (the rest of the query is cancelled)')
+
     # Output options
     parser.add_argument('--debug', action='store_true',
                         help='Enable debug logging')
 
     args = parser.parse_args()
+    if args.limit is not None and args.limit < 1:
+        parser.error('--limit must be at least 1')
 
     # Enable debug logging if requested
     if args.debug:
@@ -317,7 +516,8 @@ Date Formats:
         args.aet,
         args.aec,
         query_ds,
-        args.query_model
+        args.query_model,
+        limit=args.limit
     )
 
     # Display results
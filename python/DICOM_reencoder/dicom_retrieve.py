@@ -16,8 +16,9 @@ the DICOM C-MOVE or C-GET protocols.
 import sys
 import os
 import argparse
+import logging
 from pathlib import Path
-from pynetdicom import AE, evt, StoragePresentationContexts, debug_logger
+from pynetdicom import evt, debug_logger
 from pynetdicom.sop_class import (
     PatientRootQueryRetrieveInformationModelMove,
     StudyRootQueryRetrieveInformationModelMove,
@@ -26,6 +27,12 @@ from pynetdicom.sop_class import (
 )
 from pydicom.dataset import Dataset
 
+from .core.association_pool import MAX_CONTEXTS, open_association
+from .core.negotiation import POLICIES, storage_contexts
+from .storage_writer import FSYNC_POLICIES, LAYOUTS, StorageWriter
+
+logger = logging.getLogger(__name__)
+
 # Optional: Enable debug logging
 # debug_logger()
 
@@ -34,6 +41,9 @@ def handle_store(event, output_dir):
     """
     Handler for C-STORE requests (when receiving instances).
 
+    Decodes and re-encodes every instance; ``StorageWriter.handle_store`` writes the
+    received bytes directly and is what ``retrieve_with_get`` uses.
+
     Args:
         event: The C-STORE event
         output_dir: Directory to save received files
@@ -99,8 +109,39 @@ def create_retrieve_query(level, study_uid=None, series_uid=None, instance_uid=N
     return ds
 
 
+def retrieve_contexts(query_model='StudyRoot', operation='GET', policy='native'):
+    """
+    Presentation contexts for a C-MOVE or C-GET request.
+
+    Args:
+        query_model: Query model ('PatientRoot' or 'StudyRoot')
+        operation: 'MOVE' or 'GET'
+        policy: Transfer syntaxes proposed for C-GET storage ('native', 'lossless' or 'lossy')
+
+    Returns:
+        Tuple of (query/retrieve SOP class, requested contexts, SCP/SCU role selections)
+    """
+    if operation == 'MOVE':
+        if query_model == 'PatientRoot':
+            model = PatientRootQueryRetrieveInformationModelMove
+        else:  # StudyRoot
+            model = StudyRootQueryRetrieveInformationModelMove
+        return model, [model], []
+
+    if query_model == 'PatientRoot':
+        model = PatientRootQueryRetrieveInformationModelGet
+    else:  # StudyRoot
+        model = StudyRootQueryRetrieveInformationModelGet
+
+    # C-GET delivers instances over the same association, so we also request the storage
+    # contexts and propose the SCP role for them (one slot is left for Verification)
+    storage = storage_contexts(policy, limit=MAX_CONTEXTS - 2)
+    roles = [(context.abstract_syntax, False, True) for context in storage]
+    return model, [model] + storage, roles
+
+
 def retrieve_with_move(host, port, aet, aec, move_destination, query_dataset,
-                       query_model='StudyRoot'):
+                       query_model='StudyRoot', pool=None):
     """
     Retrieve using C-MOVE protocol.
 
@@ -112,18 +153,13 @@ def retrieve_with_move(host, port, aet, aec, move_destination, query_dataset,
         move_destination: AE Title where images should be sent
         query_dataset: Retrieve query dataset
         query_model: Query model ('PatientRoot' or 'StudyRoot')
+        pool: Optional AssociationPool to reuse live associations across requests
 
     Returns:
         Number of instances moved
     """
-    # Initialize Application Entity
-    ae = AE(ae_title=aet)
-
-    # Add requested presentation context for C-MOVE
-    if query_model == 'PatientRoot':
-        ae.add_requested_context(PatientRootQueryRetrieveInformationModelMove)
-    else:  # StudyRoot
-        ae.add_requested_context(StudyRootQueryRetrieveInformationModelMove)
+    # Requested presentation context for C-MOVE
+    model, contexts, _ = retrieve_contexts(query_model, 'MOVE')
 
     print(f"\nConnecting to PACS server for C-MOVE...")
     print(f"  Host: {host}:{port}")
@@ -132,12 +168,14 @@ def retrieve_with_move(host, port, aet, aec, move_destination, query_dataset,
     print(f"  Move Destination: {move_destination}")
     print(f"{'='*80}\n")
 
-    # Associate with peer AE
-    assoc = ae.associate(host, port, ae_title=aec)
-
     moved_count = 0
 
-    if assoc.is_established:
+    # Associate with peer AE
+    with open_association(host, port, contexts, calling_aet=aet, called_aet=aec, pool=pool) as assoc:
+        if not assoc.is_established:
+            print(f"✗ Association rejected, aborted or never connected\n")
+            return 0
+
         print("✓ Association established\n")
         print(f"Sending C-MOVE request...")
         print(f"  Query Level: {query_dataset.QueryRetrieveLevel}")
@@ -147,7 +185,7 @@ def retrieve_with_move(host, port, aet, aec, move_destination, query_dataset,
         responses = assoc.send_c_move(
             query_dataset,
             move_destination,
-            query_model=query_model
+            query_model=model
         )
 
         for (status, identifier) in responses:
@@ -170,19 +208,13 @@ def retrieve_with_move(host, port, aet, aec, move_destination, query_dataset,
                     # Warning or failure
                     print(f"\n⚠ C-MOVE status: 0x{status.Status:04X}")
 
-        # Release the association
-        assoc.release()
-        print(f"✓ Association released\n")
-
-    else:
-        print(f"✗ Association rejected, aborted or never connected\n")
-        return 0
+    print("✓ Association released\n" if pool is None else "✓ Association returned to pool\n")
 
     return moved_count
 
 
 def retrieve_with_get(host, port, aet, aec, output_dir, query_dataset,
-                      query_model='StudyRoot'):
+                      query_model='StudyRoot', pool=None, layout='flat', fsync='batch', policy='native'):
     """
     Retrieve using C-GET protocol.
 
@@ -194,21 +226,17 @@ def retrieve_with_get(host, port, aet, aec, output_dir, query_dataset,
         output_dir: Directory to save received files
         query_dataset: Retrieve query dataset
         query_model: Query model ('PatientRoot' or 'StudyRoot')
+        pool: Optional AssociationPool to reuse live associations across requests
+        layout: 'flat' (<SOPInstanceUID>.dcm) or 'series' (<Study>/<Series>/<SOP>.dcm)
+        fsync: 'none', 'batch' or 'always' durability for written files
+        policy: Transfer syntax policy for received instances ('native', 'lossless' or 'lossy');
+            instances are stored in whatever syntax the peer sends
 
     Returns:
         Number of instances retrieved
     """
-    # Initialize Application Entity
-    ae = AE(ae_title=aet)
-
-    # Add requested presentation context for C-GET
-    if query_model == 'PatientRoot':
-        ae.add_requested_context(PatientRootQueryRetrieveInformationModelGet)
-    else:  # StudyRoot
-        ae.add_requested_context(StudyRootQueryRetrieveInformationModelGet)
-
-    # Add storage presentation contexts (to receive instances)
-    ae.requested_contexts = StoragePresentationContexts
+    # Requested presentation contexts for C-GET plus the storage contexts (to receive instances)
+    model, contexts, roles = retrieve_contexts(query_model, 'GET', policy)
 
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
@@ -220,17 +248,23 @@ def retrieve_with_get(host, port, aet, aec, output_dir, query_dataset,
     print(f"  Output Directory: {output_dir}")
     print(f"{'='*80}\n")
 
-    # Set up event handler for C-STORE
-    # Register a minimal C-STORE handler to capture incoming instances to disk
-    handlers = [(evt.EVT_C_STORE, lambda event: handle_store(event, output_dir))]
+    retrieved_count = 0
 
-    # Associate with peer AE
-    assoc = ae.associate(host, port, ae_title=aec, evt_handlers=handlers)
+    # Received instances are written raw (no decode/re-encode) by a background writer thread
+    writer = StorageWriter(output_dir, layout=layout, fsync=fsync,
+                           on_written=lambda path: print(f"  ✓ Received and saved: {path.name}"))
+    handlers = [(evt.EVT_C_STORE, writer.handle_store)]
 
-    retrieved_count = 0
+    # Associate with peer AE; pooled associations bind the handler for this request only.
+    # The association ends first, then the writer flushes whatever is still queued.
+    with writer, open_association(host, port, contexts, calling_aet=aet, called_aet=aec, roles=roles,
+                                  evt_handlers=handlers, pool=pool) as assoc:
+        if not assoc.is_established:
+            print(f"✗ Association rejected, aborted or never connected\n")
+            return 0
 
-    if assoc.is_established:
         print("✓ Association established\n")
+        writer.syntaxes.record_association(assoc)
         print(f"Sending C-GET request...")
         print(f"  Query Level: {query_dataset.QueryRetrieveLevel}")
         print(f"{'─'*80}\n")
@@ -238,7 +272,7 @@ def retrieve_with_get(host, port, aet, aec, output_dir, query_dataset,
         print("Receiving instances:\n")
 
         # Send C-GET request
-        responses = assoc.send_c_get(query_dataset, query_model=query_model)
+        responses = assoc.send_c_get(query_dataset, query_model=model)
 
         for (status, identifier) in responses:
             if status:
@@ -260,17 +294,62 @@ def retrieve_with_get(host, port, aet, aec, output_dir, query_dataset,
                     # Warning or failure
                     print(f"\n⚠ C-GET status: 0x{status.Status:04X}")
 
-        # Release the association
-        assoc.release()
-        print(f"✓ Association released\n")
-
-    else:
-        print(f"✗ Association rejected, aborted or never connected\n")
-        return 0
+    print("✓ Association released\n" if pool is None else "✓ Association returned to pool\n")
+    writer.syntaxes.log(logger)
+    for name, entry in writer.syntaxes.summary().items():
+        print(f"  {name}: {entry['instances']} instance(s), {entry['bytes'] / 1e6:.1f} MB")
 
     return retrieved_count
 
 
+def retrieve_all_series(args):
+    """Find every series of ``args.study_uid`` and retrieve them through the concurrent scheduler."""
+    from .dicom_query import create_series_query, query_pacs
+    from .retrieve_scheduler import Peer, RetrieveScheduler, jobs_from_identifiers, summarize
+
+    series = query_pacs(args.host, args.port, args.aet, args.aec, create_series_query(args.study_uid),
+                        args.query_model)
+    if not series:
+        print("No series found for the study")
+        return 1
+
+    peer = Peer(args.host, args.port, called_aet=args.aec, calling_aet=args.aet, max_associations=args.jobs)
+    for identifier in series:
+        identifier.StudyInstanceUID = args.study_uid
+    jobs = jobs_from_identifiers(series, peer, level='SERIES')
+
+    def report(progress):
+        print(f"  Progress: {progress['jobs_done']}/{progress['jobs']} series, "
+              f"{progress['completed']} completed, {progress['remaining']} remaining, {progress['failed']} failed")
+
+    scheduler = RetrieveScheduler(
+        method='MOVE' if args.use_move else 'GET',
+        output_dir=args.output_dir,
+        move_destination=args.move_dest,
+        query_model=args.query_model,
+        workers=args.jobs,
+        retries=args.retries,
+        progress=report,
+        layout=args.layout,
+        fsync=args.fsync,
+        policy=args.ts_policy,
+    )
+    results = scheduler.run(jobs)
+    totals = summarize(results)
+    syntaxes = scheduler.syntaxes.summary()
+
+    print(f"{'='*80}")
+    print(f"✓ Retrieved {totals['instances']} instance(s) from {totals['succeeded']}/{totals['jobs']} series "
+          f"({totals['retries']} retries)")
+    for result in results:
+        if not result.ok:
+            print(f"  ✗ {result.job.label}: {result.to_dict()['status'] or result.error}")
+    for name, entry in syntaxes.items():
+        print(f"  {name}: {entry['instances']} instance(s), {entry['bytes'] / 1e6:.1f} MB")
+    print(f"{'='*80}\n")
+    return 0 if totals['failed_jobs'] == 0 else 1
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Retrieve DICOM studies from PACS using C-MOVE or C-GET',
@@ -289,6 +368,12 @@ Examples:
   # Retrieve with custom AE titles
   %(prog)s -H pacs.example.com -p 11112 --aet MYAE --aec PACSAE --study-uid 1.2.3.4.5 -o ./output
 
+  # Accept compressed lossless instances as the PACS stores them
+  %(prog)s -H pacs.example.com -p 11112 --study-uid 1.2.3.4.5 --ts-policy lossless -o ./output
+
+  # Prefetch every series of a study over 4 parallel associations
+  %(prog)s -H pacs.example.com -p 11112 --study-uid 1.2.3.4.5 --all-series --jobs 4 -o ./output
+
 Notes:
   - C-GET retrieves directly to this application (recommended for most cases)
   - C-MOVE sends images to a third party (requires configured SCP)
@@ -321,9 +406,25 @@ Notes:
     parser.add_argument('--move-dest',
                         help='Move destination AE Title (required for C-MOVE)')
 
+    # Concurrent retrieval
+    parser.add_argument('--all-series', action='store_true',
+                        help='Query the study\'s series and retrieve them concurrently')
+    parser.add_argument('--jobs', type=int, default=4,
+                        help='Parallel associations for --all-series (default: 4)')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='Retries on 0xA7xx/0xCxxx statuses for --all-series (default: 3)')
+
     # Output options
     parser.add_argument('-o', '--output-dir', default='./dicom_retrieved',
                         help='Output directory for C-GET (default: ./dicom_retrieved)')
+    parser.add_argument('--layout', choices=LAYOUTS, default='flat',
+                        help='File layout for C-GET: flat or <study>/<series> folders (default: flat)')
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, default='batch',
+                        help='fsync policy for received files (default: batch)')
+    parser.add_argument('--ts-policy', choices=list(POLICIES), default='native',
+                        help='Transfer syntaxes accepted for C-GET: native (uncompressed), lossless '
+                             '(compressed lossless preferred) or lossy (any); files keep the received '
+                             'encoding (default: native)')
 
     # Query model
     parser.add_argument('--query-model', choices=['PatientRoot', 'StudyRoot'],
@@ -345,6 +446,13 @@ Notes:
         print("Error: --move-dest is required when using C-MOVE")
         return 1
 
+    if args.all_series:
+        # An empty identifier would make the series query match every study on the PACS
+        if not args.study_uid:
+            print("Error: --study-uid is required when using --all-series")
+            return 1
+        return retrieve_all_series(args)
+
     # Determine query level
     if args.instance_uid:
         if not args.series_uid:
@@ -388,7 +496,10 @@ Notes:
             args.aec,
             args.output_dir,
             query_ds,
-            args.query_model
+            args.query_model,
+            layout=args.layout,
+            fsync=args.fsync,
+            policy=args.ts_policy
         )
         print(f"{'='*80}")
         print(f"✓ Retrieved {count} instance(s) via C-GET")
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+#
+# dicom_send.py
+# Dicom-Tools-py
+#
+# Bulk C-STORE sender spreading files over parallel associations.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Push DICOM files to a Storage SCP.
+
+Only each file's File Meta Information is read up front. Files are grouped by
+(SOP Class, Transfer Syntax) so one set of presentation contexts is negotiated
+for the whole transfer (split into several sets when there are more than 128
+pairs). The file list is then drained by ``associations`` workers, each holding
+a single association open, so slow instances on one connection never stall the
+others:
+
+    sender = DicomSender("pacs.example.org", 104, called_aet="ARCHIVE", associations=8)
+    results = sender.send(["study_a/", "study_b/"])
+    print(summarize(results, sender.elapsed))
+
+Files are sent from their path with pynetdicom's chunked dataset mode: the
+encoded dataset is copied from disk into P-DATA fragments without decoding it,
+so pixel data never passes through pydicom. Only when the peer accepted a
+different uncompressed transfer syntax than the file's own is the file decoded
+and re-encoded. The mode is a process-wide pynetdicom setting that applies to
+every association in the process, so ``DicomSender`` never toggles it:
+``dicom-send`` and ``dicom-tools send`` call ``enable_chunked_send()`` at
+start-up, and other callers opt in the same way (otherwise every file is decoded
+before it is sent). Transient failures (out of resources, a dropped association)
+go back on the work queue with backoff. The retry usually reuses the worker's
+open association; a new one is opened only after the previous one dropped.
+"""
+
+import argparse
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import pydicom
+from pydicom.errors import InvalidDicomError
+from pydicom.filereader import read_file_meta_info
+from pydicom.uid import ExplicitVRLittleEndian, ImplicitVRLittleEndian
+from pynetdicom import _config
+from pynetdicom.presentation import PresentationContext, build_context
+
+from .core.association_pool import MAX_CONTEXTS, open_association
+
+logger = logging.getLogger(__name__)
+
+UNCOMPRESSED = (ExplicitVRLittleEndian, ImplicitVRLittleEndian)
+WARNING_STATUSES = (0x0001, 0xB000, 0xB006, 0xB007)
+
+
+def enable_chunked_send() -> None:
+    """Stream C-STORE datasets from their files (pynetdicom's process-wide ``STORE_SEND_CHUNKED_DATASET``)."""
+    _config.STORE_SEND_CHUNKED_DATASET = True
+
+
+def is_retryable(status: Optional[int]) -> bool:
+    """Out of resources (0xA7xx) or no response at all, usually a dropped association."""
+    return status is None or (status & 0xFF00) == 0xA700
+
+
+@dataclass(frozen=True)
+class SendItem:
+    """A file to send, described by its File Meta Information."""
+
+    path: Path
+    sop_class_uid: str
+    sop_instance_uid: str
+    transfer_syntax: str
+    size: int
+
+    @property
+    def context_key(self) -> Tuple[str, str]:
+        return self.sop_class_uid, self.transfer_syntax
+
+
+@dataclass
+class SendResult:
+    """Final per-instance outcome."""
+
+    item: SendItem
+    status: Optional[int] = None
+    attempts: int = 0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 0x0000 or self.status in WARNING_STATUSES
+
+    def to_dict(self) -> dict:
+        return {
+            "path": str(self.item.path),
+            "sop_instance_uid": self.item.sop_instance_uid,
+            "status": None if self.status is None else f"0x{self.status:04X}",
+            "attempts": self.attempts,
+            "error": self.error,
+        }
+
+
+def _iter_files(paths: Iterable[Union[str, Path]]) -> Iterable[Path]:
+    for path in map(Path, paths):
+        if path.is_dir():
+            yield from sorted(p for p in path.rglob("*") if p.is_file())
+        elif path.is_file():
+            yield path
+
+
+def scan_files(paths: Iterable[Union[str, Path]]) -> Tuple[List[SendItem], List[Path]]:
+    """
+    Read the File Meta Information of every file under ``paths``.
+
+    Returns (sendable items, skipped paths). Files without a Part 10 header carrying the
+    SOP Class/Instance and Transfer Syntax UIDs are skipped.
+    """
+    items, skipped = [], []
+    for path in _iter_files(paths):
+        try:
+            meta = read_file_meta_info(path)
+            items.append(SendItem(
+                path=path,
+                sop_class_uid=str(meta.MediaStorageSOPClassUID),
+                sop_instance_uid=str(meta.MediaStorageSOPInstanceUID),
+                transfer_syntax=str(meta.TransferSyntaxUID),
+                size=path.stat().st_size,
+            ))
+        except (InvalidDicomError, AttributeError, OSError, EOFError) as exc:
+            logger.debug("Skipping %s: %s", path, exc)
+            skipped.append(path)
+    return items, skipped
+
+
+def plan_contexts(items: Sequence[SendItem]) -> List[Tuple[List[PresentationContext], List[SendItem]]]:
+    """
+    Group items by (SOP Class, Transfer Syntax) into context sets of at most 128 contexts.
+
+    Each context proposes the file's own syntax first; uncompressed files also offer the
+    other uncompressed syntax as a fallback the peer may pick instead.
+    """
+    groups: Dict[Tuple[str, str], List[SendItem]] = {}
+    for item in items:
+        groups.setdefault(item.context_key, []).append(item)
+
+    plans = []
+    keys = list(groups)
+    for start in range(0, len(keys), MAX_CONTEXTS):
+        chunk = keys[start:start + MAX_CONTEXTS]
+        contexts = []
+        for sop_class, transfer_syntax in chunk:
+            syntaxes = [transfer_syntax]
+            if transfer_syntax in UNCOMPRESSED:
+                syntaxes += [ts for ts in UNCOMPRESSED if ts != transfer_syntax]
+            contexts.append(build_context(sop_class, syntaxes))
+        plans.append((contexts, [item for key in chunk for item in groups[key]]))
+    return plans
+
+
+class DicomSender:
+    """Send files over ``associations`` parallel associations with per-instance retries."""
+
+    def __init__(self, host: str, port: int, *, calling_aet: str = "DICOMTOOLS_SCU", called_aet: str = "ANY-SCP",
+                 associations: int = 4, retries: int = 2, backoff: float = 0.5, timeout: Optional[float] = 30,
+                 progress: Optional[Callable[[SendResult], None]] = None):
+        """
+        Args:
+            associations: Parallel associations (and worker threads) per context set.
+            retries: Extra attempts for an instance after a retryable failure.
+            backoff: First retry delay in seconds, doubled per attempt.
+            timeout: ACSE/DIMSE/network timeout of each association.
+            progress: Called from the worker threads with each final result.
+        """
+        self.host = host
+        self.port = port
+        self.calling_aet = calling_aet
+        self.called_aet = called_aet
+        self.associations = max(1, associations)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.timeout = timeout
+        self.progress = progress
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def _send_one(self, assoc, item: SendItem, accepted: set):
+        if (item.sop_class_uid, item.transfer_syntax) in accepted and getattr(_config, "STORE_SEND_CHUNKED_DATASET", False):
+            # Chunked mode: the encoded dataset is streamed from the file as-is
+            return assoc.send_c_store(item.path)
+        # Chunked mode is off or the peer chose another uncompressed syntax; pynetdicom encodes the decoded dataset
+        return assoc.send_c_store(pydicom.dcmread(item.path))
+
+    def _worker(self, contexts: List[PresentationContext], work: "queue.Queue",
+                results: Dict[int, SendResult], items: Sequence[SendItem]) -> None:
+        while True:
+            try:
+                index, attempt = work.get_nowait()
+            except queue.Empty:
+                return
+            with open_association(self.host, self.port, contexts, calling_aet=self.calling_aet,
+                                  called_aet=self.called_aet, timeout=self.timeout) as assoc:
+                if not assoc.is_established:
+                    self._finish(index, attempt, None, "Association rejected, aborted or never connected",
+                                 results, items, work)
+                    continue
+                accepted = {(cx.abstract_syntax, cx.transfer_syntax[0]) for cx in assoc.accepted_contexts}
+                supported = {cx.abstract_syntax for cx in assoc.accepted_contexts}
+                while assoc.is_established:
+                    item = items[index]
+                    if item.sop_class_uid not in supported:
+                        self._finish(index, attempt, None, "No accepted presentation context", results, items,
+                                     None)
+                    else:
+                        status, error = None, None
+                        try:
+                            response = self._send_one(assoc, item, accepted)
+                            status = int(response.Status) if "Status" in response else None
+                            if status is None:
+                                error = "No response status (timeout or aborted association)"
+                        except (OSError, ValueError, AttributeError, InvalidDicomError) as exc:
+                            error = str(exc)
+                        self._finish(index, attempt, status, error, results, items, work)
+                    try:
+                        index, attempt = work.get_nowait()
+                    except queue.Empty:
+                        return
+                else:
+                    # The association dropped before this item was tried; requeue it unchanged
+                    work.put((index, attempt))
+
+    def _finish(self, index: int, attempt: int, status: Optional[int], error: Optional[str],
+                results: Dict[int, SendResult], items: Sequence[SendItem], work: Optional["queue.Queue"]) -> None:
+        if work is not None and is_retryable(status) and attempt <= self.retries:
+            time.sleep(self.backoff * (2 ** (attempt - 1)))
+            work.put((index, attempt + 1))
+            return
+        result = SendResult(item=items[index], status=status, attempts=attempt, error=error)
+        with self._lock:
+            results[index] = result
+        if not result.ok:
+            logger.warning("Failed to send %s: %s", items[index].path,
+                           error or f"status 0x{status:04X}")
+        if self.progress:
+            self.progress(result)
+
+    def send_items(self, items: Sequence[SendItem]) -> List[SendResult]:
+        """
+        Send scanned items and return one result per item, in input order.
+
+        Files are streamed without decoding only after ``enable_chunked_send()``.
+        """
+        items = list(items)
+        results: Dict[int, SendResult] = {}
+        position = {id(item): index for index, item in enumerate(items)}
+        started = time.monotonic()
+        try:
+            for contexts, group in plan_contexts(items):
+                work: "queue.Queue" = queue.Queue()
+                for item in group:
+                    work.put((position[id(item)], 1))
+                threads = [threading.Thread(target=self._worker, args=(contexts, work, results, items),
+                                            name=f"dicom-send-{n}", daemon=True)
+                           for n in range(min(self.associations, len(group)))]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            self.elapsed = time.monotonic() - started
+        return [results[index] for index in range(len(items))]
+
+    def send(self, paths: Iterable[Union[str, Path]]) -> List[SendResult]:
+        """Scan ``paths`` (files or directories) and send every DICOM file found."""
+        items, skipped = scan_files(paths)
+        for path in skipped:
+            logger.info("Skipped non-DICOM file %s", path)
+        return self.send_items(items)
+
+
+def summarize(results: Sequence[SendResult], elapsed: float) -> dict:
+    """Totals and throughput for a send run."""
+    sent = [r for r in results if r.ok]
+    total_bytes = sum(r.item.size for r in sent)
+    return {
+        "files": len(results),
+        "sent": len(sent),
+        "failed": len(results) - len(sent),
+        "warnings": sum(1 for r in sent if r.status != 0x0000),
+        "retries": sum(max(0, r.attempts - 1) for r in results),
+        "bytes": total_bytes,
+        "seconds": round(elapsed, 3),
+        "instances_per_s": round(len(sent) / elapsed, 1) if elapsed else 0.0,
+        "mb_per_s": round(total_bytes / 1e6 / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Send DICOM files to a Storage SCP (C-STORE) over parallel associations",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Send a study folder
+  %(prog)s pacs.example.org 104 ./study --aec ARCHIVE
+
+  # Migrate a tree over 8 associations and keep a per-instance report
+  %(prog)s pacs.example.org 104 /data/export --aec ARCHIVE -j 8 --report send.json
+        """,
+    )
+    parser.add_argument("host", help="Storage SCP host")
+    parser.add_argument("port", type=int, help="Storage SCP port")
+    parser.add_argument("paths", nargs="+", help="Files or directories to send")
+    parser.add_argument("--aet", default="DICOMTOOLS_SCU", help="Calling AE Title (default: DICOMTOOLS_SCU)")
+    parser.add_argument("--aec", default="ANY-SCP", help="Called AE Title (default: ANY-SCP)")
+    parser.add_argument("-j", "--associations", type=int, default=4,
+                        help="Parallel associations (default: 4)")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="Retries per instance after a transient failure (default: 2)")
+    parser.add_argument("--timeout", type=float, default=30, help="Network timeout in seconds (default: 30)")
+    parser.add_argument("--report", help="Write per-instance statuses and the summary as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print every instance status")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    enable_chunked_send()
+    items, skipped = scan_files(args.paths)
+    print(f"Sending {len(items)} file(s) ({sum(i.size for i in items) / 1e6:.1f} MB) to "
+          f"{args.aec}@{args.host}:{args.port}" + (f", skipping {len(skipped)} non-DICOM" if skipped else ""))
+
+    def report(result: SendResult) -> None:
+        if args.verbose:
+            status = "----" if result.status is None else f"{result.status:04X}"
+            print(f"  [{status}] {result.item.path}")
+
+    sender = DicomSender(args.host, args.port, calling_aet=args.aet, called_aet=args.aec,
+                         associations=args.associations, retries=args.retries, timeout=args.timeout,
+                         progress=report)
+    results = sender.send_items(items)
+    summary = summarize(results, sender.elapsed)
+    print(f"✓ Sent {summary['sent']}/{summary['files']} instance(s), {summary['bytes'] / 1e6:.1f} MB in "
+          f"{summary['seconds']:.1f}s ({summary['mb_per_s']} MB/s, {summary['instances_per_s']} instances/s)")
+    if summary["failed"]:
+        print(f"✗ {summary['failed']} instance(s) failed", file=sys.stderr)
+    if args.report:
+        Path(args.report).write_text(json.dumps(
+            {"summary": summary, "instances": [r.to_dict() for r in results]}, indent=2))
+    return 0 if not summary["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
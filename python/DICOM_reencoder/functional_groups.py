@@ -0,0 +1,371 @@
+#
+# functional_groups.py
+# Dicom-Tools-py
+#
+# Extracts enhanced multi-frame functional-group attributes into NumPy arrays and builds volumes from them.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Per-frame geometry and value transforms of enhanced multi-frame objects.
+
+Enhanced CT/MR/PET objects keep frame geometry in
+``PerFrameFunctionalGroupsSequence`` (one nested Dataset per frame) with
+defaults in ``SharedFunctionalGroupsSequence``. Reading it attribute by
+attribute through pydicom converts every DS string into ``DSfloat`` objects
+and is slow for thousands of frames. :func:`parse_frame_table` walks the
+groups once, reads the leaf elements in their raw (undecoded) form and parses
+them straight into contiguous arrays, filling gaps from the shared groups and
+then from the top-level dataset (classic multi-frame files).
+
+:func:`read_frame_table` caches tables per file (path, size and mtime), so
+frame sorting, selection by stack/temporal position/dimension index and
+:func:`build_enhanced_volume` reuse one parse.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pydicom
+from pydicom.dataelem import RawDataElement
+from pydicom.dataset import Dataset
+
+PathLike = Union[str, Path]
+
+PER_FRAME_GROUPS = 0x52009230
+SHARED_GROUPS = 0x52009229
+FRAME_CONTENT = 0x00209111
+DIMENSION_INDEX_VALUES = 0x00209157
+STACK_ID = 0x00209056
+
+# name -> (functional group macro sequence, attribute, encoding, values)
+FRAME_ATTRIBUTES: Dict[str, Tuple[int, int, str, int]] = {
+    "position": (0x00209113, 0x00200032, "ds", 3),  # PlanePosition / ImagePositionPatient
+    "orientation": (0x00209116, 0x00200037, "ds", 6),  # PlaneOrientation / ImageOrientationPatient
+    "pixel_spacing": (0x00289110, 0x00280030, "ds", 2),  # PixelMeasures / PixelSpacing
+    "slice_thickness": (0x00289110, 0x00180050, "ds", 1),  # PixelMeasures / SliceThickness
+    "rescale_intercept": (0x00289145, 0x00281052, "ds", 1),  # PixelValueTransformation
+    "rescale_slope": (0x00289145, 0x00281053, "ds", 1),
+    "window_center": (0x00289132, 0x00281050, "ds", 1),  # FrameVOILUT
+    "window_width": (0x00289132, 0x00281051, "ds", 1),
+    "in_stack_position": (FRAME_CONTENT, 0x00209057, "ul", 1),
+    "temporal_position": (FRAME_CONTENT, 0x00209128, "ul", 1),
+    "echo_time": (0x00189114, 0x00189082, "fd", 1),  # MREcho / EffectiveEchoTime
+}
+_INTEGER_FIELDS = {"in_stack_position", "temporal_position"}
+_BINARY_DTYPES = {"ul": "u4", "fd": "f8"}
+
+CACHE_SIZE = 32
+
+
+def _numbers(element, encoding: str) -> Optional[List[float]]:
+    """Values of a (possibly still raw) element as floats, or None when absent or empty."""
+    if element is None:
+        return None
+    value = element.value
+    if value is None or value == b"" or value == "":
+        return None
+    if isinstance(element, RawDataElement):
+        if encoding == "ds":
+            text = value.decode("ascii", "replace").strip(" \0")
+            return [float(part) for part in text.split("\\") if part.strip()] or None
+        order = "<" if element.is_little_endian else ">"
+        return np.frombuffer(value, dtype=order + _BINARY_DTYPES[encoding]).tolist()
+    if isinstance(value, (str, bytes)) or not hasattr(value, "__iter__"):
+        value = [value]
+    return [float(v) for v in value]
+
+
+def _text(element) -> Optional[str]:
+    if element is None or element.value is None:
+        return None
+    value = element.value
+    if isinstance(value, bytes):
+        value = value.decode("ascii", "replace")
+    return str(value).strip(" \0") or None
+
+
+def _first_item(dataset: Optional[Dataset], tag: int) -> Optional[Dataset]:
+    if dataset is None or tag not in dataset:
+        return None
+    sequence = dataset[tag].value
+    return sequence[0] if sequence else None
+
+
+def _group_values(group: Optional[Dataset]) -> dict:
+    """Attributes present in one functional-groups item (per-frame or shared)."""
+    values: dict = {}
+    if group is None:
+        return values
+    macros: Dict[int, Optional[Dataset]] = {}
+    for name, (macro, tag, encoding, _) in FRAME_ATTRIBUTES.items():
+        if macro not in macros:
+            macros[macro] = _first_item(group, macro)
+        item = macros[macro]
+        if item is not None and tag in item:
+            found = _numbers(item.get_item(tag), encoding)
+            if found is not None:
+                values[name] = found
+    content = macros.get(FRAME_CONTENT)
+    if content is not None:
+        if DIMENSION_INDEX_VALUES in content:
+            dims = _numbers(content.get_item(DIMENSION_INDEX_VALUES), "ul")
+            if dims is not None:
+                values["dimension_index"] = [int(v) for v in dims]
+        if STACK_ID in content:
+            stack = _text(content.get_item(STACK_ID))
+            if stack is not None:
+                values["stack_id"] = stack
+    return values
+
+
+def _root_values(dataset: Dataset) -> dict:
+    """Top-level attributes used when the functional groups do not carry them."""
+    values: dict = {}
+    for name, (_, tag, encoding, _) in FRAME_ATTRIBUTES.items():
+        if tag in dataset:
+            found = _numbers(dataset.get_item(tag), encoding)
+            if found is not None:
+                values[name] = found
+    return values
+
+
+@dataclass
+class FrameTable:
+    """Per-frame attributes of one multi-frame object as arrays indexed by frame number (0-based).
+
+    Missing floating-point values are NaN and missing integers -1.
+    """
+
+    rows: int
+    columns: int
+    position: np.ndarray  # (frames, 3)
+    orientation: np.ndarray  # (frames, 6)
+    pixel_spacing: np.ndarray  # (frames, 2) row spacing, column spacing
+    slice_thickness: np.ndarray
+    rescale_intercept: np.ndarray
+    rescale_slope: np.ndarray
+    window_center: np.ndarray
+    window_width: np.ndarray
+    in_stack_position: np.ndarray
+    temporal_position: np.ndarray
+    echo_time: np.ndarray
+    dimension_index: np.ndarray  # (frames, index columns)
+    stack_id: np.ndarray  # strings, "" when absent
+
+    @property
+    def frames(self) -> int:
+        return len(self.position)
+
+    def select(self, *, stack_id: Optional[str] = None, temporal_position: Optional[int] = None,
+               dimension: Optional[Sequence[Optional[int]]] = None) -> np.ndarray:
+        """Frame indices matching every given criterion.
+
+        ``dimension`` matches DimensionIndexValues column by column; ``None`` entries are wildcards.
+        """
+        mask = np.ones(self.frames, dtype=bool)
+        if stack_id is not None:
+            mask &= self.stack_id == str(stack_id)
+        if temporal_position is not None:
+            mask &= self.temporal_position == int(temporal_position)
+        for column, value in enumerate(dimension or ()):
+            if value is None:
+                continue
+            if column >= self.dimension_index.shape[1]:
+                return np.empty(0, dtype=np.intp)
+            mask &= self.dimension_index[:, column] == int(value)
+        return np.flatnonzero(mask)
+
+    def sort_order(self, frames: Optional[Iterable[int]] = None) -> np.ndarray:
+        """Sort ``frames`` (default: all) along the slice normal.
+
+        Frames without geometry fall back to InStackPositionNumber, then DimensionIndexValues,
+        then frame number.
+        """
+        frames = np.arange(self.frames) if frames is None else np.asarray(list(frames), dtype=np.intp)
+        if len(frames) == 0:
+            return frames
+        keys = [frames]
+        for column in range(self.dimension_index.shape[1] - 1, -1, -1):
+            keys.append(self.dimension_index[frames, column])
+        keys.append(self.in_stack_position[frames])
+        normal = self.slice_normal(frames)
+        positions = self.position[frames]
+        if normal is not None and not np.isnan(positions).any():
+            keys.append(positions @ normal)
+        # np.lexsort sorts by the last key first
+        return frames[np.lexsort(keys)]
+
+    def slice_normal(self, frames: Optional[Sequence[int]] = None) -> Optional[np.ndarray]:
+        orientation = self.orientation[frames[0] if frames is not None and len(frames) else 0]
+        if np.isnan(orientation).any():
+            return None
+        return np.cross(orientation[:3], orientation[3:])
+
+    def affine(self, frames: Sequence[int]) -> np.ndarray:
+        """Voxel-to-patient (LPS) affine for ``frames`` in the given (sorted) order, as ``plan_volume`` builds it."""
+        frames = np.asarray(frames, dtype=np.intp)
+        first = frames[0]
+        if np.isnan(self.orientation[first]).any() or np.isnan(self.position[first]).any():
+            raise RuntimeError("Frames are missing ImageOrientationPatient/ImagePositionPatient")
+        row_cosine, column_cosine = self.orientation[first, :3], self.orientation[first, 3:]
+        slice_cosine = np.cross(row_cosine, column_cosine)
+        row_spacing, column_spacing = (1.0, 1.0) if np.isnan(self.pixel_spacing[first]).any() \
+            else self.pixel_spacing[first]
+        if len(frames) > 1:
+            slice_spacing = float(np.median(np.diff(self.position[frames] @ slice_cosine)))
+        else:
+            thickness = self.slice_thickness[first]
+            slice_spacing = 0.0 if np.isnan(thickness) else float(thickness)
+        affine = np.identity(4, dtype=np.float32)
+        affine[:3, 0] = row_cosine * column_spacing
+        affine[:3, 1] = column_cosine * row_spacing
+        affine[:3, 2] = slice_cosine * slice_spacing
+        affine[:3, 3] = self.position[first]
+        return affine
+
+
+def parse_frame_table(dataset: Dataset) -> FrameTable:
+    """Extract per-frame functional-group attributes of ``dataset`` in one pass."""
+    per_frame = dataset[PER_FRAME_GROUPS].value if PER_FRAME_GROUPS in dataset else []
+    frames = int(getattr(dataset, "NumberOfFrames", 0) or 0) or len(per_frame) or 1
+    if per_frame and len(per_frame) != frames:
+        raise RuntimeError(f"PerFrameFunctionalGroupsSequence has {len(per_frame)} items for {frames} frames")
+
+    # Later sources only fill what earlier ones left empty: per-frame, shared, top level
+    defaults = _root_values(dataset)
+    defaults.update(_group_values(_first_item(dataset, SHARED_GROUPS)))
+
+    arrays = {name: np.full((frames, width) if width > 1 else frames, np.nan)
+              for name, (_, _, _, width) in FRAME_ATTRIBUTES.items()}
+    dimension_rows: List[List[int]] = []
+    stacks: List[str] = []
+    for index in range(frames):
+        values = dict(defaults)
+        if per_frame:
+            values.update(_group_values(per_frame[index]))
+        for name, (_, _, _, width) in FRAME_ATTRIBUTES.items():
+            found = values.get(name)
+            if found is None or len(found) < width:
+                continue
+            arrays[name][index] = found[:width] if width > 1 else found[0]
+        dimension_rows.append(values.get("dimension_index", []))
+        stacks.append(values.get("stack_id", ""))
+
+    columns = max((len(row) for row in dimension_rows), default=0)
+    dimension_index = np.full((frames, columns), -1, dtype=np.int64)
+    for index, row in enumerate(dimension_rows):
+        dimension_index[index, :len(row)] = row
+    for name in _INTEGER_FIELDS:
+        arrays[name] = np.where(np.isnan(arrays[name]), -1, arrays[name]).astype(np.int64)
+
+    return FrameTable(rows=int(getattr(dataset, "Rows", 0) or 0), columns=int(getattr(dataset, "Columns", 0) or 0),
+                      dimension_index=dimension_index, stack_id=np.array(stacks, dtype=str), **arrays)
+
+
+_cache: "OrderedDict[tuple, FrameTable]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_key(path: Path) -> tuple:
+    stat = path.stat()
+    return str(path.resolve()), stat.st_size, stat.st_mtime_ns
+
+
+def read_frame_table(path: PathLike) -> FrameTable:
+    """Header-only parse of ``path``, cached per file until it changes on disk."""
+    path = Path(path)
+    key = _cache_key(path)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    table = parse_frame_table(pydicom.dcmread(path, stop_before_pixels=True, force=True))
+    with _cache_lock:
+        _cache[key] = table
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return table
+
+
+def clear_frame_table_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+def is_multiframe(path: PathLike) -> bool:
+    """True for files holding more than one frame (enhanced or classic multi-frame)."""
+    try:
+        header = pydicom.dcmread(path, stop_before_pixels=True, force=True, specific_tags=["NumberOfFrames"])
+        return int(header.get("NumberOfFrames") or 1) > 1
+    except Exception:  # noqa: BLE001
+        return False
+
+
+def _iter_frames(path: Path, frames: np.ndarray) -> Iterable[np.ndarray]:
+    try:
+        from pydicom.pixels import iter_pixels
+    except ImportError:  # pydicom < 3.0 decodes every frame at once
+        pixels = pydicom.dcmread(path, force=True).pixel_array
+        pixels = pixels[np.newaxis] if pixels.ndim == 2 else pixels
+        return (pixels[index] for index in frames)
+    return iter_pixels(path, indices=[int(index) for index in frames])
+
+
+def build_enhanced_volume(path: PathLike, *, frames: Optional[Sequence[int]] = None, stack_id: Optional[str] = None,
+                          temporal_position: Optional[int] = None,
+                          dimension: Optional[Sequence[Optional[int]]] = None,
+                          rescale: Optional[bool] = None) -> Tuple[np.ndarray, np.ndarray, dict]:
+    """
+    Build a volume from selected frames of one multi-frame object.
+
+    Frames are chosen by explicit indices or by stack/temporal position/dimension index,
+    sorted along the slice normal and decoded one at a time into a preallocated array.
+    Returns ``(volume, affine, metadata)`` with the same ``(x, y, z)`` layout as ``build_volume``.
+    """
+    from .volume_builder import _volume_metadata
+
+    path = Path(path)
+    table = read_frame_table(path)
+    if frames is None:
+        frames = table.select(stack_id=stack_id, temporal_position=temporal_position, dimension=dimension)
+    order = table.sort_order(frames)
+    if len(order) == 0:
+        raise RuntimeError(f"No frames of {path.name} match the selection")
+
+    orientation = table.orientation[order]
+    if not np.isnan(orientation).all() and not np.allclose(orientation, orientation[0], atol=1e-4):
+        raise RuntimeError("Selected frames have different orientations; select one stack")
+    affine = table.affine(order)
+    if len(order) > 1:
+        steps = np.diff(table.position[order] @ np.cross(orientation[0, :3], orientation[0, 3:]))
+        if np.any(np.abs(steps) < 1e-6):
+            raise RuntimeError("Selected frames share slice positions; select one stack or temporal position")
+        if not np.allclose(steps, steps[0], atol=0, rtol=1e-1):
+            raise RuntimeError("It appears there are missing slices")
+
+    slope = np.nan_to_num(table.rescale_slope[order], nan=1.0)
+    intercept = np.nan_to_num(table.rescale_intercept[order], nan=0.0)
+    if rescale is None:
+        rescale = bool(np.any(slope != 1.0) or np.any(intercept != 0.0))
+
+    header = pydicom.dcmread(path, stop_before_pixels=True, force=True)
+    buffer = None
+    for k, plane in enumerate(_iter_frames(path, order)):
+        if buffer is None:
+            buffer = np.empty((len(order),) + plane.shape, dtype=np.float32 if rescale else plane.dtype)
+        buffer[k] = plane * np.float32(slope[k]) + np.float32(intercept[k]) if rescale else plane
+    volume = buffer.T
+
+    metadata = _volume_metadata(volume, affine, header)
+    spacing = table.pixel_spacing[order[0]]
+    thickness = table.slice_thickness[order[0]]
+    metadata["spacing_mm"] = [float(v) for v in np.nan_to_num(spacing, nan=1.0)] + \
+        [float(np.nan_to_num(thickness, nan=1.0))]
+    metadata["frames"] = [int(index) for index in order]
+    metadata["number_of_frames"] = table.frames
+    return volume, affine, metadata
@@ -0,0 +1,274 @@
+#
+# mpr.py
+# Dicom-Tools-py
+#
+# NumPy multiplanar reformatting: orthogonal views, oblique reslicing and thick slabs over built volumes.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Multiplanar reformatting (MPR) on top of ``volume_builder`` output.
+
+Volumes use the ``build_volume`` layout: axes ``(x, y, z)`` = (column, row,
+slice) and a 4x4 affine mapping voxel indices to patient millimetres.
+
+* Orthogonal planes along the acquisition grid are returned as NumPy views
+  (no copy), so scrolling costs O(1) regardless of volume size. ``axial``
+  fixes the slice index, ``coronal`` the row and ``sagittal`` the column;
+  coronal and sagittal images put the last slice at the top.
+* Oblique planes are resampled in patient space with nearest-neighbour or
+  trilinear interpolation, vectorized over blocks of output rows to bound
+  temporary memory.
+* Thick slabs combine several planes along the normal (mean, max or min),
+  both for orthogonal and oblique planes; sliding slabs over whole volumes
+  live in :mod:`DICOM_reencoder.projection`.
+
+    from DICOM_reencoder.mpr import Reslicer
+    reslicer = Reslicer.from_directory("series/")
+    coronal = reslicer.orthogonal("coronal", 120, slab=5)
+    oblique = reslicer.oblique(normal=(0, 0.7071, 0.7071), order="linear")
+"""
+
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+PLANES = ("axial", "coronal", "sagittal")
+INTERPOLATIONS = ("nearest", "linear")
+SLAB_MODES = ("mean", "max", "min")
+
+# Volume axis held fixed by each orthogonal plane
+_PLANE_AXIS = {"axial": 2, "coronal": 1, "sagittal": 0}
+DEFAULT_CHUNK_ROWS = 64
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=float)
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        raise ValueError("Direction vector must be non-zero")
+    return vector / norm
+
+
+def plane_axes(normal: Sequence[float], up: Optional[Sequence[float]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return orthonormal ``(row_dir, column_dir, normal)`` for a plane; ``up`` hints the image's upward direction."""
+    normal = _unit(normal)
+    if up is None:
+        # Patient superior (+z in LPS) reads as "up" unless the plane is nearly axial
+        up = (0.0, 0.0, 1.0) if abs(normal[2]) < 0.9 else (0.0, -1.0, 0.0)
+    down = -_unit(up)
+    down = down - np.dot(down, normal) * normal
+    if np.linalg.norm(down) < 1e-6:
+        raise ValueError("Up vector must not be parallel to the plane normal")
+    column_dir = down / np.linalg.norm(down)
+    row_dir = np.cross(column_dir, normal)
+    return row_dir, column_dir, normal
+
+
+def window_to_uint8(image: np.ndarray, center: Optional[float] = None, width: Optional[float] = None) -> np.ndarray:
+    """Map an image to 8-bit display values; without a window the full image range is used."""
+    image = np.asarray(image, dtype=np.float32)
+    if center is None or not width:
+        low, high = (float(image.min()), float(image.max())) if image.size else (0.0, 1.0)
+    else:
+        low, high = center - width / 2.0, center + width / 2.0
+    scale = 255.0 / max(high - low, 1e-6)
+    return np.clip((image - low) * scale, 0, 255).astype(np.uint8)
+
+
+def sample_points(volume: np.ndarray, coords: np.ndarray, *, order: str = "linear", fill: float = 0.0) -> np.ndarray:
+    """Sample ``volume`` at fractional voxel coordinates ``coords[..., 3]``; outside samples get ``fill``."""
+    if order not in INTERPOLATIONS:
+        raise ValueError(f"Unknown interpolation '{order}'. Choose from: {', '.join(INTERPOLATIONS)}")
+    shape = np.asarray(volume.shape[:3])
+    flat = coords.reshape(-1, 3)
+    out = np.full(flat.shape[0], fill, dtype=np.float32)
+
+    if order == "nearest":
+        index = np.rint(flat).astype(np.intp)
+        inside = np.all((index >= 0) & (index < shape), axis=1)
+        i, j, k = index[inside].T
+        out[inside] = volume[i, j, k]
+        return out.reshape(coords.shape[:-1])
+
+    # Samples exactly on the last voxel plane are valid; their upper neighbour is clamped
+    inside = np.all((flat >= 0) & (flat <= shape - 1), axis=1)
+    points = flat[inside]
+    base = np.minimum(np.floor(points).astype(np.intp), shape - 2).clip(min=0)
+    frac = (points - base).astype(np.float32)
+    upper = np.minimum(base + 1, shape - 1)
+    i = (base[:, 0], upper[:, 0])
+    j = (base[:, 1], upper[:, 1])
+    k = (base[:, 2], upper[:, 2])
+    fx, fy, fz = frac[:, 0], frac[:, 1], frac[:, 2]
+    acc = np.zeros(points.shape[0], dtype=np.float32)
+    for di, wx in ((0, 1 - fx), (1, fx)):
+        for dj, wy in ((0, 1 - fy), (1, fy)):
+            for dk, wz in ((0, 1 - fz), (1, fz)):
+                acc += volume[i[di], j[dj], k[dk]] * (wx * wy * wz)
+    out[inside] = acc
+    return out.reshape(coords.shape[:-1])
+
+
+class Reslicer:
+    """Orthogonal, oblique and thick-slab reslicing of one volume."""
+
+    def __init__(self, volume: np.ndarray, affine: np.ndarray, metadata: Optional[dict] = None):
+        if volume.ndim != 3:
+            raise ValueError(f"Expected a 3D volume, got shape {volume.shape}")
+        self.volume = volume
+        self.affine = np.asarray(affine, dtype=float)
+        self.inverse = np.linalg.inv(self.affine)
+        self.spacing = np.linalg.norm(self.affine[:3, :3], axis=0)
+        self.metadata = metadata or {}
+
+    @classmethod
+    def from_directory(cls, dicom_dir, **build_kwargs) -> "Reslicer":
+        """Build (or load from the volume cache) the series in ``dicom_dir``."""
+        from .volume_builder import build_volume
+
+        volume, affine, metadata = build_volume(Path(dicom_dir), **build_kwargs)
+        return cls(volume, affine, metadata)
+
+    # Orthogonal planes ---------------------------------------------------
+
+    def plane_count(self, plane: str) -> int:
+        return self.volume.shape[plane_axis(plane)]
+
+    def plane_spacing(self, plane: str) -> float:
+        """Distance between consecutive orthogonal planes, in mm."""
+        return float(self.spacing[plane_axis(plane)])
+
+    def orthogonal(self, plane: str, index: int, *, slab: int = 1, slab_mode: str = "mean") -> np.ndarray:
+        """Return plane ``index``; a view for ``slab == 1``, else ``slab_mode`` over ``slab`` neighbours."""
+        axis = plane_axis(plane)
+        count = self.volume.shape[axis]
+        if not 0 <= index < count:
+            raise IndexError(f"{plane} index {index} out of range for {count} planes")
+        if slab <= 1:
+            return orient_plane(_take_view(self.volume, axis, index), plane)
+        lo = max(0, index - slab // 2)
+        hi = min(count, lo + slab)
+        window = [slice(None)] * 3
+        window[axis] = slice(lo, hi)
+        block = self.volume[tuple(window)]
+        if slab_mode == "mean":
+            reduced = block.mean(axis=axis, dtype=np.float32)
+        else:
+            reduced = _slab_reducer(slab_mode).reduce(block, axis=axis)
+        return orient_plane(reduced, plane)
+
+    def location_mm(self, plane: str, index: int) -> float:
+        """Position of an orthogonal plane along its normal, in patient millimetres."""
+        axis = plane_axis(plane)
+        direction = self.affine[:3, axis] / self.spacing[axis]
+        voxel = np.zeros(4)
+        voxel[axis] = index
+        voxel[3] = 1.0
+        return float(np.dot(self.affine[:3] @ voxel, direction))
+
+    # Oblique planes ------------------------------------------------------
+
+    @property
+    def center_mm(self) -> np.ndarray:
+        voxel = np.append((np.asarray(self.volume.shape) - 1) / 2.0, 1.0)
+        return (self.affine @ voxel)[:3]
+
+    def _extent_mm(self) -> float:
+        return float(np.linalg.norm(np.asarray(self.volume.shape) * self.spacing))
+
+    def oblique_count(self, normal: Sequence[float], spacing: Optional[float] = None) -> int:
+        """Number of planes of ``spacing`` mm needed to cover the volume along ``normal``."""
+        spacing = spacing or float(self.spacing.min())
+        return max(1, int(np.ceil(self._extent_mm() / spacing)))
+
+    def oblique(self, normal: Sequence[float], *, center: Optional[Sequence[float]] = None,
+                up: Optional[Sequence[float]] = None, offset_mm: float = 0.0, size: Optional[Tuple[int, int]] = None,
+                spacing: Optional[float] = None, order: str = "linear", slab_mm: float = 0.0,
+                slab_step: Optional[float] = None, slab_mode: str = "mean", fill: float = 0.0,
+                chunk_rows: int = DEFAULT_CHUNK_ROWS) -> np.ndarray:
+        """
+        Resample an arbitrary plane through the volume.
+
+        Args:
+            normal: Plane normal in patient coordinates.
+            center: Point on the plane (mm); defaults to the volume centre.
+            up: Direction that should point up in the image; see :func:`plane_axes`.
+            offset_mm: Shift of the plane along its normal from ``center``.
+            size: Output ``(rows, columns)``; defaults to a square covering the whole volume.
+            spacing: Output pixel spacing in mm; defaults to the finest voxel spacing.
+            order: ``"nearest"`` or ``"linear"`` (trilinear).
+            slab_mm: Thick-slab thickness; ``slab_mm / slab_step`` planes across it are combined.
+            slab_step: Distance between combined planes; defaults to ``spacing``.
+            slab_mode: ``"mean"`` (average), ``"max"`` (MIP) or ``"min"`` (MinIP).
+            fill: Value for samples outside the volume.
+            chunk_rows: Output rows resampled per vectorized block.
+
+        Returns:
+            float32 image of shape ``size``.
+        """
+        row_dir, column_dir, normal = plane_axes(normal, up)
+        reducer = None if slab_mode == "mean" else _slab_reducer(slab_mode)
+        spacing = spacing or float(self.spacing.min())
+        if size is None:
+            side = max(1, int(np.ceil(self._extent_mm() / spacing)))
+            size = (side, side)
+        rows, columns = size
+        center = np.asarray(center if center is not None else self.center_mm, dtype=float) + offset_mm * normal
+
+        # A slab of N steps combines N planes centred on the plane, matching orthogonal(slab=N)
+        step = slab_step or spacing
+        count = max(1, int(round(slab_mm / step))) if slab_mm else 1
+        offsets = (np.arange(count) - (count - 1) / 2.0) * step
+
+        # Work in voxel space: one origin plus per-pixel and per-slab steps
+        linear = self.inverse[:3, :3]
+        origin = self.inverse[:3] @ np.append(center, 1.0)
+        step_column = linear @ (row_dir * spacing)
+        step_row = linear @ (column_dir * spacing)
+        step_normal = linear @ normal
+        origin = origin - step_column * (columns - 1) / 2.0 - step_row * (rows - 1) / 2.0
+
+        out = np.empty((rows, columns), dtype=np.float32)
+        column_terms = np.arange(columns)[:, None] * step_column
+        for start in range(0, rows, max(1, chunk_rows)):
+            stop = min(rows, start + chunk_rows)
+            grid = origin + np.arange(start, stop)[:, None, None] * step_row + column_terms[None]
+            acc = None
+            for delta in offsets:
+                sampled = sample_points(self.volume, grid + delta * step_normal, order=order, fill=fill)
+                if acc is None:
+                    acc = sampled
+                elif reducer is None:
+                    acc += sampled
+                else:
+                    reducer(acc, sampled, out=acc)
+            out[start:stop] = acc / len(offsets) if reducer is None else acc
+        return out
+
+
+def plane_axis(plane: str) -> int:
+    try:
+        return _PLANE_AXIS[plane]
+    except KeyError:
+        raise ValueError(f"Unknown plane '{plane}'. Choose from: {', '.join(PLANES)}") from None
+
+
+def _slab_reducer(mode: str) -> np.ufunc:
+    if mode not in SLAB_MODES:
+        raise ValueError(f"Unknown slab mode '{mode}'. Choose from: {', '.join(SLAB_MODES)}")
+    return np.maximum if mode == "max" else np.minimum
+
+
+def _take_view(volume: np.ndarray, axis: int, index: int) -> np.ndarray:
+    key = [slice(None)] * 3
+    key[axis] = index
+    return volume[tuple(key)]
+
+
+def orient_plane(block: np.ndarray, plane: str) -> np.ndarray:
+    """Turn an (a, b) block into display rows/columns; still a view of ``block``."""
+    if plane == "axial":
+        return block.T  # (row, column)
+    return block[:, ::-1].T  # (slice reversed, in-plane axis)
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+#
+# network_benchmark.py
+# Dicom-Tools-py
+#
+# Load-test harness timing C-ECHO, C-FIND, C-STORE and C-GET against local SCPs and reporting JSON.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Network benchmark (``dicom-netbench``).
+
+Starts the toolkit's own SCPs on loopback (``VerificationServer``,
+``StorageSCP`` and ``QueryRetrieveSCP``) over a synthetic series written by
+``build_synthetic_series``. The SCU helpers then drive them:
+
+* ``echo``: ``send_c_echo``.
+* ``find``: a study-level ``iter_query``.
+* ``store``: one C-STORE per operation.
+* ``get``: a study-level C-GET written through ``StorageWriter``.
+
+Each workload runs ``operations`` requests on ``concurrency`` threads. The
+threads either share an ``AssociationPool`` or negotiate a new association
+per request (``pooled=False``), so pooling regressions show up directly.
+The report is JSON. For every workload it gives latency percentiles (ms),
+operations/s, associations/s, instances/s and MB/s, plus the settings that
+produced it (series size, PDU size, fsync policy). Failed requests are counted
+by exception type, with the first few messages kept as samples:
+
+    with NetworkBenchmark(slices=16, shape=(256, 256), concurrency=4) as bench:
+        report = bench.run(["echo", "store", "get"])
+"""
+
+import argparse
+import contextlib
+import json
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import pydicom
+from pynetdicom import evt
+from pynetdicom.presentation import build_context
+
+from .core.association_pool import AssociationPool, open_association
+from .core.factories import build_synthetic_series
+from .core.network import VerificationServer, send_c_echo
+from .dicom_query import create_study_query, iter_query
+from .dicom_retrieve import create_retrieve_query, retrieve_contexts
+from .qr_scp import QueryRetrieveSCP
+from .storage_scp import StorageSCP
+from .storage_writer import FSYNC_POLICIES, StorageWriter
+
+WORKLOADS = ("echo", "find", "store", "get")
+PERCENTILES = (50, 90, 95, 99)
+ERROR_SAMPLES = 5
+SCU_AET = "NETBENCH"
+
+# An operation returns the (instances, bytes) it transferred
+Operation = Callable[[Optional[AssociationPool]], Tuple[int, int]]
+
+
+def percentiles(samples: Sequence[float]) -> dict:
+    """Latency summary in milliseconds (nearest-rank percentiles) for samples in seconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    summary = {"min": ordered[0], "mean": sum(ordered) / len(ordered)}
+    for pct in PERCENTILES:
+        rank = max(1, -(-pct * len(ordered) // 100))
+        summary[f"p{pct}"] = ordered[rank - 1]
+    summary["max"] = ordered[-1]
+    return {name: round(value * 1000, 3) for name, value in summary.items()}
+
+
+@dataclass
+class WorkloadResult:
+    """Counters and latencies of one workload."""
+
+    workload: str
+    concurrency: int
+    pooled: bool
+    operations: int = 0
+    errors: int = 0
+    associations: int = 0
+    instances: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    latencies: List[float] = field(default_factory=list, repr=False)
+    error_types: Counter = field(default_factory=Counter)
+    error_samples: List[str] = field(default_factory=list)
+
+    def record_error(self, exc: BaseException) -> None:
+        """Count ``exc`` by type and keep the first ``ERROR_SAMPLES`` messages."""
+        self.errors += 1
+        self.error_types[type(exc).__name__] += 1
+        if len(self.error_samples) < ERROR_SAMPLES:
+            self.error_samples.append(f"{type(exc).__name__}: {exc}")
+
+    def _rate(self, value: float) -> float:
+        return round(value / self.seconds, 2) if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "workload": self.workload,
+            "concurrency": self.concurrency,
+            "pooled": self.pooled,
+            "operations": self.operations,
+            "errors": self.errors,
+            "error_types": dict(self.error_types),
+            "error_samples": list(self.error_samples),
+            "associations": self.associations,
+            "instances": self.instances,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 3),
+            "operations_per_s": self._rate(self.operations),
+            "associations_per_s": self._rate(self.associations),
+            "instances_per_s": self._rate(self.instances),
+            "mb_per_s": self._rate(self.bytes / 1e6),
+            "latency_ms": percentiles(self.latencies),
+        }
+
+
+def run_workload(name: str, operation: Operation, *, operations: int, concurrency: int,
+                 pooled: bool = True, pool_timeout: float = 30) -> WorkloadResult:
+    """Run ``operation`` ``operations`` times on ``concurrency`` threads and time every call."""
+    result = WorkloadResult(workload=name, concurrency=concurrency, pooled=pooled)
+    pool = AssociationPool(max_size=concurrency, health_check_interval=None, timeout=pool_timeout) if pooled else None
+    lock = threading.Lock()
+    remaining = [operations]
+
+    def worker() -> None:
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                instances, size = operation(pool)
+            except Exception as exc:  # noqa: BLE001 - a failed request is counted, not fatal to the run
+                with lock:
+                    result.record_error(exc)
+                continue
+            elapsed = time.perf_counter() - started
+            with lock:
+                result.operations += 1
+                result.instances += instances
+                result.bytes += size
+                result.latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker, name=f"netbench-{n}", daemon=True) for n in range(concurrency)]
+    started = time.perf_counter()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        result.seconds = time.perf_counter() - started
+        if pool is not None:
+            result.associations = pool.stats["created"]
+            pool.close()
+        else:
+            result.associations = result.operations + result.errors
+    return result
+
+
+class NetworkBenchmark:
+    """Local SCPs over a synthetic series, and the workloads that load them."""
+
+    def __init__(self, workdir: Optional[str] = None, *, slices: int = 16, shape: Tuple[int, int] = (256, 256),
+                 operations: int = 200, concurrency: int = 4, pooled: bool = True, fsync: str = "none",
+                 max_pdu: Optional[int] = None, host: str = "127.0.0.1"):
+        """
+        Args:
+            workdir: Where the series and received files go; a temporary directory by default.
+            slices, shape: Size of the synthetic series (instances and rows x columns).
+            operations: Requests per workload.
+            concurrency: Threads issuing requests (and associations in the pool).
+            pooled: Share an ``AssociationPool``; otherwise every request negotiates its own association.
+            fsync: ``StorageWriter`` fsync policy of the Storage SCP and the C-GET writer.
+            max_pdu: Maximum PDU of the local SCPs, i.e. the largest PDU the SCU may send them.
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unsupported fsync policy: {fsync}")
+        self.slices = slices
+        self.shape = tuple(shape)
+        self.operations = operations
+        self.concurrency = max(1, concurrency)
+        self.pooled = pooled
+        self.fsync = fsync
+        self.max_pdu = max_pdu
+        self.host = host
+        self._tmp = tempfile.TemporaryDirectory(prefix="netbench-") if workdir is None else None
+        self.workdir = Path(workdir or self._tmp.name)
+        self._stack = contextlib.ExitStack()
+        self._lock = threading.Lock()
+        self._next = 0
+        self._writer: Optional[StorageWriter] = None
+        self.datasets: list = []
+        self.sizes: List[int] = []
+
+    # Lifecycle ----------------------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Write the synthetic series and start the echo, storage and query/retrieve SCPs."""
+        paths = build_synthetic_series(self.workdir / "archive", slices=self.slices, shape=self.shape)
+        # Datasets are held in memory so C-STORE timings exclude reading the source files
+        self.datasets = [pydicom.dcmread(path) for path in paths]
+        self.sizes = [path.stat().st_size for path in paths]
+        # Unpooled runs release and open associations back to back, so leave room for stragglers
+        limit = 2 * self.concurrency + 2
+        self.echo_server = self._stack.enter_context(VerificationServer(self.host, max_associations=limit))
+        self.storage_scp = self._stack.enter_context(
+            StorageSCP(self.workdir / "received", host=self.host, max_associations=limit, fsync=self.fsync,
+                       max_pdu=self.max_pdu))
+        self.qr_scp = self._stack.enter_context(
+            QueryRetrieveSCP(self.workdir / "archive", host=self.host, max_associations=limit, max_pdu=self.max_pdu))
+
+    def stop(self) -> None:
+        self._stack.close()
+        if self._tmp is not None:
+            self._tmp.cleanup()
+            self._tmp = None
+
+    def __enter__(self) -> "NetworkBenchmark":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    # Workloads ----------------------------------------------------------------------------------
+
+    def _echo(self, pool: Optional[AssociationPool]) -> Tuple[int, int]:
+        status = send_c_echo(self.host, self.echo_server.port, calling_aet=SCU_AET,
+                             called_aet=self.echo_server.ae_title, pool=pool)
+        if status != 0x0000:
+            raise RuntimeError(f"C-ECHO status 0x{status:04X}")
+        return 0, 0
+
+    def _find(self, pool: Optional[AssociationPool]) -> Tuple[int, int]:
+        reports = []
+        matches = list(iter_query(self.host, self.qr_scp.port, SCU_AET, self.qr_scp.ae_title, create_study_query(),
+                                  pool=pool, report=reports.append))
+        if not matches or reports[-1].status != 0x0000:
+            raise RuntimeError("C-FIND returned no matches")
+        return 0, 0
+
+    def _store(self, pool: Optional[AssociationPool]) -> Tuple[int, int]:
+        with self._lock:
+            index = self._next % len(self.datasets)
+            self._next += 1
+        ds = self.datasets[index]
+        context = build_context(ds.SOPClassUID, ds.file_meta.TransferSyntaxUID)
+        with open_association(self.host, self.storage_scp.port, [context], calling_aet=SCU_AET,
+                              called_aet=self.storage_scp.ae_title, pool=pool) as assoc:
+            if not assoc.is_established:
+                raise RuntimeError("Association rejected, aborted or never connected")
+            status = assoc.send_c_store(ds)
+        if status.get("Status") != 0x0000:
+            raise RuntimeError("C-STORE failed")
+        return 1, self.sizes[index]
+
+    def _get(self, pool: Optional[AssociationPool]) -> Tuple[int, int]:
+        model, contexts, roles = retrieve_contexts("StudyRoot", "GET")
+        query = create_retrieve_query("STUDY", self.datasets[0].StudyInstanceUID)
+        handlers = [(evt.EVT_C_STORE, self._writer.handle_store)]
+        completed = None
+        with open_association(self.host, self.qr_scp.port, contexts, calling_aet=SCU_AET,
+                              called_aet=self.qr_scp.ae_title, roles=roles, evt_handlers=handlers,
+                              pool=pool) as assoc:
+            if not assoc.is_established:
+                raise RuntimeError("Association rejected, aborted or never connected")
+            for status, _ in assoc.send_c_get(query, query_model=model):
+                if status and status.Status == 0x0000:
+                    completed = int(status.get("NumberOfCompletedSuboperations", 0) or 0)
+        if completed != len(self.datasets):
+            raise RuntimeError("C-GET did not complete every sub-operation")
+        return completed, sum(self.sizes)
+
+    def run_one(self, workload: str) -> WorkloadResult:
+        operation = {"echo": self._echo, "find": self._find, "store": self._store, "get": self._get}.get(workload)
+        if operation is None:
+            raise ValueError(f"Unknown workload: {workload}")
+        self._next = 0
+        # C-GET instances go through the same raw writer a real retrieve uses
+        self._writer = StorageWriter(self.workdir / "retrieved", fsync=self.fsync)
+        try:
+            return run_workload(workload, operation, operations=self.operations, concurrency=self.concurrency,
+                                pooled=self.pooled)
+        finally:
+            self._writer.close()
+
+    def config(self) -> dict:
+        return {
+            "slices": self.slices,
+            "shape": list(self.shape),
+            "series_bytes": sum(self.sizes),
+            "operations": self.operations,
+            "concurrency": self.concurrency,
+            "pooled": self.pooled,
+            "fsync": self.fsync,
+            "max_pdu": self.max_pdu,
+        }
+
+    def run(self, workloads: Sequence[str] = WORKLOADS) -> dict:
+        """Run ``workloads`` in order and return the JSON-ready report."""
+        results = [self.run_one(workload).to_dict() for workload in workloads]
+        return {"config": self.config(), "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark C-ECHO/C-FIND/C-STORE/C-GET throughput and latency against local SCPs",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Every workload, 200 requests each over 4 pooled associations
+  %(prog)s
+
+  # Association setup cost: a new association per request
+  %(prog)s --workloads echo store --no-pool
+
+  # Larger instances, bigger PDUs and durable writes, saved for comparison
+  %(prog)s --workloads store get --shape 512 512 --max-pdu 262144 --fsync batch -o bench.json
+        """,
+    )
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS),
+                        help="Workloads to run, in order (default: all)")
+    parser.add_argument("-n", "--operations", type=int, default=200, help="Requests per workload (default: 200)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Concurrent requests (default: 4)")
+    parser.add_argument("--no-pool", dest="pooled", action="store_false",
+                        help="Negotiate a new association for every request")
+    parser.add_argument("--slices", type=int, default=16, help="Instances in the synthetic series (default: 16)")
+    parser.add_argument("--shape", type=int, nargs=2, default=(256, 256), metavar=("ROWS", "COLUMNS"),
+                        help="Rows and columns of each instance (default: 256 256)")
+    parser.add_argument("--max-pdu", type=int, help="Maximum PDU of the local SCPs (default: pynetdicom's 16382)")
+    parser.add_argument("--fsync", choices=FSYNC_POLICIES, default="none",
+                        help="fsync policy for received files (default: none)")
+    parser.add_argument("--workdir", help="Directory for the series and received files (default: temporary)")
+    parser.add_argument("-o", "--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    with NetworkBenchmark(args.workdir, slices=args.slices, shape=args.shape, operations=args.operations,
+                          concurrency=args.concurrency, pooled=args.pooled, fsync=args.fsync,
+                          max_pdu=args.max_pdu) as bench:
+        report = bench.run(args.workloads)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+        for result in report["results"]:
+            latency = result["latency_ms"]
+            print(f"{result['workload']:>5}: {result['operations_per_s']:>8.1f} op/s, "
+                  f"p50 {latency.get('p50', 0):.2f} ms, p99 {latency.get('p99', 0):.2f} ms, "
+                  f"{result['mb_per_s']:.2f} MB/s, {result['errors']} error(s)")
+            for sample in result["error_samples"]:
+                print(f"       {sample}")
+    else:
+        print(text)
+    return 0 if all(result["errors"] == 0 for result in report["results"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+#
+# nifti_writer.py
+# Dicom-Tools-py
+#
+# Native NIfTI-1/NIfTI-2 writer streaming slices from the DICOM loader with parallel gzip members.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Write NIfTI files without SimpleITK.
+
+The header (NIfTI-1 or NIfTI-2, single ``.nii`` file) is packed directly and
+the voxels are streamed slice by slice: NIfTI stores x fastest, then y, then
+z, which is exactly the order of the decoded DICOM planes, so no volume is
+ever held in memory. For ``.nii.gz`` the byte stream is cut into blocks that a
+thread pool compresses into independent gzip members (the pigz approach);
+concatenated members form a valid gzip file that zlib/gzip/ITK/nibabel read
+transparently.
+
+Patient coordinates are converted from DICOM LPS to NIfTI RAS and written to
+both the qform (quaternion) and the sform (affine) with scanner-anatomical
+codes.
+"""
+
+import dataclasses
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+PathLike = Union[str, Path]
+
+# NIfTI datatype codes
+NIFTI_DTYPES = {
+    np.dtype(np.uint8): 2,
+    np.dtype(np.int16): 4,
+    np.dtype(np.int32): 8,
+    np.dtype(np.float32): 16,
+    np.dtype(np.float64): 64,
+    np.dtype(np.int8): 256,
+    np.dtype(np.uint16): 512,
+    np.dtype(np.uint32): 768,
+    np.dtype(np.int64): 1024,
+    np.dtype(np.uint64): 1280,
+}
+NIFTI_XFORM_SCANNER_ANAT = 1
+NIFTI_UNITS_MM = 2
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+DEFAULT_LEVEL = 6
+
+_NIFTI1 = struct.Struct("<i10s18sihcb8h3f4h8f3fhbb4f2i80s24s2h6f4f4f4f16s4s")
+_NIFTI2 = struct.Struct("<i8s2h8q3d8dq6d2q80s24s2i6d4d4d4d3i16sc15s")
+_HEADER_SIZES = {1: 348, 2: 540}
+_MAGIC = {1: b"n+1\0", 2: b"n+2\0\r\n\x1a\n"}
+assert _NIFTI1.size == _HEADER_SIZES[1] and _NIFTI2.size == _HEADER_SIZES[2]
+
+# DICOM patient axes are LPS; NIfTI world axes are RAS
+LPS_TO_RAS = np.diag([-1.0, -1.0, 1.0, 1.0])
+
+
+def _gzip_member(block: bytes, level: int) -> bytes:
+    # wbits=31 emits a complete gzip member (header, deflate stream, CRC32, size)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(block) + compressor.flush()
+
+
+class ParallelGzipWriter:
+    """File-like sink compressing fixed-size blocks into concatenated gzip members on a thread pool.
+
+    Members are written in submission order; at most ``2 * workers`` blocks are in flight.
+    """
+
+    def __init__(self, fileobj: BinaryIO, *, level: int = DEFAULT_LEVEL, workers: Optional[int] = None,
+                 block_size: int = DEFAULT_BLOCK_SIZE):
+        self.fileobj = fileobj
+        self.level = level
+        self.block_size = max(1, int(block_size))
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        self._pending: deque = deque()
+        self._buffer = bytearray()
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def write(self, data) -> int:
+        view = memoryview(data).cast("B")
+        self._buffer += view
+        self.bytes_in += len(view)
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+        return len(view)
+
+    def _submit(self, block: bytes) -> None:
+        if len(self._pending) >= 2 * self.workers:
+            self._drain_one()
+        self._pending.append(self._pool.submit(_gzip_member, block, self.level))
+
+    def _drain_one(self) -> None:
+        member = self._pending.popleft().result()
+        self.fileobj.write(member)
+        self.bytes_out += len(member)
+
+    def close(self) -> None:
+        try:
+            if self._buffer or not (self.bytes_in or self._pending):
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._drain_one()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> "ParallelGzipWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _quaternion(rotation: np.ndarray) -> Tuple[float, float, float]:
+    """Quaternion (b, c, d) of a proper rotation matrix, as in nifti1_io's mat44_to_quatern."""
+    r = rotation
+    a = r[0, 0] + r[1, 1] + r[2, 2] + 1.0
+    if a > 0.5:
+        a = 0.5 * np.sqrt(a)
+        b, c, d = 0.25 * (r[2, 1] - r[1, 2]) / a, 0.25 * (r[0, 2] - r[2, 0]) / a, 0.25 * (r[1, 0] - r[0, 1]) / a
+    else:
+        xd = 1.0 + r[0, 0] - (r[1, 1] + r[2, 2])
+        yd = 1.0 + r[1, 1] - (r[0, 0] + r[2, 2])
+        zd = 1.0 + r[2, 2] - (r[0, 0] + r[1, 1])
+        if xd > 1.0:
+            b = 0.5 * np.sqrt(xd)
+            c, d, a = 0.25 * (r[0, 1] + r[1, 0]) / b, 0.25 * (r[0, 2] + r[2, 0]) / b, 0.25 * (r[2, 1] - r[1, 2]) / b
+        elif yd > 1.0:
+            c = 0.5 * np.sqrt(yd)
+            b, d, a = 0.25 * (r[0, 1] + r[1, 0]) / c, 0.25 * (r[1, 2] + r[2, 1]) / c, 0.25 * (r[0, 2] - r[2, 0]) / c
+        else:
+            d = 0.5 * np.sqrt(zd)
+            b, c, a = 0.25 * (r[0, 2] + r[2, 0]) / d, 0.25 * (r[1, 2] + r[2, 1]) / d, 0.25 * (r[1, 0] - r[0, 1]) / d
+        if a < 0:
+            b, c, d = -b, -c, -d
+    return float(b), float(c), float(d)
+
+
+def _complete_affine(affine: np.ndarray) -> np.ndarray:
+    """Give zero-length axes (e.g. the slice axis of a single slice) a unit-length orthogonal direction."""
+    affine = np.array(affine, dtype=float)
+    if np.linalg.norm(affine[:3, 2]) == 0:
+        normal = np.cross(affine[:3, 0], affine[:3, 1])
+        affine[:3, 2] = normal / (np.linalg.norm(normal) or 1.0)
+    return affine
+
+
+def nifti_header(shape: Sequence[int], dtype, affine: np.ndarray, *, version: int = 1,
+                 description: str = "DICOM Tools", scl_slope: float = 1.0, scl_inter: float = 0.0) -> bytes:
+    """
+    Pack a single-file NIfTI header plus the empty extension flag.
+
+    ``affine`` maps voxel indices to DICOM patient (LPS) millimetres, as returned by
+    ``build_volume``/``plan_volume``; ``shape`` is ``(x, y, z)``. Readers apply
+    ``scl_slope``/``scl_inter`` to the stored values, like a DICOM rescale.
+    """
+    if version not in _HEADER_SIZES:
+        raise ValueError("NIfTI version must be 1 or 2")
+    dtype = np.dtype(dtype)
+    if dtype.newbyteorder("<") not in NIFTI_DTYPES:
+        raise ValueError(f"Unsupported NIfTI data type: {dtype}")
+    code = NIFTI_DTYPES[dtype.newbyteorder("<")]
+
+    ras = LPS_TO_RAS @ _complete_affine(affine)
+    spacing = np.linalg.norm(ras[:3, :3], axis=0)
+    rotation = ras[:3, :3] / spacing
+    qfac = -1.0 if np.linalg.det(rotation) < 0 else 1.0
+    if qfac < 0:
+        rotation[:, 2] *= -1
+    quatern = _quaternion(rotation)
+    offsets = tuple(float(v) for v in ras[:3, 3])
+
+    dims = [3] + [int(v) for v in shape[:3]] + [1, 1, 1, 1]
+    pixdim = [qfac] + [float(v) for v in spacing] + [0.0, 0.0, 0.0, 0.0]
+    vox_offset = _HEADER_SIZES[version] + 4
+    descrip = description.encode("ascii", "replace")[:79]
+    srows = [float(v) for row in ras[:3] for v in row]
+    bitpix = dtype.itemsize * 8
+
+    if version == 1:
+        header = _NIFTI1.pack(
+            348, b"", b"", 0, 0, b"r", 0,
+            *dims, 0.0, 0.0, 0.0,
+            0, code, bitpix, 0,
+            *pixdim, float(vox_offset), float(scl_slope), float(scl_inter),
+            0, 0, NIFTI_UNITS_MM,
+            0.0, 0.0, 0.0, 0.0, 0, 0,
+            descrip, b"", NIFTI_XFORM_SCANNER_ANAT, NIFTI_XFORM_SCANNER_ANAT,
+            *quatern, *offsets, *srows, b"", _MAGIC[1],
+        )
+    else:
+        header = _NIFTI2.pack(
+            540, _MAGIC[2], code, bitpix,
+            *dims, 0.0, 0.0, 0.0,
+            *pixdim, vox_offset, float(scl_slope), float(scl_inter),
+            0.0, 0.0, 0.0, 0.0, 0, 0,
+            descrip, b"", NIFTI_XFORM_SCANNER_ANAT, NIFTI_XFORM_SCANNER_ANAT,
+            *quatern, *offsets, *srows,
+            0, NIFTI_UNITS_MM, 0, b"", b"\0", b"",
+        )
+    return header + b"\0\0\0\0"
+
+
+def is_compressed_path(path: PathLike) -> bool:
+    return str(path).endswith(".gz")
+
+
+def write_planes(planes: Iterable[np.ndarray], output: PathLike, shape: Sequence[int], dtype, affine: np.ndarray, *,
+                 version: int = 1, compress: Optional[bool] = None, level: int = DEFAULT_LEVEL,
+                 workers: Optional[int] = None, block_size: int = DEFAULT_BLOCK_SIZE, scl_slope: float = 1.0,
+                 scl_inter: float = 0.0) -> Path:
+    """
+    Stream ``(rows, columns)`` planes, in slice order, into a NIfTI file.
+
+    ``shape`` is the volume's ``(x, y, z)`` = (columns, rows, slices). Compression defaults to
+    the ``.gz`` suffix. The file is written under a temporary name and renamed when complete.
+    """
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    compress = is_compressed_path(output) if compress is None else compress
+    dtype = np.dtype(dtype).newbyteorder("<")
+    partial = output.with_name(output.name + ".part")
+    expected = int(shape[2])
+    written = 0
+
+    try:
+        with open(partial, "wb") as raw:
+            sink = ParallelGzipWriter(raw, level=level, workers=workers, block_size=block_size) if compress else raw
+            try:
+                sink.write(nifti_header(shape, dtype, affine, version=version, scl_slope=scl_slope,
+                                        scl_inter=scl_inter))
+                for plane in planes:
+                    sink.write(np.ascontiguousarray(plane, dtype=dtype).data)
+                    written += 1
+            finally:
+                if compress:
+                    sink.close()
+        if written != expected:
+            raise RuntimeError(f"Expected {expected} slices, wrote {written}")
+    except BaseException:
+        # Never leave a truncated file behind when a plane fails to decode or the disk fills up
+        partial.unlink(missing_ok=True)
+        raise
+    os.replace(partial, output)
+    return output
+
+
+def write_nifti(volume: np.ndarray, affine: np.ndarray, output: PathLike, **kwargs) -> Path:
+    """Write an in-memory ``(x, y, z)`` volume (``build_volume`` layout) to NIfTI."""
+    planes = (volume[:, :, k].T for k in range(volume.shape[2]))
+    return write_planes(planes, output, volume.shape, volume.dtype, affine, **kwargs)
+
+
+def write_series_nifti(files: Iterable[PathLike], output: PathLike, *, decode_workers: Optional[int] = None,
+                       use_processes: bool = False, **kwargs):
+    """
+    Decode a DICOM series slice by slice straight into a NIfTI file.
+
+    The output stays integer whenever the rescale allows it, like SimpleITK's: unit slopes
+    with whole intercepts (every CT, even when the intercept varies per slice) are added in
+    the smallest integer type that holds the rescaled ``BitsStored`` range. Any other
+    rescale shared by all slices is kept as ``scl_slope``/``scl_inter`` over the stored
+    values. Only the remaining series are written as float32.
+
+    Returns ``(output_path, plan)`` where ``plan`` is the :class:`~DICOM_reencoder.volume_builder.VolumePlan`.
+    """
+    from .volume_builder import iter_slices, plan_volume
+
+    plan = plan_volume(files, workers=decode_workers, rescale=False)
+    if len(plan.plane_shape) != 2:
+        raise RuntimeError("The native NIfTI writer supports single-sample images only; use the SimpleITK backend")
+    shifted = _shifted_dtype(plan.reference, plan.rescales)
+    if shifted is not None:
+        plan = dataclasses.replace(plan, dtype=shifted)
+    elif len(set(plan.rescales)) == 1:
+        kwargs["scl_slope"], kwargs["scl_inter"] = plan.rescales[0]
+    else:
+        plan = dataclasses.replace(plan, rescale=True, dtype=np.dtype(np.float32))
+    shape = (plan.plane_shape[1], plan.plane_shape[0], len(plan.paths))
+    slices = iter_slices(plan, workers=decode_workers, use_processes=use_processes)
+    if shifted is not None:
+        planes = (np.add(plane, int(plan.rescales[k][1]), dtype=shifted, casting="unsafe") for k, plane in slices)
+    else:
+        planes = (plane for _, plane in slices)
+    return write_planes(planes, output, shape, plan.dtype, plan.affine, **kwargs), plan
+
+
+def _shifted_dtype(header, rescales) -> Optional[np.dtype]:
+    """Smallest integer type for stored values plus whole intercepts (None unless every slope is 1)."""
+    if any(slope != 1 or not intercept.is_integer() for slope, intercept in rescales):
+        return None
+    bits = int(getattr(header, "BitsStored", 0) or getattr(header, "BitsAllocated", 16))
+    signed = int(getattr(header, "PixelRepresentation", 0)) == 1
+    low, high = (-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if signed else (0, (1 << bits) - 1)
+    intercepts = [int(intercept) for _, intercept in rescales]
+    low, high = low + min(intercepts), high + max(intercepts)
+    for dtype in (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32):
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return None
+    bits = int(getattr(header, "BitsStored", 0) or getattr(header, "BitsAllocated", 16))
+    signed = int(getattr(header, "PixelRepresentation", 0)) == 1
+    low, high = (-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if signed else (0, (1 << bits) - 1)
+    low, high = low + int(intercept), high + int(intercept)
+    for dtype in (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32):
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return None
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+#
+# pacs_crawler.py
+# Dicom-Tools-py
+#
+# Inventories a PACS by walking the study/series/image hierarchy with concurrent C-FIND queries.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Hierarchical, resumable PACS crawler.
+
+Studies are enumerated by StudyDate windows. A window whose query comes back
+with ``max_results`` matches (the peer's result limit) or a failure status is
+split in half, first by days and then by StudyTime within one day, until every
+window fits. Each study found queues a SERIES query and, with
+``depth="image"``, each series queues an IMAGE query. Every level has its own
+worker pool, and all levels share one association pool:
+
+    with open_index("inventory.sqlite") as index:
+        crawler = PacsCrawler("pacs", 104, index=index, called_aet="ARCHIVE", depth="series")
+        print(crawler.crawl(date(2015, 1, 1), date(2024, 12, 31)))
+
+The index stores each completed query's records together with a "done" marker,
+and a window that had to be split gets a ``split:`` marker. Re-running against
+the same index skips finished windows, studies and series, goes straight to the
+halves of split windows, and picks up any child queries that had not completed. Patient attributes are
+recorded from the study responses, since PATIENT-level wildcard queries cannot
+be split when they overflow. Studies without a StudyDate cannot be found by
+date windows.
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from pydicom.multival import MultiValue
+
+from .core.association_pool import AssociationPool
+from .dicom_query import (
+    create_image_query,
+    create_series_query,
+    create_study_query,
+    iter_query,
+)
+
+logger = logging.getLogger(__name__)
+
+DEPTHS = ("study", "series", "image")
+LEVEL_FIELDS = {
+    "study": ("StudyInstanceUID", "PatientID", "PatientName", "StudyDate", "StudyTime", "AccessionNumber",
+              "StudyDescription", "ModalitiesInStudy", "NumberOfStudyRelatedSeries",
+              "NumberOfStudyRelatedInstances"),
+    "series": ("SeriesInstanceUID", "StudyInstanceUID", "Modality", "SeriesNumber", "SeriesDescription",
+               "NumberOfSeriesRelatedInstances"),
+    "image": ("SOPInstanceUID", "SeriesInstanceUID", "StudyInstanceUID", "SOPClassUID", "InstanceNumber"),
+}
+MINUTES_PER_DAY = 24 * 60
+
+
+def record_from(identifier, level: str) -> Dict[str, str]:
+    """Flatten the indexed attributes of a C-FIND identifier into strings."""
+    record = {}
+    for keyword in LEVEL_FIELDS[level]:
+        value = identifier.get(keyword, "")
+        if isinstance(value, MultiValue):
+            value = "\\".join(str(v) for v in value)
+        record[keyword] = "" if value is None else str(value)
+    return record
+
+
+@dataclass(frozen=True)
+class DateWindow:
+    """An inclusive StudyDate range, optionally narrowed to a StudyTime range (in minutes) of a single day."""
+
+    start: date
+    end: date
+    first_minute: int = 0
+    last_minute: int = MINUTES_PER_DAY - 1
+
+    @property
+    def is_whole_days(self) -> bool:
+        return self.first_minute == 0 and self.last_minute == MINUTES_PER_DAY - 1
+
+    @property
+    def study_date(self) -> str:
+        return f"{self.start:%Y%m%d}-{self.end:%Y%m%d}"
+
+    @property
+    def study_time(self) -> str:
+        first, last = divmod(self.first_minute, 60), divmod(self.last_minute, 60)
+        return f"{first[0]:02d}{first[1]:02d}00-{last[0]:02d}{last[1]:02d}59"
+
+    @property
+    def key(self) -> str:
+        if self.is_whole_days:
+            return f"study:{self.study_date}"
+        return f"study:{self.study_date}:{self.study_time}"
+
+    def split(self, min_minutes: int = 15) -> List["DateWindow"]:
+        """Two halves of this window, or an empty list when it cannot be narrowed further."""
+        days = (self.end - self.start).days
+        if days > 0:
+            middle = self.start + timedelta(days=days // 2)
+            return [DateWindow(self.start, middle), DateWindow(middle + timedelta(days=1), self.end)]
+        span = self.last_minute - self.first_minute + 1
+        if span < 2 * min_minutes:
+            return []
+        middle = self.first_minute + span // 2
+        return [DateWindow(self.start, self.end, self.first_minute, middle - 1),
+                DateWindow(self.start, self.end, middle, self.last_minute)]
+
+    def query(self):
+        ds = create_study_query(study_date=self.study_date)
+        if not self.is_whole_days:
+            ds.StudyTime = self.study_time
+        return ds
+
+
+def date_windows(start: date, end: date, span_days: int) -> List[DateWindow]:
+    """Initial windows of ``span_days`` covering start..end; later splits refine them."""
+    windows = []
+    span_days = max(1, span_days)
+    while start <= end:
+        last = min(end, start + timedelta(days=span_days - 1))
+        windows.append(DateWindow(start, last))
+        start = last + timedelta(days=1)
+    return windows
+
+
+class SQLiteIndex:
+    """Crawl index in SQLite: one table per level plus the finished query units."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode with explicit transactions: a unit's records and its done marker land together
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for level, fields in LEVEL_FIELDS.items():
+            columns = ", ".join(f"{name} TEXT" for name in fields)
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {level} ({columns}, PRIMARY KEY ({fields[0]}))")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS done (unit TEXT PRIMARY KEY, finished TEXT)")
+
+    def commit_unit(self, unit: str, level: str, records: List[Dict[str, str]]) -> None:
+        fields = LEVEL_FIELDS[level]
+        sql = f"INSERT OR REPLACE INTO {level} VALUES ({', '.join('?' for _ in fields)})"
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(sql, [tuple(r[name] for name in fields) for r in records])
+                self._conn.execute("INSERT OR REPLACE INTO done VALUES (?, ?)",
+                                   (unit, datetime.now().isoformat(timespec="seconds")))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def done_units(self) -> Set[str]:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT unit FROM done")}
+
+    def pending(self, level: str) -> List[Tuple[str, ...]]:
+        """Parents whose ``level`` query has not completed: study UIDs for series, (study, series) for images."""
+        with self._lock:
+            if level == "series":
+                rows = self._conn.execute(
+                    "SELECT StudyInstanceUID FROM study "
+                    "WHERE 'series:' || StudyInstanceUID NOT IN (SELECT unit FROM done)")
+            else:
+                rows = self._conn.execute(
+                    "SELECT StudyInstanceUID, SeriesInstanceUID FROM series "
+                    "WHERE 'image:' || SeriesInstanceUID NOT IN (SELECT unit FROM done)")
+            return [tuple(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {level: int(self._conn.execute(f"SELECT COUNT(*) FROM {level}").fetchone()[0])
+                    for level in LEVEL_FIELDS}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class NDJSONIndex:
+    """Append-only NDJSON crawl index; one line per record and per finished unit, replayed on open."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._done: Set[str] = set()
+        self._uids: Dict[str, Dict[str, Tuple[str, ...]]] = {level: {} for level in LEVEL_FIELDS}
+        if self.path.exists():
+            self._replay()
+        self._handle = open(self.path, "a", encoding="utf-8")
+
+    def _replay(self) -> None:
+        with open(self.path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # A line cut short by an interrupted run
+                if "done" in entry:
+                    self._done.add(entry["done"])
+                elif entry.get("level") in LEVEL_FIELDS:
+                    self._remember(entry["level"], entry)
+
+    def _remember(self, level: str, record: Dict[str, str]) -> None:
+        parents = (record.get("StudyInstanceUID", ""),) if level == "series" else ()
+        self._uids[level][record[LEVEL_FIELDS[level][0]]] = parents
+
+    def commit_unit(self, unit: str, level: str, records: List[Dict[str, str]]) -> None:
+        lines = [json.dumps({"level": level, **record}) for record in records]
+        lines.append(json.dumps({"done": unit, "finished": datetime.now().isoformat(timespec="seconds")}))
+        with self._lock:
+            self._handle.write("\n".join(lines) + "\n")
+            self._handle.flush()
+            for record in records:
+                self._remember(level, record)
+            self._done.add(unit)
+
+    def done_units(self) -> Set[str]:
+        with self._lock:
+            return set(self._done)
+
+    def pending(self, level: str) -> List[Tuple[str, ...]]:
+        with self._lock:
+            if level == "series":
+                return [(uid,) for uid in self._uids["study"] if f"series:{uid}" not in self._done]
+            return [(parents[0], uid) for uid, parents in self._uids["series"].items()
+                    if f"image:{uid}" not in self._done]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {level: len(uids) for level, uids in self._uids.items()}
+
+    def close(self) -> None:
+        with self._lock:
+            self._handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_index(path: Union[str, Path]):
+    """NDJSON index for ``.ndjson``/``.jsonl`` paths, SQLite otherwise."""
+    if Path(path).suffix.lower() in (".ndjson", ".jsonl"):
+        return NDJSONIndex(path)
+    return SQLiteIndex(path)
+
+
+class PacsCrawler:
+    """Walk STUDY → SERIES (→ IMAGE) with bounded concurrency per level, streaming into an index."""
+
+    def __init__(self, host: str, port: int, *, index, calling_aet: str = "DICOMTOOLS", called_aet: str = "PACS",
+                 depth: str = "series", max_results: int = 1000, workers: Optional[Dict[str, int]] = None,
+                 span_days: int = 30, min_minutes: int = 15, pool: Optional[AssociationPool] = None,
+                 progress: Optional[Callable[[dict], None]] = None):
+        """
+        Args:
+            index: ``SQLiteIndex`` or ``NDJSONIndex`` (see ``open_index``).
+            depth: Deepest level to enumerate: ``study``, ``series`` or ``image``.
+            max_results: The peer's C-FIND result limit; a window reaching it is split.
+            workers: Concurrent queries per level, e.g. ``{"study": 2, "series": 4, "image": 4}``.
+            span_days: Width of the initial date windows.
+            min_minutes: Narrowest StudyTime window before a full one is accepted as truncated.
+            pool: Association pool to use; by default one sized for all levels is created per crawl.
+            progress: Called with a stats snapshot after every finished query.
+        """
+        if depth not in DEPTHS:
+            raise ValueError(f"Unsupported depth: {depth}")
+        self.host = host
+        self.port = port
+        self.index = index
+        self.calling_aet = calling_aet
+        self.called_aet = called_aet
+        self.depth = depth
+        self.max_results = max(1, max_results)
+        self.workers = {"study": 2, "series": 4, "image": 4, **(workers or {})}
+        self.span_days = span_days
+        self.min_minutes = min_minutes
+        self.pool = pool
+        self.progress = progress
+        self.stats = {"queries": 0, "study": 0, "series": 0, "image": 0, "splits": 0, "truncated": 0,
+                      "skipped": 0, "errors": 0}
+        self._lock = threading.Condition()
+        self._outstanding = 0
+        self._scheduled: Set[str] = set()
+        self._done: Set[str] = set()
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._active_pool: Optional[AssociationPool] = None
+
+    def _query(self, query) -> Tuple[list, object]:
+        reports = []
+        results = list(iter_query(self.host, self.port, self.calling_aet, self.called_aet, query,
+                                  pool=self._active_pool, limit=self.max_results, report=reports.append))
+        stats = reports[0]
+        with self._lock:
+            self.stats["queries"] += 1
+        if stats.error:
+            raise RuntimeError(stats.error)
+        return results, stats
+
+    def _schedule(self, level: str, unit: str, task: Callable, *args) -> None:
+        with self._lock:
+            if unit in self._scheduled:
+                return
+            self._scheduled.add(unit)
+            if unit in self._done:
+                self.stats["skipped"] += 1
+                return
+            self._outstanding += 1
+        self._executors[level].submit(self._run, unit, task, *args)
+
+    def _run(self, unit: str, task: Callable, *args) -> None:
+        try:
+            task(*args)
+        except Exception as exc:  # noqa: BLE001 - the unit stays pending for the next run
+            logger.warning("Query %s failed: %s", unit, exc)
+            with self._lock:
+                self.stats["errors"] += 1
+        finally:
+            with self._lock:
+                self._outstanding -= 1
+                snapshot = dict(self.stats)
+                self._lock.notify_all()
+            if self.progress:
+                self.progress(snapshot)
+
+    def _commit(self, unit: str, level: str, identifiers: Iterable) -> List[Dict[str, str]]:
+        records = [record_from(identifier, level) for identifier in identifiers]
+        records = [record for record in records if record[LEVEL_FIELDS[level][0]]]
+        self.index.commit_unit(unit, level, records)
+        with self._lock:
+            self.stats[level] += len(records)
+        return records
+
+    def _crawl_window(self, window: DateWindow) -> None:
+        split_unit = f"split:{window.key}"
+        if split_unit in self._done:
+            # Overflowed on an earlier run: go straight to the halves instead of repeating the query
+            with self._lock:
+                self.stats["skipped"] += 1
+            self._schedule_halves(window.split(self.min_minutes))
+            return
+        results, stats = self._query(window.query())
+        failed = stats.status not in (0x0000, 0xFE00)
+        if failed or stats.matches >= self.max_results:
+            halves = window.split(self.min_minutes)
+            if halves:
+                self.index.commit_unit(split_unit, "study", [])
+                with self._lock:
+                    self.stats["splits"] += 1
+                self._schedule_halves(halves)
+                return
+            if failed:
+                raise RuntimeError(f"C-FIND status 0x{stats.status:04X}")
+            logger.warning("Window %s still returns %d matches; results may be incomplete", window.key,
+                           stats.matches)
+            with self._lock:
+                self.stats["truncated"] += 1
+        for record in self._commit(window.key, "study", results):
+            if self.depth != "study":
+                study_uid = record["StudyInstanceUID"]
+                self._schedule("series", f"series:{study_uid}", self._crawl_study, study_uid)
+
+    def _schedule_halves(self, halves: List[DateWindow]) -> None:
+        for half in halves:
+            self._schedule("study", half.key, self._crawl_window, half)
+
+    def _crawl_study(self, study_uid: str) -> None:
+        results, stats = self._query(create_series_query(study_uid))
+        self._check_leaf(f"series:{study_uid}", stats)
+        for identifier in results:
+            # Peers may omit the parent key from responses; the index needs it to resume
+            identifier.StudyInstanceUID = identifier.get("StudyInstanceUID") or study_uid
+        for record in self._commit(f"series:{study_uid}", "series", results):
+            if self.depth == "image":
+                series_uid = record["SeriesInstanceUID"]
+                self._schedule("image", f"image:{series_uid}", self._crawl_series, study_uid, series_uid)
+
+    def _crawl_series(self, study_uid: str, series_uid: str) -> None:
+        results, stats = self._query(create_image_query(study_uid, series_uid))
+        self._check_leaf(f"image:{series_uid}", stats)
+        for identifier in results:
+            identifier.StudyInstanceUID = identifier.get("StudyInstanceUID") or study_uid
+            identifier.SeriesInstanceUID = identifier.get("SeriesInstanceUID") or series_uid
+        self._commit(f"image:{series_uid}", "image", results)
+
+    def _check_leaf(self, unit: str, stats) -> None:
+        """Series/image queries cannot be split: fail on errors, warn on truncation."""
+        if stats.status not in (0x0000, 0xFE00):
+            raise RuntimeError(f"C-FIND status 0x{stats.status:04X}")
+        if stats.matches >= self.max_results:
+            logger.warning("%s returned %d matches; results may be incomplete", unit, stats.matches)
+            with self._lock:
+                self.stats["truncated"] += 1
+
+    def crawl(self, start: date, end: date) -> dict:
+        """Crawl studies dated start..end (inclusive) down to ``depth``; returns the run's stats."""
+        self._done = self.index.done_units()
+        self._scheduled = set()
+        self.stats = dict.fromkeys(self.stats, 0)
+        own_pool = self.pool is None
+        levels = DEPTHS[:DEPTHS.index(self.depth) + 1]
+        self._active_pool = self.pool or AssociationPool(max_size=sum(self.workers[level] for level in levels))
+        self._executors = {level: ThreadPoolExecutor(max_workers=max(1, self.workers[level]),
+                                                     thread_name_prefix=f"crawl-{level}") for level in levels}
+        try:
+            # Children of a previous, interrupted run first
+            if self.depth != "study":
+                for (study_uid,) in self.index.pending("series"):
+                    self._schedule("series", f"series:{study_uid}", self._crawl_study, study_uid)
+            if self.depth == "image":
+                for study_uid, series_uid in self.index.pending("image"):
+                    self._schedule("image", f"image:{series_uid}", self._crawl_series, study_uid, series_uid)
+            for window in date_windows(start, end, self.span_days):
+                self._schedule("study", window.key, self._crawl_window, window)
+            with self._lock:
+                while self._outstanding:
+                    self._lock.wait()
+        finally:
+            for executor in self._executors.values():
+                executor.shutdown(wait=True)
+            if own_pool:
+                self._active_pool.close()
+            self._active_pool = None
+        return dict(self.stats)
+
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value, "%Y%m%d").date()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Inventory a PACS by crawling studies, series and images into a local index",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Index every study and series of 2023 into SQLite (re-run to resume)
+  %(prog)s -H pacs.example.com -p 104 --aec ARCHIVE --from 20230101 --to 20231231 --index inventory.sqlite
+
+  # Down to instances, streaming NDJSON, for a PACS capped at 500 matches per query
+  %(prog)s -H pacs.example.com --aec ARCHIVE --from 20240101 --depth image --max-results 500 --index inv.ndjson
+        """,
+    )
+    parser.add_argument("-H", "--host", required=True, help="PACS server hostname or IP address")
+    parser.add_argument("-p", "--port", type=int, default=11112, help="PACS server port (default: 11112)")
+    parser.add_argument("--aet", default="DICOMTOOLS", help="Calling AE Title (default: DICOMTOOLS)")
+    parser.add_argument("--aec", default="PACS", help="Called AE Title (default: PACS)")
+    parser.add_argument("--from", dest="start", type=_parse_date, required=True, help="First StudyDate (YYYYMMDD)")
+    parser.add_argument("--to", dest="end", type=_parse_date, default=date.today(),
+                        help="Last StudyDate (YYYYMMDD, default: today)")
+    parser.add_argument("--index", required=True, help="Index file (.sqlite, or .ndjson/.jsonl)")
+    parser.add_argument("--depth", choices=DEPTHS, default="series", help="Deepest level (default: series)")
+    parser.add_argument("--max-results", type=int, default=1000,
+                        help="Peer's C-FIND result limit; windows reaching it are split (default: 1000)")
+    parser.add_argument("--span-days", type=int, default=30, help="Initial date window width (default: 30)")
+    parser.add_argument("--study-workers", type=int, default=2, help="Concurrent study queries (default: 2)")
+    parser.add_argument("--series-workers", type=int, default=4, help="Concurrent series queries (default: 4)")
+    parser.add_argument("--image-workers", type=int, default=4, help="Concurrent image queries (default: 4)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    def report(stats: dict) -> None:
+        if stats["queries"] % 100 == 0:
+            logger.info("%d queries: %d studies, %d series, %d images", stats["queries"], stats["study"],
+                        stats["series"], stats["image"])
+
+    with open_index(args.index) as index:
+        crawler = PacsCrawler(args.host, args.port, index=index, calling_aet=args.aet, called_aet=args.aec,
+                              depth=args.depth, max_results=args.max_results, span_days=args.span_days,
+                              workers={"study": args.study_workers, "series": args.series_workers,
+                                       "image": args.image_workers},
+                              progress=report)
+        stats = crawler.crawl(args.start, args.end)
+        counts = index.counts()
+    print(json.dumps({"run": stats, "index": counts}, indent=2))
+    return 0 if not stats["errors"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+#
+# projection.py
+# Dicom-Tools-py
+#
+# Slab intensity projections (MIP/MinIP/AvgIP) over in-memory, memory-mapped or chunked volumes.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Maximum, minimum and average intensity projections.
+
+Works on anything indexable like the ``build_volume`` output: NumPy arrays,
+``.npy`` memmaps or :class:`~DICOM_reencoder.chunked_volume.ChunkedVolume`
+stores. Memory stays bounded because the projection plane is split into
+strips processed by a thread pool (NumPy reductions release the GIL), and each
+strip is reduced ``chunk_bytes`` at a time.
+
+Sliding slabs (a thick slab that follows the scroll position) reuse work
+between neighbouring positions: :class:`SlabProjector` keeps a two-stack
+aggregate queue, the whole-plane analogue of a monotonic deque, so moving the
+slab by one plane costs a constant number of elementwise max/min operations
+regardless of slab thickness. Average projections keep a running sum instead.
+
+    from DICOM_reencoder.projection import project, project_slabs
+    mip = project(volume, "axial", "mip")
+    slabs = project_slabs(volume, "axial", thickness=10, mode="mip")
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from .core.parallel import default_workers, strip_ranges
+from .mpr import PLANES, plane_axis
+
+MODES = ("max", "min", "mean")
+MODE_ALIASES = {"mip": "max", "minip": "min", "avgip": "mean", "avg": "mean", "average": "mean"}
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+Axis = Union[int, str]
+
+
+def normalize_mode(mode: str) -> str:
+    """Accept ``max``/``min``/``mean`` or the ``mip``/``minip``/``avgip`` aliases."""
+    name = MODE_ALIASES.get(str(mode).lower(), str(mode).lower())
+    if name not in MODES:
+        raise ValueError(f"Unknown projection mode '{mode}'. Choose from: {', '.join(MODES + tuple(MODE_ALIASES))}")
+    return name
+
+
+def resolve_axis(axis: Axis) -> int:
+    """Volume axis for an index (0-2) or an orthogonal plane name."""
+    if isinstance(axis, str):
+        return plane_axis(axis) if axis in PLANES else resolve_axis(int(axis))
+    if axis not in (0, 1, 2):
+        raise ValueError(f"Projection axis must be 0, 1, 2 or one of {', '.join(PLANES)}")
+    return int(axis)
+
+
+def _key(axis: int, along, region: Tuple[slice, slice]) -> tuple:
+    key = list(region)
+    key.insert(axis, along)
+    return tuple(key)
+
+
+def _strips(volume, axis: int, depth: int, chunk_bytes: int, workers: int) -> List[Tuple[slice, slice]]:
+    """Split the projection plane into row strips small enough for ``depth`` planes to fit ``chunk_bytes``."""
+    rows, columns = (dim for i, dim in enumerate(volume.shape[:3]) if i != axis)
+    itemsize = np.dtype(volume.dtype).itemsize
+    return [(strip, slice(None)) for strip in strip_ranges(rows, columns * itemsize * depth, chunk_bytes, workers)]
+
+
+def _output_dtype(dtype, mode: str) -> np.dtype:
+    return np.dtype(np.float32) if mode == "mean" else np.dtype(dtype)
+
+
+def project(volume, axis: Axis = "axial", mode: str = "max", start: int = 0, stop: Optional[int] = None, *,
+            workers: Optional[int] = None, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> np.ndarray:
+    """
+    Project planes ``start:stop`` along ``axis`` into one image.
+
+    Returns an array over the two remaining volume axes (in volume order); use
+    :func:`DICOM_reencoder.mpr.orient_plane` for display orientation.
+    """
+    axis, mode = resolve_axis(axis), normalize_mode(mode)
+    count = volume.shape[axis]
+    stop = count if stop is None else min(stop, count)
+    if not 0 <= start < stop:
+        raise ValueError(f"Empty projection range {start}:{stop} for {count} planes")
+    workers = default_workers(workers)
+    plane_shape = tuple(dim for i, dim in enumerate(volume.shape[:3]) if i != axis)
+    out = np.empty(plane_shape, dtype=_output_dtype(volume.dtype, mode))
+    row_bytes = plane_shape[1] * np.dtype(volume.dtype).itemsize
+    strips = _strips(volume, axis, 1, chunk_bytes, workers)
+
+    def reduce_strip(region: Tuple[slice, slice]) -> None:
+        # As many planes of this strip as fit the budget are reduced per read
+        depth = max(1, chunk_bytes // max(1, row_bytes * (region[0].stop - region[0].start)))
+        acc = None
+        for lo in range(start, stop, depth):
+            block = np.asarray(volume[_key(axis, slice(lo, min(stop, lo + depth)), region)])
+            if mode == "mean":
+                partial = block.sum(axis=axis, dtype=np.float64)
+                acc = partial if acc is None else acc + partial
+            else:
+                partial = block.max(axis=axis) if mode == "max" else block.min(axis=axis)
+                acc = partial if acc is None else (np.maximum if mode == "max" else np.minimum)(acc, partial)
+        out[region] = acc / (stop - start) if mode == "mean" else acc
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(reduce_strip, strips))
+    return out
+
+
+class SlabProjector:
+    """
+    Sliding thick-slab projection along one axis with work reuse between positions.
+
+    ``slab(index)`` projects planes ``[index - thickness // 2, index - thickness // 2 + thickness)``
+    clipped to the volume. Moving forward by any step that keeps the windows overlapping
+    only reads the planes entering the slab; other moves rebuild the window.
+    """
+
+    def __init__(self, volume, axis: Axis, thickness: int, mode: str = "max",
+                 region: Tuple[slice, slice] = (slice(None), slice(None))):
+        self.volume = volume
+        self.axis = resolve_axis(axis)
+        self.mode = normalize_mode(mode)
+        self.thickness = max(1, int(thickness))
+        self.region = region
+        self.count = volume.shape[self.axis]
+        self.planes_read = 0
+        self._reset()
+
+    def bounds(self, index: int) -> Tuple[int, int]:
+        lo = index - self.thickness // 2
+        return max(0, lo), min(self.count, lo + self.thickness)
+
+    def _reset(self) -> None:
+        self._lo = self._hi = 0
+        # Two-stack queue: _back holds new planes plus their running aggregate,
+        # _front holds suffix aggregates with the oldest plane's on top
+        self._back: List[np.ndarray] = []
+        self._back_agg: Optional[np.ndarray] = None
+        self._front: List[np.ndarray] = []
+        self._planes: deque = deque()
+        self._sum: Optional[np.ndarray] = None
+
+    def _read(self, index: int) -> np.ndarray:
+        self.planes_read += 1
+        return np.asarray(self.volume[_key(self.axis, index, self.region)])
+
+    def _combine(self, a: Optional[np.ndarray], b: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return np.maximum(a, b) if self.mode == "max" else np.minimum(a, b)
+
+    def _push(self, plane: np.ndarray) -> None:
+        if self.mode == "mean":
+            self._planes.append(plane)
+            self._sum = plane.astype(np.float64) if self._sum is None else self._sum + plane
+            return
+        self._back.append(plane)
+        self._back_agg = self._combine(self._back_agg, plane)
+
+    def _pop(self) -> None:
+        if self.mode == "mean":
+            self._sum -= self._planes.popleft()
+            return
+        if not self._front:
+            running = None
+            for plane in reversed(self._back):
+                running = self._combine(running, plane)
+                self._front.append(running)
+            self._back, self._back_agg = [], None
+        self._front.pop()
+
+    def slab(self, index: int) -> np.ndarray:
+        if not 0 <= index < self.count:
+            raise IndexError(f"Slab index {index} out of range for {self.count} planes")
+        lo, hi = self.bounds(index)
+        if not (self._lo <= lo < self._hi and hi >= self._hi):
+            self._reset()
+            self._lo = self._hi = lo
+        for position in range(self._hi, hi):
+            self._push(self._read(position))
+        for _ in range(lo - self._lo):
+            self._pop()
+        self._lo, self._hi = lo, hi
+
+        if self.mode == "mean":
+            return (self._sum / (hi - lo)).astype(np.float32)
+        # Copy so callers cannot modify the cached aggregates
+        return np.array(self._combine(self._front[-1] if self._front else None, self._back_agg))
+
+
+def project_slabs(volume, axis: Axis = "axial", thickness: int = 10, mode: str = "max", *, step: int = 1,
+                  out: Optional[np.ndarray] = None, workers: Optional[int] = None,
+                  chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> np.ndarray:
+    """
+    Compute a sliding slab at every ``step``-th plane along ``axis``.
+
+    Each worker streams one strip of the plane through its own :class:`SlabProjector`, so
+    memory is bounded by ``chunk_bytes`` per worker plus ``out``. Pass a memmap as ``out``
+    to keep the result on disk. Returns an array of shape ``(positions, *plane)``.
+    """
+    axis, mode = resolve_axis(axis), normalize_mode(mode)
+    positions = range(0, volume.shape[axis], max(1, int(step)))
+    plane_shape = tuple(dim for i, dim in enumerate(volume.shape[:3]) if i != axis)
+    if out is None:
+        out = np.empty((len(positions),) + plane_shape, dtype=_output_dtype(volume.dtype, mode))
+    elif out.shape != (len(positions),) + plane_shape:
+        raise ValueError(f"Output shape {out.shape} does not match {(len(positions),) + plane_shape}")
+    workers = default_workers(workers)
+    # A strip holds up to two slabs of planes (queue plus suffix aggregates)
+    strips = _strips(volume, axis, 2 * max(1, int(thickness)), chunk_bytes, workers)
+
+    def run_strip(region: Tuple[slice, slice]) -> None:
+        projector = SlabProjector(volume, axis, thickness, mode, region=region)
+        for n, index in enumerate(positions):
+            out[(n,) + region] = projector.slab(index)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run_strip, strips))
+    return out
+
+
+def volume_order_view(stack: np.ndarray, plane: str) -> np.ndarray:
+    """View a display-oriented ``(positions, rows, columns)`` stack in the plane order projections produce.
+
+    Inverse of :func:`DICOM_reencoder.mpr.orient_plane` applied per position, so ``project_slabs``
+    can write straight into a display-ordered output.
+    """
+    swapped = np.swapaxes(stack, 1, 2)
+    return swapped if plane == "axial" else swapped[:, :, ::-1]
+
+
+def load_volume(source, **build_kwargs) -> Tuple[object, Optional[np.ndarray]]:
+    """Open ``source`` as ``(volume, affine)``: a ``.npy`` file (memory-mapped), a chunked store, or a DICOM directory."""
+    path = Path(source)
+    if path.suffix == ".npy":
+        return np.load(path, mmap_mode="r"), None
+    if (path / "index.json").exists():
+        from .chunked_volume import open_chunked
+
+        store = open_chunked(path)
+        return store, store.affine
+    from .volume_builder import build_volume
+
+    volume, affine, _ = build_volume(path, **build_kwargs)
+    return volume, affine
+
@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+#
+# qr_scp.py
+# Dicom-Tools-py
+#
+# Query/Retrieve SCP serving a local directory tree from an indexed header table.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Local Query/Retrieve SCP (``dicom-qrscp``).
+
+A small PACS for test rigs and edge caches. It supports C-FIND, C-MOVE and
+C-GET under the Study Root and Patient Root models.
+
+At startup the tree is scanned once into a SQLite header table. Each file's
+headers are read up to Pixel Data, and later refreshes re-read only changed
+files. Queries never touch the files themselves.
+
+Each C-FIND identifier is compiled once into a single SQL statement:
+
+* Single values and UID lists become ``=``/``IN``.
+* ``*``/``?`` wildcards become ``GLOB``.
+* Date and time ranges become string comparisons.
+
+The statement is grouped by the query level. Study, series and patient rows
+also get the ``NumberOf...Related...`` counts and ``ModalitiesInStudy``:
+
+    with QueryRetrieveSCP("/data/archive", port=11112, known_aets={"VIEWER": ("10.0.0.5", 104)}) as scp:
+        ...
+
+C-GET and C-MOVE stream the matching instances one at a time. Each file is
+opened with deferred reading: element values stay undecoded raw bytes, and
+Pixel Data is only read from disk when the C-STORE sub-operation encodes it,
+so it goes out in its stored transfer syntax.
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import pydicom
+from pydicom.dataset import Dataset
+from pydicom.errors import InvalidDicomError
+from pydicom.multival import MultiValue
+from pydicom.uid import ExplicitVRLittleEndian
+from pynetdicom import AE, ALL_TRANSFER_SYNTAXES, AllStoragePresentationContexts, evt
+from pynetdicom.presentation import build_context
+from pynetdicom.sop_class import (
+    PatientRootQueryRetrieveInformationModelFind,
+    PatientRootQueryRetrieveInformationModelGet,
+    PatientRootQueryRetrieveInformationModelMove,
+    StudyRootQueryRetrieveInformationModelFind,
+    StudyRootQueryRetrieveInformationModelGet,
+    StudyRootQueryRetrieveInformationModelMove,
+    Verification,
+)
+
+from .core.association_pool import MAX_CONTEXTS
+from .core.network import pick_free_port
+
+logger = logging.getLogger(__name__)
+
+# Indexed attributes: (keyword, VR) per level; the first entry is the level's unique key
+LEVEL_ATTRIBUTES = {
+    "PATIENT": (("PatientID", "LO"), ("PatientName", "PN"), ("PatientBirthDate", "DA"), ("PatientSex", "CS")),
+    "STUDY": (("StudyInstanceUID", "UI"), ("StudyDate", "DA"), ("StudyTime", "TM"), ("AccessionNumber", "SH"),
+              ("StudyID", "SH"), ("StudyDescription", "LO"), ("ReferringPhysicianName", "PN")),
+    "SERIES": (("SeriesInstanceUID", "UI"), ("Modality", "CS"), ("SeriesNumber", "IS"),
+               ("SeriesDescription", "LO"), ("SeriesDate", "DA"), ("SeriesTime", "TM")),
+    "IMAGE": (("SOPInstanceUID", "UI"), ("SOPClassUID", "UI"), ("InstanceNumber", "IS")),
+}
+LEVELS = tuple(LEVEL_ATTRIBUTES)
+VR_OF = {keyword: vr for attributes in LEVEL_ATTRIBUTES.values() for keyword, vr in attributes}
+COLUMNS = tuple(VR_OF) + ("TransferSyntaxUID", "path", "mtime", "size")
+READ_TAGS = [keyword for keyword in VR_OF]
+RANGE_VRS = ("DA", "TM", "DT")
+
+# Computed return keys per level: keyword -> SQL aggregate
+AGGREGATES = {
+    "PATIENT": {"NumberOfPatientRelatedStudies": "COUNT(DISTINCT StudyInstanceUID)",
+                "NumberOfPatientRelatedSeries": "COUNT(DISTINCT SeriesInstanceUID)",
+                "NumberOfPatientRelatedInstances": "COUNT(*)"},
+    "STUDY": {"NumberOfStudyRelatedSeries": "COUNT(DISTINCT SeriesInstanceUID)",
+              "NumberOfStudyRelatedInstances": "COUNT(*)",
+              "ModalitiesInStudy": "GROUP_CONCAT(DISTINCT Modality)"},
+    "SERIES": {"NumberOfSeriesRelatedInstances": "COUNT(*)"},
+    "IMAGE": {},
+}
+
+FIND_MODELS = {StudyRootQueryRetrieveInformationModelFind: "STUDY_ROOT",
+               PatientRootQueryRetrieveInformationModelFind: "PATIENT_ROOT"}
+RETRIEVE_MODELS = (StudyRootQueryRetrieveInformationModelGet, StudyRootQueryRetrieveInformationModelMove,
+                   PatientRootQueryRetrieveInformationModelGet, PatientRootQueryRetrieveInformationModelMove)
+
+
+def _values(value) -> List[str]:
+    if isinstance(value, MultiValue):
+        return [str(v) for v in value]
+    return [str(value)] if value not in (None, "") else []
+
+
+def _glob_pattern(value: str) -> str:
+    # '*' and '?' mean the same in DICOM and GLOB; '[' must be matched literally
+    return value.replace("[", "[[]")
+
+
+@dataclass
+class CompiledQuery:
+    """One C-FIND identifier turned into SQL, built once per request."""
+
+    level: str
+    sql: str
+    params: Tuple[str, ...]
+    return_keys: Tuple[str, ...]
+
+
+def compile_query(identifier: Dataset) -> CompiledQuery:
+    """Translate an identifier's matching keys into a single grouped SELECT for its level."""
+    level = str(identifier.get("QueryRetrieveLevel", "")).upper()
+    if level not in LEVELS:
+        raise ValueError(f"Unsupported Query/Retrieve Level: {level!r}")
+    depth = LEVELS.index(level)
+
+    conditions, params = [], []
+    for elem in identifier:
+        keyword = elem.keyword
+        if keyword == "ModalitiesInStudy":
+            modalities = _values(elem.value)
+            if modalities:
+                conditions.append("StudyInstanceUID IN (SELECT StudyInstanceUID FROM instances WHERE "
+                                  f"Modality IN ({', '.join('?' for _ in modalities)}))")
+                params += modalities
+            continue
+        vr = VR_OF.get(keyword)
+        values = [v.strip() for v in _values(elem.value)] if vr else []
+        if not values or values == ["*"]:
+            continue  # Universal matching (or an attribute the index does not hold)
+        if len(values) > 1:
+            # List of UID matching
+            conditions.append(f"{keyword} IN ({', '.join('?' for _ in values)})")
+            params += values
+            continue
+        value = values[0]
+        if vr in RANGE_VRS and "-" in value:
+            low, _, high = value.partition("-")
+            if low:
+                conditions.append(f"{keyword} >= ?")
+                params.append(low)
+            if high:
+                # Compare only as many characters as the bound has, so 115959 includes 115959.5
+                conditions.append(f"substr({keyword}, 1, {len(high)}) <= ?")
+                params.append(high)
+        elif vr != "UI" and ("*" in value or "?" in value):
+            conditions.append(f"{keyword} GLOB ?")
+            params.append(_glob_pattern(value))
+        else:
+            conditions.append(f"{keyword} = ?")
+            params.append(value)
+
+    key = LEVEL_ATTRIBUTES[level][0][0]
+    indexed = [keyword for lvl in LEVELS[:depth + 1] for keyword, _ in LEVEL_ATTRIBUTES[lvl]]
+    requested = tuple(elem.keyword for elem in identifier
+                      if elem.keyword and elem.keyword != "QueryRetrieveLevel")
+    selects = [f"MIN({keyword}) AS {keyword}" for keyword in indexed if keyword != key]
+    selects += [f"{sql} AS {keyword}" for keyword, sql in AGGREGATES[level].items()]
+    where = " AND ".join(conditions) or "1"
+    sql = (f"SELECT {key} AS {key}, {', '.join(selects)} FROM instances WHERE {where} "
+           f"GROUP BY {key} ORDER BY MIN(rowid)")
+    return CompiledQuery(level=level, sql=sql, params=tuple(params), return_keys=requested)
+
+
+class HeaderIndex:
+    """SQLite table of instance headers and paths under a root directory."""
+
+    def __init__(self, root: Union[str, Path], path: Optional[Union[str, Path]] = None):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path) if path else ":memory:", timeout=30, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = ", ".join(f"{name} TEXT" for name in COLUMNS if name not in ("mtime", "size"))
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS instances ({columns}, mtime REAL, size INTEGER, "
+                           "UNIQUE (SOPInstanceUID))")
+        for keyword in ("PatientID", "StudyInstanceUID", "SeriesInstanceUID", "StudyDate", "path"):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{keyword} ON instances ({keyword})")
+
+    def refresh(self) -> Dict[str, int]:
+        """Index new and changed files under the root and drop rows of deleted ones."""
+        with self._lock:
+            known = {row["path"]: (row["mtime"], row["size"])
+                     for row in self._conn.execute("SELECT path, mtime, size FROM instances")}
+        counts = {"added": 0, "unchanged": 0, "removed": 0, "skipped": 0}
+        rows, seen = [], set()
+        for path in sorted(p for p in self.root.rglob("*") if p.is_file()):
+            stat = path.stat()
+            seen.add(str(path))
+            if known.get(str(path)) == (stat.st_mtime, stat.st_size):
+                counts["unchanged"] += 1
+                continue
+            row = self._read(path, stat)
+            if row is None:
+                counts["skipped"] += 1
+                continue
+            rows.append(row)
+            counts["added"] += 1
+        removed = [(path,) for path in known if path not in seen]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("DELETE FROM instances WHERE path = ?", removed)
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO instances ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in COLUMNS)})", rows)
+            self._conn.execute("COMMIT")
+        counts["removed"] = len(removed)
+        return counts
+
+    @staticmethod
+    def _read(path: Path, stat: os.stat_result) -> Optional[tuple]:
+        try:
+            ds = pydicom.dcmread(path, stop_before_pixels=True, specific_tags=READ_TAGS)
+        except (InvalidDicomError, OSError, EOFError, ValueError) as exc:
+            logger.debug("Not indexing %s: %s", path, exc)
+            return None
+        if "SOPInstanceUID" not in ds:
+            return None
+        values = ["\\".join(_values(ds.get(keyword, ""))) for keyword in VR_OF]
+        transfer_syntax = str(getattr(ds.get("file_meta"), "TransferSyntaxUID", "") or "")
+        return tuple(values) + (transfer_syntax, str(path), stat.st_mtime, stat.st_size)
+
+    def find(self, query: CompiledQuery) -> Iterable[sqlite3.Row]:
+        with self._lock:
+            rows = self._conn.execute(query.sql, query.params).fetchall()
+        return rows
+
+    def instances(self, query: CompiledQuery) -> List[sqlite3.Row]:
+        """Instance rows (path, SOP class, transfer syntax) below every match of ``query``."""
+        key = LEVEL_ATTRIBUTES[query.level][0][0]
+        sql = (f"SELECT path, SOPClassUID, SOPInstanceUID, TransferSyntaxUID FROM instances "
+               f"WHERE {key} IN (SELECT {key} FROM ({query.sql})) ORDER BY {key}, rowid")
+        with self._lock:
+            return self._conn.execute(sql, query.params).fetchall()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM instances").fetchone()[0])
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def response_identifier(row: sqlite3.Row, query: CompiledQuery, identifier: Dataset) -> Dataset:
+    """A match carrying the requested return keys (empty when not known) and the query level."""
+    response = Dataset()
+    response.QueryRetrieveLevel = query.level
+    if "SpecificCharacterSet" in identifier:
+        response.SpecificCharacterSet = identifier.SpecificCharacterSet
+    names = row.keys()
+    for keyword in query.return_keys:
+        if keyword == "SpecificCharacterSet":
+            continue
+        value = row[keyword] if keyword in names else None
+        if keyword == "ModalitiesInStudy" and value:
+            value = value.split(",")
+        elif isinstance(value, str) and "\\" in value:
+            value = value.split("\\")
+        setattr(response, keyword, value if value not in (None, "") else "")
+    return response
+
+
+def load_instance(path: str) -> Dataset:
+    """Read an instance for a C-STORE sub-operation without decoding its values."""
+    # Deferred elements (Pixel Data) are read from disk only when the dataset is encoded
+    return pydicom.dcmread(path, defer_size="64 KB")
+
+
+class QueryRetrieveSCP:
+    """C-FIND/C-MOVE/C-GET SCP answering from a ``HeaderIndex``."""
+
+    def __init__(self, root: Union[str, Path], *, index_path: Optional[Union[str, Path]] = None,
+                 host: str = "0.0.0.0", port: Optional[int] = None, ae_title: str = "DICOMTOOLS_QR",
+                 known_aets: Optional[Dict[str, Tuple[str, int]]] = None, max_associations: int = 10,
+                 max_pdu: Optional[int] = None):
+        """
+        Args:
+            root: Directory tree to serve.
+            index_path: SQLite file for the header table (kept between runs); in memory when omitted.
+            port: Listening port; a free one is picked when omitted.
+            known_aets: C-MOVE destinations, AE title -> (host, port).
+            max_associations: Concurrent associations before new ones are rejected.
+            max_pdu: Largest PDU peers may send (0 for unlimited); pynetdicom's 16382 by default.
+        """
+        self.root = Path(root)
+        self.host = host
+        self.port = port or pick_free_port()
+        self.ae_title = ae_title
+        self.known_aets = dict(known_aets or {})
+        self.index = HeaderIndex(self.root, index_path)
+        self.stats = {"find": 0, "get": 0, "move": 0, "matches": 0, "sent": 0}
+        self._lock = threading.Lock()
+        self._ae = AE(ae_title=ae_title)
+        self._ae.maximum_associations = max_associations
+        if max_pdu is not None:
+            self._ae.maximum_pdu_size = max_pdu
+        for model in list(FIND_MODELS) + list(RETRIEVE_MODELS):
+            self._ae.add_supported_context(model)
+        self._ae.add_supported_context(Verification)
+        # C-GET sends C-STORE over the requestor's association, which needs SCP/SCU role selection.
+        # The acceptor's syntax order decides: Explicit VR Little Endian first, so the usual stored
+        # encoding goes out unconverted
+        syntaxes = [ExplicitVRLittleEndian] + [ts for ts in ALL_TRANSFER_SYNTAXES if ts != ExplicitVRLittleEndian]
+        for context in AllStoragePresentationContexts:
+            self._ae.add_supported_context(context.abstract_syntax, syntaxes, scu_role=True, scp_role=True)
+        self._server = None
+
+    def refresh(self) -> Dict[str, int]:
+        started = time.monotonic()
+        counts = self.index.refresh()
+        logger.info("Indexed %s in %.2fs: %s", self.root, time.monotonic() - started, counts)
+        return counts
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += amount
+
+    # Event handlers -----------------------------------------------------------------------------
+
+    def handle_find(self, event):
+        """EVT_C_FIND handler."""
+        self._count("find")
+        identifier = event.identifier
+        try:
+            query = compile_query(identifier)
+        except ValueError as exc:
+            logger.warning("Rejected C-FIND: %s", exc)
+            yield 0xA900, None
+            return
+        if query.level == "PATIENT" and FIND_MODELS.get(event.request.AffectedSOPClassUID) != "PATIENT_ROOT":
+            yield 0xA900, None
+            return
+        for row in self.index.find(query):
+            if event.is_cancelled:
+                yield 0xFE00, None
+                return
+            self._count("matches")
+            yield 0xFF00, response_identifier(row, query, identifier)
+
+    def _retrieve(self, event, name: str):
+        self._count(name)
+        try:
+            query = compile_query(event.identifier)
+        except ValueError as exc:
+            logger.warning("Rejected C-%s: %s", name.upper(), exc)
+            return None
+        return self.index.instances(query)
+
+    def _stream(self, event, rows):
+        for row in rows:
+            if event.is_cancelled:
+                yield 0xFE00, None
+                return
+            try:
+                dataset = load_instance(row["path"])
+            except (OSError, InvalidDicomError) as exc:
+                logger.warning("Cannot read %s: %s", row["path"], exc)
+                failed = Dataset()
+                failed.FailedSOPInstanceUIDList = [row["SOPInstanceUID"]]
+                yield 0xB000, failed
+                continue
+            self._count("sent")
+            yield 0xFF00, dataset
+
+    def handle_get(self, event):
+        """EVT_C_GET handler: number of sub-operations, then one instance at a time."""
+        rows = self._retrieve(event, "get")
+        if rows is None:
+            # A count of 0 would end in success, so announce one sub-operation and fail it
+            yield 1
+            yield 0xA900, None
+            return
+        yield len(rows)
+        yield from self._stream(event, rows)
+
+    def handle_move(self, event):
+        """EVT_C_MOVE handler: destination, number of sub-operations, then one instance at a time."""
+        destination = self.known_aets.get(str(event.move_destination).strip())
+        if destination is None:
+            logger.warning("Unknown C-MOVE destination %s", event.move_destination)
+            yield None, None
+            return
+        rows = self._retrieve(event, "move")
+        if rows is None:
+            yield destination
+            yield 1
+            yield 0xA900, None
+            return
+        # Propose exactly the (SOP Class, Transfer Syntax) pairs being moved
+        pairs = list(dict.fromkeys((row["SOPClassUID"], row["TransferSyntaxUID"]) for row in rows))
+        contexts = [build_context(sop_class, transfer_syntax) for sop_class, transfer_syntax in pairs][:MAX_CONTEXTS]
+        yield destination[0], destination[1], {"contexts": contexts or None}
+        yield len(rows)
+        yield from self._stream(event, rows)
+
+    # Lifecycle ----------------------------------------------------------------------------------
+
+    @property
+    def handlers(self) -> list:
+        return [
+            (evt.EVT_C_FIND, self.handle_find),
+            (evt.EVT_C_GET, self.handle_get),
+            (evt.EVT_C_MOVE, self.handle_move),
+        ]
+
+    def start(self, block: bool = False):
+        """Index the tree, then start listening; with ``block=True`` serve until interrupted."""
+        self.refresh()
+        if block:
+            self._ae.start_server((self.host, self.port), block=True, evt_handlers=self.handlers)
+            return None
+        self._server = self._ae.start_server((self.host, self.port), block=False, evt_handlers=self.handlers)
+        return self._server
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+        self._ae.shutdown()
+
+    def __enter__(self) -> "QueryRetrieveSCP":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+        self.index.close()
+
+
+def _parse_destination(spec: str) -> Tuple[str, Tuple[str, int]]:
+    try:
+        aet, address = spec.split("=", 1)
+        host, port = address.rsplit(":", 1)
+        return aet, (host, int(port))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected AET=host:port, got {spec!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Query/Retrieve SCP serving a local directory (C-FIND, C-MOVE, C-GET)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Serve ./archive on port 11112, keeping the header index between runs
+  %(prog)s ./archive --index archive.sqlite
+
+  # Allow C-MOVE to a viewer
+  %(prog)s ./archive --move-dest VIEWER=10.0.0.5:104
+        """,
+    )
+    parser.add_argument("root", help="Directory tree to serve")
+    parser.add_argument("--index", help="SQLite header index file (default: in memory)")
+    parser.add_argument("--host", default="0.0.0.0", help="Listen address (default: 0.0.0.0)")
+    parser.add_argument("-p", "--port", type=int, default=11112, help="Listen port (default: 11112)")
+    parser.add_argument("--aet", default="DICOMTOOLS_QR", help="AE Title (default: DICOMTOOLS_QR)")
+    parser.add_argument("--move-dest", type=_parse_destination, action="append", default=[],
+                        help="C-MOVE destination as AET=host:port; repeatable")
+    parser.add_argument("--max-associations", type=int, default=10,
+                        help="Concurrent associations before new ones are rejected (default: 10)")
+    parser.add_argument("--debug", action="store_true", help="Enable pynetdicom debug logging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.debug:
+        from pynetdicom import debug_logger
+
+        debug_logger()
+
+    scp = QueryRetrieveSCP(args.root, index_path=args.index, host=args.host, port=args.port, ae_title=args.aet,
+                           known_aets=dict(args.move_dest), max_associations=args.max_associations)
+    print(f"Q/R SCP {args.aet} serving {args.root} on {args.host}:{scp.port}")
+    try:
+        scp.start(block=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scp.stop()
+        print(f"Served {scp.stats['find']} C-FIND, {scp.stats['get']} C-GET and {scp.stats['move']} C-MOVE "
+              f"request(s); sent {scp.stats['sent']} instance(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+#
+# resample.py
+# Dicom-Tools-py
+#
+# Isotropic resampling and block-mean downsampling pyramids for build_volume outputs.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Resample volumes to isotropic voxels and build downsampled pyramids.
+
+Both operations work from the volume's affine (``(x, y, z)`` axes, columns
+scaled by voxel spacing, as returned by ``build_volume``) and are separable:
+one axis is processed at a time, so linear interpolation costs two gathers and
+a blend per axis instead of eight-point trilinear lookups, and block means are
+a single ``np.add.reduceat`` per axis. Each pass splits the volume into strips
+along another axis that are processed by a thread pool (NumPy releases the GIL)
+with at most ``chunk_bytes`` of input per strip, so memory-mapped inputs are
+read incrementally.
+
+    from DICOM_reencoder.resample import build_pyramid, resample_isotropic
+    iso, iso_affine = resample_isotropic(volume, affine, spacing=1.0)
+    levels = build_pyramid(iso, iso_affine, levels=3)  # base, 2x, 4x
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .core.parallel import default_workers, strip_ranges
+
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+Level = Tuple[np.ndarray, np.ndarray]
+
+
+def voxel_spacing(affine: np.ndarray) -> np.ndarray:
+    """Spacing along each volume axis (length of the affine's columns)."""
+    spacing = np.linalg.norm(np.asarray(affine, dtype=float)[:3, :3], axis=0)
+    # Single-slice volumes carry a zero slice column; treat it as unit spacing
+    return np.where(spacing > 0, spacing, 1.0)
+
+
+def _run_strips(volume, out: np.ndarray, axis: int, chunk_bytes: int, workers: Optional[int],
+                kernel: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+    """Apply ``kernel`` (which transforms ``axis``) to strips taken along another axis, in parallel."""
+    others = [i for i in range(3) if i != axis]
+    split = max(others, key=lambda i: volume.shape[i])
+    plane_bytes = volume.nbytes // max(1, volume.shape[split])
+    workers = default_workers(workers)
+
+    def run(strip: slice) -> None:
+        key = [slice(None)] * volume.ndim
+        key[split] = strip
+        out[tuple(key)] = kernel(np.asarray(volume[tuple(key)]))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run, strip_ranges(volume.shape[split], plane_bytes, chunk_bytes, workers)))
+    return out
+
+
+def resample_axis(volume, axis: int, size: int, step: float, *, workers: Optional[int] = None,
+                  chunk_bytes: int = DEFAULT_CHUNK_BYTES, dtype=np.float32) -> np.ndarray:
+    """
+    Linearly interpolate ``volume`` along one axis at positions ``0, step, 2*step, ...`` (input voxel units).
+
+    Positions past the last voxel clamp to it; returns a new array with ``size`` samples on ``axis``.
+    """
+    count = volume.shape[axis]
+    positions = np.minimum(np.arange(size, dtype=np.float64) * step, count - 1)
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, count - 1)
+    shape = [1] * volume.ndim
+    shape[axis] = size
+    weight = (positions - lower).astype(dtype).reshape(shape)
+
+    def kernel(block: np.ndarray) -> np.ndarray:
+        low = np.take(block, lower, axis=axis).astype(dtype, copy=False)
+        high = np.take(block, upper, axis=axis).astype(dtype, copy=False)
+        return low + (high - low) * weight
+
+    out_shape = list(volume.shape)
+    out_shape[axis] = size
+    out = np.empty(out_shape, dtype=dtype)
+    return _run_strips(volume, out, axis, chunk_bytes, workers, kernel)
+
+
+def resample_isotropic(volume, affine: np.ndarray, spacing: Union[float, Sequence[float]] = 1.0, *,
+                       workers: Optional[int] = None, chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                       dtype=np.float32) -> Level:
+    """
+    Resample an ``(x, y, z[, ...])`` volume to ``spacing`` mm voxels (scalar for isotropic, or per axis).
+
+    The first voxel centre is kept, so the new affine only rescales the direction columns.
+    Axes are processed shrinking ones first to keep intermediates small.
+    """
+    affine = np.asarray(affine, dtype=float)
+    current = voxel_spacing(affine)
+    target = np.broadcast_to(np.asarray(spacing, dtype=float), (3,))
+    if np.any(target <= 0):
+        raise ValueError(f"Resampling spacing must be positive, got {spacing}")
+    sizes = [int(np.floor((n - 1) * s / t + 1e-6)) + 1 for n, s, t in zip(volume.shape[:3], current, target)]
+
+    result = volume
+    for axis in sorted(range(3), key=lambda i: sizes[i] / volume.shape[i]):
+        if sizes[axis] == result.shape[axis] and np.isclose(target[axis], current[axis]):
+            continue
+        result = resample_axis(result, axis, sizes[axis], target[axis] / current[axis], workers=workers,
+                               chunk_bytes=chunk_bytes, dtype=dtype)
+    if result is volume:
+        result = np.asarray(volume, dtype=dtype)
+
+    new_affine = affine.copy()
+    for axis in range(3):
+        column = affine[:3, axis]
+        norm = np.linalg.norm(column)
+        new_affine[:3, axis] = column * (target[axis] / norm) if norm > 0 else 0.0
+    return result, new_affine
+
+
+def downsample(volume, affine: np.ndarray, factor: int = 2, *, workers: Optional[int] = None,
+               chunk_bytes: int = DEFAULT_CHUNK_BYTES, dtype=np.float32) -> Level:
+    """
+    Block-mean downsample the three spatial axes by an integer ``factor``.
+
+    Trailing partial blocks average the voxels they contain; single-voxel axes are left as is.
+    The new affine places each voxel at the centre of a full block. An affine is a regular
+    grid, so this is not exact for a trailing partial block: with 7 planes and factor 2 the
+    last voxel averages plane 6 only but sits at 6.5. Such a voxel lies up to
+    ``(factor - 1) / 2`` input voxels off its true centre.
+    """
+    factor = int(factor)
+    if factor < 1:
+        raise ValueError("Downsampling factor must be >= 1")
+    result = volume
+    factors = np.ones(3)
+    for axis in range(3):
+        count = result.shape[axis]
+        starts = np.arange(0, count, factor)
+        if len(starts) == count:
+            continue
+        factors[axis] = factor
+        shape = [1] * result.ndim
+        shape[axis] = len(starts)
+        counts = np.diff(np.append(starts, count)).astype(np.float64).reshape(shape)
+
+        def kernel(block: np.ndarray, axis=axis, starts=starts, counts=counts) -> np.ndarray:
+            sums = np.add.reduceat(block, starts, axis=axis, dtype=np.float64)
+            return (sums / counts).astype(dtype, copy=False)
+
+        out_shape = list(result.shape)
+        out_shape[axis] = len(starts)
+        result = _run_strips(result, np.empty(out_shape, dtype=dtype), axis, chunk_bytes, workers, kernel)
+    if result is volume:
+        result = np.asarray(volume, dtype=dtype)
+
+    affine = np.asarray(affine, dtype=float)
+    new_affine = affine.copy()
+    new_affine[:3, :3] = affine[:3, :3] * factors
+    new_affine[:3, 3] = affine[:3, 3] + affine[:3, :3] @ ((factors - 1) / 2.0)
+    return result, new_affine
+
+
+def build_pyramid(volume, affine: np.ndarray, levels: int, factor: int = 2, **kwargs) -> List[Level]:
+    """Return ``levels`` entries: the base ``(volume, affine)`` followed by successive ``factor``x reductions."""
+    pyramid: List[Level] = [(volume, np.asarray(affine, dtype=float))]
+    for _ in range(1, max(1, int(levels))):
+        pyramid.append(downsample(*pyramid[-1], factor=factor, **kwargs))
+    return pyramid
+
+
+def level_path(base: Union[str, Path], level: int) -> Path:
+    """Sibling path for a pyramid level, e.g. ``vol.npy`` -> ``vol_level2.npy``."""
+    base = Path(base)
+    return base.with_name(f"{base.stem}_level{level}{base.suffix}")
+
+
+def level_metadata(metadata: dict, volume: np.ndarray, affine: np.ndarray, **extra) -> dict:
+    """Copy ``build_volume`` metadata with the geometry and statistics of a resampled volume."""
+    updated = dict(metadata)
+    updated.update(
+        shape=list(volume.shape),
+        dtype=str(volume.dtype),
+        affine=np.asarray(affine).tolist(),
+        spacing_mm=[float(v) for v in voxel_spacing(affine)],
+        stats={
+            "min": float(volume.min()),
+            "max": float(volume.max()),
+            "mean": float(volume.mean()),
+            "std": float(volume.std()),
+        },
+        **extra,
+    )
+    return updated
+
+
+def save_pyramid(levels: Sequence[Level], base_path: Union[str, Path], metadata: dict, *, fmt: str = "npy",
+                 chunk_size: int = 64, codec: str = "zlib", workers: Optional[int] = None) -> List[dict]:
+    """
+    Write pyramid levels 1.. next to ``base_path`` (``.npy`` plus JSON sidecar, or chunked stores).
+
+    Level 0 is the base volume the caller writes itself. Returns one summary entry per written
+    level for the base metadata.
+    """
+    entries = []
+    for level, (volume, affine) in enumerate(levels):
+        if level == 0:
+            continue
+        path = level_path(base_path, level)
+        meta = level_metadata(metadata, volume, affine, pyramid_level=level)
+        meta.pop("pyramid", None)
+        if fmt == "chunked":
+            from .chunked_volume import write_chunked
+
+            write_chunked(volume, path, chunk_shape=(chunk_size,) * volume.ndim, codec=codec, metadata=meta,
+                          workers=workers)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            np.save(path, volume)
+            path.with_suffix(".json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        entries.append({"level": level, "path": str(path), "shape": meta["shape"], "spacing_mm": meta["spacing_mm"]})
+    return entries
+
+
+def prepare_levels(volume, affine: np.ndarray, metadata: dict, *, spacing: Optional[float] = None,
+                   levels: int = 1, workers: Optional[int] = None) -> Tuple[List[Level], dict]:
+    """
+    Optionally resample to ``spacing`` mm and build a ``levels``-deep pyramid for the volume CLIs.
+
+    Returns the pyramid (level 0 is the volume to write as the base) and the base metadata.
+    """
+    if spacing:
+        volume, affine = resample_isotropic(volume, affine, spacing, workers=workers)
+        metadata = level_metadata(metadata, volume, affine, resampled_mm=float(spacing))
+    return build_pyramid(volume, affine, levels, workers=workers), metadata
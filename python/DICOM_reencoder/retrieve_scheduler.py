@@ -0,0 +1,326 @@
+#
+# retrieve_scheduler.py
+# Dicom-Tools-py
+#
+# Runs many C-GET/C-MOVE retrievals concurrently with per-peer limits, retries and aggregated progress.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Concurrent retrieve scheduler.
+
+``dicom_retrieve`` pulls one STUDY/SERIES/IMAGE key per association and waits
+for it to finish. The scheduler takes a list of keys (or a C-FIND result set)
+and runs them across a bounded number of concurrent associations:
+
+    peer = Peer("pacs.example.com", 11112, called_aet="PACS", max_associations=4)
+    jobs = jobs_from_identifiers(series_results, peer)
+    results = RetrieveScheduler(output_dir="prefetch").run(jobs)
+
+Each peer gets at most ``max_associations`` requests in flight, and the total is
+capped by ``workers``. Associations come from an ``AssociationPool``, so
+consecutive series reuse live associations instead of renegotiating. Requests
+that end with an out-of-resources (0xA7xx) or unable-to-process (0xC0xx-0xCFxx)
+status, or that cannot associate, are re-queued with exponential backoff; the
+backoff does not hold a slot, so other keys keep flowing meanwhile. Progress is
+aggregated from the NumberOf*Suboperations fields of every pending response.
+"""
+
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from pydicom.dataset import Dataset
+from pynetdicom import evt
+
+from .core.association_pool import AssociationPool, open_association
+from .core.negotiation import TransferSyntaxStats
+from .dicom_retrieve import create_retrieve_query, retrieve_contexts
+from .storage_writer import StorageWriter
+
+PENDING = (0xFF00, 0xFF01)
+SUBOPERATION_FIELDS = {
+    "completed": "NumberOfCompletedSuboperations",
+    "remaining": "NumberOfRemainingSuboperations",
+    "failed": "NumberOfFailedSuboperations",
+    "warning": "NumberOfWarningSuboperations",
+}
+
+
+def is_retryable(status: Optional[int]) -> bool:
+    """Transient failures worth retrying: no status (association/DIMSE failure), 0xA7xx and 0xCxxx."""
+    return status is None or 0xA700 <= status <= 0xA7FF or 0xC000 <= status <= 0xCFFF
+
+
+@dataclass(frozen=True)
+class Peer:
+    """A remote Q/R SCP and how many associations we may open to it at once."""
+
+    host: str
+    port: int
+    called_aet: str = "PACS"
+    calling_aet: str = "DICOMTOOLS"
+    max_associations: int = 2
+
+    @property
+    def key(self) -> tuple:
+        return (self.host, int(self.port), self.called_aet)
+
+
+@dataclass
+class RetrieveJob:
+    """One C-GET/C-MOVE identifier sent to one peer."""
+
+    query: Dataset
+    peer: Peer
+    label: str = ""
+
+
+@dataclass
+class RetrieveResult:
+    """Outcome of a job after its final attempt."""
+
+    job: RetrieveJob
+    status: Optional[int] = None
+    completed: int = 0
+    remaining: int = 0
+    failed: int = 0
+    warning: int = 0
+    attempts: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 0x0000
+
+    def to_dict(self) -> dict:
+        return {
+            "label": self.job.label,
+            "status": None if self.status is None else f"0x{self.status:04X}",
+            "completed": self.completed,
+            "failed": self.failed,
+            "warning": self.warning,
+            "attempts": self.attempts,
+            "elapsed_s": round(self.elapsed, 3),
+            "error": self.error,
+        }
+
+
+@dataclass
+class RetrieveProgress:
+    """Thread-safe totals over every job, updated from pending C-GET/C-MOVE responses."""
+
+    jobs: int = 0
+    jobs_done: int = 0
+    per_job: Dict[int, Dict[str, int]] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def update(self, index: int, counts: Dict[str, int]) -> dict:
+        with self._lock:
+            self.per_job[index] = dict(counts)
+            return self._snapshot()
+
+    def finish(self, index: int) -> dict:
+        with self._lock:
+            self.jobs_done += 1
+            entry = self.per_job.setdefault(index, {})
+            entry["remaining"] = 0
+            return self._snapshot()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> dict:
+        totals = {name: sum(job.get(name, 0) for job in self.per_job.values()) for name in SUBOPERATION_FIELDS}
+        return {"jobs": self.jobs, "jobs_done": self.jobs_done, **totals}
+
+
+def jobs_from_identifiers(identifiers: Iterable[Dataset], peer: Peer, level: Optional[str] = None) -> List[RetrieveJob]:
+    """
+    Build retrieve jobs from C-FIND results (or any datasets carrying the key UIDs).
+
+    The level defaults to each identifier's QueryRetrieveLevel, else the deepest UID present.
+    """
+    jobs = []
+    for identifier in identifiers:
+        study = identifier.get("StudyInstanceUID")
+        series = identifier.get("SeriesInstanceUID")
+        instance = identifier.get("SOPInstanceUID")
+        job_level = level or identifier.get("QueryRetrieveLevel") or (
+            "IMAGE" if instance else "SERIES" if series else "STUDY")
+        query = create_retrieve_query(job_level, study, series, instance)
+        label = {"STUDY": study, "SERIES": series, "IMAGE": instance}.get(job_level) or ""
+        jobs.append(RetrieveJob(query=query, peer=peer, label=str(label)))
+    return jobs
+
+
+class RetrieveScheduler:
+    """Run retrieve jobs concurrently with per-peer limits and retry/backoff."""
+
+    def __init__(self, *, method: str = "GET", output_dir: Optional[str] = None,
+                 move_destination: Optional[str] = None, query_model: str = "StudyRoot", workers: int = 4,
+                 retries: int = 3, backoff: float = 0.5, max_backoff: float = 10.0,
+                 pool: Optional[AssociationPool] = None,
+                 progress: Optional[Callable[[dict], None]] = None,
+                 store_handler: Optional[Callable] = None, layout: str = "flat", fsync: str = "batch",
+                 policy: str = "native"):
+        """
+        Args:
+            method: 'GET' (instances arrive on our association) or 'MOVE' (sent to ``move_destination``).
+            output_dir: Where C-GET instances are written (ignored with ``store_handler``).
+            workers: Most requests in flight across all peers.
+            retries: Extra attempts after a retryable failure.
+            backoff: First retry delay in seconds; doubled per attempt (with jitter) up to ``max_backoff``.
+            pool: Association pool to draw from; by default one is created for the run.
+            progress: Called with aggregated totals after every pending response and finished job.
+            store_handler: Custom EVT_C_STORE handler for C-GET instead of writing to ``output_dir``.
+            layout, fsync: ``StorageWriter`` options for the instances written to ``output_dir``.
+            policy: Transfer syntax policy for C-GET storage contexts (see ``core.negotiation``).
+        """
+        method = method.upper()
+        if method not in ("GET", "MOVE"):
+            raise ValueError(f"Unsupported retrieve method: {method}")
+        if method == "MOVE" and not move_destination:
+            raise ValueError("move_destination is required for C-MOVE")
+        if method == "GET" and not (output_dir or store_handler):
+            raise ValueError("output_dir or store_handler is required for C-GET")
+        self.method = method
+        self.output_dir = output_dir
+        self.move_destination = move_destination
+        self.query_model = query_model
+        self.workers = max(1, workers)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool = pool
+        self.progress_callback = progress
+        self.store_handler = store_handler
+        self.layout = layout
+        self.fsync = fsync
+        self.policy = policy
+        self.progress = RetrieveProgress()
+        self.syntaxes = TransferSyntaxStats()
+
+    def _delay(self, attempt: int) -> float:
+        delay = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+        # Jitter keeps parallel retries from hitting a recovering peer in lockstep
+        return delay * (0.5 + random.random() / 2)
+
+    def _report(self, snapshot: dict) -> None:
+        if self.progress_callback:
+            self.progress_callback(snapshot)
+
+    def _attempt(self, index: int, job: RetrieveJob, pool: AssociationPool,
+                 store_handler: Optional[Callable]) -> RetrieveResult:
+        """Send one C-GET/C-MOVE for ``job`` and collect its final status and sub-operation counts."""
+        result = RetrieveResult(job=job)
+        model, contexts, roles = retrieve_contexts(self.query_model, self.method, self.policy)
+        handlers = [(evt.EVT_C_STORE, store_handler)] if self.method == "GET" else None
+        peer = job.peer
+        try:
+            with open_association(peer.host, peer.port, contexts, calling_aet=peer.calling_aet,
+                                  called_aet=peer.called_aet, roles=roles, evt_handlers=handlers,
+                                  pool=pool) as assoc:
+                if not assoc.is_established:
+                    result.error = "Association rejected, aborted or never connected"
+                    return result
+                if self.method == "GET":
+                    self.syntaxes.record_association(assoc)
+                    responses = assoc.send_c_get(job.query, query_model=model)
+                else:
+                    responses = assoc.send_c_move(job.query, self.move_destination, query_model=model)
+                for status, _ in responses:
+                    if not status:
+                        # An empty status means the request timed out or the association was aborted
+                        result.status = None
+                        result.error = "No response status (timeout or aborted association)"
+                        break
+                    counts = {name: int(status.get(keyword, 0) or 0)
+                              for name, keyword in SUBOPERATION_FIELDS.items()}
+                    if any(counts.values()):
+                        result.completed, result.remaining = counts["completed"], counts["remaining"]
+                        result.failed, result.warning = counts["failed"], counts["warning"]
+                        self._report(self.progress.update(index, counts))
+                    if status.Status not in PENDING:
+                        result.status = int(status.Status)
+        except Exception as exc:  # noqa: BLE001 - one bad job must not end the run and lose the others' results
+            result.error = f"{type(exc).__name__}: {exc}"
+        return result
+
+    def run(self, jobs: Sequence[RetrieveJob]) -> List[RetrieveResult]:
+        """Run every job and return one result per job, in input order."""
+        jobs = list(jobs)
+        self.progress = RetrieveProgress(jobs=len(jobs))
+        results: List[Optional[RetrieveResult]] = [None] * len(jobs)
+        if not jobs:
+            return []
+        own_pool = self.pool is None
+        pool = self.pool or AssociationPool(max_size=max(job.peer.max_associations for job in jobs))
+        # One raw writer thread serves every concurrent C-GET of the run
+        writer = None
+        store_handler = self.store_handler
+        if self.method == "GET" and store_handler is None:
+            writer = StorageWriter(self.output_dir, layout=self.layout, fsync=self.fsync, syntaxes=self.syntaxes)
+            store_handler = writer.handle_store
+        started = {index: time.monotonic() for index in range(len(jobs))}
+        # Queue entries are (index, attempt, not_before); FIFO keeps the caller's priority order
+        queue = [(index, 1, 0.0) for index in range(len(jobs))]
+        active: Counter = Counter()
+        running = {}
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while queue or running:
+                    now = time.monotonic()
+                    for entry in list(queue):
+                        if len(running) >= self.workers:
+                            break
+                        index, attempt, not_before = entry
+                        peer = jobs[index].peer
+                        if not_before > now or active[peer.key] >= peer.max_associations:
+                            continue
+                        queue.remove(entry)
+                        active[peer.key] += 1
+                        future = executor.submit(self._attempt, index, jobs[index], pool, store_handler)
+                        running[future] = (index, attempt)
+
+                    if not running:
+                        time.sleep(max(0.0, min(entry[2] for entry in queue) - time.monotonic()))
+                        continue
+                    waiting = [entry[2] - now for entry in queue if entry[2] > now]
+                    done, _ = wait(running, timeout=min(waiting) if waiting else None, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, attempt = running.pop(future)
+                        active[jobs[index].peer.key] -= 1
+                        result = future.result()
+                        result.attempts = attempt
+                        if is_retryable(result.status) and attempt <= self.retries:
+                            queue.append((index, attempt + 1, time.monotonic() + self._delay(attempt)))
+                            continue
+                        result.elapsed = time.monotonic() - started[index]
+                        results[index] = result
+                        self._report(self.progress.finish(index))
+        finally:
+            if own_pool:
+                pool.close()
+            if writer is not None:
+                writer.close()
+        return results
+
+
+def summarize(results: Sequence[RetrieveResult]) -> dict:
+    """Totals over a scheduler run, e.g. for printing or a JSON report."""
+    return {
+        "jobs": len(results),
+        "succeeded": sum(1 for r in results if r.ok),
+        "failed_jobs": sum(1 for r in results if not r.ok),
+        "instances": sum(r.completed for r in results),
+        "failed_instances": sum(r.failed for r in results),
+        "retries": sum(max(0, r.attempts - 1) for r in results),
+    }
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+#
+# series_export.py
+# Dicom-Tools-py
+#
+# Groups a directory tree into series/stacks in one header pass and exports them concurrently.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Export every series of a study directory in one run.
+
+A single parallel header pass (pixel data skipped) buckets files by
+SeriesInstanceUID and acquisition geometry - Rows/Columns and
+ImageOrientationPatient - so a series holding several stacks (e.g. a
+localizer with three orientations) becomes one volume per stack. The selected
+stacks are then exported concurrently to NIfTI (native streaming writer) or
+``.npy`` volumes, and a ``manifest.json`` records what was written, skipped or
+failed for each of them.
+
+    dicom-export-series study/ -o out/ --format nifti --modality CT --jobs 4
+"""
+
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pydicom
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+FORMATS = ("nifti", "npy")
+MANIFEST_NAME = "manifest.json"
+
+# Only these elements are parsed during the grouping pass
+GROUP_TAGS = [
+    "SeriesInstanceUID",
+    "SeriesNumber",
+    "SeriesDescription",
+    "Modality",
+    "Rows",
+    "Columns",
+    "ImageOrientationPatient",
+]
+# Direction cosines closer than this belong to the same stack
+ORIENTATION_DECIMALS = 3
+
+
+@dataclass
+class SeriesStack:
+    """Files of one series that share dimensions and orientation."""
+
+    series_uid: str
+    stack: int
+    series_number: Optional[int]
+    description: str
+    modality: str
+    rows: int
+    columns: int
+    orientation: Tuple[float, ...]
+    paths: List[Path] = field(default_factory=list)
+
+    @property
+    def instances(self) -> int:
+        return len(self.paths)
+
+    @property
+    def name(self) -> str:
+        """File-system friendly output name, e.g. ``0003_T1_AXIAL`` or ``0003_T1_AXIAL_stack1``."""
+        label = re.sub(r"[^A-Za-z0-9._-]+", "_", self.description or self.modality or "series").strip("_")
+        number = f"{self.series_number:04d}" if self.series_number is not None else "none"
+        return f"{number}_{label or 'series'}" + (f"_stack{self.stack}" if self.stack else "")
+
+    def to_dict(self) -> dict:
+        return {
+            "series_uid": self.series_uid,
+            "stack": self.stack,
+            "series_number": self.series_number,
+            "description": self.description,
+            "modality": self.modality,
+            "instances": self.instances,
+            "rows": self.rows,
+            "columns": self.columns,
+            "orientation": list(self.orientation),
+        }
+
+
+def _read_group_header(path: Path) -> Optional[dict]:
+    try:
+        ds = pydicom.dcmread(path, stop_before_pixels=True, force=True, specific_tags=GROUP_TAGS)
+    except Exception:  # noqa: BLE001
+        return None
+    uid = str(ds.get("SeriesInstanceUID", "") or "")
+    rows, columns = ds.get("Rows"), ds.get("Columns")
+    # DICOMDIRs, reports and other non-image objects have no pixel matrix
+    if not uid or rows is None or columns is None:
+        return None
+    try:
+        number = int(ds.get("SeriesNumber")) if ds.get("SeriesNumber") not in (None, "") else None
+    except (TypeError, ValueError):
+        number = None
+    try:
+        orientation = tuple(round(float(v), ORIENTATION_DECIMALS) + 0.0 for v in ds.ImageOrientationPatient)
+    except (AttributeError, TypeError, ValueError):
+        orientation = ()
+    return {
+        "series_uid": uid,
+        "series_number": number,
+        "description": str(ds.get("SeriesDescription", "") or ""),
+        "modality": str(ds.get("Modality", "") or ""),
+        "rows": int(rows),
+        "columns": int(columns),
+        "orientation": orientation,
+    }
+
+
+def _candidate_files(directory: Path, recursive: bool) -> List[Path]:
+    if recursive:
+        files = [Path(root) / name for root, _, names in os.walk(directory) for name in names]
+    else:
+        files = [p for p in directory.iterdir() if p.is_file()]
+    return sorted(files)
+
+
+def group_series(files: Sequence[PathLike], *, workers: Optional[int] = None) -> Tuple[List[SeriesStack], List[Path]]:
+    """
+    Bucket ``files`` by SeriesInstanceUID plus (Rows, Columns, orientation).
+
+    Returns ``(stacks, skipped)``: stacks ordered by series number then UID (stack 0 is the
+    largest stack of its series), and the files that are not readable image instances.
+    """
+    files = [Path(f) for f in files]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        headers = list(pool.map(_read_group_header, files))
+
+    buckets: Dict[tuple, SeriesStack] = {}
+    skipped: List[Path] = []
+    for path, header in zip(files, headers):
+        if header is None:
+            skipped.append(path)
+            continue
+        key = (header["series_uid"], header["rows"], header["columns"], header["orientation"])
+        if key not in buckets:
+            buckets[key] = SeriesStack(stack=0, **header)
+        buckets[key].paths.append(path)
+
+    by_series: Dict[str, List[SeriesStack]] = {}
+    for stack in buckets.values():
+        by_series.setdefault(stack.series_uid, []).append(stack)
+    stacks: List[SeriesStack] = []
+    for members in by_series.values():
+        members.sort(key=lambda s: (-s.instances, s.paths[0]))
+        for index, stack in enumerate(members):
+            stack.stack = index
+        stacks.extend(members)
+    stacks.sort(key=lambda s: (s.series_number is None, s.series_number or 0, s.series_uid, s.stack))
+    return stacks, skipped
+
+
+def scan_series(directory: PathLike, *, recursive: bool = True,
+                workers: Optional[int] = None) -> Tuple[List[SeriesStack], List[Path]]:
+    """Group every file below ``directory`` into series stacks in one header pass."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        raise RuntimeError(f"Not a directory: {directory}")
+    return group_series(_candidate_files(directory, recursive), workers=workers)
+
+
+def select_stacks(stacks: Sequence[SeriesStack], *, series_uids: Optional[Sequence[str]] = None,
+                  modalities: Optional[Sequence[str]] = None, match: Optional[str] = None,
+                  min_instances: int = 1) -> List[SeriesStack]:
+    """Filter stacks by UID, modality, a case-insensitive SeriesDescription glob and size."""
+    wanted_modalities = {m.upper() for m in modalities or []}
+    selected = []
+    for stack in stacks:
+        if series_uids and stack.series_uid not in series_uids:
+            continue
+        if wanted_modalities and stack.modality.upper() not in wanted_modalities:
+            continue
+        if match and not fnmatch.fnmatch(stack.description.lower(), match.lower()):
+            continue
+        if stack.instances < min_instances:
+            continue
+        selected.append(stack)
+    return selected
+
+
+def _export_nifti(stack: SeriesStack, output_dir: Path, name: str, compress: bool, workers: Optional[int]) -> dict:
+    from .nifti_writer import write_series_nifti
+
+    output = output_dir / f"{name}.nii{'.gz' if compress else ''}"
+    output, plan = write_series_nifti(stack.paths, output, workers=workers, decode_workers=workers)
+    return {"output": str(output), "shape": [plan.plane_shape[1], plan.plane_shape[0], len(plan.paths)],
+            "dtype": str(plan.dtype), "affine": plan.affine.tolist()}
+
+
+def _export_npy(stack: SeriesStack, output_dir: Path, name: str, workers: Optional[int]) -> dict:
+    from .volume_builder import _volume_metadata, assemble_volume
+
+    volume, affine, plan = assemble_volume(stack.paths, workers=workers)
+    output = output_dir / f"{name}.npy"
+    np.save(output, volume)
+    metadata = _volume_metadata(volume, affine, plan.reference)
+    metadata_path = output.with_suffix(".json")
+    metadata_path.write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+    return {"output": str(output), "metadata": str(metadata_path), "shape": list(volume.shape),
+            "dtype": str(volume.dtype), "affine": np.asarray(affine).tolist()}
+
+
+def export_series(directory: PathLike, output_dir: PathLike, *, fmt: str = "nifti", recursive: bool = True,
+                  series_uids: Optional[Sequence[str]] = None, modalities: Optional[Sequence[str]] = None,
+                  match: Optional[str] = None, min_instances: int = 1, compress: bool = True,
+                  jobs: Optional[int] = None, workers: Optional[int] = None) -> dict:
+    """
+    Scan ``directory`` once and export the selected series stacks concurrently.
+
+    Args:
+        directory: Study directory (searched recursively by default).
+        output_dir: Destination for the volumes and ``manifest.json``.
+        fmt: ``nifti`` (``.nii.gz``/``.nii``) or ``npy`` (volume plus JSON metadata).
+        series_uids / modalities / match / min_instances: Filters, see :func:`select_stacks`.
+        compress: gzip NIfTI output.
+        jobs: Stacks exported at the same time.
+        workers: Decoder (and gzip) threads per stack; defaults to splitting the CPUs between jobs.
+
+    Returns:
+        The manifest dict, also written to ``output_dir/manifest.json``. A stack that fails is
+        recorded with ``status: "failed"`` and its error instead of aborting the run.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    stacks, skipped = scan_series(directory, recursive=recursive, workers=workers)
+    selected = select_stacks(stacks, series_uids=series_uids, modalities=modalities, match=match,
+                             min_instances=min_instances)
+    jobs = max(1, min(jobs or min(4, os.cpu_count() or 1), len(selected) or 1))
+    workers = workers or max(1, (os.cpu_count() or 1) // jobs)
+
+    # Names must be unique even when two series share number and description
+    names: Dict[int, str] = {}
+    for stack in selected:
+        name = stack.name
+        if name in names.values():
+            name = f"{name}_{stack.series_uid.rsplit('.', 1)[-1]}"
+        names[id(stack)] = name
+
+    def run(stack: SeriesStack) -> dict:
+        entry = stack.to_dict()
+        entry["name"] = names[id(stack)]
+        try:
+            if fmt == "nifti":
+                entry.update(_export_nifti(stack, output_dir, entry["name"], compress, workers))
+            else:
+                entry.update(_export_npy(stack, output_dir, entry["name"], workers))
+            entry["status"] = "exported"
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Export of %s failed: %s", entry["name"], exc)
+            entry.update(status="failed", error=str(exc))
+        return entry
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        entries = list(pool.map(run, selected))
+
+    selected_ids = {id(stack) for stack in selected}
+    excluded = [dict(stack.to_dict(), status="filtered") for stack in stacks if id(stack) not in selected_ids]
+    manifest = {
+        "source": str(Path(directory)),
+        "format": fmt,
+        "series": entries + excluded,
+        "exported": sum(entry["status"] == "exported" for entry in entries),
+        "failed": sum(entry["status"] == "failed" for entry in entries),
+        "skipped_files": [str(path) for path in skipped],
+    }
+    (output_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def print_manifest(manifest: dict, output_dir) -> None:
+    """Console summary of :func:`export_series`: one line per exported or failed stack, then totals."""
+    for entry in manifest["series"]:
+        if entry["status"] == "exported":
+            print(f"{entry['name']}: {entry['output']}")
+        elif entry["status"] == "failed":
+            print(f"{entry['name']}: FAILED ({entry['error']})")
+    print(f"Exported {manifest['exported']} stack(s), {manifest['failed']} failed; "
+          f"manifest at {Path(output_dir) / MANIFEST_NAME}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Export every series (stack) of a DICOM directory with a manifest")
+    parser.add_argument("directory", help="Study directory")
+    parser.add_argument("-o", "--output", default="output/series", help="Output directory (default: output/series)")
+    parser.add_argument("--format", choices=FORMATS, default="nifti", help="Volume format")
+    parser.add_argument("--no-recursive", action="store_true", help="Only scan the top-level directory")
+    parser.add_argument("--series-uid", action="append", help="Export only this SeriesInstanceUID (repeatable)")
+    parser.add_argument("--modality", action="append", help="Export only this modality (repeatable)")
+    parser.add_argument("--match", help="Case-insensitive glob on SeriesDescription, e.g. '*t1*'")
+    parser.add_argument("--min-instances", type=int, default=1, help="Skip stacks with fewer instances")
+    parser.add_argument("--no-compress", action="store_true", help="Write .nii instead of .nii.gz")
+    parser.add_argument("--jobs", type=int, help="Stacks exported concurrently")
+    parser.add_argument("--workers", type=int, help="Decoder threads per stack")
+    parser.add_argument("--list", action="store_true", help="Only print the series/stack grouping")
+    args = parser.parse_args()
+
+    if args.list:
+        stacks, skipped = scan_series(args.directory, recursive=not args.no_recursive, workers=args.workers)
+        for stack in select_stacks(stacks, series_uids=args.series_uid, modalities=args.modality, match=args.match,
+                                   min_instances=args.min_instances):
+            print(f"{stack.name}: {stack.instances} instances {stack.columns}x{stack.rows} {stack.series_uid}")
+        if skipped:
+            print(f"{len(skipped)} non-image or unreadable files skipped")
+        return 0
+
+    manifest = export_series(args.directory, args.output, fmt=args.format, recursive=not args.no_recursive,
+                             series_uids=args.series_uid, modalities=args.modality, match=args.match,
+                             min_instances=args.min_instances, compress=not args.no_compress, jobs=args.jobs,
+                             workers=args.workers)
+    print_manifest(manifest, args.output)
+    return 0 if not manifest["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
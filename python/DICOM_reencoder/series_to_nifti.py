@@ -3,38 +3,87 @@
 # series_to_nifti.py
 # Dicom-Tools-py
 #
-# Converts a DICOM series directory into a NIfTI volume using SimpleITK.
+# Converts a DICOM series directory into a NIfTI volume (native streaming writer or SimpleITK).
 #
 # Thales Matheus Mendonça Santos - November 2025
 
 """
-Convert a DICOM series into a NIfTI volume using SimpleITK.
+Convert a DICOM series into a NIfTI volume.
 
-This leverages SimpleITK's series reader to honor spacing, orientation, and
-instance sorting. It is intentionally minimal so it can run as a quick bridge
-between DICOM folders and research tooling that expects NIfTI.
+The default native backend sorts slices from headers and streams them through
+:mod:`DICOM_reencoder.nifti_writer`, compressing with parallel gzip members, so
+neither SimpleITK nor a full in-memory volume is needed. The SimpleITK backend
+leverages its series reader to honor spacing, orientation, and instance sorting
+and remains available for inputs the native writer does not handle (e.g. RGB).
+It is intentionally minimal so it can run as a quick bridge between DICOM
+folders and research tooling that expects NIfTI.
 """
 
 import argparse
 import json
+import logging
+import shutil
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pydicom
+
+from .validate_series import check_series
+from .volume_cache import VolumeCache, fingerprint_files, resolve_cache
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("native", "simpleitk")
 
 
 def _require_simpleitk():
     try:
         import SimpleITK as sitk
     except ImportError as exc:  # noqa: BLE001
-        raise SystemExit("SimpleITK is required for dicom-to-nifti. Install with: pip install SimpleITK") from exc
+        raise SystemExit("SimpleITK is required for the simpleitk backend. Install with: pip install SimpleITK") from exc
     return sitk
 
 
-def _normalize_output_path(base_dir: Path, output: str | None, series_uid: str) -> Path:
+def _series_uid_of(path: Path) -> Optional[str]:
+    try:
+        header = pydicom.dcmread(path, stop_before_pixels=True, force=True, specific_tags=["SeriesInstanceUID"])
+    except Exception:  # noqa: BLE001
+        return None
+    uid = getattr(header, "SeriesInstanceUID", None)
+    return str(uid) if uid else None
+
+
+def group_series_files(series_dir: Path, workers: Optional[int] = None) -> Dict[str, List[Path]]:
+    """Group the directory's direct files by SeriesInstanceUID (header-only reads, like GDCM's scan)."""
+    files = sorted(p for p in Path(series_dir).iterdir() if p.is_file()) if Path(series_dir).is_dir() else []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        uids = list(pool.map(_series_uid_of, files))
+    groups: Dict[str, List[Path]] = defaultdict(list)
+    for path, uid in zip(files, uids):
+        if uid:
+            groups[uid].append(path)
+    return dict(sorted(groups.items()))
+
+
+def _select_series(series_ids: List[str], series_uid: str | None, series_dir: Path) -> str:
+    if not series_ids:
+        raise RuntimeError(f"No DICOM series found in {series_dir}")
+    target_uid = series_uid or series_ids[0]
+    if target_uid not in series_ids:
+        found = ", ".join(series_ids)
+        raise RuntimeError(f"Series UID {target_uid} not found in {series_dir}. Available: {found}")
+    return target_uid
+
+
+def _normalize_output_path(base_dir: Path, output: str | None, series_uid: str, compress: bool = True) -> Path:
     """Choose a sensible .nii.gz output path."""
     if output:
         out_path = Path(output)
     else:
-        out_path = base_dir / f"{series_uid}.nii.gz"
+        out_path = base_dir / f"{series_uid}.nii{'.gz' if compress else ''}"
 
     suffixes = "".join(out_path.suffixes)
     if suffixes not in {".nii", ".nii.gz"}:
@@ -45,7 +94,9 @@ def _normalize_output_path(base_dir: Path, output: str | None, series_uid: str)
 
 
 def convert_series_to_nifti(series_dir: Path, *, series_uid: str | None = None, output: str | None = None,
-                            compress: bool = True, metadata_path: str | None = None) -> Tuple[Path, dict]:
+                            compress: bool = True, metadata_path: str | None = None,
+                            preflight: bool = False, cache=None, refresh: bool = False, backend: str = "native",
+                            version: int = 1, workers: Optional[int] = None) -> Tuple[Path, dict]:
     """
     Convert a directory containing a DICOM series into a NIfTI file.
 
@@ -55,30 +106,77 @@ def convert_series_to_nifti(series_dir: Path, *, series_uid: str | None = None,
         output: Output file path (.nii or .nii.gz). Defaults to <SeriesUID>.nii.gz.
         compress: Whether to write compressed NIfTI (.nii.gz).
         metadata_path: Optional path to write a JSON sidecar with spacing/origin/direction.
+        preflight: Validate the selected series headers (duplicates, gaps, mixed geometry) before reading pixels.
+        cache: A :class:`~DICOM_reencoder.volume_cache.VolumeCache`, a cache directory, or ``True`` for the
+            default location. A hit copies the previously written NIfTI without reading the series.
+        refresh: Convert again and replace the cached entry even if it is still valid.
+        backend: ``native`` (streaming writer, no SimpleITK) or ``simpleitk``.
+        version: NIfTI format version for the native backend (1 or 2).
+        workers: Slice decoding and gzip threads for the native backend.
     """
-    sitk = _require_simpleitk()
     series_dir = Path(series_dir)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown NIfTI backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+    if version not in (1, 2):
+        raise ValueError("NIfTI version must be 1 or 2")
+    if backend == "simpleitk" and version != 1:
+        raise ValueError("The simpleitk backend writes NIfTI-1 only")
+
+    store = resolve_cache(cache)
+    if store is not None:
+        # GDCM scans the directory non-recursively, so its direct files define the input
+        members = [p for p in series_dir.iterdir() if p.is_file()] if series_dir.is_dir() else []
+        label = series_uid or "default"
+        fingerprint = fingerprint_files(members)
+        # Backends differ in slice selection and header details, so each caches its own output
+        variant = f"{backend}." + ("nii.gz" if compress else "nii") + ("" if version == 1 else ".v2")
+        # Preflight needs the backend's file selection, so it always takes the full path
+        cached = None if refresh or preflight else store.get_file(label, fingerprint, variant)
+        if cached is not None:
+            cached_path, meta = cached
+            meta.pop("cached_file", None)
+            output_path = _normalize_output_path(series_dir, output, meta["series_uid"], compress)
+            shutil.copyfile(cached_path, output_path)
+            meta["output"] = str(output_path)
+            _write_metadata(metadata_path, meta)
+            return output_path, meta
+
+    if backend == "native":
+        meta = _convert_native(series_dir, series_uid, output, compress, preflight, version, workers)
+    else:
+        meta = _convert_simpleitk(series_dir, series_uid, output, compress, preflight)
+    meta["backend"] = backend
+    output_path = Path(meta["output"])
+
+    if store is not None:
+        try:
+            store.put_file(label, fingerprint, variant, output_path, meta)
+        except OSError as exc:
+            logger.warning("Could not write NIfTI cache entry: %s", exc)
+
+    _write_metadata(metadata_path, meta)
+    return output_path, meta
+
+
+def _convert_simpleitk(series_dir: Path, series_uid: str | None, output: str | None, compress: bool,
+                       preflight: bool) -> dict:
+    sitk = _require_simpleitk()
 
     reader = sitk.ImageSeriesReader()
     series_ids: Iterable[str] = reader.GetGDCMSeriesIDs(str(series_dir)) or []
-    series_ids = list(series_ids)
-    if not series_ids:
-        raise RuntimeError(f"No DICOM series found in {series_dir}")
-
-    target_uid = series_uid or series_ids[0]
-    if target_uid not in series_ids:
-        found = ", ".join(series_ids)
-        raise RuntimeError(f"Series UID {target_uid} not found in {series_dir}. Available: {found}")
+    target_uid = _select_series(list(series_ids), series_uid, series_dir)
 
     # Let SimpleITK decide ordering to honor slice spacing/orientation
     file_names = reader.GetGDCMSeriesFileNames(str(series_dir), target_uid)
+    if preflight:
+        check_series(file_names, series_uid=target_uid)
     reader.SetFileNames(file_names)
     image = reader.Execute()
 
-    output_path = _normalize_output_path(series_dir, output, target_uid)
+    output_path = _normalize_output_path(series_dir, output, target_uid, compress)
     sitk.WriteImage(image, str(output_path), useCompression=compress)
 
-    meta = {
+    return {
         "series_uid": target_uid,
         "files": list(file_names),
         "size": list(image.GetSize()),
@@ -89,20 +187,66 @@ def convert_series_to_nifti(series_dir: Path, *, series_uid: str | None = None,
         "compress": bool(compress),
     }
 
+
+def _convert_native(series_dir: Path, series_uid: str | None, output: str | None, compress: bool, preflight: bool,
+                    version: int, workers: Optional[int]) -> dict:
+    from .nifti_writer import is_compressed_path, write_series_nifti
+
+    groups = group_series_files(series_dir, workers)
+    target_uid = _select_series(list(groups), series_uid, series_dir)
+    if preflight:
+        check_series(groups[target_uid], series_uid=target_uid)
+
+    # Like ITK, the file name decides whether the stream is gzipped
+    output_path = _normalize_output_path(series_dir, output, target_uid, compress)
+    output_path, plan = write_series_nifti(groups[target_uid], output_path, version=version, workers=workers,
+                                           decode_workers=workers)
+
+    # Report geometry the way SimpleITK does: LPS origin, column spacing first, row-major direction
+    columns = np.array(plan.affine[:3, :3], dtype=float)
+    spacing = np.linalg.norm(columns, axis=0)
+    if spacing[2] == 0:
+        columns[:, 2] = np.cross(columns[:, 0], columns[:, 1]) / (spacing[0] * spacing[1])
+        spacing[2] = 1.0
+    direction = columns / spacing
+    return {
+        "series_uid": target_uid,
+        "files": [str(path) for path in plan.paths],
+        "size": [int(plan.plane_shape[1]), int(plan.plane_shape[0]), len(plan.paths)],
+        "spacing": [float(v) for v in spacing],
+        "origin": [float(v) for v in plan.affine[:3, 3]],
+        "direction": [float(v) for v in direction.ravel()],
+        "output": str(output_path),
+        "compress": is_compressed_path(output_path),
+        "version": version,
+    }
+
+
+def _write_metadata(metadata_path: str | None, meta: dict) -> None:
     if metadata_path:
         Path(metadata_path).parent.mkdir(parents=True, exist_ok=True)
         Path(metadata_path).write_text(json.dumps(meta, indent=2), encoding="utf-8")
 
-    return output_path, meta
-
 
 def main() -> None:
-    parser = argparse.ArgumentParser(description="Convert a DICOM series directory to NIfTI using SimpleITK")
+    parser = argparse.ArgumentParser(description="Convert a DICOM series directory to NIfTI")
     parser.add_argument("directory", help="Directory containing the DICOM series")
     parser.add_argument("-o", "--output", help="Output NIfTI path (.nii or .nii.gz)")
     parser.add_argument("--series-uid", help="Specific SeriesInstanceUID to export (if multiple series exist)")
     parser.add_argument("--no-compress", action="store_true", help="Disable gzip compression for output NIfTI")
     parser.add_argument("--metadata", help="Optional path to write JSON metadata about the export")
+    parser.add_argument("--preflight", action="store_true",
+                        help="Check the series for duplicates, gaps and mixed geometry before reading pixels")
+    parser.add_argument("--backend", choices=BACKENDS, default="native",
+                        help="native streaming writer (default) or SimpleITK's series reader/writer")
+    parser.add_argument("--nifti-version", type=int, choices=(1, 2), default=1,
+                        help="NIfTI format version (native backend)")
+    parser.add_argument("--workers", type=int, help="Slice decoding and gzip threads (native backend)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse and store results in the persistent volume cache (off by default; LRU, 10G budget)")
+    parser.add_argument("--no-cache", dest="cache", action="store_false", help="Do not use the volume cache (default)")
+    parser.add_argument("--refresh", action="store_true", help="Convert again and replace the cache entry")
+    parser.add_argument("--cache-dir", help="Volume cache directory (default: $DICOM_TOOLS_CACHE_DIR or ~/.cache)")
     args = parser.parse_args()
 
     try:
@@ -112,6 +256,12 @@ def main() -> None:
             output=args.output,
             compress=not args.no_compress,
             metadata_path=args.metadata,
+            preflight=args.preflight,
+            cache=VolumeCache(args.cache_dir) if args.cache else None,
+            refresh=args.refresh,
+            backend=args.backend,
+            version=args.nifti_version,
+            workers=args.workers,
         )
         print(f"NIfTI written to {output_path}")
         print(json.dumps(meta, indent=2))
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+#
+# storage_scp.py
+# Dicom-Tools-py
+#
+# Standalone Storage SCP that writes received instances raw, with backpressure, counters and hooks.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Production Storage SCP (``dicom-storescp``).
+
+Accepts every storage SOP class (plus Verification) with a configurable set of
+transfer syntaxes (a UID list or a ``core.negotiation`` policy, whose order is
+the preference applied when a peer proposes several) and writes instances through ``StorageWriter``'s raw fast
+path, organized as ``<StudyInstanceUID>/<SeriesInstanceUID>/<SOP>.dcm`` by
+default. Load is bounded at two points:
+
+* ``max_associations`` caps concurrent associations; pynetdicom rejects extra
+  peers with a transient "local limit exceeded" reason so they can retry later.
+* ``queue_size`` caps instances waiting for the disk. When the writer falls
+  behind, C-STORE handlers block and TCP flow control slows the senders.
+
+Each association records the instances and bytes it received and its
+throughput. Written files can be fed to downstream pipelines (indexing,
+anonymization, ...) through ``hooks``, callables run on their own thread so a
+slow hook only delays the disk queue, never the network:
+
+    with StorageSCP("incoming", port=11112, hooks=[index.add]) as scp:
+        ...
+        print(scp.stats())
+"""
+
+import argparse
+import logging
+import queue
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from pynetdicom import AE, ALL_TRANSFER_SYNTAXES, AllStoragePresentationContexts, DEFAULT_TRANSFER_SYNTAXES, evt
+from pynetdicom.sop_class import Verification
+
+from .core.negotiation import POLICIES
+from .core.network import pick_free_port
+from .storage_writer import FSYNC_POLICIES, LAYOUTS, StorageWriter
+
+logger = logging.getLogger(__name__)
+
+TRANSFER_SYNTAX_SETS = {
+    "uncompressed": list(DEFAULT_TRANSFER_SYNTAXES),
+    "all": list(ALL_TRANSFER_SYNTAXES),
+    **{name: list(syntaxes) for name, syntaxes in POLICIES.items()},
+}
+
+Hook = Callable[[Path], None]
+_STOP = object()
+
+
+@dataclass
+class AssociationCounters:
+    """Traffic received on one association."""
+
+    calling_aet: str
+    address: str
+    started: float
+    ended: Optional[float] = None
+    instances: int = 0
+    bytes: int = 0
+    status: str = "active"
+
+    @property
+    def elapsed(self) -> float:
+        return (self.ended or time.monotonic()) - self.started
+
+    def to_dict(self) -> dict:
+        elapsed = self.elapsed
+        return {
+            "calling_aet": self.calling_aet,
+            "address": self.address,
+            "status": self.status,
+            "instances": self.instances,
+            "bytes": self.bytes,
+            "seconds": round(elapsed, 3),
+            "instances_per_s": round(self.instances / elapsed, 2) if elapsed > 0 else 0.0,
+            "mb_per_s": round(self.bytes / elapsed / 1e6, 2) if elapsed > 0 else 0.0,
+        }
+
+
+def resolve_transfer_syntaxes(spec: Union[str, Sequence[str]]) -> List[str]:
+    """A named set (``uncompressed``, ``all`` or a policy), or explicit UIDs (a list or comma-separated string)."""
+    if isinstance(spec, str):
+        if spec in TRANSFER_SYNTAX_SETS:
+            return list(TRANSFER_SYNTAX_SETS[spec])
+        spec = [uid.strip() for uid in spec.split(",") if uid.strip()]
+    if not spec:
+        raise ValueError("At least one transfer syntax is required")
+    return list(spec)
+
+
+def command_hook(command: str) -> Hook:
+    """Hook running ``command`` per file; ``{}`` is replaced by the path, else the path is appended."""
+    template = shlex.split(command)
+
+    def run(path: Path) -> None:
+        args = [part.replace("{}", str(path)) for part in template]
+        if "{}" not in command:
+            args.append(str(path))
+        subprocess.run(args, check=True)
+
+    return run
+
+
+class StorageSCP:
+    """Storage SCP service writing raw instances through a bounded writer queue."""
+
+    def __init__(self, output_dir: Union[str, Path], *, host: str = "0.0.0.0", port: Optional[int] = None,
+                 ae_title: str = "DICOMTOOLS_SCP", transfer_syntaxes: Union[str, Sequence[str]] = "uncompressed",
+                 max_associations: int = 10, queue_size: int = 256, layout: str = "series", fsync: str = "batch",
+                 hooks: Sequence[Hook] = (), hook_queue_size: int = 1024, history: int = 100,
+                 max_pdu: Optional[int] = None):
+        """
+        Args:
+            output_dir: Root directory for received files.
+            port: Listening port; a free one is picked when omitted.
+            transfer_syntaxes: ``uncompressed``, ``all``, ``native``, ``lossless``, ``lossy`` or explicit UIDs
+                accepted for every storage class, in order of preference.
+            max_associations: Concurrent associations before new ones are rejected.
+            queue_size: Instances waiting for the disk before C-STORE handlers block.
+            layout, fsync: ``StorageWriter`` options.
+            hooks: Callables receiving each written path, run on a dedicated thread.
+            history: Finished associations kept for ``stats()``.
+            max_pdu: Largest PDU peers may send (0 for unlimited); pynetdicom's 16382 by default.
+        """
+        self.output_dir = Path(output_dir)
+        self.host = host
+        self.port = port or pick_free_port()
+        self.ae_title = ae_title
+        self.transfer_syntaxes = resolve_transfer_syntaxes(transfer_syntaxes)
+        self.hooks = list(hooks)
+        self._ae = AE(ae_title=ae_title)
+        self._ae.maximum_associations = max_associations
+        if max_pdu is not None:
+            self._ae.maximum_pdu_size = max_pdu
+        for context in AllStoragePresentationContexts:
+            self._ae.add_supported_context(context.abstract_syntax, self.transfer_syntaxes)
+        self._ae.add_supported_context(Verification)
+        self._writer = StorageWriter(self.output_dir, layout=layout, fsync=fsync, queue_size=queue_size,
+                                     on_written=self._written if self.hooks else None)
+        self._hook_queue: "queue.Queue" = queue.Queue(maxsize=hook_queue_size)
+        self._hook_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._active: Dict[object, AssociationCounters] = {}
+        self._finished: deque = deque(maxlen=history)
+        self._totals = {"associations": 0, "instances": 0, "bytes": 0, "hook_errors": 0}
+        self._server = None
+        self._started = time.monotonic()
+
+    # Event handlers -----------------------------------------------------------------------------
+
+    def _accepted(self, event) -> None:
+        requestor = event.assoc.requestor
+        counters = AssociationCounters(calling_aet=str(requestor.ae_title).strip(),
+                                       address=f"{requestor.address}:{requestor.port}", started=time.monotonic())
+        with self._lock:
+            self._active[event.assoc] = counters
+            self._totals["associations"] += 1
+        self._writer.syntaxes.record_association(event.assoc)
+
+    def _ended(self, event, status: str) -> None:
+        with self._lock:
+            counters = self._active.pop(event.assoc, None)
+            if counters is None:
+                return
+            counters.ended = time.monotonic()
+            counters.status = status
+            self._finished.append(counters)
+        summary = counters.to_dict()
+        logger.info("Association from %s (%s) %s: %d instance(s), %.2f MB/s", summary["calling_aet"],
+                    summary["address"], status, summary["instances"], summary["mb_per_s"])
+
+    def handle_store(self, event) -> int:
+        """EVT_C_STORE handler: count the instance against its association and queue it raw."""
+        size = event.request.DataSet.getbuffer().nbytes
+        status = self._writer.handle_store(event)
+        if status == 0x0000:
+            with self._lock:
+                counters = self._active.get(event.assoc)
+                if counters is not None:
+                    counters.instances += 1
+                    counters.bytes += size
+                self._totals["instances"] += 1
+                self._totals["bytes"] += size
+        return status
+
+    # Hooks --------------------------------------------------------------------------------------
+
+    def _written(self, path: Path) -> None:
+        # Called on the writer thread; a full hook queue slows the writer, which in turn slows C-STORE
+        self._hook_queue.put(path)
+
+    def _run_hooks(self) -> None:
+        while True:
+            path = self._hook_queue.get()
+            if path is _STOP:
+                return
+            for hook in self.hooks:
+                try:
+                    hook(path)
+                except Exception:  # noqa: BLE001 - a failing hook must not stop ingest
+                    logger.exception("Hook %r failed for %s", hook, path)
+                    with self._lock:
+                        self._totals["hook_errors"] += 1
+
+    # Lifecycle ----------------------------------------------------------------------------------
+
+    @property
+    def handlers(self) -> list:
+        return [
+            (evt.EVT_C_STORE, self.handle_store),
+            (evt.EVT_ACCEPTED, self._accepted),
+            (evt.EVT_RELEASED, lambda event: self._ended(event, "released")),
+            (evt.EVT_ABORTED, lambda event: self._ended(event, "aborted")),
+        ]
+
+    def start(self, block: bool = False):
+        """Start listening; with ``block=True`` serve until interrupted."""
+        if self.hooks and self._hook_thread is None:
+            self._hook_thread = threading.Thread(target=self._run_hooks, name="dicom-storescp-hooks", daemon=True)
+            self._hook_thread.start()
+        self._started = time.monotonic()
+        if block:
+            self._ae.start_server((self.host, self.port), block=True, evt_handlers=self.handlers)
+            return None
+        self._server = self._ae.start_server((self.host, self.port), block=False, evt_handlers=self.handlers)
+        return self._server
+
+    def stop(self) -> None:
+        """Stop accepting, then flush the writer queue and the hooks."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+        self._ae.shutdown()
+        self._writer.close()
+        self._writer.syntaxes.log(logger)
+        if self._hook_thread is not None:
+            self._hook_queue.put(_STOP)
+            self._hook_thread.join()
+            self._hook_thread = None
+
+    def __enter__(self) -> "StorageSCP":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def stats(self) -> dict:
+        """Totals, writer and per-transfer-syntax counters, and per-association counters (active and recent)."""
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            totals = dict(self._totals)
+            active = [counters.to_dict() for counters in self._active.values()]
+            finished = [counters.to_dict() for counters in self._finished]
+        totals["mb_per_s"] = round(totals["bytes"] / elapsed / 1e6, 2) if elapsed > 0 else 0.0
+        return {**totals, "writer": dict(self._writer.stats), "transfer_syntaxes": self._writer.syntaxes.summary(),
+                "active": active, "finished": finished}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Storage SCP that writes received instances raw, organized by study/series",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Receive into ./incoming on port 11112
+  %(prog)s -o ./incoming
+
+  # Accept compressed syntaxes too and index every file as it lands
+  %(prog)s -o ./incoming --transfer-syntaxes all --exec "my-indexer add {}"
+
+  # Prefer compressed lossless when the sender offers it, keeping files as received
+  %(prog)s -o ./incoming --transfer-syntaxes lossless
+        """,
+    )
+    parser.add_argument("-o", "--output-dir", default="./dicom_received", help="Output directory")
+    parser.add_argument("--host", default="0.0.0.0", help="Listen address (default: 0.0.0.0)")
+    parser.add_argument("-p", "--port", type=int, default=11112, help="Listen port (default: 11112)")
+    parser.add_argument("--aet", default="DICOMTOOLS_SCP", help="AE Title (default: DICOMTOOLS_SCP)")
+    parser.add_argument("--transfer-syntaxes", default="uncompressed",
+                        help="uncompressed, all, a policy (native, lossless, lossy) or comma-separated "
+                             "transfer syntax UIDs in order of preference (default: uncompressed)")
+    parser.add_argument("--max-associations", type=int, default=10,
+                        help="Concurrent associations before new ones are rejected (default: 10)")
+    parser.add_argument("--queue-size", type=int, default=256,
+                        help="Instances buffered for the disk before senders are slowed (default: 256)")
+    parser.add_argument("--layout", choices=LAYOUTS, default="series", help="File layout (default: series)")
+    parser.add_argument("--fsync", choices=FSYNC_POLICIES, default="batch", help="fsync policy (default: batch)")
+    parser.add_argument("--exec", dest="commands", action="append", default=[],
+                        help="Command run for each written file ({} is replaced by the path); repeatable")
+    parser.add_argument("--debug", action="store_true", help="Enable pynetdicom debug logging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.debug:
+        from pynetdicom import debug_logger
+
+        debug_logger()
+
+    scp = StorageSCP(args.output_dir, host=args.host, port=args.port, ae_title=args.aet,
+                     transfer_syntaxes=args.transfer_syntaxes, max_associations=args.max_associations,
+                     queue_size=args.queue_size, layout=args.layout, fsync=args.fsync,
+                     hooks=[command_hook(command) for command in args.commands])
+    print(f"Storage SCP {args.aet} listening on {args.host}:{scp.port}, writing to {args.output_dir}")
+    try:
+        scp.start(block=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scp.stop()
+        stats = scp.stats()
+        print(f"Received {stats['instances']} instance(s), {stats['bytes'] / 1e6:.1f} MB "
+              f"over {stats['associations']} association(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
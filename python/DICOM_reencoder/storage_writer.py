@@ -0,0 +1,318 @@
+#
+# storage_writer.py
+# Dicom-Tools-py
+#
+# Writes received C-STORE instances to disk as raw bytes on a background writer thread.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Raw-write storage for C-STORE handlers.
+
+The classic handler reads ``event.dataset`` (decoding every element) and then
+``save_as`` re-encodes it all. ``StorageWriter.handle_store`` skips both: it
+encodes only the File Meta header and queues it with the received dataset bytes,
+exactly as the peer sent them (original transfer syntax included). A writer
+thread drains the queue so the DIMSE loop never waits on disk I/O unless the
+queue is full, which throttles a peer faster than the disk:
+
+    with StorageWriter("incoming", layout="series", fsync="batch") as writer:
+        handlers = [(evt.EVT_C_STORE, writer.handle_store)]
+        ...
+
+File names come from the request's Affected SOP Instance UID. The ``series``
+layout also needs the Study/Series Instance UIDs, which are read from the raw
+bytes by a partial parse that stops after (0020,000E). A value that is not a
+plain UID (digits and dots, at most 64 characters) is replaced by a hashed
+``unknown-...`` name, so a peer cannot steer files outside ``output_dir``. Files are written to a
+``.part`` sibling and renamed when complete (a retransmitted instance replaces
+the earlier copy). ``fsync`` chooses durability:
+``none`` leaves flushing to the OS, ``always`` syncs every file before it is
+renamed, and ``batch`` syncs groups of ``fsync_every`` files (or whatever
+arrived within ``fsync_interval`` seconds) together. A batch that fails to sync
+is discarded and counted in ``stats["errors"]``; once the writer is closed (or
+its thread has stopped) ``handle_store`` answers 0xA700 (out of resources).
+``syntaxes`` counts the received instances and bytes per transfer syntax.
+"""
+
+import contextlib
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, List, Optional, Set, Tuple, Union
+
+from pydicom.filebase import DicomBytesIO
+from pydicom.filereader import read_dataset
+from pydicom.filewriter import write_file_meta_info
+from pydicom.uid import UID
+
+from .core.negotiation import TransferSyntaxStats
+
+logger = logging.getLogger(__name__)
+
+LAYOUTS = ("flat", "series")
+FSYNC_POLICIES = ("none", "batch", "always")
+PREAMBLE = b"\x00" * 128 + b"DICM"
+SERIES_UID_TAG = 0x0020000E
+UNKNOWN = "unknown"
+# Digits and dots only, starting with a digit so "." and ".." never pass
+UID_PATTERN = re.compile(r"[0-9][0-9.]{0,63}")
+
+_STOP = object()
+
+
+@dataclass
+class _Instance:
+    sop_instance_uid: str
+    transfer_syntax: UID
+    header: bytes
+    body: memoryview
+
+
+def encode_header(file_meta) -> bytes:
+    """Preamble, DICM prefix and encoded File Meta Information for a Part 10 file."""
+    buffer = DicomBytesIO()
+    write_file_meta_info(buffer, file_meta, enforce_standard=True)
+    return PREAMBLE + buffer.getvalue()
+
+
+def path_component(uid) -> str:
+    """``uid`` when it is a well-formed UID, otherwise a name that cannot leave its directory."""
+    value = str(uid or "")
+    if UID_PATTERN.fullmatch(value):
+        return value
+    if not value:
+        return UNKNOWN
+    # Peers control these values: never let "..", separators or oversized names reach the path
+    return f"{UNKNOWN}-{hashlib.sha1(value.encode('utf-8', 'surrogateescape')).hexdigest()[:16]}"
+
+
+def read_series_uids(body: Union[bytes, memoryview], transfer_syntax: UID) -> Tuple[str, str]:
+    """Study and Series directory names (see ``path_component``) from encoded bytes, parsing up to (0020,000E)."""
+    transfer_syntax = UID(transfer_syntax)
+    try:
+        if transfer_syntax.is_deflated:
+            # Inflate just the start of the stream; the identifying groups come first
+            body = zlib.decompressobj(-zlib.MAX_WBITS).decompress(bytes(body[:1 << 16]), 1 << 16)
+        ds = read_dataset(BytesIO(body), transfer_syntax.is_implicit_VR, transfer_syntax.is_little_endian,
+                          stop_when=lambda tag, vr, length: tag > SERIES_UID_TAG)
+        return path_component(ds.get("StudyInstanceUID")), path_component(ds.get("SeriesInstanceUID"))
+    except Exception:  # noqa: BLE001 - naming must never fail the store
+        return UNKNOWN, UNKNOWN
+
+
+class StorageWriter:
+    """Queue received instances and write them to ``output_dir`` from a background thread."""
+
+    def __init__(self, output_dir: Union[str, Path], *, layout: str = "flat", fsync: str = "batch",
+                 fsync_every: int = 64, fsync_interval: float = 1.0, queue_size: int = 256,
+                 buffer_size: int = 1 << 20, on_written: Optional[Callable[[Path], None]] = None,
+                 syntaxes: Optional[TransferSyntaxStats] = None):
+        """
+        Args:
+            output_dir: Root directory for received files.
+            layout: ``flat`` (``<SOPInstanceUID>.dcm``) or ``series`` (``<Study>/<Series>/<SOP>.dcm``).
+            fsync: ``none``, ``batch`` or ``always`` (see module docstring).
+            fsync_every: Files per batched fsync.
+            fsync_interval: Longest a batched file waits for its fsync, in seconds.
+            queue_size: Instances buffered before ``handle_store`` blocks the association.
+            buffer_size: Buffer of each file writer.
+            on_written: Called from the writer thread with each final path.
+            syntaxes: Shared per-transfer-syntax counters (a new set by default).
+        """
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unsupported layout: {layout}")
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unsupported fsync policy: {fsync}")
+        self.output_dir = Path(output_dir)
+        self.layout = layout
+        self.fsync = fsync
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval
+        self.buffer_size = buffer_size
+        self.on_written = on_written
+        self.stats = {"received": 0, "written": 0, "bytes": 0, "errors": 0, "fsyncs": 0}
+        self.syntaxes = syntaxes if syntaxes is not None else TransferSyntaxStats()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._dirs: Set[Path] = set()
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="dicom-storage-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "StorageWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def handle_store(self, event) -> int:
+        """EVT_C_STORE handler: queue the raw instance and acknowledge without decoding it."""
+        if self._closed or not self._thread.is_alive():
+            # Out of resources: the writer has been shut down
+            return 0xA700
+        request = event.request
+        file_meta = event.file_meta
+        instance = _Instance(
+            sop_instance_uid=str(request.AffectedSOPInstanceUID),
+            transfer_syntax=UID(file_meta.TransferSyntaxUID),
+            header=encode_header(file_meta),
+            body=request.DataSet.getbuffer(),
+        )
+        while True:
+            try:
+                self._queue.put(instance, timeout=1.0)
+                break
+            except queue.Full:
+                # A full queue throttles the peer; a dead writer would never drain it
+                if not self._thread.is_alive():
+                    return 0xA700
+        with self._lock:
+            self.stats["received"] += 1
+        self.syntaxes.record(instance.transfer_syntax, instance.body.nbytes)
+        return 0x0000
+
+    def _path_for(self, instance: _Instance) -> Path:
+        name = f"{path_component(instance.sop_instance_uid)}.dcm"
+        if self.layout == "series":
+            study, series = read_series_uids(instance.body, instance.transfer_syntax)
+            return self.output_dir / study / series / name
+        return self.output_dir / name
+
+    def _directory(self, directory: Path) -> None:
+        # Each directory is created once; repeated makedirs calls cost a stat per instance
+        if directory not in self._dirs:
+            if not directory.resolve().is_relative_to(self.output_dir.resolve()):
+                raise ValueError(f"Refusing to write outside {self.output_dir}: {directory}")
+            directory.mkdir(parents=True, exist_ok=True)
+            self._dirs.add(directory)
+
+    def _write(self, instance: _Instance, pending: List[tuple]) -> None:
+        path = self._path_for(instance)
+        # A sequence number keeps retransmitted instances in one batch from sharing a temporary file
+        self._sequence += 1
+        part = path.with_name(f"{path.name}.{self._sequence}.part")
+        try:
+            self._directory(path.parent)
+            handle = open(part, "wb", buffering=self.buffer_size)
+            try:
+                handle.write(instance.header)
+                handle.write(instance.body)
+                if self.fsync == "none":
+                    handle.close()
+                else:
+                    handle.flush()
+            except BaseException:
+                handle.close()
+                raise
+        except (OSError, ValueError) as exc:
+            logger.error("Failed to write %s: %s", path, exc)
+            with self._lock:
+                self.stats["errors"] += 1
+            part.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self.stats["bytes"] += len(instance.header) + instance.body.nbytes
+        if self.fsync == "none":
+            self._finish([(None, part, path)])
+        else:
+            pending.append((handle, part, path))
+            if self.fsync == "always":
+                self._flush(pending)
+
+    def _sync(self, pending: List[tuple]) -> None:
+        """fsync, close and rename a batch of written files, then sync their directories once."""
+        for handle, _, _ in pending:
+            try:
+                os.fsync(handle.fileno())
+            finally:
+                handle.close()
+        self._finish(pending)
+        for directory in {path.parent for _, _, path in pending}:
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            except OSError:
+                pass  # Not every platform can fsync a directory
+            finally:
+                os.close(fd)
+        with self._lock:
+            self.stats["fsyncs"] += 1
+        pending.clear()
+
+    def _flush(self, pending: List[tuple]) -> None:
+        """``_sync`` a batch; if that fails, drop its temporary files so none are left open or behind."""
+        try:
+            self._sync(pending)
+        except Exception:  # noqa: BLE001 - a failed batch must not stop the writer thread
+            logger.exception("Failed to sync %d file(s); discarding them", len(pending))
+            for handle, part, _ in pending:
+                if not part.exists():
+                    continue  # Renamed before the failure
+                with self._lock:
+                    self.stats["errors"] += 1
+                # The handle is closed even when flushing it fails
+                with contextlib.suppress(OSError):
+                    handle.close()
+                with contextlib.suppress(OSError):
+                    part.unlink()
+            pending.clear()
+
+    def _finish(self, entries: List[tuple]) -> None:
+        for _, part, path in entries:
+            os.replace(part, path)
+            with self._lock:
+                self.stats["written"] += 1
+            if self.on_written:
+                self.on_written(path)
+
+    def _run(self) -> None:
+        pending: List[tuple] = []
+        oldest = 0.0
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, oldest + self.fsync_interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush(pending)
+                continue
+            try:
+                if item is _STOP:
+                    if pending:
+                        self._flush(pending)
+                    return
+                if not pending:
+                    oldest = time.monotonic()
+                self._write(item, pending)
+                if pending and (len(pending) >= self.fsync_every
+                                or time.monotonic() - oldest >= self.fsync_interval):
+                    self._flush(pending)
+            except Exception:  # noqa: BLE001 - keep draining so the association never blocks forever
+                logger.exception("Storage writer failed")
+                with self._lock:
+                    self.stats["errors"] += 1
+            finally:
+                self._queue.task_done()
+
+    def drain(self) -> None:
+        """Block until every queued instance has been written (batched fsyncs may still be pending)."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Write everything still queued, sync pending batches and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
@@ -13,25 +13,55 @@ This script checks DICOM files for proper structure, required tags,
 and data integrity.
 """
 
-from typing import Optional
+from typing import Iterable, List, Optional
 
 import pydicom
 import sys
 import os
 
+from .core.streaming import can_splice
+from .validation_rules import (
+    Finding,
+    Rule,
+    RuleContext,
+    RuleEngine,
+    is_valid_dicom_date,
+    is_valid_dicom_time,
+    read_pixel_layout,
+)
+
+# "header" checks Pixel Data structure without decoding; "full" also decompresses it
+VALIDATION_LEVELS = ("header", "full")
+
+
 class DicomValidator:
     """DICOM file validator."""
 
-    def __init__(self):
+    def __init__(self, level: str = "full", rules: Optional[Iterable[Rule]] = None):
+        if level not in VALIDATION_LEVELS:
+            raise ValueError(f"Unknown validation level '{level}'. Choose from: {', '.join(VALIDATION_LEVELS)}")
+        self.level = level
+        # Rules are compiled once and reused for every file this validator sees
+        self.engine = RuleEngine(rules)
+        self.findings: List[Finding] = []
         self.errors = []
         self.warnings = []
         self.info = []
 
     def _reset(self):
+        self.findings = []
         self.errors = []
         self.warnings = []
         self.info = []
 
+    def _record(self, finding: Finding):
+        self.findings.append(finding)
+        target = {"error": self.errors, "warning": self.warnings}.get(finding.severity, self.info)
+        target.append(finding.message)
+
+    def _add(self, rule_id: str, severity: str, message: str):
+        self._record(Finding(rule_id, severity, message))
+
     def validate_file(self, file_path, *, display: bool = True):
         """
         Validate a DICOM file.
@@ -53,27 +83,45 @@ class DicomValidator:
 
         # Check if file exists
         if not os.path.exists(file_path):
-            self.errors.append(f"File does not exist: {file_path}")
+            self._add("file.exists", "error", f"File does not exist: {file_path}")
             return False
 
         # Check file size
         file_size = os.path.getsize(file_path)
         if file_size == 0:
-            self.errors.append("File is empty")
+            self._add("file.size", "error", "File is empty")
             return False
 
-        self.info.append(f"File size: {file_size:,} bytes ({file_size/1024/1024:.2f} MB)")
+        self._add("file.size", "info", f"File size: {file_size:,} bytes ({file_size/1024/1024:.2f} MB)")
 
-        # Try to read the file
+        # Read preamble and dataset from a single open handle
+        pixel_layout = None
         try:
-            # `force=True` lets us surface more actionable errors on slightly malformed files
-            dataset = pydicom.dcmread(file_path, force=True)
+            with open(file_path, 'rb') as fp:
+                self._check_prefix(fp.read(132)[128:])
+                fp.seek(0)
+                if self.level == "header":
+                    # Only the tags the rules declare are parsed, and never Pixel Data
+                    dataset = pydicom.dcmread(fp, force=True, stop_before_pixels=True,
+                                              specific_tags=self.engine.specific_tags)
+                    if can_splice(dataset):
+                        # pydicom leaves the handle at the Pixel Data tag; only item headers are read from here
+                        pixel_layout = read_pixel_layout(fp, dataset, fp.tell(), file_size)
+                    else:
+                        # Deflated bodies have no raw offsets to walk, so parse the element instead
+                        fp.seek(0)
+                        dataset = pydicom.dcmread(fp, force=True)
+                else:
+                    # `force=True` lets us surface more actionable errors on slightly malformed files
+                    dataset = pydicom.dcmread(fp, force=True)
         except Exception as e:
-            self.errors.append(f"Failed to read DICOM file: {e}")
+            self._add("file.read", "error", f"Failed to read DICOM file: {e}")
             return False
 
-        self._validate_preamble(file_path)
-        return self.validate_dataset(dataset, file_path=file_path, display=display)
+        self._validate_contents(dataset, pixel_layout)
+        if display:
+            self._print_results()
+        return len(self.errors) == 0
 
     def validate_dataset(self, dataset: pydicom.dataset.Dataset, *, file_path: Optional[str] = None,
                          display: bool = True) -> bool:
@@ -85,220 +133,48 @@ class DicomValidator:
         if file_path:
             self._validate_preamble(file_path)
 
-        if not hasattr(dataset, 'file_meta'):
-            self.errors.append("Missing file meta information header")
-        else:
-            self._validate_file_meta(dataset.file_meta)
-
-        self._validate_required_elements(dataset)
-        self._validate_sop_class(dataset)
-        self._validate_transfer_syntax(dataset)
-
-        if 'PixelData' in dataset:
-            self._validate_pixel_data(dataset)
-
-        self._validate_uids(dataset)
-        self._validate_dates_times(dataset)
+        self._validate_contents(dataset)
 
         if display:
             self._print_results()
 
         return len(self.errors) == 0
 
+    def _validate_contents(self, dataset, pixel_layout=None):
+        """Run the rule engine; ``pixel_layout`` describes Pixel Data left on disk."""
+        context = RuleContext(level=self.level, pixel_layout=pixel_layout)
+        for finding in self.engine.evaluate(dataset, context):
+            self._record(finding)
+
+    def to_dict(self) -> dict:
+        """Structured results: findings with rule id, severity and tag."""
+        return {
+            "ok": not self.errors,
+            "findings": [finding.to_dict() for finding in self.findings],
+        }
+
     def _validate_preamble(self, file_path: str):
         try:
             with open(file_path, 'rb') as f:
                 f.read(128)
-                prefix = f.read(4)
-
-                if prefix != b'DICM':
-                    # Some writers omit the preamble; warn instead of failing to keep validation informative
-                    self.warnings.append("Missing 'DICM' prefix (file may be implicit format)")
-                else:
-                    self.info.append("✓ Valid DICOM prefix found")
-        except Exception as e:
-            self.warnings.append(f"Could not check DICOM preamble: {e}")
-
-    def _validate_file_meta(self, file_meta):
-        """Validate file meta information."""
-        # Minimal set of tags required by Part 10 to describe the encapsulated dataset
-        required_meta = [
-            'FileMetaInformationGroupLength',
-            'FileMetaInformationVersion',
-            'MediaStorageSOPClassUID',
-            'MediaStorageSOPInstanceUID',
-            'TransferSyntaxUID',
-        ]
-
-        for tag in required_meta:
-            if tag not in file_meta:
-                self.errors.append(f"Missing required file meta tag: {tag}")
-            else:
-                self.info.append(f"✓ {tag} present")
-
-    def _validate_required_elements(self, dataset):
-        """Validate required DICOM elements."""
-        # Common required Type 1 elements
-        required_elements = {
-            'SOPClassUID': 'SOP Class UID',
-            'SOPInstanceUID': 'SOP Instance UID',
-            'StudyInstanceUID': 'Study Instance UID',
-            'SeriesInstanceUID': 'Series Instance UID',
-            'Modality': 'Modality',
-        }
-
-        for tag, description in required_elements.items():
-            if tag not in dataset:
-                self.errors.append(f"Missing required element: {description} ({tag})")
-            elif not dataset.get(tag):
-                self.errors.append(f"Empty required element: {description} ({tag})")
-            else:
-                self.info.append(f"✓ {description} present")
-
-        # Type 2 elements (must be present but can be empty)
-        type2_elements = {
-            'PatientName': 'Patient Name',
-            'PatientID': 'Patient ID',
-            'StudyDate': 'Study Date',
-            'StudyTime': 'Study Time',
-        }
-
-        for tag, description in type2_elements.items():
-            if tag not in dataset:
-                self.warnings.append(f"Missing Type 2 element: {description} ({tag})")
-
-    def _validate_sop_class(self, dataset):
-        """Validate SOP Class UID."""
-        if 'SOPClassUID' in dataset:
-            sop_class_uid = dataset.SOPClassUID
-            try:
-                sop_class_name = sop_class_uid.name
-                self.info.append(f"✓ SOP Class: {sop_class_name}")
-            except AttributeError:
-                self.warnings.append(f"Unknown SOP Class UID: {sop_class_uid}")
-
-    def _validate_transfer_syntax(self, dataset):
-        """Validate transfer syntax."""
-        if hasattr(dataset, 'file_meta') and 'TransferSyntaxUID' in dataset.file_meta:
-            ts_uid = dataset.file_meta.TransferSyntaxUID
-            try:
-                ts_name = ts_uid.name
-                self.info.append(f"✓ Transfer Syntax: {ts_name}")
-
-                if hasattr(ts_uid, 'is_compressed'):
-                    if ts_uid.is_compressed:
-                        self.info.append(f"  Image is compressed")
-                    else:
-                        self.info.append(f"  Image is uncompressed")
-            except AttributeError:
-                self.warnings.append(f"Unknown Transfer Syntax UID: {ts_uid}")
-
-    def _validate_pixel_data(self, dataset):
-        """Validate pixel data."""
-        try:
-            # Check pixel data attributes
-            required_pixel_attrs = ['Rows', 'Columns', 'BitsAllocated', 'BitsStored',
-                                   'HighBit', 'PixelRepresentation', 'PhotometricInterpretation']
-
-            for attr in required_pixel_attrs:
-                if attr not in dataset:
-                    self.errors.append(f"Missing required pixel attribute: {attr}")
-
-            # Try to access pixel array
-            try:
-                # Accessing pixel_array forces decompression and reveals shape/dtype issues early
-                pixel_array = dataset.pixel_array
-                shape = pixel_array.shape
-                dtype = pixel_array.dtype
-
-                rows = dataset.get('Rows', 0)
-                cols = dataset.get('Columns', 0)
-
-                # Validate dimensions match
-                if len(shape) >= 2:
-                    actual_rows, actual_cols = shape[-2], shape[-1]
-                    if actual_rows != rows or actual_cols != cols:
-                        self.errors.append(
-                            f"Pixel array dimensions ({actual_cols}x{actual_rows}) "
-                            f"don't match metadata ({cols}x{rows})"
-                        )
-                    else:
-                        self.info.append(f"✓ Pixel data: {cols}x{rows}, dtype={dtype}")
-
-                # Check for multi-frame
-                if len(shape) > 2:
-                    frames = shape[0]
-                    self.info.append(f"  Multi-frame image: {frames} frames")
-
-            except Exception as e:
-                self.errors.append(f"Cannot read pixel array: {e}")
-
+                self._check_prefix(f.read(4))
         except Exception as e:
-            self.errors.append(f"Error validating pixel data: {e}")
-
-    def _validate_uids(self, dataset):
-        """Validate UID format and uniqueness."""
-        uid_tags = ['SOPInstanceUID', 'StudyInstanceUID', 'SeriesInstanceUID']
-
-        for tag in uid_tags:
-            if tag in dataset:
-                uid = str(dataset.get(tag))
-
-                # Check UID format (should contain only digits and dots)
-                if not all(c.isdigit() or c == '.' for c in uid):
-                    self.errors.append(f"Invalid UID format in {tag}: {uid}")
+            self._add("file.preamble", "warning", f"Could not check DICOM preamble: {e}")
 
-                # Check UID length (max 64 characters)
-                if len(uid) > 64:
-                    self.errors.append(f"UID too long in {tag}: {len(uid)} characters")
-
-                # Check for leading/trailing dots
-                if uid.startswith('.') or uid.endswith('.'):
-                    self.errors.append(f"Invalid UID (leading/trailing dot) in {tag}")
-
-    def _validate_dates_times(self, dataset):
-        """Validate date and time format."""
-        date_tags = ['StudyDate', 'SeriesDate', 'ContentDate', 'AcquisitionDate']
-        time_tags = ['StudyTime', 'SeriesTime', 'ContentTime', 'AcquisitionTime']
-
-        for tag in date_tags:
-            if tag in dataset:
-                date_str = str(dataset.get(tag))
-                if date_str and not self._is_valid_dicom_date(date_str):
-                    self.warnings.append(f"Invalid date format in {tag}: {date_str}")
-
-        for tag in time_tags:
-            if tag in dataset:
-                time_str = str(dataset.get(tag))
-                if time_str and not self._is_valid_dicom_time(time_str):
-                    self.warnings.append(f"Invalid time format in {tag}: {time_str}")
+    def _check_prefix(self, prefix: bytes):
+        if prefix != b'DICM':
+            # Some writers omit the preamble; warn instead of failing to keep validation informative
+            self._add("file.preamble", "warning", "Missing 'DICM' prefix (file may be implicit format)")
+        else:
+            self._add("file.preamble", "info", "✓ Valid DICOM prefix found")
 
     def _is_valid_dicom_date(self, date_str):
         """Check if date string is valid DICOM format (YYYYMMDD)."""
-        if len(date_str) != 8:
-            return False
-        try:
-            int(date_str)
-            year = int(date_str[:4])
-            month = int(date_str[4:6])
-            day = int(date_str[6:8])
-            return 1 <= month <= 12 and 1 <= day <= 31 and 1900 <= year <= 2100
-        except ValueError:
-            return False
+        return is_valid_dicom_date(date_str)
 
     def _is_valid_dicom_time(self, time_str):
         """Check if time string is valid DICOM format (HHMMSS.FFFFFF)."""
-        if not time_str:
-            return False
-        try:
-            parts = time_str.split('.')
-            time_part = parts[0]
-            if len(time_part) < 2:
-                return False
-            hour = int(time_part[:2])
-            return 0 <= hour <= 23
-        except (ValueError, IndexError):
-            return False
+        return is_valid_dicom_time(time_str)
 
     def _print_results(self):
         """Print validation results."""
@@ -334,16 +210,22 @@ class DicomValidator:
         print(f"{'='*80}\n")
 
 def main():
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
+    args = sys.argv[1:]
+    level = "full"
+    if "--fast" in args:
+        args.remove("--fast")
+        level = "header"
+
+    if args:
+        input_file = args[0]
     else:
-        print("Usage: dicom-validate <input_file>")
+        print("Usage: dicom-validate [--fast] <input_file>")
         if os.path.exists("1.dcm"):
             input_file = "1.dcm"
         else:
             sys.exit(1)
 
-    validator = DicomValidator()
+    validator = DicomValidator(level=level)
     is_valid = validator.validate_file(input_file)
 
     sys.exit(0 if is_valid else 1)
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+#
+# validate_series.py
+# Dicom-Tools-py
+#
+# Cross-instance consistency checks for DICOM series: duplicates, mixed geometry, and missing slices.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Validate DICOM series as a whole rather than file by file.
+
+One parallel header pass collects a compact per-instance record (dimensions,
+spacing, position, orientation) into a NumPy structured array. The checks then
+run vectorized per series: duplicate SOP Instance UIDs, mixed Rows/Columns or
+PixelSpacing, inconsistent orientation, duplicate slice positions, gaps and
+irregular spacing along the slice normal.
+"""
+
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pydicom
+
+from .batch_process import find_dicom_files
+
+PathLike = Union[str, Path]
+
+# Only these elements are parsed; everything else (and Pixel Data) is skipped
+HEADER_TAGS = [
+    "SOPInstanceUID",
+    "SeriesInstanceUID",
+    "InstanceNumber",
+    "Rows",
+    "Columns",
+    "PixelSpacing",
+    "ImagePositionPatient",
+    "ImageOrientationPatient",
+]
+
+INSTANCE_DTYPE = np.dtype([
+    ("series", "i4"),  # index into InstanceRecords.series_uids
+    ("sop_uid", "U64"),
+    ("instance_number", "i4"),
+    ("rows", "i4"),
+    ("columns", "i4"),
+    ("spacing", "f8", (2,)),
+    ("position", "f8", (3,)),
+    ("orientation", "f8", (6,)),
+])
+
+# Geometry tolerances in mm (or direction cosine units)
+POSITION_TOLERANCE = 1e-3
+SPACING_TOLERANCE = 1e-3
+ORIENTATION_TOLERANCE = 1e-3
+# Spacing deviations beyond this fraction of the median are reported
+IRREGULAR_SPACING_RTOL = 0.1
+# A step this many times the median spacing means at least one slice is missing
+GAP_FACTOR = 1.5
+# Cap the number of offending files listed per message
+MAX_LISTED = 5
+
+
+@dataclass
+class InstanceRecords:
+    """Per-instance header records for a set of files."""
+
+    records: np.ndarray
+    series_uids: List[str]
+    paths: List[Path]
+    failures: List[Tuple[Path, str]] = field(default_factory=list)
+
+
+@dataclass
+class SeriesReport:
+    """Validation outcome for one series."""
+
+    series_uid: str
+    instances: int
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+    info: List[str] = field(default_factory=list)
+    slice_spacing: Optional[float] = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def to_dict(self) -> dict:
+        return {
+            "series_uid": self.series_uid,
+            "instances": self.instances,
+            "ok": self.ok,
+            "slice_spacing": self.slice_spacing,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "info": self.info,
+        }
+
+
+def _floats(value, count: int) -> List[float]:
+    try:
+        values = [float(v) for v in value]
+    except (TypeError, ValueError):
+        return [np.nan] * count
+    return values if len(values) == count else [np.nan] * count
+
+
+def _read_instance(path: PathLike) -> Tuple[Optional[dict], Optional[str]]:
+    try:
+        ds = pydicom.dcmread(path, stop_before_pixels=True, force=True, specific_tags=HEADER_TAGS)
+    except Exception as exc:  # noqa: BLE001
+        return None, str(exc)
+
+    try:
+        instance_number = int(ds.get("InstanceNumber") or -1)
+    except (TypeError, ValueError):
+        instance_number = -1
+
+    return {
+        "series_uid": str(ds.get("SeriesInstanceUID", "") or ""),
+        "sop_uid": str(ds.get("SOPInstanceUID", "") or ""),
+        "instance_number": instance_number,
+        "rows": int(ds.get("Rows") or -1),
+        "columns": int(ds.get("Columns") or -1),
+        "spacing": _floats(ds.get("PixelSpacing"), 2),
+        "position": _floats(ds.get("ImagePositionPatient"), 3),
+        "orientation": _floats(ds.get("ImageOrientationPatient"), 6),
+    }, None
+
+
+def collect_instance_records(files: Sequence[PathLike], *, workers: Optional[int] = None) -> InstanceRecords:
+    """Read the headers of ``files`` in parallel into a structured array."""
+    files = [Path(f) for f in files]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_read_instance, files))
+
+    series_index: Dict[str, int] = {}
+    paths: List[Path] = []
+    failures: List[Tuple[Path, str]] = []
+    rows = []
+    for path, (entry, error) in zip(files, results):
+        if entry is None:
+            failures.append((path, error))
+            continue
+        series = series_index.setdefault(entry.pop("series_uid"), len(series_index))
+        rows.append((series, entry["sop_uid"], entry["instance_number"], entry["rows"], entry["columns"],
+                     entry["spacing"], entry["position"], entry["orientation"]))
+        paths.append(path)
+
+    records = np.array(rows, dtype=INSTANCE_DTYPE)
+    return InstanceRecords(records=records, series_uids=list(series_index), paths=paths, failures=failures)
+
+
+def _names(paths: Sequence[Path]) -> str:
+    listed = ", ".join(p.name for p in paths[:MAX_LISTED])
+    return listed + (f" (+{len(paths) - MAX_LISTED} more)" if len(paths) > MAX_LISTED else "")
+
+
+def _check_duplicates(report: SeriesReport, records: np.ndarray, paths: List[Path]) -> None:
+    uids, inverse, counts = np.unique(records["sop_uid"], return_inverse=True, return_counts=True)
+    for idx in np.flatnonzero((counts > 1) & (uids != "")):
+        members = [paths[i] for i in np.flatnonzero(inverse == idx)]
+        report.errors.append(f"Duplicate SOPInstanceUID {uids[idx]} in {len(members)} files: {_names(members)}")
+    if np.any(uids == ""):
+        report.errors.append(f"{int(counts[uids == ''][0])} instance(s) without SOPInstanceUID")
+
+
+def _check_dimensions(report: SeriesReport, records: np.ndarray, paths: List[Path]) -> None:
+    dims = np.stack([records["rows"], records["columns"]], axis=1)
+    unique, inverse, counts = np.unique(dims, axis=0, return_inverse=True, return_counts=True)
+    if len(unique) > 1:
+        majority = int(np.argmax(counts))
+        outliers = [paths[i] for i in np.flatnonzero(inverse.ravel() != majority)]
+        found = ", ".join(f"{c}x{r}" for r, c in unique)
+        report.errors.append(f"Mixed Rows/Columns within series ({found}); outliers: {_names(outliers)}")
+    else:
+        report.info.append(f"✓ Consistent dimensions: {unique[0][1]}x{unique[0][0]}")
+
+
+def _deviating(values: np.ndarray, tolerance: float) -> np.ndarray:
+    """Boolean mask of rows that differ from the per-column median by more than ``tolerance``."""
+    valid = ~np.isnan(values).any(axis=1)
+    mask = np.zeros(len(values), dtype=bool)
+    if valid.any():
+        reference = np.median(values[valid], axis=0)
+        mask[valid] = np.abs(values[valid] - reference).max(axis=1) > tolerance
+    return mask
+
+
+def _check_spacing_and_orientation(report: SeriesReport, records: np.ndarray, paths: List[Path]) -> None:
+    spacing_outliers = _deviating(records["spacing"], SPACING_TOLERANCE)
+    if spacing_outliers.any():
+        outliers = [paths[i] for i in np.flatnonzero(spacing_outliers)]
+        report.errors.append(f"Mixed PixelSpacing within series; outliers: {_names(outliers)}")
+
+    missing = np.isnan(records["orientation"]).any(axis=1)
+    if missing.any():
+        report.warnings.append(f"{int(missing.sum())} instance(s) without ImageOrientationPatient")
+    orientation_outliers = _deviating(records["orientation"], ORIENTATION_TOLERANCE)
+    if orientation_outliers.any():
+        outliers = [paths[i] for i in np.flatnonzero(orientation_outliers)]
+        report.errors.append(f"Inconsistent ImageOrientationPatient; outliers: {_names(outliers)}")
+
+
+def _check_positions(report: SeriesReport, records: np.ndarray, paths: List[Path]) -> None:
+    positions = records["position"]
+    missing = np.isnan(positions).any(axis=1)
+    if missing.any():
+        report.warnings.append(
+            f"{int(missing.sum())} instance(s) without ImagePositionPatient; slice order checks skipped"
+        )
+        return
+    if len(records) < 2:
+        return
+
+    orientation = records["orientation"][~np.isnan(records["orientation"]).any(axis=1)]
+    if len(orientation):
+        reference = np.median(orientation, axis=0)
+        normal = np.cross(reference[:3], reference[3:])
+    else:
+        normal = np.array([0.0, 0.0, 1.0])
+
+    # Project every slice on the normal once, then all checks work on the sorted 1D positions
+    projections = positions @ normal
+    order = np.argsort(projections, kind="stable")
+    sorted_positions = projections[order]
+    steps = np.diff(sorted_positions)
+
+    duplicates = np.flatnonzero(steps < POSITION_TOLERANCE)
+    for idx in duplicates[:MAX_LISTED]:
+        pair = [paths[order[idx]], paths[order[idx + 1]]]
+        report.errors.append(f"Duplicate slice position at {sorted_positions[idx]:.3f} mm: {_names(pair)}")
+    if len(duplicates) > MAX_LISTED:
+        report.errors.append(f"{len(duplicates) - MAX_LISTED} more duplicate slice position(s)")
+
+    distinct = steps[steps >= POSITION_TOLERANCE]
+    if not len(distinct):
+        return
+    spacing = float(np.median(distinct))
+    report.slice_spacing = spacing
+
+    gaps = np.flatnonzero(steps > GAP_FACTOR * spacing)
+    for idx in gaps:
+        missing_slices = int(round(steps[idx] / spacing)) - 1
+        report.errors.append(
+            f"Gap of {steps[idx]:.3f} mm after slice at {sorted_positions[idx]:.3f} mm "
+            f"(~{missing_slices} missing slice(s), expected spacing {spacing:.3f} mm)"
+        )
+
+    irregular = (np.abs(steps - spacing) > IRREGULAR_SPACING_RTOL * spacing) & (steps >= POSITION_TOLERANCE)
+    irregular &= steps <= GAP_FACTOR * spacing
+    if irregular.any():
+        report.warnings.append(
+            f"Irregular slice spacing at {int(irregular.sum())} position(s) "
+            f"(range {distinct.min():.3f}-{distinct.max():.3f} mm)"
+        )
+
+    if not duplicates.size and not gaps.size:
+        report.info.append(f"✓ {len(records)} slices, spacing {spacing:.3f} mm")
+
+
+def validate_records(table: InstanceRecords) -> List[SeriesReport]:
+    """Run the cross-instance checks for every series in ``table``."""
+    reports = []
+    series_column = table.records["series"]
+    for index, series_uid in enumerate(table.series_uids):
+        members = np.flatnonzero(series_column == index)
+        records = table.records[members]
+        paths = [table.paths[i] for i in members]
+        report = SeriesReport(series_uid=series_uid or "<missing SeriesInstanceUID>", instances=len(records))
+        if not series_uid:
+            report.errors.append("Instances without SeriesInstanceUID")
+
+        _check_duplicates(report, records, paths)
+        _check_dimensions(report, records, paths)
+        _check_spacing_and_orientation(report, records, paths)
+        _check_positions(report, records, paths)
+        reports.append(report)
+    return reports
+
+
+def validate_series_files(files: Sequence[PathLike], *, workers: Optional[int] = None) -> List[SeriesReport]:
+    """Collect headers for ``files`` and validate every series found."""
+    table = collect_instance_records(files, workers=workers)
+    reports = validate_records(table)
+    if table.failures:
+        unreadable = SeriesReport(series_uid="<unreadable>", instances=len(table.failures))
+        for path, error in table.failures:
+            unreadable.errors.append(f"Failed to read {path.name}: {error}")
+        reports.append(unreadable)
+    return reports
+
+
+def check_series(files: Sequence[PathLike], *, series_uid: Optional[str] = None,
+                 workers: Optional[int] = None) -> List[SeriesReport]:
+    """Raise RuntimeError if any (or the selected) series in ``files`` has errors.
+
+    Builders call this before loading pixels so inconsistent series fail in a
+    header pass instead of after the whole series has been decoded.
+    """
+    reports = validate_series_files(files, workers=workers)
+    selected = [r for r in reports if series_uid is None or r.series_uid in (series_uid, "<unreadable>")]
+    errors = [f"{report.series_uid}: {message}" for report in selected for message in report.errors]
+    if errors:
+        raise RuntimeError("Series failed preflight validation:\n  " + "\n  ".join(errors))
+    return selected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate cross-instance consistency of DICOM series")
+    parser.add_argument("directory", help="Directory containing DICOM files")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Search for DICOM files recursively")
+    parser.add_argument("--workers", type=int, help="Number of parallel header readers")
+    parser.add_argument("--json", action="store_true", help="Emit structured per-series results")
+    args = parser.parse_args()
+
+    files = find_dicom_files(args.directory, args.recursive)
+    if not files:
+        print("No DICOM files found.")
+        return 1
+
+    reports = validate_series_files(files, workers=args.workers)
+
+    if args.json:
+        print(json.dumps([report.to_dict() for report in reports], indent=2))
+    else:
+        for report in reports:
+            status = "VALID" if report.ok else "INVALID"
+            print(f"{report.series_uid} ({report.instances} instances): {status}")
+            for message in report.errors:
+                print(f"  ERROR: {message}")
+            for message in report.warnings:
+                print(f"  WARNING: {message}")
+
+    return 0 if all(report.ok for report in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
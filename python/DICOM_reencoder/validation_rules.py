@@ -0,0 +1,494 @@
+#
+# validation_rules.py
+# Dicom-Tools-py
+#
+# Rule registry and engine behind DicomValidator: declared tags, structured findings, and per-rule timing.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Pluggable validation rules.
+
+Each rule declares the keywords it reads and yields ``(severity, message, tag)``
+tuples. A :class:`RuleEngine` compiles a rule list once, exposes the union of
+declared tags so headers can be parsed with ``specific_tags``, and records call
+counts, hit counts and time spent per rule while it is applied over many
+datasets.
+
+Site profiles can add declarative rules from JSON (see :func:`rules_from_profile`).
+"""
+
+import json
+import re
+import time
+from dataclasses import asdict, dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from pydicom.datadict import tag_for_keyword
+from pydicom.dataset import Dataset
+
+from .core.streaming import PIXEL_DATA_TAG, UNDEFINED_LENGTH, iter_fragments, read_element_header
+
+SEVERITIES = ("error", "warning", "info")
+
+# (severity, message, tag keyword or None)
+RawFinding = Tuple[str, str, Optional[str]]
+PixelLayout = Tuple[int, Optional[List[Tuple[int, int]]]]
+
+
+@dataclass(frozen=True)
+class Finding:
+    """One structured validation result."""
+
+    rule_id: str
+    severity: str
+    message: str
+    tag: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class RuleContext:
+    """Per-dataset information that is not part of the dataset itself."""
+
+    level: str = "full"
+    # (length, fragments) of Pixel Data left on disk by a header-only read
+    pixel_layout: Optional[PixelLayout] = None
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A named check over a declared set of tags."""
+
+    rule_id: str
+    tags: Tuple[str, ...]
+    check: Callable[[Dataset, RuleContext], Iterable[RawFinding]]
+    description: str = ""
+
+
+@dataclass
+class RuleStats:
+    calls: int = 0
+    hits: int = 0
+    seconds: float = 0.0
+
+
+DEFAULT_RULES: List[Rule] = []
+
+
+def rule(rule_id: str, *, tags: Sequence[str] = (), registry: Optional[List[Rule]] = None):
+    """Register the decorated check function as a rule (in the default registry unless given)."""
+    def decorator(func):
+        target = DEFAULT_RULES if registry is None else registry
+        target.append(Rule(rule_id, tuple(tags), func, (func.__doc__ or "").strip()))
+        return func
+    return decorator
+
+
+class RuleEngine:
+    """Apply a compiled rule list to datasets and collect per-rule statistics."""
+
+    def __init__(self, rules: Optional[Iterable[Rule]] = None):
+        self.rules: Tuple[Rule, ...] = tuple(DEFAULT_RULES if rules is None else rules)
+        seen = set()
+        for item in self.rules:
+            if item.rule_id in seen:
+                raise ValueError(f"Duplicate rule id: {item.rule_id}")
+            seen.add(item.rule_id)
+            for keyword in item.tags:
+                if tag_for_keyword(keyword) is None:
+                    raise ValueError(f"Rule {item.rule_id} declares unknown tag keyword: {keyword}")
+
+        # Parse only what the rules look at; sorted by tag so the list is stable across runs
+        keywords = {keyword for item in self.rules for keyword in item.tags}
+        self.specific_tags: List[str] = sorted(keywords, key=tag_for_keyword)
+        self.stats: Dict[str, RuleStats] = {item.rule_id: RuleStats() for item in self.rules}
+
+    def evaluate(self, dataset: Dataset, context: Optional[RuleContext] = None) -> List[Finding]:
+        context = context or RuleContext()
+        findings: List[Finding] = []
+        for item in self.rules:
+            stats = self.stats[item.rule_id]
+            start = time.perf_counter()
+            try:
+                produced = [Finding(item.rule_id, severity, message, tag)
+                            for severity, message, tag in item.check(dataset, context)]
+            except Exception as exc:  # noqa: BLE001
+                produced = [Finding(item.rule_id, "error", f"Rule {item.rule_id} failed: {exc}")]
+            stats.seconds += time.perf_counter() - start
+            stats.calls += 1
+            stats.hits += sum(1 for finding in produced if finding.severity != "info")
+            findings.extend(produced)
+        return findings
+
+    def stats_dict(self) -> Dict[str, dict]:
+        return {rule_id: asdict(stats) for rule_id, stats in self.stats.items()}
+
+    def reset_stats(self) -> None:
+        self.stats = {item.rule_id: RuleStats() for item in self.rules}
+
+
+# -- Pixel Data layout -------------------------------------------------------
+
+
+def read_pixel_layout(fp, dataset: Dataset, offset: int, file_size: int) -> Optional[PixelLayout]:
+    """Describe the Pixel Data element at ``offset`` as ``(length, fragments)``.
+
+    ``fragments`` is None for native data, otherwise the ``(offset, length)`` of
+    every item including the Basic Offset Table. Returns None if no Pixel Data.
+    """
+    if offset >= file_size:
+        return None
+    transfer_syntax = dataset.file_meta.TransferSyntaxUID
+    little_endian = transfer_syntax.is_little_endian
+    fp.seek(offset)
+    tag, length, header_length = read_element_header(
+        fp, implicit_vr=transfer_syntax.is_implicit_VR, little_endian=little_endian
+    )
+    if tag != PIXEL_DATA_TAG:
+        return None
+    if length != UNDEFINED_LENGTH:
+        return length, None
+    return length, list(iter_fragments(fp, offset + header_length, little_endian=little_endian))
+
+
+def _pixel_layout_in_memory(dataset: Dataset) -> PixelLayout:
+    elem = dataset['PixelData']
+    transfer_syntax = getattr(getattr(dataset, 'file_meta', None), 'TransferSyntaxUID', None)
+    encapsulated = elem.is_undefined_length or bool(getattr(transfer_syntax, 'is_compressed', False))
+    value = elem.value or b''
+    if not encapsulated:
+        return len(value), None
+    return UNDEFINED_LENGTH, list(iter_fragments(BytesIO(value), 0))
+
+
+def _has_pixel_data(dataset: Dataset, context: RuleContext) -> bool:
+    return context.pixel_layout is not None or 'PixelData' in dataset
+
+
+def _frame_count(dataset: Dataset) -> int:
+    try:
+        return max(int(dataset.get('NumberOfFrames') or 1), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def is_valid_dicom_date(date_str: str) -> bool:
+    """Check if date string is valid DICOM format (YYYYMMDD)."""
+    if len(date_str) != 8:
+        return False
+    try:
+        int(date_str)
+        year = int(date_str[:4])
+        month = int(date_str[4:6])
+        day = int(date_str[6:8])
+        return 1 <= month <= 12 and 1 <= day <= 31 and 1900 <= year <= 2100
+    except ValueError:
+        return False
+
+
+def is_valid_dicom_time(time_str: str) -> bool:
+    """Check if time string is valid DICOM format (HHMMSS.FFFFFF)."""
+    if not time_str:
+        return False
+    try:
+        parts = time_str.split('.')
+        time_part = parts[0]
+        if len(time_part) < 2:
+            return False
+        hour = int(time_part[:2])
+        return 0 <= hour <= 23
+    except (ValueError, IndexError):
+        return False
+
+
+# -- Default rules -----------------------------------------------------------
+
+# Minimal set of tags required by Part 10 to describe the encapsulated dataset
+REQUIRED_FILE_META = [
+    'FileMetaInformationGroupLength',
+    'FileMetaInformationVersion',
+    'MediaStorageSOPClassUID',
+    'MediaStorageSOPInstanceUID',
+    'TransferSyntaxUID',
+]
+
+# Common required Type 1 elements
+TYPE1_ELEMENTS = {
+    'SOPClassUID': 'SOP Class UID',
+    'SOPInstanceUID': 'SOP Instance UID',
+    'StudyInstanceUID': 'Study Instance UID',
+    'SeriesInstanceUID': 'Series Instance UID',
+    'Modality': 'Modality',
+}
+
+# Type 2 elements (must be present but can be empty)
+TYPE2_ELEMENTS = {
+    'PatientName': 'Patient Name',
+    'PatientID': 'Patient ID',
+    'StudyDate': 'Study Date',
+    'StudyTime': 'Study Time',
+}
+
+REQUIRED_PIXEL_ATTRS = ['Rows', 'Columns', 'BitsAllocated', 'BitsStored',
+                        'HighBit', 'PixelRepresentation', 'PhotometricInterpretation']
+UID_TAGS = ['SOPInstanceUID', 'StudyInstanceUID', 'SeriesInstanceUID']
+DATE_TAGS = ['StudyDate', 'SeriesDate', 'ContentDate', 'AcquisitionDate']
+TIME_TAGS = ['StudyTime', 'SeriesTime', 'ContentTime', 'AcquisitionTime']
+
+
+@rule("file-meta.required")
+def check_file_meta(dataset, context):
+    """Part 10 file meta elements are present."""
+    if not hasattr(dataset, 'file_meta'):
+        yield "error", "Missing file meta information header", None
+        return
+    for tag in REQUIRED_FILE_META:
+        if tag not in dataset.file_meta:
+            yield "error", f"Missing required file meta tag: {tag}", tag
+        else:
+            yield "info", f"✓ {tag} present", tag
+
+
+@rule("element.type1", tags=list(TYPE1_ELEMENTS))
+def check_type1_elements(dataset, context):
+    """Type 1 elements are present and non-empty."""
+    for tag, description in TYPE1_ELEMENTS.items():
+        if tag not in dataset:
+            yield "error", f"Missing required element: {description} ({tag})", tag
+        elif not dataset.get(tag):
+            yield "error", f"Empty required element: {description} ({tag})", tag
+        else:
+            yield "info", f"✓ {description} present", tag
+
+
+@rule("element.type2", tags=list(TYPE2_ELEMENTS))
+def check_type2_elements(dataset, context):
+    """Type 2 elements are present."""
+    for tag, description in TYPE2_ELEMENTS.items():
+        if tag not in dataset:
+            yield "warning", f"Missing Type 2 element: {description} ({tag})", tag
+
+
+@rule("sop-class.known", tags=["SOPClassUID"])
+def check_sop_class(dataset, context):
+    """SOP Class UID is a registered UID."""
+    if 'SOPClassUID' in dataset:
+        sop_class_uid = dataset.SOPClassUID
+        try:
+            yield "info", f"✓ SOP Class: {sop_class_uid.name}", 'SOPClassUID'
+        except AttributeError:
+            yield "warning", f"Unknown SOP Class UID: {sop_class_uid}", 'SOPClassUID'
+
+
+@rule("transfer-syntax.known")
+def check_transfer_syntax(dataset, context):
+    """Transfer Syntax UID is a registered UID."""
+    if hasattr(dataset, 'file_meta') and 'TransferSyntaxUID' in dataset.file_meta:
+        ts_uid = dataset.file_meta.TransferSyntaxUID
+        try:
+            yield "info", f"✓ Transfer Syntax: {ts_uid.name}", 'TransferSyntaxUID'
+            if hasattr(ts_uid, 'is_compressed'):
+                state = "compressed" if ts_uid.is_compressed else "uncompressed"
+                yield "info", f"  Image is {state}", 'TransferSyntaxUID'
+        except AttributeError:
+            yield "warning", f"Unknown Transfer Syntax UID: {ts_uid}", 'TransferSyntaxUID'
+
+
+@rule("pixel-data.attributes", tags=REQUIRED_PIXEL_ATTRS)
+def check_pixel_attributes(dataset, context):
+    """Image Pixel module attributes accompany Pixel Data."""
+    if not _has_pixel_data(dataset, context):
+        return
+    for attr in REQUIRED_PIXEL_ATTRS:
+        if attr not in dataset:
+            yield "error", f"Missing required pixel attribute: {attr}", attr
+
+
+@rule("pixel-data.layout", tags=REQUIRED_PIXEL_ATTRS + ['NumberOfFrames', 'SamplesPerPixel'])
+def check_pixel_layout(dataset, context):
+    """Native length or encapsulated fragment structure matches the image attributes, without decoding."""
+    if not _has_pixel_data(dataset, context) or any(attr not in dataset for attr in REQUIRED_PIXEL_ATTRS):
+        return
+    try:
+        length, fragments = context.pixel_layout or _pixel_layout_in_memory(dataset)
+    except Exception as e:
+        yield "error", f"Error validating pixel data: {e}", 'PixelData'
+        return
+    if fragments is None:
+        yield from _check_native_length(dataset, length)
+    else:
+        yield from _check_fragments(dataset, fragments)
+
+
+def _check_native_length(dataset, length: int):
+    """Compare native Pixel Data length with Rows x Columns x Frames x Samples x BitsAllocated."""
+    rows, cols = int(dataset.Rows), int(dataset.Columns)
+    frames = _frame_count(dataset)
+    samples = int(dataset.get('SamplesPerPixel') or 1)
+    total_bits = rows * cols * frames * samples * int(dataset.BitsAllocated)
+    expected = (total_bits + 7) // 8
+    # Values are padded to an even length
+    padded = expected + (expected % 2)
+
+    if length < expected:
+        yield "error", f"Pixel data length ({length:,} bytes) is shorter than expected ({expected:,} bytes)", 'PixelData'
+    elif length > padded:
+        yield "warning", f"Pixel data length ({length:,} bytes) exceeds expected ({expected:,} bytes)", 'PixelData'
+    else:
+        yield "info", f"✓ Pixel data length: {length:,} bytes for {cols}x{rows}x{frames}", 'PixelData'
+
+
+def _check_fragments(dataset, fragments: List[Tuple[int, int]]):
+    """Check encapsulated item structure against the frame count without decoding."""
+    if not fragments:
+        yield "error", "Encapsulated pixel data has no Basic Offset Table item", 'PixelData'
+        return
+
+    frames = _frame_count(dataset)
+    table_length = fragments[0][1]
+    data_fragments = fragments[1:]
+
+    if not data_fragments:
+        yield "error", "Encapsulated pixel data contains no fragments", 'PixelData'
+    elif len(data_fragments) < frames:
+        yield ("error", f"Encapsulated pixel data has fewer fragments ({len(data_fragments)}) than frames ({frames})",
+               'PixelData')
+    if table_length not in (0, 4 * frames):
+        yield "warning", f"Basic Offset Table length ({table_length}) does not match {frames} frame(s)", 'PixelData'
+    if any(length % 2 for _, length in fragments):
+        yield "warning", "Encapsulated pixel data contains odd-length items", 'PixelData'
+    if data_fragments:
+        yield "info", f"✓ Encapsulated pixel data: {len(data_fragments)} fragment(s) for {frames} frame(s)", 'PixelData'
+
+
+@rule("pixel-data.decode", tags=['Rows', 'Columns'])
+def check_pixel_decode(dataset, context):
+    """Pixel Data decodes to an array matching Rows/Columns (full level only)."""
+    if context.level != "full" or 'PixelData' not in dataset:
+        return
+    try:
+        # Accessing pixel_array forces decompression and reveals shape/dtype issues early
+        pixel_array = dataset.pixel_array
+    except Exception as e:
+        yield "error", f"Cannot read pixel array: {e}", 'PixelData'
+        return
+
+    shape = pixel_array.shape
+    rows = dataset.get('Rows', 0)
+    cols = dataset.get('Columns', 0)
+
+    # Validate dimensions match
+    if len(shape) >= 2:
+        actual_rows, actual_cols = shape[-2], shape[-1]
+        if actual_rows != rows or actual_cols != cols:
+            yield ("error", f"Pixel array dimensions ({actual_cols}x{actual_rows}) "
+                            f"don't match metadata ({cols}x{rows})", 'PixelData')
+        else:
+            yield "info", f"✓ Pixel data: {cols}x{rows}, dtype={pixel_array.dtype}", 'PixelData'
+
+    # Check for multi-frame
+    if len(shape) > 2:
+        yield "info", f"  Multi-frame image: {shape[0]} frames", 'PixelData'
+
+
+@rule("uid.format", tags=UID_TAGS)
+def check_uid_format(dataset, context):
+    """UIDs use digits and dots only, fit in 64 characters and have no leading/trailing dot."""
+    for tag in UID_TAGS:
+        if tag not in dataset:
+            continue
+        uid = str(dataset.get(tag))
+
+        # Check UID format (should contain only digits and dots)
+        if not all(c.isdigit() or c == '.' for c in uid):
+            yield "error", f"Invalid UID format in {tag}: {uid}", tag
+
+        # Check UID length (max 64 characters)
+        if len(uid) > 64:
+            yield "error", f"UID too long in {tag}: {len(uid)} characters", tag
+
+        # Check for leading/trailing dots
+        if uid.startswith('.') or uid.endswith('.'):
+            yield "error", f"Invalid UID (leading/trailing dot) in {tag}", tag
+
+
+@rule("date.format", tags=DATE_TAGS)
+def check_date_format(dataset, context):
+    """DA values are YYYYMMDD."""
+    for tag in DATE_TAGS:
+        if tag in dataset:
+            date_str = str(dataset.get(tag))
+            if date_str and not is_valid_dicom_date(date_str):
+                yield "warning", f"Invalid date format in {tag}: {date_str}", tag
+
+
+@rule("time.format", tags=TIME_TAGS)
+def check_time_format(dataset, context):
+    """TM values start with a valid hour."""
+    for tag in TIME_TAGS:
+        if tag in dataset:
+            time_str = str(dataset.get(tag))
+            if time_str and not is_valid_dicom_time(time_str):
+                yield "warning", f"Invalid time format in {tag}: {time_str}", tag
+
+
+# -- Declarative site profiles ----------------------------------------------
+
+
+def _profile_check(kind: str, keyword: str, severity: str, value, message: Optional[str]):
+    if kind == "required":
+        def check(dataset, context):
+            if not dataset.get(keyword):
+                yield severity, message or f"Missing required element: {keyword}", keyword
+    elif kind == "present":
+        def check(dataset, context):
+            if keyword not in dataset:
+                yield severity, message or f"Missing element: {keyword}", keyword
+    elif kind == "pattern":
+        pattern = re.compile(value)
+
+        def check(dataset, context):
+            if keyword in dataset and not pattern.fullmatch(str(dataset.get(keyword))):
+                yield severity, message or f"{keyword} does not match {value}: {dataset.get(keyword)}", keyword
+    elif kind == "one_of":
+        allowed = {str(item) for item in value}
+
+        def check(dataset, context):
+            if keyword in dataset and str(dataset.get(keyword)) not in allowed:
+                yield severity, message or f"Unexpected value in {keyword}: {dataset.get(keyword)}", keyword
+    elif kind == "max_length":
+        def check(dataset, context):
+            if keyword in dataset and len(str(dataset.get(keyword))) > int(value):
+                yield severity, message or f"{keyword} exceeds {value} characters", keyword
+    else:
+        raise ValueError(f"Unknown profile check '{kind}'")
+    return check
+
+
+def rules_from_profile(entries: Iterable[dict]) -> List[Rule]:
+    """Compile declarative profile entries into rules.
+
+    Each entry holds ``id``, ``tag`` (keyword), ``check`` (``required``, ``present``,
+    ``pattern``, ``one_of`` or ``max_length``), an optional ``value`` for the check,
+    ``severity`` (default ``error``) and an optional ``message``.
+    """
+    rules = []
+    for entry in entries:
+        severity = entry.get("severity", "error")
+        if severity not in SEVERITIES:
+            raise ValueError(f"Unknown severity '{severity}' in rule {entry.get('id')}")
+        check = _profile_check(entry["check"], entry["tag"], severity, entry.get("value"), entry.get("message"))
+        rules.append(Rule(entry["id"], (entry["tag"],), check, entry.get("description", "")))
+    return rules
+
+
+def load_profile(path: Union[str, Path], *, include_defaults: bool = True) -> List[Rule]:
+    """Load a JSON profile (a list of entries, or ``{"rules": [...]}``) into a rule list."""
+    payload = json.loads(Path(path).read_text(encoding="utf-8"))
+    entries = payload.get("rules", []) if isinstance(payload, dict) else payload
+    return (list(DEFAULT_RULES) if include_defaults else []) + rules_from_profile(entries)
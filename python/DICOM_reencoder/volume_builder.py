@@ -3,27 +3,63 @@
 # volume_builder.py
 # Dicom-Tools-py
 #
-# Builds 3D numpy volumes and affine matrices from DICOM slices via dicom-numpy.
+# Builds 3D numpy volumes and affine matrices from DICOM slices (native assembler or dicom-numpy).
 #
 # Thales Matheus Mendonça Santos - November 2025
 
 """
-Construct a 3D volume from a directory of DICOM slices using dicom-numpy.
+Construct a 3D volume from a directory of DICOM slices.
 
-Outputs a .npy volume (z, y, x) along with an optional JSON sidecar that
-captures the affine transform, spacing, and basic statistics. This is useful
-for quickly feeding DICOM datasets into research pipelines or sanity-checking
-slice ordering.
+Outputs a .npy volume along with an optional JSON sidecar that captures the
+affine transform, spacing, and basic statistics. This is useful for quickly
+feeding DICOM datasets into research pipelines or sanity-checking slice
+ordering.
+
+The default native engine sorts slices from a header-only pass, preallocates
+the voxel array once and decodes each slice straight into its plane from a
+worker pool, releasing every Dataset as soon as its pixels are copied. It
+returns the same layout, affine and metadata as ``dicom_numpy.combine_slices``
+(axes ``(x, y, z)`` backed by contiguous ``(z, y, x)`` planes), which remains
+available as ``engine="dicom-numpy"``.
 """
 
 import argparse
+import hashlib
 import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 import numpy as np
 import pydicom
 
+from .core.parallel import default_workers
+from .functional_groups import build_enhanced_volume, is_multiframe
+from .validate_series import check_series
+from .volume_cache import VolumeCache, fingerprint_files, resolve_cache
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ("native", "dicom-numpy")
+
+# Attributes every slice must share (same set dicom-numpy enforces)
+INVARIANT_ATTRIBUTES = [
+    'Modality',
+    'SOPClassUID',
+    'SeriesInstanceUID',
+    'Rows',
+    'Columns',
+    'SamplesPerPixel',
+    'PixelSpacing',
+    'PixelRepresentation',
+    'BitsAllocated',
+]
+DICOMDIR_SOP_CLASS = '1.2.840.10008.1.3.10'
+
 
 def _require_dicom_numpy():
     try:
@@ -33,14 +69,34 @@ def _require_dicom_numpy():
     return dicom_numpy
 
 
-def _load_sorted_datasets(dicom_dir: Path) -> List[pydicom.dataset.Dataset]:
-    """Load datasets sorted by InstanceNumber (fallback to filename)."""
+def _find_slice_files(dicom_dir: Path) -> List[Path]:
     files = sorted(
         [p for p in dicom_dir.rglob("*") if p.is_file() and p.suffix.lower() in {".dcm", ""}],
         key=lambda p: p.name,
     )
     if not files:
         raise RuntimeError(f"No DICOM files found in {dicom_dir}")
+    return files
+
+
+def _preflight(files: List[Path]) -> None:
+    """Fail on cross-instance problems using a header-only pass."""
+    reports = check_series(files)
+    if len(reports) > 1:
+        found = ", ".join(report.series_uid for report in reports)
+        raise RuntimeError(f"Expected a single series, found {len(reports)}: {found}")
+
+
+def _require_single_series(datasets: Iterable[pydicom.dataset.Dataset]) -> None:
+    """Refuse to stack slices from several series (``_find_slice_files`` picks up every file below the root)."""
+    found = sorted({str(getattr(ds, "SeriesInstanceUID", "")) for ds in datasets})
+    if len(found) > 1:
+        raise RuntimeError(f"Expected a single series, found {len(found)}: {', '.join(found)}")
+
+
+def _load_sorted_datasets(dicom_dir: Path, files: List[Path] | None = None) -> List[pydicom.dataset.Dataset]:
+    """Load datasets sorted by InstanceNumber (fallback to filename)."""
+    files = files if files is not None else _find_slice_files(dicom_dir)
 
     datasets = []
     for path in files:
@@ -50,41 +106,396 @@ def _load_sorted_datasets(dicom_dir: Path) -> List[pydicom.dataset.Dataset]:
         except Exception as exc:  # noqa: BLE001
             raise RuntimeError(f"Failed to read {path}: {exc}") from exc
 
+    _require_single_series(datasets)
     # Sort slices using InstanceNumber to preserve correct anatomical order
     datasets.sort(key=lambda ds: getattr(ds, "InstanceNumber", 0))
     return datasets
 
 
-def build_volume(dicom_dir: Path) -> Tuple[np.ndarray, np.ndarray, dict]:
+@dataclass
+class VolumePlan:
+    """Everything needed to allocate and fill a volume, derived from headers only."""
+
+    paths: List[Path]  # sorted along the slice normal
+    plane_shape: Tuple[int, ...]  # (rows, columns[, samples])
+    dtype: np.dtype
+    rescale: bool
+    affine: np.ndarray
+    reference: pydicom.dataset.Dataset  # lowest InstanceNumber header, used for metadata
+    rescales: Optional[List[Tuple[float, float]]] = None  # (slope, intercept) of each path
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """Allocation shape with one contiguous plane per slice: (z, y, x[, samples])."""
+        return (len(self.paths),) + self.plane_shape
+
+
+def _read_header(path: Path) -> pydicom.dataset.Dataset:
+    try:
+        return pydicom.dcmread(path, stop_before_pixels=True, force=True)
+    except Exception as exc:  # noqa: BLE001
+        raise RuntimeError(f"Failed to read {path}: {exc}") from exc
+
+
+def _cosines(orientation) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    row_cosine = np.array(orientation[:3], dtype=float)
+    column_cosine = np.array(orientation[3:], dtype=float)
+    return row_cosine, column_cosine, np.cross(row_cosine, column_cosine)
+
+
+def _validate_grid(headers: List[pydicom.dataset.Dataset]) -> None:
+    """Raise RuntimeError unless the slices form a uniform grid, mirroring dicom-numpy's checks."""
+    first = headers[0]
+    for name in INVARIANT_ATTRIBUTES:
+        initial = getattr(first, name, None)
+        for header in headers[1:]:
+            value = getattr(header, name, None)
+            if value != initial:
+                raise RuntimeError(f'All slices must have the same value for "{name}": {value} != {initial}')
+
+    orientation = first.ImageOrientationPatient
+    row_cosine, column_cosine, _ = _cosines(orientation)
+    if not np.isclose(np.dot(row_cosine, column_cosine), 0.0, rtol=0, atol=1e-4):
+        raise RuntimeError(f"Non-orthogonal direction cosines: {row_cosine}, {column_cosine}")
+    for label, cosine in (("row", row_cosine), ("column", column_cosine)):
+        if not np.isclose(np.linalg.norm(cosine), 1.0, rtol=0, atol=1e-4):
+            raise RuntimeError(f"The {label} direction cosine's magnitude is not 1: {cosine}")
+    for header in headers[1:]:
+        if not np.allclose(header.ImageOrientationPatient, orientation, atol=1e-5):
+            raise RuntimeError('All slices must have the same value for "ImageOrientationPatient" within "1e-05"')
+
+
+def plan_volume(files: Iterable[Path], *, workers: Optional[int] = None, rescale: Optional[bool] = None,
+                enforce_slice_spacing: bool = True) -> VolumePlan:
+    """Sort slices by position along the normal and derive shape, dtype and affine without decoding pixels."""
+    files = sorted((Path(f) for f in files), key=lambda p: p.name)
+    if not files:
+        raise RuntimeError("No DICOM files to assemble")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        headers = list(pool.map(_read_header, files))
+    entries = [(path, header) for path, header in zip(files, headers)
+               if getattr(header, 'MediaStorageSOPClassUID', None) != DICOMDIR_SOP_CLASS]
+    if not entries:
+        raise RuntimeError("Must provide at least one image DICOM dataset")
+    _require_single_series(header for _, header in entries)
+
+    # Same reference slice the dicom-numpy path reports metadata from
+    reference = sorted(entries, key=lambda entry: getattr(entry[1], "InstanceNumber", 0))[0][1]
+
+    for path, header in entries:
+        if 'ImageOrientationPatient' not in header or 'ImagePositionPatient' not in header:
+            raise RuntimeError(f"{path.name} is missing ImageOrientationPatient/ImagePositionPatient")
+    _, _, slice_cosine = _cosines(entries[0][1].ImageOrientationPatient)
+    positions = [float(np.dot(slice_cosine, np.array(h.ImagePositionPatient, dtype=float))) for _, h in entries]
+    order = sorted(range(len(entries)), key=positions.__getitem__)
+    entries = [entries[i] for i in order]
+    positions = [positions[i] for i in order]
+    headers = [header for _, header in entries]
+
+    _validate_grid(headers)
+    if enforce_slice_spacing and len(positions) > 1:
+        steps = np.diff(positions)
+        if not np.allclose(steps, steps[0], atol=0, rtol=1e-5):
+            logger.warning("The slice spacing is non-uniform. Slice spacings:\n%s", steps)
+        if not np.allclose(steps, steps[0], atol=0, rtol=1e-1):
+            raise RuntimeError("It appears there are missing slices")
+
+    first = headers[0]
+    if rescale is None:
+        rescale = any(hasattr(h, 'RescaleSlope') or hasattr(h, 'RescaleIntercept') for h in headers)
+    samples = int(getattr(first, 'SamplesPerPixel', 1) or 1)
+    plane_shape = (int(first.Rows), int(first.Columns)) + ((samples,) if samples > 1 else ())
+    dtype = np.dtype(np.float32) if rescale else _pixel_dtype(first, entries[0][0])
+    rescales = [(float(getattr(h, 'RescaleSlope', 1)), float(getattr(h, 'RescaleIntercept', 0))) for h in headers]
+
+    row_cosine, column_cosine, slice_cosine = _cosines(first.ImageOrientationPatient)
+    row_spacing, column_spacing = (float(v) for v in first.PixelSpacing)
+    slice_spacing = np.median(np.diff(positions)) if len(positions) > 1 else getattr(first, 'SpacingBetweenSlices', 0)
+    affine = np.identity(4, dtype=np.float32)
+    affine[:3, 0] = row_cosine * column_spacing
+    affine[:3, 1] = column_cosine * row_spacing
+    affine[:3, 2] = slice_cosine * slice_spacing
+    affine[:3, 3] = first.ImagePositionPatient
+
+    return VolumePlan(paths=[path for path, _ in entries], plane_shape=plane_shape, dtype=dtype,
+                      rescale=bool(rescale), affine=affine, reference=reference,
+                      rescales=rescales)
+
+
+def _pixel_dtype(header: pydicom.dataset.Dataset, path: Path) -> np.dtype:
+    try:
+        from pydicom.pixels.utils import pixel_dtype
+    except ImportError:  # pydicom < 3.0
+        from pydicom.pixel_data_handlers.util import pixel_dtype
+    try:
+        return np.dtype(pixel_dtype(header))
+    except Exception:  # noqa: BLE001
+        # Unusual encodings: decode one slice to learn what pydicom will hand back
+        return pydicom.dcmread(path, force=True).pixel_array.dtype
+
+
+def _decode_slice(path: Path, rescale: bool) -> np.ndarray:
+    """Decode one slice (optionally rescaled to float32); the Dataset is dropped on return."""
+    dataset = pydicom.dcmread(path, force=True)
+    plane = dataset.pixel_array
+    if rescale:
+        slope = float(getattr(dataset, 'RescaleSlope', 1))
+        intercept = float(getattr(dataset, 'RescaleIntercept', 0))
+        plane = plane.astype(np.float32) * slope + intercept
+    return plane
+
+
+class RunningStats:
+    """Volume min/max/mean/std accumulated slice by slice (Chan et al. pairwise merge)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, plane: np.ndarray) -> None:
+        n = plane.size
+        if n == 0:
+            return
+        plane_mean = float(plane.mean(dtype=np.float64))
+        plane_m2 = float(np.square(plane - plane_mean, dtype=np.float64).sum())
+        total = self.count + n
+        delta = plane_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += plane_m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(plane.min()))
+        self.max = max(self.max, float(plane.max()))
+
+    def as_dict(self) -> dict:
+        return {
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "std": float(np.sqrt(self.m2 / self.count)) if self.count else 0.0,
+        }
+
+
+def slice_footprint(plan: VolumePlan) -> int:
+    """Approximate peak bytes held per in-flight slice (encoded bytes, decoded plane, rescaled copy)."""
+    return 3 * int(np.prod(plan.plane_shape)) * plan.dtype.itemsize
+
+
+def fill_volume(plan: VolumePlan, out: np.ndarray, *, workers: Optional[int] = None, use_processes: bool = False,
+                max_in_flight: Optional[int] = None, stats: Optional[RunningStats] = None,
+                flush_bytes: Optional[int] = None) -> np.ndarray:
+    """Decode every slice of ``plan`` into ``out[k]`` (shape ``plan.shape``).
+
+    Slices are decoded by a thread (or process) pool and written in order by the
+    caller's thread, with at most ``max_in_flight`` decoded slices held at once.
+    ``stats`` is updated as each slice lands; ``flush_bytes`` flushes memory-mapped
+    outputs after that many bytes have been written.
+    """
+    if out.shape != plan.shape:
+        raise ValueError(f"Output shape {out.shape} does not match plan {plan.shape}")
+
+    written = 0
+    for k, plane in iter_slices(plan, workers=workers, use_processes=use_processes, max_in_flight=max_in_flight):
+        out[k] = plane
+        if stats is not None:
+            stats.update(out[k])
+        written += out[k].nbytes
+        if flush_bytes and written >= flush_bytes and hasattr(out, "flush"):
+            # Push dirty pages to disk so page cache stays within the budget
+            out.flush()
+            written = 0
+    return out
+
+
+def iter_slices(plan: VolumePlan, *, workers: Optional[int] = None, use_processes: bool = False,
+                max_in_flight: Optional[int] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """Yield ``(k, plane)`` in slice order while a pool decodes up to ``max_in_flight`` slices ahead."""
+    workers = workers or ((os.cpu_count() or 1) if use_processes else default_workers())
+    window = max_in_flight or 2 * workers
+    workers = max(1, min(workers, window))
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+
+    def checked(k: int, plane: np.ndarray) -> Tuple[int, np.ndarray]:
+        if plane.shape != plan.plane_shape:
+            raise RuntimeError(f"{plan.paths[k].name}: decoded shape {plane.shape} != expected {plan.plane_shape}")
+        return k, plane
+
+    with executor_cls(max_workers=workers) as pool:
+        pending = deque()
+        for k, path in enumerate(plan.paths):
+            if len(pending) >= window:
+                index, future = pending.popleft()
+                yield checked(index, future.result())
+            pending.append((k, pool.submit(_decode_slice, path, plan.rescale)))
+        while pending:
+            index, future = pending.popleft()
+            yield checked(index, future.result())
+
+
+def assemble_volume(files: Iterable[Path], *, workers: Optional[int] = None, use_processes: bool = False,
+                    rescale: Optional[bool] = None) -> Tuple[np.ndarray, np.ndarray, VolumePlan]:
+    """Assemble slices into a volume laid out like ``dicom_numpy.combine_slices``.
+
+    Returns ``(volume, affine, plan)`` where ``volume`` has axes ``(x, y, z)`` and is a
+    transposed view of one preallocated C-ordered ``(z, y, x)`` buffer.
+    """
+    plan = plan_volume(files, workers=workers, rescale=rescale)
+    voxels = np.empty(plan.shape, dtype=plan.dtype)
+    fill_volume(plan, voxels, workers=workers, use_processes=use_processes)
+    return voxels.T, plan.affine, plan
+
+
+def _series_uid(path: Path) -> str:
+    header = pydicom.dcmread(path, stop_before_pixels=True, specific_tags=["SeriesInstanceUID"], force=True)
+    return str(getattr(header, "SeriesInstanceUID", "") or "unknown")
+
+
+def build_volume(dicom_dir: Path, *, preflight: bool = False, engine: str = "native", workers: Optional[int] = None,
+                 use_processes: bool = False, cache=None, refresh: bool = False,
+                 frames: Optional[dict] = None) -> Tuple[np.ndarray, np.ndarray, dict]:
     """
     Build a 3D numpy volume and affine matrix from a directory of DICOM slices.
 
+    A multi-frame file (or a directory holding a single one) is built from its functional
+    groups by :func:`~DICOM_reencoder.functional_groups.build_enhanced_volume`.
+
+    Args:
+        dicom_dir: Directory containing the slices, or one multi-frame file.
+        preflight: Validate the series headers (duplicates, gaps, mixed geometry) before loading pixels.
+        engine: ``"native"`` (parallel, preallocated) or ``"dicom-numpy"``.
+        workers: Worker count for the native engine.
+        use_processes: Decode slices in worker processes instead of threads (native engine).
+        cache: A :class:`~DICOM_reencoder.volume_cache.VolumeCache`, a cache directory, or ``True`` for the
+            default location. Hits return a read-only memory-mapped volume without decoding any pixels.
+        refresh: Rebuild and overwrite the cached entry even if it is still valid.
+        frames: Frame selection for multi-frame input (``stack_id``, ``temporal_position``, ``dimension``
+            or explicit ``frames`` indices).
+
     Returns:
-        volume: 3D numpy array shaped (z, y, x).
+        volume: 3D numpy array with axes (x, y, z), as produced by dicom-numpy.
         affine: 4x4 affine matrix describing voxel orientation and spacing.
         metadata: Dict with spacing, orientation, and summary statistics.
     """
-    dicom_numpy = _require_dicom_numpy()
-    datasets = _load_sorted_datasets(dicom_dir)
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown volume engine '{engine}'. Choose from: {', '.join(ENGINES)}")
+    dicom_dir = Path(dicom_dir)
+    files = [dicom_dir] if dicom_dir.is_file() else _find_slice_files(dicom_dir)
+    enhanced = len(files) == 1 and is_multiframe(files[0])
+    if preflight and not enhanced:
+        _preflight(files)
+
+    store = resolve_cache(cache)
+    if store is not None:
+        # Keyed by series identity plus file stats, so edited or added slices miss
+        series_uid, fingerprint = _series_uid(files[0]), fingerprint_files(files)
+        if frames:
+            fingerprint += "-" + hashlib.blake2b(json.dumps(frames, sort_keys=True, default=str).encode(),
+                                                 digest_size=6).hexdigest()
+        if not refresh:
+            cached = store.get_volume(series_uid, fingerprint)
+            if cached is not None:
+                return cached
+
+    if enhanced:
+        volume, affine, metadata = build_enhanced_volume(files[0], **(frames or {}))
+    elif frames:
+        raise ValueError("Frame selection requires a multi-frame file")
+    elif engine == "native":
+        try:
+            volume, affine, plan = assemble_volume(files, workers=workers, use_processes=use_processes)
+        except RuntimeError as exc:
+            raise RuntimeError(f"Failed to combine slices: {exc}") from exc
+        metadata = _volume_metadata(volume, affine, plan.reference)
+    else:
+        dicom_numpy = _require_dicom_numpy()
+        datasets = _load_sorted_datasets(dicom_dir, files)
+        try:
+            volume, affine = dicom_numpy.combine_slices(datasets)
+        except dicom_numpy.DicomImportException as exc:
+            raise RuntimeError(f"Failed to combine slices: {exc}") from exc
+        metadata = _volume_metadata(volume, affine, datasets[0])
+
+    if store is not None:
+        try:
+            store.put_volume(series_uid, fingerprint, volume, affine, metadata)
+        except OSError as exc:
+            logger.warning("Could not write volume cache entry: %s", exc)
+    return volume, affine, metadata
+
+
+def parse_size(text: str) -> int:
+    """Parse a byte count such as ``512M``, ``8G`` or ``1.5GiB`` (binary units)."""
+    units = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    value = str(text).strip().upper().removesuffix("IB").removesuffix("B")
+    suffix = value[-1] if value and value[-1] in "KMGT" else ""
+    number = value[:-1] if suffix else value
+    try:
+        return int(float(number) * units[suffix])
+    except ValueError as exc:
+        raise ValueError(f"Invalid size: {text}") from exc
+
+
+def build_volume_to_npy(dicom_dir: Path, output: Path, *, max_memory: Optional[int] = None, preflight: bool = False,
+                        workers: Optional[int] = None, use_processes: bool = False) -> Tuple[np.ndarray, np.ndarray, dict]:
+    """
+    Build a volume straight into a memory-mapped ``.npy`` file without holding it in RAM.
+
+    The file has the same layout as ``np.save`` of the in-memory volume. Statistics are
+    accumulated as slices arrive. ``max_memory`` (bytes) bounds the decoded slices in
+    flight and how much dirty page cache builds up before a flush.
 
+    Returns:
+        volume: Read/write memmap of the written file, axes (x, y, z).
+        affine: 4x4 affine matrix.
+        metadata: Same structure as :func:`build_volume`.
+    """
+    files = _find_slice_files(Path(dicom_dir))
+    if preflight:
+        _preflight(files)
     try:
-        volume, affine = dicom_numpy.combine_slices(datasets)
-    except dicom_numpy.DicomImportException as exc:
+        plan = plan_volume(files, workers=workers)
+    except RuntimeError as exc:
         raise RuntimeError(f"Failed to combine slices: {exc}") from exc
 
-    first = datasets[0]
+    max_in_flight = None
+    if max_memory:
+        footprint = slice_footprint(plan)
+        max_in_flight = max(1, max_memory // footprint)
+        if max_memory < footprint:
+            logger.warning("max-memory (%d bytes) is below one slice (%d bytes); decoding one slice at a time",
+                           max_memory, footprint)
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    # Fortran order on the (x, y, z) shape is exactly the C-ordered (z, y, x) planes the plan fills
+    volume = np.lib.format.open_memmap(output, mode="w+", dtype=plan.dtype, shape=plan.shape[::-1],
+                                       fortran_order=True)
+    stats = RunningStats()
+    fill_volume(plan, volume.T, workers=workers, use_processes=use_processes, max_in_flight=max_in_flight,
+                stats=stats, flush_bytes=max_memory // 2 if max_memory else None)
+    volume.flush()
+
+    return volume, plan.affine, _volume_metadata(volume, plan.affine, plan.reference, stats=stats.as_dict())
+
+
+def _volume_metadata(volume: np.ndarray, affine: np.ndarray, first: pydicom.dataset.Dataset,
+                     stats: Optional[dict] = None) -> dict:
     # Combine in-plane spacing with slice thickness to fully describe voxel size
     spacing = list(getattr(first, "PixelSpacing", [1.0, 1.0]))
     spacing.append(float(getattr(first, "SliceThickness", 1.0)))
 
-    stats = {
-        "min": float(volume.min()),
-        "max": float(volume.max()),
-        "mean": float(volume.mean()),
-        "std": float(volume.std()),
-    }
+    if stats is None:
+        stats = {
+            "min": float(volume.min()),
+            "max": float(volume.max()),
+            "mean": float(volume.mean()),
+            "std": float(volume.std()),
+        }
 
-    metadata = {
+    return {
         "shape": list(volume.shape),
         "dtype": str(volume.dtype),
         "affine": affine.tolist(),
@@ -94,39 +505,154 @@ def build_volume(dicom_dir: Path) -> Tuple[np.ndarray, np.ndarray, dict]:
         "stats": stats,
     }
 
-    return volume, affine, metadata
 
+def _streams_slices(dicom_dir: Path, frames: Optional[dict]) -> bool:
+    """True when ``build_volume_to_npy`` can handle the input (a directory of single-frame slices)."""
+    if frames or dicom_dir.is_file():
+        return False
+    files = _find_slice_files(dicom_dir)
+    return not (len(files) == 1 and is_multiframe(files[0]))
 
-def _default_output_paths(dicom_dir: Path, output: str | None) -> Tuple[Path, Path]:
-    base_name = dicom_dir.name or "volume"
-    npy_path = Path(output) if output else Path("output") / f"{base_name}_volume.npy"
-    meta_path = npy_path.with_suffix(".json")
-    npy_path.parent.mkdir(parents=True, exist_ok=True)
-    return npy_path, meta_path
 
+def default_output_path(dicom_dir: Path, fmt: str = "npy") -> Path:
+    """``output/<dir>_volume.npy`` (or ``.chunks`` for the chunked format)."""
+    base_name = Path(dicom_dir).name or "volume"
+    return Path("output") / f"{base_name}_volume{'.chunks' if fmt == 'chunked' else '.npy'}"
 
-def main() -> None:
-    parser = argparse.ArgumentParser(description="Build a 3D volume from a DICOM folder using dicom-numpy")
-    parser.add_argument("directory", help="Path to directory containing DICOM slices")
-    parser.add_argument("-o", "--output", help="Output .npy path (default: output/<dir>_volume.npy)")
-    parser.add_argument("--metadata", help="Optional path to write JSON metadata (default: alongside .npy)")
-    parser.add_argument("--preview", action="store_true", help="Print metadata without writing files")
-    args = parser.parse_args()
 
-    volume, affine, metadata = build_volume(Path(args.directory))
+def export_volume(dicom_dir: Path, *, output: Optional[str] = None, metadata_path: Optional[str] = None,
+                  fmt: str = "npy", preview: bool = False, preflight: bool = False, engine: str = "native",
+                  workers: Optional[int] = None, use_processes: bool = False, out_of_core: bool = False,
+                  max_memory: Optional[int] = None, chunk_size: int = 64, codec: str = "zlib",
+                  frames: Optional[dict] = None, resample: Optional[float] = None, pyramid: int = 1,
+                  cache=None, refresh: bool = False) -> dict:
+    """
+    Build a volume and write it as ``.npy`` plus JSON sidecar, or as a chunked store.
+
+    This is the pipeline behind ``dicom-volume`` and ``dicom-tools volume``. ``max_memory``
+    implies ``out_of_core``: slices stream into a memory-mapped ``.npy`` (a scratch one for
+    the chunked format, removed afterwards). Out-of-core builds need a directory of
+    single-frame slices; multi-frame input and ``frames`` selections raise ``ValueError``.
+    ``resample``/``pyramid`` add a resampled base and downsampled levels written alongside.
+
+    Returns:
+        Dict with ``metadata``, ``format``, and the written ``output`` and ``metadata_path``
+        (both None for ``preview``).
+    """
+    dicom_dir = Path(dicom_dir)
+    output_path = Path(output) if output else default_output_path(dicom_dir, fmt)
+    out_of_core = bool(out_of_core or max_memory) and not preview
+    if out_of_core and not _streams_slices(dicom_dir, frames):
+        raise ValueError("--out-of-core/--max-memory needs a directory of single-frame slices; multi-frame input "
+                         "and --stack-id/--temporal-position are built in memory (drop the out-of-core options)")
+
+    if out_of_core:
+        # Chunked output goes through a scratch memmap that is removed once the store is written
+        npy_path = output_path if fmt == "npy" else output_path.with_name(output_path.name + ".tmp.npy")
+        volume, affine, metadata = build_volume_to_npy(dicom_dir, npy_path, max_memory=max_memory,
+                                                       preflight=preflight, workers=workers,
+                                                       use_processes=use_processes)
+    else:
+        volume, affine, metadata = build_volume(dicom_dir, preflight=preflight, engine=engine, workers=workers,
+                                                use_processes=use_processes, cache=cache, refresh=refresh,
+                                                frames=frames)
+    result = {"metadata": metadata, "format": fmt, "output": None, "metadata_path": None}
+    if preview:
+        return result
 
-    if args.preview:
+    rewrite_base = False
+    if resample or pyramid > 1:
+        from .resample import prepare_levels, save_pyramid
+
+        levels, metadata = prepare_levels(volume, affine, metadata, spacing=resample, levels=pyramid, workers=workers)
+        # A resampled base no longer lives in the out-of-core memmap and is written below
+        volume, rewrite_base = levels[0][0], bool(resample)
+        metadata["pyramid"] = save_pyramid(levels, output_path, metadata, fmt=fmt, chunk_size=chunk_size,
+                                           codec=codec, workers=workers)
+        del levels
+    result["metadata"] = metadata
+    result["output"] = output_path
+
+    if fmt == "chunked":
+        from .chunked_volume import write_chunked
+
+        write_chunked(volume, output_path, chunk_shape=(chunk_size,) * volume.ndim, codec=codec, metadata=metadata,
+                      workers=workers)
+        if out_of_core:
+            del volume
+            npy_path.unlink(missing_ok=True)
+        return result
+
+    if not out_of_core or rewrite_base:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(output_path, volume)
+    meta_path = Path(metadata_path) if metadata_path else output_path.with_suffix(".json")
+    meta_path.parent.mkdir(parents=True, exist_ok=True)
+    meta_path.write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+    result["metadata_path"] = meta_path
+    return result
+
+
+def print_export(result: dict) -> None:
+    """Console summary of :func:`export_volume` (the metadata itself for a preview)."""
+    metadata = result["metadata"]
+    if result["output"] is None:
         print(json.dumps(metadata, indent=2))
         return
+    kind = "Chunked volume" if result["format"] == "chunked" else "Volume"
+    print(f"{kind} saved to {result['output']} (shape={metadata['shape']}, dtype={metadata['dtype']})")
+    for entry in metadata.get("pyramid", []):
+        print(f"Pyramid level {entry['level']} saved to {entry['path']} (shape={entry['shape']})")
+    if result["metadata_path"] is not None:
+        print(f"Metadata written to {result['metadata_path']}")
 
-    npy_path, default_meta = _default_output_paths(Path(args.directory), args.output)
-    meta_path = Path(args.metadata) if args.metadata else default_meta
 
-    np.save(npy_path, volume)
-    meta_path.write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a 3D volume from a DICOM folder")
+    parser.add_argument("directory", help="Path to directory containing DICOM slices (or one multi-frame file)")
+    parser.add_argument("-o", "--output", help="Output .npy path (default: output/<dir>_volume.npy)")
+    parser.add_argument("--metadata", help="Optional path to write JSON metadata (default: alongside .npy)")
+    parser.add_argument("--preview", action="store_true", help="Print metadata without writing files")
+    parser.add_argument("--preflight", action="store_true",
+                        help="Check the series for duplicates, gaps and mixed geometry before loading pixels")
+    parser.add_argument("--engine", choices=ENGINES, default="native",
+                        help="Slice assembler: native parallel loader (default) or dicom-numpy")
+    parser.add_argument("--workers", type=int, help="Number of parallel slice decoders (native engine)")
+    parser.add_argument("--processes", action="store_true", help="Decode slices in worker processes (native engine)")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="Stream slices into a memory-mapped .npy instead of building the volume in RAM")
+    parser.add_argument("--max-memory", type=parse_size,
+                        help="Memory budget for in-flight slices, e.g. 2G (implies --out-of-core)")
+    parser.add_argument("--format", choices=["npy", "chunked"], default="npy",
+                        help="Write a .npy file or a chunked compressed store (directory)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Chunk edge length for --format chunked")
+    parser.add_argument("--codec", choices=["zlib", "lzma"], default="zlib", help="Chunk compression codec")
+    parser.add_argument("--stack-id", help="Multi-frame input: build only frames of this StackID")
+    parser.add_argument("--temporal-position", type=int, help="Multi-frame input: TemporalPositionIndex to build")
+    parser.add_argument("--resample", type=float, metavar="MM", help="Resample to isotropic voxels of this size (mm)")
+    parser.add_argument("--pyramid", type=int, default=1, metavar="LEVELS",
+                        help="Pyramid levels including the base, each halving the resolution (written alongside)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse and store results in the persistent volume cache (off by default; LRU, 10G budget)")
+    parser.add_argument("--no-cache", dest="cache", action="store_false", help="Do not use the volume cache (default)")
+    parser.add_argument("--refresh", action="store_true", help="Rebuild the volume and replace its cache entry")
+    parser.add_argument("--cache-dir", help="Volume cache directory (default: $DICOM_TOOLS_CACHE_DIR or ~/.cache)")
+    parser.add_argument("--cache-size", type=parse_size, help="Volume cache budget, e.g. 20G (default: 10G)")
+    args = parser.parse_args()
 
-    print(f"Volume saved to {npy_path} with shape {metadata['shape']} and dtype {metadata['dtype']}")
-    print(f"Metadata written to {meta_path}")
+    cache = VolumeCache(args.cache_dir, max_bytes=args.cache_size) if args.cache else None
+    frames = {key: value for key, value in (("stack_id", args.stack_id),
+                                            ("temporal_position", args.temporal_position)) if value is not None}
+    try:
+        result = export_volume(Path(args.directory), output=args.output, metadata_path=args.metadata, fmt=args.format,
+                               preview=args.preview, preflight=args.preflight, engine=args.engine,
+                               workers=args.workers, use_processes=args.processes, out_of_core=args.out_of_core,
+                               max_memory=args.max_memory, chunk_size=args.chunk_size, codec=args.codec,
+                               frames=frames, resample=args.resample, pyramid=args.pyramid, cache=cache,
+                               refresh=args.refresh)
+    except ValueError as exc:
+        parser.error(str(exc))
+    print_export(result)
 
 
 if __name__ == "__main__":
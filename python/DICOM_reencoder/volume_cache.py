@@ -0,0 +1,224 @@
+#
+# volume_cache.py
+# Dicom-Tools-py
+#
+# Persistent on-disk cache of assembled series volumes keyed by series identity and file fingerprint.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+"""
+Cache assembled volumes between runs.
+
+Entries live under ``<root>/<SeriesInstanceUID>/<fingerprint>.<variant>/``, where
+the fingerprint hashes the member files' paths, sizes and modification times,
+so touching, adding or removing a slice yields a new key. A volume entry holds
+``volume.npy`` (loaded back memory-mapped), ``affine.npy`` and ``metadata.json``;
+file entries (e.g. a NIfTI export) hold the artifact next to its metadata.
+Entries are written to a temporary directory and renamed into place, and the
+least recently used ones are evicted once the cache exceeds its size budget.
+
+The default root is ``$DICOM_TOOLS_CACHE_DIR`` or ``~/.cache/dicom-tools/volumes``;
+the default budget is ``$DICOM_TOOLS_CACHE_SIZE`` (e.g. ``20G``) or 10 GiB.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+METADATA_NAME = "metadata.json"
+VOLUME_NAME = "volume.npy"
+AFFINE_NAME = "affine.npy"
+VOLUME_VARIANT = "volume"
+
+
+def default_cache_dir() -> Path:
+    env = os.environ.get("DICOM_TOOLS_CACHE_DIR")
+    return Path(env) if env else Path.home() / ".cache" / "dicom-tools" / "volumes"
+
+
+def _default_max_bytes() -> int:
+    env = os.environ.get("DICOM_TOOLS_CACHE_SIZE")
+    if not env:
+        return DEFAULT_MAX_BYTES
+    from .volume_builder import parse_size
+
+    return parse_size(env)
+
+
+def fingerprint_files(files: Iterable[PathLike]) -> str:
+    """Hash the sorted (absolute path, size, mtime) of every file; any change yields a new fingerprint."""
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(str(Path(f).resolve()) for f in files):
+        stat = os.stat(path)
+        digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+
+def _safe_label(series_uid: str) -> str:
+    return re.sub(r"[^0-9A-Za-z._-]", "_", str(series_uid or "unknown"))
+
+
+def _tree_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class VolumeCache:
+    """Size-bounded LRU cache of volumes and derived files on disk."""
+
+    def __init__(self, root: Optional[PathLike] = None, max_bytes: Optional[int] = None):
+        self.root = Path(root) if root else default_cache_dir()
+        self.max_bytes = max_bytes if max_bytes is not None else _default_max_bytes()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def entry_path(self, series_uid: str, fingerprint: str, variant: str = VOLUME_VARIANT) -> Path:
+        return self.root / _safe_label(series_uid) / f"{fingerprint}.{variant}"
+
+    def _lookup(self, entry: Path) -> Optional[dict]:
+        meta_path = entry / METADATA_NAME
+        try:
+            metadata = json.loads(meta_path.read_text(encoding="utf-8"))
+            # The metadata file's mtime doubles as the entry's last-access time for LRU eviction
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return metadata
+
+    def _commit(self, entry: Path, populate) -> Path:
+        """Build an entry in a scratch directory via ``populate(dir)`` and rename it into place."""
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        scratch = Path(tempfile.mkdtemp(prefix=".tmp-", dir=entry.parent))
+        try:
+            populate(scratch)
+            if entry.exists():
+                shutil.rmtree(entry, ignore_errors=True)
+            os.replace(scratch, entry)
+        except OSError:
+            # Another process committed the same entry first; theirs is equivalent
+            shutil.rmtree(scratch, ignore_errors=True)
+            if not entry.exists():
+                raise
+        self.evict(keep=entry)
+        return entry
+
+    def get_volume(self, series_uid: str, fingerprint: str) -> Optional[Tuple[np.ndarray, np.ndarray, dict]]:
+        """Return ``(volume, affine, metadata)`` with a read-only memory-mapped volume, or None on a miss."""
+        entry = self.entry_path(series_uid, fingerprint)
+        metadata = self._lookup(entry)
+        if metadata is None:
+            return None
+        try:
+            volume = np.load(entry / VOLUME_NAME, mmap_mode="r")
+            affine = np.load(entry / AFFINE_NAME)
+        except (OSError, ValueError) as exc:
+            logger.warning("Discarding unreadable cache entry %s: %s", entry, exc)
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        return volume, affine, metadata
+
+    def put_volume(self, series_uid: str, fingerprint: str, volume: np.ndarray, affine: np.ndarray,
+                   metadata: dict) -> Path:
+        def populate(scratch: Path) -> None:
+            # np.save keeps the (x, y, z) Fortran layout, so the memmap comes back identical
+            np.save(scratch / VOLUME_NAME, volume)
+            np.save(scratch / AFFINE_NAME, affine)
+            (scratch / METADATA_NAME).write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+
+        return self._commit(self.entry_path(series_uid, fingerprint), populate)
+
+    def get_file(self, series_uid: str, fingerprint: str, variant: str) -> Optional[Tuple[Path, dict]]:
+        """Return ``(cached_file, metadata)`` for a file entry, or None on a miss."""
+        entry = self.entry_path(series_uid, fingerprint, variant)
+        metadata = self._lookup(entry)
+        if metadata is None:
+            return None
+        cached = entry / metadata.get("cached_file", "")
+        if not cached.is_file():
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        return cached, metadata
+
+    def put_file(self, series_uid: str, fingerprint: str, variant: str, source: PathLike, metadata: dict) -> Path:
+        source = Path(source)
+
+        def populate(scratch: Path) -> None:
+            shutil.copyfile(source, scratch / source.name)
+            stored = dict(metadata, cached_file=source.name)
+            (scratch / METADATA_NAME).write_text(json.dumps(stored, indent=2), encoding="utf-8")
+
+        return self._commit(self.entry_path(series_uid, fingerprint, variant), populate)
+
+    def invalidate(self, series_uid: str, fingerprint: str, variant: str = VOLUME_VARIANT) -> None:
+        shutil.rmtree(self.entry_path(series_uid, fingerprint, variant), ignore_errors=True)
+
+    def entries(self) -> List[Tuple[Path, int, float]]:
+        """List committed entries as ``(path, bytes, last_access)``, least recently used first."""
+        found = []
+        if not self.root.exists():
+            return found
+        for meta_path in self.root.glob(f"*/*/{METADATA_NAME}"):
+            entry = meta_path.parent
+            if entry.name.startswith(".tmp-"):
+                continue
+            try:
+                found.append((entry, _tree_bytes(entry), meta_path.stat().st_mtime))
+            except OSError:
+                continue
+        found.sort(key=lambda item: item[2])
+        return found
+
+    def size_bytes(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep: Optional[Path] = None) -> List[Path]:
+        """Remove least recently used entries until the cache fits ``max_bytes``."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for entry, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and entry == keep and size <= self.max_bytes:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed.append(entry)
+        for entry in removed:
+            try:
+                entry.parent.rmdir()
+            except OSError:
+                pass
+        return removed
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def resolve_cache(cache: Union[None, bool, PathLike, VolumeCache]) -> Optional[VolumeCache]:
+    """Accept ``None``/``False`` (disabled), ``True`` (default location), a directory, or a VolumeCache."""
+    if cache is None or cache is False:
+        return None
+    if isinstance(cache, VolumeCache):
+        return cache
+    if cache is True:
+        return VolumeCache()
+    return VolumeCache(cache)
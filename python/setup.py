@@ -82,9 +82,11 @@ setup(
 
             # Privacy and Anonymization
             'dicom-anonymize=DICOM_reencoder.anonymize_dicom:main',
+            'dicom-anonymize-batch=DICOM_reencoder.batch_anonymize:main',
 
             # Validation and Analysis
             'dicom-validate=DICOM_reencoder.validate_dicom:main',
+            'dicom-validate-series=DICOM_reencoder.validate_series:main',
             'dicom-pixel-stats=DICOM_reencoder.pixel_stats:main',
 
             # Modification and Organization
@@ -103,12 +105,18 @@ setup(
             # Volume utilities
             'dicom-volume=DICOM_reencoder.volume_builder:main',
             'dicom-to-nifti=DICOM_reencoder.series_to_nifti:main',
+            'dicom-export-series=DICOM_reencoder.series_export:main',
             'dicom-transcode=DICOM_reencoder.transcode_dicom:main',
 
             # DICOM Networking
             'dicom-query=DICOM_reencoder.dicom_query:main',
             'dicom-retrieve=DICOM_reencoder.dicom_retrieve:main',
             'dicom-echo=DICOM_reencoder.dicom_echo:main',
+            'dicom-storescp=DICOM_reencoder.storage_scp:main',
+            'dicom-send=DICOM_reencoder.dicom_send:main',
+            'dicom-crawl=DICOM_reencoder.pacs_crawler:main',
+            'dicom-qrscp=DICOM_reencoder.qr_scp:main',
+            'dicom-netbench=DICOM_reencoder.network_benchmark:main',
 
             # Web Interface
             'dicom-web=DICOM_reencoder.web_interface:main',
@@ -7,6 +7,8 @@ from __future__ import annotations
 
 import contextlib
 import socket
+import threading
+import time
 from typing import Iterable, Iterator, Tuple
 
 from pydicom.dataset import Dataset
@@ -133,3 +135,52 @@ def get_scp(datasets: list[Dataset]):
 def mwl_scp(responses: Iterable[Dataset]):
     with find_scp(responses, model=ModalityWorklistInformationFind) as info:
         yield info
+
+
+@contextlib.contextmanager
+def role_get_scp(datasets: list[Dataset], failures: dict | None = None, delay: float = 0.0):
+    """
+    C-GET SCP that accepts the SCP role for storage, so sub-operations reach the requestor.
+
+    Requests are matched on SeriesInstanceUID when the identifier carries one. ``failures`` maps a
+    series UID to final statuses returned (one per request) before that series succeeds. Yields
+    (host, port, state) where state records the identifiers seen and peak concurrent requests.
+    """
+    ae = AE(ae_title="GET_SCP")
+    ae.add_supported_context(StudyRootQueryRetrieveInformationModelGet)
+    ae.add_supported_context(CTImageStorage, scu_role=True, scp_role=True)
+    ae.add_supported_context(SecondaryCaptureImageStorage, scu_role=True, scp_role=True)
+    failures = {key: list(value) for key, value in (failures or {}).items()}
+    state = {"requests": [], "active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def handle_get(event):
+        identifier = event.identifier
+        series = identifier.get("SeriesInstanceUID")
+        with lock:
+            state["requests"].append(identifier)
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            failure = failures.get(series, []).pop(0) if failures.get(series) else None
+        try:
+            time.sleep(delay)
+            if failure is not None:
+                # A zero sub-operation count would end the request with Success before the failure is sent
+                yield 1
+                yield failure, None
+                return
+            matches = [ds for ds in datasets if not series or ds.SeriesInstanceUID == series]
+            yield len(matches)
+            for ds in matches:
+                yield 0xFF00, ds
+        finally:
+            with lock:
+                state["active"] -= 1
+
+    port = free_port()
+    server = ae.start_server(("127.0.0.1", port), block=False, evt_handlers=[(evt.EVT_C_GET, handle_get)])
+    try:
+        yield "127.0.0.1", port, state
+    finally:
+        server.shutdown()
+        ae.shutdown()
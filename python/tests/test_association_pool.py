@@ -0,0 +1,141 @@
+#
+# test_association_pool.py
+# Dicom-Tools-py
+#
+# Tests for pooled SCU associations: reuse, limits, idle expiry and re-association after aborts.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import contextlib
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from pydicom.dataset import Dataset
+from pynetdicom import AE, evt
+from pynetdicom.sop_class import (
+    CTImageStorage,
+    StudyRootQueryRetrieveInformationModelFind,
+    StudyRootQueryRetrieveInformationModelGet,
+    Verification,
+)
+
+from DICOM_reencoder.core.association_pool import AssociationPool
+from DICOM_reencoder.core.network import send_c_echo
+from DICOM_reencoder.dicom_query import create_study_query, query_pacs
+from DICOM_reencoder.dicom_retrieve import create_retrieve_query
+
+sys.path.append(str(Path(__file__).parent))
+from pynetdicom_utils import free_port, role_get_scp  # type: ignore
+
+
+@contextlib.contextmanager
+def counting_scp():
+    """Find/Verification SCP that answers every query with one match and counts connections."""
+    ae = AE(ae_title="POOL_SCP")
+    ae.add_supported_context(StudyRootQueryRetrieveInformationModelFind)
+    ae.add_supported_context(Verification)
+    connections = []
+
+    def handle_find(event):
+        match = Dataset()
+        match.QueryRetrieveLevel = "STUDY"
+        match.StudyInstanceUID = "1.2.3"
+        yield 0xFF00, match
+        yield 0x0000, None
+
+    handlers = [(evt.EVT_C_FIND, handle_find), (evt.EVT_CONN_OPEN, lambda event: connections.append(event))]
+    port = free_port()
+    server = ae.start_server(("127.0.0.1", port), block=False, evt_handlers=handlers)
+    try:
+        yield "127.0.0.1", port, connections, server
+    finally:
+        server.shutdown()
+        ae.shutdown()
+
+
+def _query(port, pool):
+    return query_pacs("127.0.0.1", port, "SCU", "POOL_SCP", create_study_query(), pool=pool)
+
+
+def test_queries_reuse_one_association():
+    with counting_scp() as (_, port, connections, _), AssociationPool() as pool:
+        results = [_query(port, pool) for _ in range(5)]
+        assert send_c_echo("127.0.0.1", port, calling_aet="SCU", called_aet="POOL_SCP", pool=pool) == 0x0000
+
+        assert all(r[0].StudyInstanceUID == "1.2.3" for r in results)
+        assert len(connections) == 2  # one for C-FIND, one for the Verification-only key
+        assert pool.stats["created"] == 2 and pool.stats["reused"] == 4
+        assert pool.idle_count == 2
+
+
+def test_concurrent_leases_respect_max_size():
+    with counting_scp() as (_, port, connections, _), AssociationPool(max_size=2) as pool:
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            results = list(executor.map(lambda _: _query(port, pool), range(12)))
+
+        assert all(len(r) == 1 for r in results)
+        assert len(connections) <= 2
+
+
+def test_acquire_times_out_when_pool_is_exhausted():
+    with counting_scp() as (host, port, _, _), AssociationPool(max_size=1) as pool:
+        with pool.acquire(host, port, [Verification], called_aet="POOL_SCP") as assoc:
+            assert assoc.is_established
+            with pytest.raises(TimeoutError):
+                with pool.acquire(host, port, [Verification], called_aet="POOL_SCP", wait=0.2):
+                    pass
+
+
+def test_idle_associations_expire():
+    with counting_scp() as (_, port, connections, _), AssociationPool(idle_timeout=0.2) as pool:
+        _query(port, pool)
+        time.sleep(0.3)
+
+        assert pool.prune() == 1
+        assert pool.idle_count == 0
+        _query(port, pool)
+        assert len(connections) == 2
+
+
+def test_reassociates_after_peer_abort():
+    with counting_scp() as (_, port, connections, server), AssociationPool(health_check_interval=0) as pool:
+        _query(port, pool)
+        for assoc in server.active_associations:
+            assoc.abort()
+        deadline = time.monotonic() + 5
+        while server.active_associations and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        assert _query(port, pool)[0].StudyInstanceUID == "1.2.3"
+        assert len(connections) == 2
+
+
+def test_failed_lease_is_not_returned():
+    with counting_scp() as (host, port, _, _), AssociationPool() as pool:
+        with pytest.raises(ValueError):
+            with pool.acquire(host, port, [Verification], called_aet="POOL_SCP"):
+                raise ValueError("boom")
+
+        assert pool.idle_count == 0 and pool.stats["dropped"] == 1
+
+
+def test_pooled_get_binds_store_handler_per_lease(synthetic_datasets):
+    query = create_retrieve_query("STUDY", study_uid=synthetic_datasets[0].StudyInstanceUID)
+    contexts = [StudyRootQueryRetrieveInformationModelGet, CTImageStorage]
+    received = {"a": [], "b": []}
+
+    def lease(name):
+        handler = (evt.EVT_C_STORE, lambda event: received[name].append(event.request.AffectedSOPInstanceUID) or 0)
+        with pool.acquire(host, port, contexts, called_aet="GET_SCP", roles=[(CTImageStorage, False, True)],
+                          evt_handlers=[handler]) as assoc:
+            return [status.Status for status, _ in assoc.send_c_get(query, StudyRootQueryRetrieveInformationModelGet)]
+
+    with role_get_scp(synthetic_datasets) as (host, port, _), AssociationPool() as pool:
+        assert lease("a")[-1] == 0x0000
+        assert lease("b")[-1] == 0x0000
+
+        assert pool.stats["created"] == 1 and pool.stats["reused"] == 1
+    assert received["a"] == received["b"] == [ds.SOPInstanceUID for ds in synthetic_datasets]
@@ -0,0 +1,203 @@
+#
+# test_batch_anonymize.py
+# Dicom-Tools-py
+#
+# Tests for the parallel batch anonymizer: compiled profile, persistent mapping
+# table, cross-run consistency, and structured results.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pydicom
+import pytest
+
+from DICOM_reencoder.anonymize_dicom import anonymize_dicom, stable_date_offset
+from DICOM_reencoder.batch_anonymize import AnonymizationProfile, BatchAnonymizer, MappingTable, anonymize_stream
+from DICOM_reencoder.core import build_synthetic_series, load_dataset, save_dataset
+
+
+class TestMappingTable:
+    """Test the persistent replacement table."""
+
+    def test_uid_mapping_is_stable(self):
+        table = MappingTable()
+        first = table.uid("1.2.3")
+        assert table.uid("1.2.3") == first
+        assert table.uid("1.2.4") != first
+        assert first.startswith("1.2.826.0.1.3680043.8.498.")
+
+    def test_mapping_persists_across_instances(self, tmp_path):
+        path = tmp_path / "mapping.sqlite"
+        with MappingTable(path) as table:
+            uid = table.uid("1.2.3")
+            patient = table.patient_id("PAT-1")
+            offset = table.date_offset("PAT-1")
+
+        with MappingTable(path) as reopened:
+            assert reopened.uid("1.2.3") == uid
+            assert reopened.patient_id("PAT-1") == patient
+            assert reopened.date_offset("PAT-1") == offset
+            assert len(reopened) == 3
+
+    def test_concurrent_lookups_converge(self, tmp_path):
+        table = MappingTable(tmp_path / "mapping.sqlite")
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            values = set(pool.map(lambda _: table.uid("1.2.840.99"), range(64)))
+        assert len(values) == 1
+        table.close()
+
+    def test_date_offset_range(self):
+        table = MappingTable()
+        offsets = {table.date_offset(f"PAT-{i}") for i in range(50)}
+        assert all(1 <= offset <= 365 for offset in offsets)
+
+
+class TestBatchAnonymizer:
+    """Test batch runs over synthetic series."""
+
+    def test_run_anonymizes_series_consistently(self, synthetic_series, tmp_path):
+        paths, originals = synthetic_series
+        out_dir = tmp_path / "anon"
+
+        summary = BatchAnonymizer().run(paths, out_dir, workers=4)
+
+        assert summary["total"] == len(paths)
+        assert summary["failed"] == 0
+        outputs = [load_dataset(out_dir / path.name) for path in paths]
+        assert {ds.PatientID for ds in outputs} == {summary["records"][0]["patient_id"]}
+        assert len({ds.StudyInstanceUID for ds in outputs}) == 1
+        assert len({ds.SOPInstanceUID for ds in outputs}) == len(paths)
+        for ds, original in zip(outputs, originals):
+            assert ds.PatientName == "ANONYMOUS^PATIENT"
+            assert ds.StudyInstanceUID != original.StudyInstanceUID
+            assert ds.file_meta.MediaStorageSOPInstanceUID == ds.SOPInstanceUID
+            assert ds.StudyDate != original.StudyDate
+            assert ds.pixel_array.shape == original.pixel_array.shape
+
+    def test_split_jobs_share_mapping(self, synthetic_series, tmp_path):
+        paths, _ = synthetic_series
+        mapping_path = tmp_path / "mapping.sqlite"
+
+        with MappingTable(mapping_path) as table:
+            BatchAnonymizer(table).run(paths[:2], tmp_path / "job1")
+        with MappingTable(mapping_path) as table:
+            BatchAnonymizer(table).run(paths[2:], tmp_path / "job2")
+
+        first = load_dataset(tmp_path / "job1" / paths[0].name)
+        second = load_dataset(tmp_path / "job2" / paths[-1].name)
+        assert first.StudyInstanceUID == second.StudyInstanceUID
+        assert first.SeriesInstanceUID == second.SeriesInstanceUID
+        assert first.PatientID == second.PatientID
+        assert first.StudyDate == second.StudyDate
+
+    def test_process_workers_share_mapping(self, synthetic_series, tmp_path):
+        paths, _ = synthetic_series
+        with MappingTable(tmp_path / "mapping.sqlite") as table:
+            summary = BatchAnonymizer(table).run(paths, tmp_path / "anon", workers=2, use_processes=True)
+
+        assert summary["failed"] == 0
+        studies = {load_dataset(tmp_path / "anon" / p.name).StudyInstanceUID for p in paths}
+        assert len(studies) == 1
+
+    def test_process_workers_require_persistent_mapping(self, synthetic_series, tmp_path):
+        paths, _ = synthetic_series
+        with pytest.raises(ValueError):
+            BatchAnonymizer().run(paths, tmp_path / "anon", use_processes=True)
+
+    def test_failures_are_reported_not_raised(self, tmp_path):
+        bogus = tmp_path / "missing.dcm"
+
+        summary = BatchAnonymizer().run([bogus], tmp_path / "anon")
+
+        assert summary["failed"] == 1
+        assert summary["records"][0]["status"] == "error"
+        assert summary["records"][0]["error"]
+
+    def test_run_is_silent(self, synthetic_series, tmp_path, capsys):
+        paths, _ = synthetic_series
+        BatchAnonymizer().run(paths, tmp_path / "anon")
+        assert capsys.readouterr().out == ""
+
+    def test_mirrors_directory_layout(self, tmp_path):
+        build_synthetic_series(tmp_path / "in" / "a", slices=1)
+        build_synthetic_series(tmp_path / "in" / "b", slices=1)
+        files = sorted((tmp_path / "in").rglob("*.dcm"))
+
+        BatchAnonymizer().run(files, tmp_path / "out", root=tmp_path / "in")
+
+        assert (tmp_path / "out" / "a" / "slice_1.dcm").exists()
+        assert (tmp_path / "out" / "b" / "slice_1.dcm").exists()
+
+
+class TestStreamingAnonymization:
+    """Test header-only anonymization with untouched Pixel Data."""
+
+    def test_stream_mode_copies_pixel_bytes(self, synthetic_series, tmp_path):
+        paths, originals = synthetic_series
+
+        summary = BatchAnonymizer(streaming=True).run(paths, tmp_path / "anon")
+
+        assert {record["mode"] for record in summary["records"]} == {"stream"}
+        for path, original in zip(paths, originals):
+            ds = load_dataset(tmp_path / "anon" / path.name)
+            assert ds.PatientName == "ANONYMOUS^PATIENT"
+            assert ds.SOPInstanceUID != original.SOPInstanceUID
+            assert ds.PixelData == original.PixelData
+
+    def test_stream_matches_full_mode_headers(self, synthetic_dicom_path, tmp_path):
+        mapping = MappingTable()
+        BatchAnonymizer(mapping).anonymize_file(synthetic_dicom_path, tmp_path / "full.dcm")
+        BatchAnonymizer(mapping, streaming=True).anonymize_file(synthetic_dicom_path, tmp_path / "stream.dcm")
+
+        full = load_dataset(tmp_path / "full.dcm")
+        streamed = load_dataset(tmp_path / "stream.dcm")
+        assert full == streamed
+
+    def test_separate_stream_calls_keep_series_linkage(self, synthetic_series, tmp_path):
+        paths, originals = synthetic_series
+
+        first = anonymize_stream(paths[0], tmp_path / "a.dcm")
+        second = anonymize_stream(paths[1], tmp_path / "b.dcm")
+        a, b = load_dataset(tmp_path / "a.dcm"), load_dataset(tmp_path / "b.dcm")
+
+        assert first["mode"] == second["mode"] == "stream"
+        assert a.StudyInstanceUID == b.StudyInstanceUID != originals[0].StudyInstanceUID
+        assert a.SeriesInstanceUID == b.SeriesInstanceUID and a.PatientID == b.PatientID
+        assert a.SOPInstanceUID != b.SOPInstanceUID and a.StudyDate == b.StudyDate
+
+        # The derived values are the ones the classic single-file anonymizer writes
+        anonymize_dicom(str(paths[0]), str(tmp_path / "classic.dcm"))
+        classic = load_dataset(tmp_path / "classic.dcm")
+        assert (a.PatientID, a.StudyInstanceUID, a.SOPInstanceUID) == \
+            (classic.PatientID, classic.StudyInstanceUID, classic.SOPInstanceUID)
+
+    def test_trailing_private_elements_use_full_mode(self, synthetic_dicom_path, tmp_path):
+        ds = load_dataset(synthetic_dicom_path)
+        ds.add_new(pydicom.tag.Tag(0x7FE1, 0x0010), "LO", "PrivateCreator")
+        ds.add_new(pydicom.tag.Tag(0x7FE1, 0x1001), "LO", "PrivateData")
+        source = save_dataset(ds, tmp_path / "trailing.dcm")
+
+        record = anonymize_stream(source, tmp_path / "anon.dcm")
+
+        assert record["mode"] == "full"
+        assert pydicom.tag.Tag(0x7FE1, 0x1001) not in load_dataset(tmp_path / "anon.dcm")
+
+
+class TestAnonymizationProfile:
+    """Test the compiled profile."""
+
+    def test_profile_removes_private_and_listed_tags(self, synthetic_dicom_path, tmp_path):
+        ds = load_dataset(synthetic_dicom_path)
+        ds.AccessionNumber = "ACC-1"
+        ds.add_new(pydicom.tag.Tag(0x0011, 0x0010), "LO", "PrivateCreator")
+        ds.add_new(pydicom.tag.Tag(0x0011, 0x1001), "LO", "PrivateData")
+
+        AnonymizationProfile.default().apply(ds, MappingTable())
+
+        assert "AccessionNumber" not in ds
+        assert pydicom.tag.Tag(0x0011, 0x1001) not in ds
+
+    def test_stable_date_offset_is_deterministic(self):
+        assert stable_date_offset("TEST-123") == stable_date_offset("TEST-123")
+        assert 1 <= stable_date_offset("TEST-123") <= 365
@@ -0,0 +1,114 @@
+#
+# test_chunked_volume.py
+# Dicom-Tools-py
+#
+# Tests for the chunked compressed volume store: round trips, block reads,
+# chunk cache behavior, and CLI output.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+from argparse import Namespace
+
+import numpy as np
+import pytest
+
+from DICOM_reencoder import cli as cli_mod
+from DICOM_reencoder.chunked_volume import ChunkCache, open_chunked, write_chunked
+from DICOM_reencoder.core import build_synthetic_series
+
+
+@pytest.fixture
+def volume():
+    return np.random.default_rng(7).integers(0, 4096, size=(23, 17, 11), dtype=np.uint16)
+
+
+class TestChunkedStore:
+    """Test writing and reading chunked volumes."""
+
+    @pytest.mark.parametrize("codec", ["zlib", "lzma"])
+    def test_round_trip(self, volume, tmp_path, codec):
+        store = write_chunked(volume, tmp_path / "vol.chunks", chunk_shape=(8, 8, 4), codec=codec, workers=4)
+
+        reader = open_chunked(store)
+
+        assert reader.shape == volume.shape
+        assert reader.dtype == volume.dtype
+        assert np.array_equal(np.asarray(reader), volume)
+
+    def test_fortran_ordered_input(self, volume, tmp_path):
+        source = np.asfortranarray(volume)
+        store = write_chunked(source, tmp_path / "vol.chunks", chunk_shape=(5, 5, 5))
+
+        assert np.array_equal(np.asarray(open_chunked(store)), volume)
+
+    @pytest.mark.parametrize("key", [
+        (slice(3, 19), slice(2, 9), slice(0, 11)),
+        (5, slice(None), slice(None)),
+        (slice(None), -1, slice(1, 10, 3)),
+        (Ellipsis, 4),
+        (slice(20, 40),),
+    ])
+    def test_block_reads_match_numpy(self, volume, tmp_path, key):
+        reader = open_chunked(write_chunked(volume, tmp_path / "vol.chunks", chunk_shape=(8, 8, 4)))
+
+        assert np.array_equal(reader[key], volume[key])
+
+    def test_block_read_touches_only_needed_chunks(self, volume, tmp_path):
+        reader = open_chunked(write_chunked(volume, tmp_path / "vol.chunks", chunk_shape=(8, 8, 4)))
+
+        reader[0:8, 0:8, 0:4]
+        assert reader.cache.misses == 1
+        reader[2:6, 2:6, 1:3]
+        assert reader.cache.hits == 1
+        reader[7:9, 0:1, 0:1]
+        assert reader.cache.misses == 2
+
+    def test_metadata_and_affine_preserved(self, volume, tmp_path):
+        affine = np.diag([0.7, 0.7, 1.0, 1.0]).astype(np.float32)
+        metadata = {"affine": affine.tolist(), "spacing_mm": [0.7, 0.7, 1.0], "stats": {"mean": np.float64(1.5)}}
+
+        reader = open_chunked(write_chunked(volume, tmp_path / "vol.chunks", metadata=metadata))
+
+        assert np.array_equal(reader.affine, affine)
+        assert reader.metadata["stats"]["mean"] == 1.5
+
+    def test_out_of_bounds_rejected(self, volume, tmp_path):
+        reader = open_chunked(write_chunked(volume, tmp_path / "vol.chunks"))
+
+        with pytest.raises(IndexError):
+            reader[23]
+        with pytest.raises(IndexError):
+            reader[0, 0, 0, 0]
+
+    def test_parallel_reader(self, volume, tmp_path):
+        store = write_chunked(volume, tmp_path / "vol.chunks", chunk_shape=(4, 4, 4))
+
+        assert np.array_equal(open_chunked(store, workers=4)[...], volume)
+
+
+class TestChunkCache:
+    """Test LRU eviction by bytes."""
+
+    def test_evicts_least_recently_used(self):
+        cache = ChunkCache(max_bytes=2 * 80)
+        for key in range(3):
+            cache.put((key,), np.zeros(10, dtype=np.float64))
+
+        assert len(cache) == 2
+        assert cache.get((0,)) is None
+        assert cache.get((2,)) is not None
+
+
+def test_cli_volume_chunked(tmp_path, capsys):
+    series_dir = tmp_path / "series"
+    build_synthetic_series(series_dir)
+    store = tmp_path / "vol.chunks"
+
+    for max_memory in (None, 1):
+        cli_mod.cmd_volume(Namespace(directory=str(series_dir), output=str(store), metadata=None, preview=False,
+                                     format="chunked", chunk_size=16, codec="zlib", max_memory=max_memory))
+        reader = open_chunked(store)
+        assert reader.shape == (32, 32, 4)
+        assert reader.metadata["series_uid"]
+        assert "Chunked volume saved" in capsys.readouterr().out
+    assert not list(tmp_path.glob("*.tmp.npy"))
@@ -86,6 +86,25 @@ def test_cli_volume_builds_files(tmp_path, capsys):
     assert out_meta.exists()
 
 
+def test_cli_volume_out_of_core(tmp_path, capsys):
+    series_dir = tmp_path / "series"
+    build_synthetic_series(series_dir)
+
+    out_npy = tmp_path / "vol.npy"
+    out = _capture_print(
+        cli_mod.cmd_volume,
+        capsys,
+        directory=str(series_dir),
+        output=str(out_npy),
+        metadata=None,
+        preview=False,
+        max_memory=cli_mod.parse_size("64K"),
+    )
+    assert "Volume saved" in out
+    assert np.load(out_npy, mmap_mode="r").shape[2] == 4
+    assert (tmp_path / "vol.json").exists()
+
+
 def test_cli_nifti_and_transcode_skip_if_missing(tmp_path, synthetic_dicom_path, capsys):
     sitk = pytest.importorskip("SimpleITK")
     out_path = tmp_path / "series.nii.gz"
@@ -28,6 +28,13 @@ from DICOM_reencoder.core.images import (
     window_frame,
 )
 from DICOM_reencoder.core.metadata import summarize_metadata
+from DICOM_reencoder.core.streaming import (
+    copy_range,
+    iter_fragments,
+    read_header,
+    tail_holds_only_pixel_data,
+    write_spliced,
+)
 
 
 class TestDatasetsIO:
@@ -233,3 +240,75 @@ class TestMetadataExtraction:
         assert "columns" in image
         assert "bits_allocated" in image
 
+
+class TestStreamingHelpers:
+    """Test header/tail splitting used by streaming rewrites."""
+
+    def test_read_header_stops_at_pixel_data(self, synthetic_dicom_path):
+        header, offset = read_header(synthetic_dicom_path)
+
+        assert "PixelData" not in header
+        with open(synthetic_dicom_path, "rb") as fp:
+            fp.seek(offset)
+            assert fp.read(4) == b"\xe0\x7f\x10\x00"
+
+    def test_write_spliced_preserves_pixels(self, synthetic_dicom_path, tmp_path):
+        header, offset = read_header(synthetic_dicom_path)
+        header.PatientName = "Spliced^Header"
+
+        output = write_spliced(header, synthetic_dicom_path, offset, tmp_path / "spliced.dcm")
+
+        original = load_dataset(synthetic_dicom_path)
+        spliced = load_dataset(output)
+        assert spliced.PatientName == "Spliced^Header"
+        assert spliced.PixelData == original.PixelData
+
+    def test_write_spliced_rejects_short_copy(self, synthetic_dicom_path, tmp_path, monkeypatch):
+        import os
+
+        header, offset = read_header(synthetic_dicom_path)
+        getsize = os.path.getsize
+        # The source shrinking between getsize and the copy looks like this
+        monkeypatch.setattr(os.path, "getsize", lambda path: getsize(path) + 100)
+
+        with pytest.raises(OSError, match="Short copy"):
+            write_spliced(header, synthetic_dicom_path, offset, tmp_path / "spliced.dcm")
+        assert not (tmp_path / "spliced.dcm").exists()
+
+    def test_tail_check_detects_elements_after_pixel_data(self, synthetic_dicom_path, tmp_path):
+        ds = load_dataset(synthetic_dicom_path)
+        ds.add_new(pydicom.tag.Tag(0x7FE1, 0x0010), "LO", "PrivateCreator")
+        path = save_dataset(ds, tmp_path / "trailing.dcm")
+
+        header, offset = read_header(path)
+        assert not tail_holds_only_pixel_data(path, header, offset)
+
+        header, offset = read_header(synthetic_dicom_path)
+        assert tail_holds_only_pixel_data(synthetic_dicom_path, header, offset)
+
+    def test_iter_fragments_walks_encapsulated_items(self, synthetic_dicom_path, tmp_path):
+        from pydicom.encaps import encapsulate
+        from pydicom.uid import RLELossless
+
+        ds = load_dataset(synthetic_dicom_path)
+        ds.PixelData = encapsulate([b"\x01" * 10, b"\x02" * 6])
+        ds["PixelData"].VR = "OB"
+        ds.file_meta.TransferSyntaxUID = RLELossless
+        path = save_dataset(ds, tmp_path / "encapsulated.dcm")
+
+        header, offset = read_header(path)
+        with open(path, "rb") as fp:
+            # Explicit VR OB header is 12 bytes
+            items = list(iter_fragments(fp, offset + 12))
+        # Basic Offset Table with two 4-byte offsets, then the two fragments
+        assert [length for _, length in items] == [8, 10, 6]
+        assert tail_holds_only_pixel_data(path, header, offset)
+
+    def test_copy_range_falls_back_for_buffers(self):
+        import io
+
+        src = io.BytesIO(b"0123456789")
+        dst = io.BytesIO()
+        assert copy_range(src, dst, 3, 4) == 4
+        assert dst.getvalue() == b"3456"
+
@@ -0,0 +1,125 @@
+#
+# test_dicom_query.py
+# Dicom-Tools-py
+#
+# Tests for streaming C-FIND: early results, limits with C-CANCEL, TTL caching and query stats.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import contextlib
+import itertools
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from pydicom.dataset import Dataset
+from pynetdicom import AE, evt
+from pynetdicom.sop_class import StudyRootQueryRetrieveInformationModelFind, Verification
+
+from DICOM_reencoder.core.association_pool import AssociationPool
+from DICOM_reencoder.dicom_query import QueryCache, create_study_query, iter_query, normalize_query, query_pacs
+
+sys.path.append(str(Path(__file__).parent))
+from pynetdicom_utils import free_port  # type: ignore
+
+
+@contextlib.contextmanager
+def broad_scp(matches=1000, delay=0.0):
+    """Find SCP streaming ``matches`` studies and recording how each request ended."""
+    ae = AE(ae_title="FIND_SCP")
+    ae.add_supported_context(StudyRootQueryRetrieveInformationModelFind)
+    ae.add_supported_context(Verification)
+    state = {"requests": 0, "sent": [], "cancelled": []}
+
+    def handle_find(event):
+        state["requests"] += 1
+        sent = 0
+        for index in range(matches):
+            if event.is_cancelled:
+                state["cancelled"].append(True)
+                yield 0xFE00, None
+                return
+            match = Dataset()
+            match.QueryRetrieveLevel = "STUDY"
+            match.StudyInstanceUID = f"1.2.{index}"
+            sent += 1
+            state["sent"].append(sent)
+            time.sleep(delay)
+            yield 0xFF00, match
+        yield 0x0000, None
+
+    port = free_port()
+    server = ae.start_server(("127.0.0.1", port), block=False, evt_handlers=[(evt.EVT_C_FIND, handle_find)])
+    try:
+        yield port, state
+    finally:
+        server.shutdown()
+        ae.shutdown()
+
+
+def test_iter_query_streams_and_cancels_at_limit():
+    reports = []
+    with broad_scp(delay=0.002) as (port, state), AssociationPool() as pool:
+        results = list(iter_query("127.0.0.1", port, "SCU", "FIND_SCP", create_study_query(patient_name="*"),
+                                  pool=pool, limit=5, report=reports.append))
+        # The association survived the cancel and serves the next query
+        follow_up = query_pacs("127.0.0.1", port, "SCU", "FIND_SCP", create_study_query(), pool=pool, limit=2)
+
+    assert [ds.StudyInstanceUID for ds in results] == [f"1.2.{i}" for i in range(5)]
+    assert len(follow_up) == 2 and pool.stats["reused"] == 1
+    stats = reports[0]
+    assert stats.matches == 5 and stats.cancelled and stats.status == 0xFE00
+    assert stats.first_response_s <= stats.elapsed_s
+    assert state["cancelled"] == [True, True] and max(state["sent"]) < 1000
+
+
+def test_closing_the_generator_cancels_the_request():
+    reports = []
+    with broad_scp(delay=0.002) as (port, state):
+        stream = iter_query("127.0.0.1", port, "SCU", "FIND_SCP", create_study_query(), report=reports.append)
+        first = list(itertools.islice(stream, 3))
+        stream.close()
+
+    assert len(first) == 3
+    assert reports[0].cancelled and reports[0].matches == 3
+    assert state["cancelled"] == [True]
+
+
+def test_cache_serves_repeated_queries_until_ttl():
+    cache = QueryCache(ttl=0.3)
+    reports = []
+    with broad_scp(matches=3) as (port, state):
+        run = lambda query: list(iter_query("127.0.0.1", port, "SCU", "FIND_SCP", query, cache=cache,
+                                            report=reports.append))
+        first = run(create_study_query(modality="CT"))
+        second = run(create_study_query(modality="CT "))
+        second[0].StudyInstanceUID = "9.9"
+        third = run(create_study_query(modality="CT"))
+        other = run(create_study_query(modality="MR"))
+        limited = list(iter_query("127.0.0.1", port, "SCU", "FIND_SCP", create_study_query(modality="MR"),
+                                  cache=cache, limit=1))
+        time.sleep(0.35)
+        expired = run(create_study_query(modality="CT"))
+
+    assert len(first) == len(second) == len(third) == len(expired) == 3
+    assert third[0].StudyInstanceUID == "1.2.0"
+    assert len(other) == 3 and len(limited) == 1
+    assert [r.cached for r in reports] == [False, True, True, False, False]
+    assert state["requests"] == 3 and cache.stats == {"hits": 3, "misses": 3}
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_limit_below_one_is_rejected(limit):
+    # Checked up front, so cached and live queries cannot disagree on what an empty limit yields
+    with pytest.raises(ValueError, match="at least 1"):
+        list(iter_query("127.0.0.1", free_port(), "SCU", "FIND_SCP", create_study_query(), cache=QueryCache(),
+                        limit=limit))
+
+
+def test_normalize_query_ignores_element_order_and_padding():
+    a, b = Dataset(), Dataset()
+    a.PatientID, a.QueryRetrieveLevel = "123 ", "STUDY"
+    b.QueryRetrieveLevel, b.PatientID = "STUDY", "123"
+
+    assert normalize_query(a) == normalize_query(b)
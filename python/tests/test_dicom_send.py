@@ -0,0 +1,104 @@
+#
+# test_dicom_send.py
+# Dicom-Tools-py
+#
+# Tests for the bulk C-STORE sender: context planning, parallel associations, retries and reporting.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+from pydicom.uid import ExplicitVRLittleEndian, ImplicitVRLittleEndian, JPEGBaseline8Bit, generate_uid
+from pynetdicom import AE, _config, evt
+from pynetdicom.sop_class import CTImageStorage
+
+from DICOM_reencoder.dicom_send import DicomSender, SendItem, plan_contexts, scan_files, summarize
+from DICOM_reencoder.storage_scp import StorageSCP
+
+sys.path.append(str(Path(__file__).parent))
+from pynetdicom_utils import free_port  # type: ignore
+
+
+def test_scan_and_plan_contexts(synthetic_series, tmp_path):
+    paths, _ = synthetic_series
+    (paths[0].parent / "notes.txt").write_text("not dicom")
+
+    items, skipped = scan_files([paths[0].parent])
+
+    assert len(items) == len(paths) and [p.name for p in skipped] == ["notes.txt"]
+    ((contexts, planned),) = plan_contexts(items)
+    assert len(contexts) == 1 and len(planned) == len(items)
+    assert contexts[0].transfer_syntax[0] == items[0].transfer_syntax
+
+    many = [SendItem(Path(f"{n}.dcm"), generate_uid(), generate_uid(), JPEGBaseline8Bit, 1) for n in range(130)]
+    plans = plan_contexts(many)
+    assert [len(contexts) for contexts, _ in plans] == [128, 2]
+    assert plans[0][0][0].transfer_syntax == [JPEGBaseline8Bit]
+
+
+@pytest.mark.parametrize("chunked", [True, False])
+def test_send_over_parallel_associations_streams_original_bytes(synthetic_series, tmp_path, monkeypatch, chunked):
+    paths, datasets = synthetic_series
+    seen = []
+    # Process-wide pynetdicom setting: the sender reads it but never changes it
+    monkeypatch.setattr(_config, "STORE_SEND_CHUNKED_DATASET", chunked)
+
+    with StorageSCP(tmp_path / "in", host="127.0.0.1", layout="flat") as scp:
+        sender = DicomSender("127.0.0.1", scp.port, called_aet="DICOMTOOLS_SCP", associations=2,
+                             progress=seen.append)
+        results = sender.send([paths[0].parent])
+    stats = scp.stats()
+
+    assert _config.STORE_SEND_CHUNKED_DATASET is chunked
+    assert [r.ok for r in results] == [True] * len(paths) and len(seen) == len(paths)
+    assert stats["associations"] == 2
+    for path, ds in zip(paths, datasets):
+        received = (tmp_path / "in" / f"{ds.SOPInstanceUID}.dcm").read_bytes()
+        # Dataset bytes are forwarded untouched from the source file
+        assert received.endswith(path.read_bytes()[-len(ds.PixelData):])
+    summary = summarize(results, sender.elapsed)
+    assert summary["sent"] == len(paths) and summary["bytes"] == sum(p.stat().st_size for p in paths)
+
+
+def test_transient_failures_are_retried(synthetic_series):
+    paths, datasets = synthetic_series
+    flaky = datasets[1].SOPInstanceUID
+    attempts = []
+    lock = threading.Lock()
+
+    def handle_store(event):
+        uid = event.request.AffectedSOPInstanceUID
+        with lock:
+            attempts.append(uid)
+            return 0xA700 if uid == flaky and attempts.count(uid) < 3 else 0x0000
+
+    ae = AE(ae_title="STORE_SCP")
+    ae.add_supported_context(CTImageStorage, [ImplicitVRLittleEndian])
+    port = free_port()
+    server = ae.start_server(("127.0.0.1", port), block=False, evt_handlers=[(evt.EVT_C_STORE, handle_store)])
+    try:
+        sender = DicomSender("127.0.0.1", port, called_aet="STORE_SCP", associations=1, retries=2, backoff=0.01)
+        results = sender.send(paths)
+    finally:
+        server.shutdown()
+        ae.shutdown()
+
+    assert [r.ok for r in results] == [True] * len(paths)
+    assert results[1].attempts == 3 and attempts.count(flaky) == 3
+    # The peer only accepted Implicit VR, so the Explicit VR files were converted on the way out
+    assert results[0].item.transfer_syntax == ExplicitVRLittleEndian
+
+
+def test_unreachable_peer_fails_every_instance(synthetic_series):
+    paths, _ = synthetic_series
+
+    sender = DicomSender("127.0.0.1", free_port(), associations=2, retries=1, backoff=0.01, timeout=2)
+    results = sender.send(paths[:2])
+
+    assert [r.ok for r in results] == [False, False]
+    assert [r.attempts for r in results] == [2, 2]
+    assert "Association" in results[0].error
+    assert summarize(results, sender.elapsed)["failed"] == 2
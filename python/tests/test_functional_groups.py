@@ -0,0 +1,152 @@
+#
+# test_functional_groups.py
+# Dicom-Tools-py
+#
+# Tests for enhanced multi-frame functional-group parsing, frame sorting and
+# selection, and volumes built from a single multi-frame object.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+from argparse import Namespace
+
+import numpy as np
+import pydicom
+import pytest
+from pydicom.dataset import Dataset
+
+from DICOM_reencoder import cli as cli_mod
+from DICOM_reencoder.core import build_multiframe_dataset, build_synthetic_series
+from DICOM_reencoder.functional_groups import (
+    build_enhanced_volume,
+    clear_frame_table_cache,
+    parse_frame_table,
+    read_frame_table,
+)
+from DICOM_reencoder.volume_builder import build_volume
+
+# Acquisition order: two temporal positions of a 4-slice stack, slices shuffled
+SLICES = [2, 0, 3, 1, 1, 3, 0, 2]
+TIMES = [1, 1, 1, 1, 2, 2, 2, 2]
+
+
+@pytest.fixture
+def enhanced_path(tmp_path):
+    ds = build_multiframe_dataset(frames=len(SLICES), shape=(6, 5))
+    for index, group in enumerate(ds.PerFrameFunctionalGroupsSequence):
+        group.PlanePositionSequence[0].ImagePositionPatient = [-5.0, 10.0, 2.5 * SLICES[index]]
+        content = group.FrameContentSequence[0]
+        content.DimensionIndexValues = [TIMES[index], SLICES[index] + 1]
+        content.TemporalPositionIndex = TIMES[index]
+        content.StackID = "1"
+        content.InStackPositionNumber = SLICES[index] + 1
+    orientation = Dataset()
+    orientation.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    transform = Dataset()
+    transform.RescaleSlope = 2
+    transform.RescaleIntercept = -100
+    shared = ds.SharedFunctionalGroupsSequence[0]
+    shared.PlaneOrientationSequence = [orientation]
+    shared.PixelValueTransformationSequence = [transform]
+    # A per-frame transform overrides the shared one
+    override = Dataset()
+    override.RescaleSlope = 1
+    override.RescaleIntercept = 0
+    ds.PerFrameFunctionalGroupsSequence[3].PixelValueTransformationSequence = [override]
+    path = tmp_path / "enhanced.dcm"
+    ds.save_as(path)
+    clear_frame_table_cache()
+    return path
+
+
+def test_table_merges_per_frame_and_shared_groups(enhanced_path):
+    table = read_frame_table(enhanced_path)
+
+    assert table.frames == 8 and (table.rows, table.columns) == (6, 5)
+    assert np.allclose(table.position[:, 2], 2.5 * np.array(SLICES))
+    assert np.allclose(table.orientation, [1, 0, 0, 0, 1, 0])
+    assert np.allclose(table.pixel_spacing, 0.5)
+    assert table.rescale_slope.tolist() == [2, 2, 2, 1, 2, 2, 2, 2]
+    assert table.dimension_index.tolist()[:2] == [[1, 3], [1, 1]]
+    assert table.temporal_position.tolist() == TIMES
+    assert set(table.stack_id) == {"1"}
+    assert np.isnan(table.echo_time).all()
+
+
+def test_raw_parse_matches_decoded_dataset(enhanced_path):
+    # Elements read from disk are parsed raw; walking the dataset first converts every element
+    raw = read_frame_table(enhanced_path)
+    decoded = pydicom.dcmread(enhanced_path)
+    decoded.walk(lambda dataset, element: None)
+
+    converted = parse_frame_table(decoded)
+    for name in ("position", "orientation", "rescale_slope", "dimension_index", "temporal_position", "stack_id"):
+        assert np.array_equal(getattr(raw, name), getattr(converted, name))
+
+
+def test_cache_reuses_table_until_file_changes(enhanced_path):
+    first = read_frame_table(enhanced_path)
+
+    assert read_frame_table(enhanced_path) is first
+    ds = pydicom.dcmread(enhanced_path)
+    ds.PerFrameFunctionalGroupsSequence[0].PlanePositionSequence[0].ImagePositionPatient = [0, 0, 99]
+    ds.save_as(enhanced_path)
+    assert read_frame_table(enhanced_path).position[0, 2] == 99
+
+
+def test_select_and_sort(enhanced_path):
+    table = read_frame_table(enhanced_path)
+
+    second = table.select(temporal_position=2)
+    assert second.tolist() == [4, 5, 6, 7]
+    assert table.sort_order(second).tolist() == [6, 4, 7, 5]
+    assert table.select(dimension=[None, 1]).tolist() == [1, 6]
+    assert table.select(stack_id="2").size == 0
+    assert np.allclose(np.diag(table.affine(table.sort_order(second))), [0.5, 0.5, 2.5, 1.0])
+
+
+def test_enhanced_volume_matches_frames(enhanced_path):
+    pixels = pydicom.dcmread(enhanced_path).pixel_array
+
+    volume, affine, metadata = build_enhanced_volume(enhanced_path, temporal_position=1)
+
+    assert volume.shape == (5, 6, 4)
+    order = [1, 3, 0, 2]
+    # Frame 3 carries its own identity transform
+    slope = np.array([2, 1, 2, 2], dtype=np.float32)[:, None, None]
+    intercept = np.array([-100, 0, -100, -100], dtype=np.float32)[:, None, None]
+    assert np.array_equal(volume.T, pixels[order].astype(np.float32) * slope + intercept)
+    assert metadata["frames"] == order
+    assert np.allclose(affine[:3, 3], [-5.0, 10.0, 0.0])
+    with pytest.raises(RuntimeError, match="share slice positions"):
+        build_enhanced_volume(enhanced_path)
+
+
+def test_build_volume_and_cli_accept_multiframe_file(enhanced_path, tmp_path, capsys):
+    volume, _, metadata = build_volume(enhanced_path.parent, frames={"temporal_position": 2})
+
+    assert volume.shape == (5, 6, 4)
+    assert metadata["frames"] == [6, 4, 7, 5]
+    series_dir = tmp_path / "series"
+    build_synthetic_series(series_dir)
+    with pytest.raises(ValueError, match="multi-frame"):
+        build_volume(series_dir, frames={"stack_id": "1"})
+
+    output = tmp_path / "vol.npy"
+    cli_mod.cmd_volume(Namespace(directory=str(enhanced_path), output=str(output), metadata=None, preview=False,
+                                 temporal_position=1))
+    assert np.load(output).shape == (5, 6, 4)
+    assert "shape=[5, 6, 4]" in capsys.readouterr().out
+
+
+def test_out_of_core_export_rejects_multiframe_input(enhanced_path, tmp_path):
+    output = tmp_path / "vol.npy"
+    for source in (enhanced_path, enhanced_path.parent):
+        with pytest.raises(SystemExit, match="single-frame slices"):
+            cli_mod.cmd_volume(Namespace(directory=str(source), output=str(output), metadata=None, preview=False,
+                                         out_of_core=True, temporal_position=1))
+    series_dir = tmp_path / "series"
+    build_synthetic_series(series_dir)
+    with pytest.raises(SystemExit, match="single-frame slices"):
+        cli_mod.cmd_volume(Namespace(directory=str(series_dir), output=str(output), metadata=None, preview=False,
+                                     max_memory=1 << 20, stack_id="1"))
+    assert not output.exists()
@@ -0,0 +1,118 @@
+#
+# test_mpr.py
+# Dicom-Tools-py
+#
+# Tests for NumPy MPR reslicing: orthogonal views, oblique interpolation,
+# chunking, and thick slabs.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import numpy as np
+import pytest
+
+from DICOM_reencoder.core import build_synthetic_series
+from DICOM_reencoder.mpr import Reslicer, plane_axes, window_to_uint8
+
+
+@pytest.fixture
+def reslicer():
+    volume = np.random.default_rng(3).normal(100, 20, size=(12, 10, 8)).astype(np.float32)
+    affine = np.diag([0.5, 0.5, 2.0, 1.0])
+    affine[:3, 3] = (-3.0, 4.0, 10.0)
+    return Reslicer(volume, affine)
+
+
+def _axial_center(reslicer, k):
+    nx, ny, _ = reslicer.volume.shape
+    return (reslicer.affine @ np.array([(nx - 1) / 2, (ny - 1) / 2, k, 1.0]))[:3]
+
+
+class TestOrthogonal:
+    """Test view-based planes."""
+
+    def test_planes_are_views_with_display_orientation(self, reslicer):
+        volume = reslicer.volume
+
+        axial = reslicer.orthogonal("axial", 3)
+        coronal = reslicer.orthogonal("coronal", 4)
+        sagittal = reslicer.orthogonal("sagittal", 5)
+
+        assert np.shares_memory(axial, volume) and np.shares_memory(sagittal, volume)
+        assert np.array_equal(axial, volume[:, :, 3].T)
+        assert np.array_equal(coronal, volume[:, 4, ::-1].T)
+        assert np.array_equal(sagittal, volume[5, :, ::-1].T)
+        assert [reslicer.plane_count(p) for p in ("axial", "coronal", "sagittal")] == [8, 10, 12]
+
+    def test_slab_averages_neighbours(self, reslicer):
+        slab = reslicer.orthogonal("axial", 0, slab=3)
+
+        assert np.allclose(slab, reslicer.volume[:, :, 0:3].mean(axis=2).T)
+
+    def test_location_and_bounds(self, reslicer):
+        assert reslicer.location_mm("axial", 2) == pytest.approx(14.0)
+        assert reslicer.plane_spacing("axial") == pytest.approx(2.0)
+        with pytest.raises(IndexError):
+            reslicer.orthogonal("axial", 8)
+        with pytest.raises(ValueError):
+            reslicer.orthogonal("oblique", 0)
+
+
+class TestOblique:
+    """Test vectorized oblique resampling."""
+
+    @pytest.mark.parametrize("order", ["nearest", "linear"])
+    def test_aligned_plane_matches_axial_slice(self, reslicer, order):
+        image = reslicer.oblique((0, 0, 1), center=_axial_center(reslicer, 5), size=(10, 12), spacing=0.5,
+                                 order=order)
+
+        assert np.allclose(image, reslicer.orthogonal("axial", 5), atol=1e-4)
+
+    def test_trilinear_is_exact_for_linear_fields(self):
+        i, j, k = np.meshgrid(np.arange(9), np.arange(8), np.arange(7), indexing="ij")
+        reslicer = Reslicer((2 * i + 3 * j - k).astype(np.float32), np.eye(4))
+        normal = (0.3, -0.5, 0.8)
+        row_dir, column_dir, unit = plane_axes(normal)
+        center = np.array([4.0, 3.5, 3.0])
+
+        image = reslicer.oblique(normal, center=center, size=(5, 5), spacing=0.7, chunk_rows=2)
+
+        r, c = np.meshgrid(np.arange(5) - 2, np.arange(5) - 2, indexing="ij")
+        points = center + r[..., None] * 0.7 * column_dir + c[..., None] * 0.7 * row_dir
+        expected = 2 * points[..., 0] + 3 * points[..., 1] - points[..., 2]
+        assert np.allclose(image, expected, atol=1e-4)
+        assert abs(np.dot(row_dir, unit)) < 1e-9 and abs(np.dot(column_dir, unit)) < 1e-9
+
+    def test_chunking_does_not_change_result(self, reslicer):
+        normal = (0.2, 0.4, 0.9)
+
+        assert np.array_equal(reslicer.oblique(normal, chunk_rows=1), reslicer.oblique(normal, chunk_rows=1000))
+
+    def test_half_step_offset_interpolates_between_slices(self, reslicer):
+        image = reslicer.oblique((0, 0, 1), center=_axial_center(reslicer, 2), offset_mm=1.0, size=(10, 12),
+                                 spacing=0.5)
+
+        expected = (reslicer.orthogonal("axial", 2) + reslicer.orthogonal("axial", 3)) / 2
+        assert np.allclose(image, expected, atol=1e-4)
+
+    def test_thick_slab_matches_orthogonal_slab(self, reslicer):
+        image = reslicer.oblique((0, 0, 1), center=_axial_center(reslicer, 4), size=(10, 12), spacing=0.5,
+                                 slab_mm=6.0, slab_step=2.0)
+
+        assert np.allclose(image, reslicer.orthogonal("axial", 4, slab=3), atol=1e-4)
+
+    def test_outside_samples_use_fill(self, reslicer):
+        image = reslicer.oblique((0, 0, 1), offset_mm=500.0, size=(4, 4), fill=-1.0)
+
+        assert np.all(image == -1.0)
+
+
+def test_from_directory_and_window(tmp_path):
+    series_dir = tmp_path / "series"
+    build_synthetic_series(series_dir)
+
+    reslicer = Reslicer.from_directory(series_dir)
+    pixels = window_to_uint8(reslicer.orthogonal("coronal", 0))
+
+    assert reslicer.metadata["series_uid"]
+    assert pixels.shape == (4, 32)
+    assert pixels.dtype == np.uint8 and pixels.max() == 255
@@ -0,0 +1,129 @@
+#
+# test_negotiation.py
+# Dicom-Tools-py
+#
+# Tests for transfer syntax policies: proposed contexts, raw storage of compressed instances and statistics.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import contextlib
+import copy
+import logging
+import sys
+from pathlib import Path
+
+import pydicom
+import pytest
+from pydicom.uid import (
+    ExplicitVRBigEndian,
+    ExplicitVRLittleEndian,
+    ImplicitVRLittleEndian,
+    JPEG2000Lossless,
+    JPEGBaseline8Bit,
+    RLELossless,
+)
+from pynetdicom import AE, StoragePresentationContexts, evt
+from pynetdicom.sop_class import CTImageStorage, StudyRootQueryRetrieveInformationModelGet
+
+from DICOM_reencoder.core.negotiation import POLICIES, TransferSyntaxStats, policy_syntaxes, storage_contexts
+from DICOM_reencoder.dicom_retrieve import create_retrieve_query, retrieve_contexts, retrieve_with_get
+from DICOM_reencoder.storage_scp import StorageSCP
+
+sys.path.append(str(Path(__file__).parent))
+from pynetdicom_utils import free_port  # type: ignore
+
+
+@pytest.fixture
+def rle_datasets(synthetic_datasets):
+    compressed = []
+    for ds in synthetic_datasets:
+        ds = copy.deepcopy(ds)
+        ds.compress(RLELossless)
+        compressed.append(ds)
+    return compressed
+
+
+@contextlib.contextmanager
+def compressed_get_scp(datasets):
+    """C-GET SCP that prefers RLE Lossless for its C-STORE sub-operations, like a PACS storing RLE."""
+    ae = AE(ae_title="GET_SCP")
+    ae.add_supported_context(StudyRootQueryRetrieveInformationModelGet)
+    ae.add_supported_context(CTImageStorage, [RLELossless, ExplicitVRLittleEndian, ImplicitVRLittleEndian],
+                             scu_role=True, scp_role=True)
+
+    def handle_get(event):
+        yield len(datasets)
+        for ds in datasets:
+            yield 0xFF00, ds
+
+    port = free_port()
+    server = ae.start_server(("127.0.0.1", port), block=False, evt_handlers=[(evt.EVT_C_GET, handle_get)])
+    try:
+        yield port
+    finally:
+        server.shutdown()
+        ae.shutdown()
+
+
+def test_policies_order_and_contexts():
+    assert policy_syntaxes("native") == [ExplicitVRLittleEndian, ImplicitVRLittleEndian]
+    assert policy_syntaxes("lossless")[0] == JPEG2000Lossless and JPEGBaseline8Bit not in POLICIES["lossless"]
+    assert POLICIES["lossy"][:len(POLICIES["lossless"])] == POLICIES["lossless"]
+    assert JPEGBaseline8Bit in POLICIES["lossy"]
+    with pytest.raises(ValueError):
+        policy_syntaxes("fastest")
+
+    contexts = storage_contexts("lossless", [CTImageStorage])
+    assert len(contexts) == 1 and contexts[0].transfer_syntax == POLICIES["lossless"]
+
+    _, requested, roles = retrieve_contexts("StudyRoot", "GET")
+    storage = requested[1:]
+    assert len(storage) == len(roles) == len(StoragePresentationContexts)
+    assert all(cx.transfer_syntax == POLICIES["native"] for cx in storage)
+    assert ExplicitVRBigEndian not in storage[0].transfer_syntax
+
+
+def test_get_keeps_compressed_encoding(rle_datasets, tmp_path):
+    query = create_retrieve_query("STUDY", rle_datasets[0].StudyInstanceUID)
+    with compressed_get_scp(rle_datasets) as port:
+        count = retrieve_with_get("127.0.0.1", port, "SCU", "GET_SCP", str(tmp_path / "lossless"), query,
+                                  fsync="none", policy="lossless")
+        # The native policy never proposes RLE, so the PACS has to send uncompressed data or fail
+        native = retrieve_with_get("127.0.0.1", port, "SCU", "GET_SCP", str(tmp_path / "native"), query,
+                                   fsync="none", policy="native")
+
+    assert count == len(rle_datasets) and native == 0
+    for original in rle_datasets:
+        received = pydicom.dcmread(tmp_path / "lossless" / f"{original.SOPInstanceUID}.dcm")
+        assert received.file_meta.TransferSyntaxUID == RLELossless
+        assert received.PixelData == original.PixelData
+
+
+def test_storage_scp_prefers_policy_order_and_counts(rle_datasets, tmp_path):
+    ae = AE(ae_title="SCU")
+    ae.add_requested_context(CTImageStorage, [ExplicitVRLittleEndian, RLELossless])
+    with StorageSCP(tmp_path, host="127.0.0.1", transfer_syntaxes="lossless") as scp:
+        assoc = ae.associate("127.0.0.1", scp.port, ae_title="DICOMTOOLS_SCP")
+        assert assoc.is_established
+        statuses = [assoc.send_c_store(ds).Status for ds in rle_datasets]
+        assoc.release()
+    stats = scp.stats()["transfer_syntaxes"]
+
+    assert statuses == [0x0000] * len(rle_datasets)
+    assert list(stats) == ["RLE Lossless"]
+    assert stats["RLE Lossless"]["contexts"] == 1
+    assert stats["RLE Lossless"]["instances"] == len(rle_datasets) and stats["RLE Lossless"]["bytes"] > 0
+
+
+def test_transfer_syntax_stats_log(caplog):
+    stats = TransferSyntaxStats()
+    stats.record(ExplicitVRLittleEndian, 2_000_000)
+    stats.record("1.2.3.4", 10)
+    with caplog.at_level("INFO"):
+        stats.log(logging.getLogger("negotiation-test"))
+
+    summary = stats.summary()
+    assert summary["Explicit VR Little Endian"] == {"uid": ExplicitVRLittleEndian, "contexts": 0,
+                                                    "instances": 1, "bytes": 2_000_000}
+    assert summary["1.2.3.4"]["instances"] == 1
+    assert "Explicit VR Little Endian: 0 context(s) accepted, 1 instance(s), 2.0 MB" in caplog.text
@@ -0,0 +1,71 @@
+#
+# test_network_benchmark.py
+# Dicom-Tools-py
+#
+# Tests for the network benchmark harness: percentile math and small pooled/unpooled runs.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import json
+
+import pytest
+
+from DICOM_reencoder.network_benchmark import NetworkBenchmark, WorkloadResult, percentiles, run_workload
+
+
+def test_percentiles_and_rates():
+    samples = [n / 1000 for n in range(1, 101)]
+    summary = percentiles(samples)
+    assert summary["p50"] == 50.0 and summary["p99"] == 99.0 and summary["max"] == 100.0
+    assert summary["min"] == 1.0 and summary["mean"] == 50.5
+    assert percentiles([]) == {}
+
+    result = WorkloadResult("store", concurrency=2, pooled=True, operations=10, associations=2, instances=10,
+                            bytes=5_000_000, seconds=2.0, latencies=[0.1] * 10)
+    report = result.to_dict()
+    assert report["operations_per_s"] == 5.0 and report["associations_per_s"] == 1.0
+    assert report["mb_per_s"] == 2.5 and report["latency_ms"]["p90"] == 100.0
+
+
+def test_run_workload_counts_errors():
+    calls = []
+
+    def flaky(pool):
+        calls.append(pool)
+        if len(calls) % 3 == 0:
+            raise RuntimeError("boom")
+        return 1, 10
+
+    result = run_workload("fake", flaky, operations=9, concurrency=3, pooled=False)
+    assert result.operations == 6 and result.errors == 3 and result.instances == 6 and result.bytes == 60
+    assert result.associations == 9 and len(result.latencies) == 6 and set(calls) == {None}
+    report = result.to_dict()
+    assert report["error_types"] == {"RuntimeError": 3}
+    assert report["error_samples"] == ["RuntimeError: boom"] * 3
+
+
+def test_benchmark_drives_every_workload(tmp_path):
+    with NetworkBenchmark(str(tmp_path), slices=3, shape=(32, 32), operations=6, concurrency=2) as bench:
+        report = bench.run()
+
+    assert report["config"]["slices"] == 3 and report["config"]["series_bytes"] > 0
+    results = {entry["workload"]: entry for entry in report["results"]}
+    assert list(results) == ["echo", "find", "store", "get"]
+    for entry in results.values():
+        assert entry["errors"] == 0 and entry["operations"] == 6 and entry["error_types"] == {}
+        assert entry["latency_ms"]["p50"] > 0
+        # Pooled runs reuse at most one association per thread
+        assert entry["associations"] <= 2
+    assert results["store"]["instances"] == 6 and results["store"]["mb_per_s"] > 0
+    assert results["get"]["instances"] == 18 and results["get"]["bytes"] == 6 * report["config"]["series_bytes"]
+    assert len(list((tmp_path / "retrieved").glob("*.dcm"))) == 3
+    json.dumps(report)
+
+
+@pytest.mark.parametrize("workload", ["echo", "store"])
+def test_unpooled_runs_negotiate_per_request(tmp_path, workload):
+    with NetworkBenchmark(str(tmp_path), slices=2, shape=(16, 16), operations=5, concurrency=2, pooled=False,
+                          max_pdu=65536) as bench:
+        result = bench.run_one(workload)
+
+    assert result.errors == 0 and result.associations == 5
@@ -0,0 +1,173 @@
+#
+# test_nifti_writer.py
+# Dicom-Tools-py
+#
+# Tests for the native NIfTI writer: headers, LPS/RAS geometry, parallel gzip
+# members, and the native dicom-to-nifti backend against SimpleITK.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import gzip
+import struct
+import zlib
+from io import BytesIO
+
+import numpy as np
+import pydicom
+import pytest
+
+from DICOM_reencoder.core import build_synthetic_series
+from DICOM_reencoder.nifti_writer import ParallelGzipWriter, nifti_header, write_nifti, write_planes
+from DICOM_reencoder.series_to_nifti import convert_series_to_nifti
+
+
+def _oblique_affine():
+    angle = np.deg2rad(30)
+    rotation = np.array([[np.cos(angle), 0, np.sin(angle)], [0, 1, 0], [-np.sin(angle), 0, np.cos(angle)]])
+    affine = np.eye(4)
+    affine[:3, :3] = rotation * np.array([0.5, 0.8, 2.5])
+    affine[:3, 3] = (-12.0, 30.5, 7.25)
+    return affine
+
+
+def _gzip_members(data: bytes) -> int:
+    count = 0
+    while data:
+        decompressor = zlib.decompressobj(wbits=31)
+        decompressor.decompress(data)
+        data = decompressor.unused_data
+        count += 1
+    return count
+
+
+class TestHeader:
+    """Test header packing."""
+
+    def test_nifti1_layout(self):
+        header = nifti_header((4, 3, 2), np.int16, np.diag([0.5, 0.5, 2.0, 1.0]))
+
+        assert len(header) == 352
+        assert struct.unpack_from("<i", header, 0)[0] == 348
+        assert header[344:348] == b"n+1\0"
+        assert struct.unpack_from("<8h", header, 40)[:4] == (3, 4, 3, 2)
+        assert struct.unpack_from("<2h", header, 70) == (4, 16)
+        assert struct.unpack_from("<f", header, 108)[0] == 352.0
+        # LPS x/y flip into RAS
+        assert struct.unpack_from("<4f", header, 280) == (-0.5, 0.0, 0.0, -0.0)
+
+    def test_nifti2_layout(self):
+        header = nifti_header((4, 3, 2), np.float32, _oblique_affine(), version=2)
+
+        assert len(header) == 544
+        assert struct.unpack_from("<i8s", header, 0) == (540, b"n+2\0\r\n\x1a\n")
+        assert struct.unpack_from("<2h", header, 12) == (16, 32)
+        assert struct.unpack_from("<4q", header, 16) == (3, 4, 3, 2)
+        assert struct.unpack_from("<q", header, 168)[0] == 544
+        assert np.allclose(struct.unpack_from("<3d", header, 112), (0.5, 0.8, 2.5))
+
+    def test_unsupported_dtype_rejected(self):
+        with pytest.raises(ValueError):
+            nifti_header((2, 2, 2), np.complex64, np.eye(4))
+
+
+def test_parallel_gzip_writes_concatenated_members():
+    payload = np.random.default_rng(1).integers(0, 50, size=10_000, dtype=np.uint8).tobytes()
+    sink = BytesIO()
+
+    with ParallelGzipWriter(sink, workers=3, block_size=1000) as writer:
+        for start in range(0, len(payload), 777):
+            writer.write(payload[start:start + 777])
+
+    assert gzip.decompress(sink.getvalue()) == payload
+    assert _gzip_members(sink.getvalue()) == 10
+    assert writer.bytes_in == len(payload)
+
+
+@pytest.mark.parametrize("name", ["volume.nii", "volume.nii.gz"])
+def test_write_nifti_roundtrip_with_simpleitk(tmp_path, name):
+    sitk = pytest.importorskip("SimpleITK")
+    volume = np.random.default_rng(2).integers(-500, 500, size=(7, 5, 4)).astype(np.int16)
+    affine = _oblique_affine()
+
+    write_nifti(volume, affine, tmp_path / name, block_size=64)
+    image = sitk.ReadImage(str(tmp_path / name))
+
+    assert np.array_equal(sitk.GetArrayFromImage(image), volume.T)
+    assert np.allclose(image.GetSpacing(), (0.5, 0.8, 2.5), atol=1e-5)
+    assert np.allclose(image.GetOrigin(), affine[:3, 3], atol=1e-4)
+    assert np.allclose(np.reshape(image.GetDirection(), (3, 3)), affine[:3, :3] / (0.5, 0.8, 2.5), atol=1e-5)
+    assert not list(tmp_path.glob("*.part"))
+
+
+@pytest.mark.parametrize("name", ["volume.nii", "volume.nii.gz"])
+def test_write_planes_removes_partial_file_on_error(tmp_path, name):
+    def planes():
+        yield np.zeros((5, 7), dtype=np.int16)
+        raise OSError("decode failed")
+
+    with pytest.raises(OSError, match="decode failed"):
+        write_planes(planes(), tmp_path / name, (7, 5, 3), np.int16, np.eye(4), block_size=64)
+    with pytest.raises(RuntimeError, match="Expected 3 slices"):
+        write_planes([np.zeros((5, 7), dtype=np.int16)], tmp_path / name, (7, 5, 3), np.int16, np.eye(4))
+    assert not list(tmp_path.iterdir())
+
+
+def test_native_backend_matches_simpleitk(tmp_path):
+    sitk = pytest.importorskip("SimpleITK")
+    series_dir = tmp_path / "series"
+    build_synthetic_series(series_dir, slices=6)
+
+    native, meta = convert_series_to_nifti(series_dir, output=str(tmp_path / "native.nii.gz"), workers=2)
+    reference, ref_meta = convert_series_to_nifti(series_dir, output=str(tmp_path / "sitk.nii.gz"),
+                                                  backend="simpleitk")
+
+    assert meta["backend"] == "native" and ref_meta["backend"] == "simpleitk"
+    assert meta["series_uid"] == ref_meta["series_uid"]
+    assert meta["size"] == ref_meta["size"]
+    for key in ("spacing", "origin", "direction"):
+        assert np.allclose(meta[key], ref_meta[key], atol=1e-5)
+    assert np.array_equal(sitk.GetArrayFromImage(sitk.ReadImage(str(native))),
+                          sitk.GetArrayFromImage(sitk.ReadImage(str(reference))))
+
+
+@pytest.mark.parametrize("rescales, dtype", [
+    ([(1, -1024), (1, -1023), (1, -1024)], np.int16),  # CT: per-slice whole intercepts stay integer
+    ([(0.5, 10)] * 3, np.uint16),  # Shared rescale kept as scl_slope/scl_inter
+    ([(0.5, 10), (0.25, 0), (0.5, 10)], np.float32),
+])
+def test_native_backend_keeps_integer_voxels(tmp_path, rescales, dtype):
+    sitk = pytest.importorskip("SimpleITK")
+    series_dir = tmp_path / "series"
+    for path, (slope, intercept) in zip(build_synthetic_series(series_dir, slices=3, shape=(16, 16)), rescales):
+        ds = pydicom.dcmread(path)
+        ds.BitsStored, ds.HighBit = 12, 11
+        ds.RescaleSlope, ds.RescaleIntercept = slope, intercept
+        ds.save_as(path)
+
+    native, _ = convert_series_to_nifti(series_dir, output=str(tmp_path / "native.nii"))
+    reference, _ = convert_series_to_nifti(series_dir, output=str(tmp_path / "sitk.nii"), backend="simpleitk")
+
+    header = native.read_bytes()[:348]
+    assert struct.unpack_from("<h", header, 70)[0] == {np.int16: 4, np.uint16: 512, np.float32: 16}[dtype]
+    assert native.stat().st_size == 352 + 16 * 16 * 3 * np.dtype(dtype).itemsize
+    assert np.allclose(sitk.GetArrayFromImage(sitk.ReadImage(str(native))),
+                       sitk.GetArrayFromImage(sitk.ReadImage(str(reference))))
+
+
+def test_native_backend_selects_series_and_writes_nifti2(tmp_path):
+    series_dir = tmp_path / "mixed"
+    first = build_synthetic_series(tmp_path / "a", slices=3)
+    second = build_synthetic_series(tmp_path / "b", slices=2, shape=(8, 8))
+    series_dir.mkdir()
+    for path in first + second:
+        path.rename(series_dir / f"{path.parent.name}_{path.name}")
+    uid = pydicom.dcmread(series_dir / f"b_{second[0].name}").SeriesInstanceUID
+
+    output, meta = convert_series_to_nifti(series_dir, series_uid=uid, output=str(tmp_path / "b.nii"), version=2)
+
+    assert meta["size"] == [8, 8, 2]
+    assert meta["compress"] is False
+    assert output.read_bytes()[4:12] == b"n+2\0\r\n\x1a\n"
+    assert output.stat().st_size == 544 + 8 * 8 * 2 * 2
+    with pytest.raises(RuntimeError, match="not found"):
+        convert_series_to_nifti(series_dir, series_uid="1.2.3", output=str(tmp_path / "x.nii"))
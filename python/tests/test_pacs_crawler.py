@@ -0,0 +1,194 @@
+#
+# test_pacs_crawler.py
+# Dicom-Tools-py
+#
+# Tests for the hierarchical PACS crawler: adaptive date splitting, per-level concurrency and resume.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import contextlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date
+from pathlib import Path
+
+import pytest
+from pydicom.dataset import Dataset
+from pynetdicom import AE, evt
+from pynetdicom.sop_class import StudyRootQueryRetrieveInformationModelFind, Verification
+
+from DICOM_reencoder.pacs_crawler import DateWindow, PacsCrawler, date_windows, open_index
+
+sys.path.append(str(Path(__file__).parent))
+from pynetdicom_utils import free_port  # type: ignore
+
+# 2024-01-01 has five studies through the day; the other days two each
+STUDY_TIMES = {1: ["080000", "090000", "130000", "150000", "200000"], 2: ["080000", "150000"],
+               3: ["080000", "150000"], 5: ["100000", "110000"]}
+
+
+def _archive():
+    studies = []
+    for day, times in STUDY_TIMES.items():
+        for n, study_time in enumerate(times):
+            study = Dataset()
+            study.StudyInstanceUID = f"1.2.{day}.{n}"
+            study.StudyDate = f"202401{day:02d}"
+            study.StudyTime = study_time
+            study.PatientID = f"P{day}{n}"
+            study.ModalitiesInStudy = ["CT", "SR"]
+            studies.append(study)
+    return studies
+
+
+def _in_range(value, spec):
+    if not spec:
+        return True
+    low, _, high = str(spec).partition("-")
+    return (low or value) <= value <= (high or value)
+
+
+@contextlib.contextmanager
+def archive_scp(limit=3, delay=0.01):
+    """Find SCP over a small archive that truncates responses at ``limit`` matches, like a real PACS."""
+    studies = _archive()
+    ae = AE(ae_title="ARCHIVE")
+    ae.add_supported_context(StudyRootQueryRetrieveInformationModelFind)
+    ae.add_supported_context(Verification)
+    state = {"queries": Counter(), "active": Counter(), "peak": Counter()}
+    lock = threading.Lock()
+
+    def matches(identifier):
+        level = identifier.QueryRetrieveLevel
+        if level == "STUDY":
+            return [s for s in studies if _in_range(s.StudyDate, identifier.get("StudyDate"))
+                    and _in_range(s.StudyTime, identifier.get("StudyTime"))]
+        if level == "SERIES":
+            return [_child(identifier.StudyInstanceUID, n, "SeriesInstanceUID", level) for n in range(2)]
+        return [_child(identifier.SeriesInstanceUID, n, "SOPInstanceUID", level) for n in range(2)]
+
+    def handle_find(event):
+        identifier = event.identifier
+        level = identifier.QueryRetrieveLevel
+        with lock:
+            state["queries"][level] += 1
+            state["active"][level] += 1
+            state["peak"][level] = max(state["peak"][level], state["active"][level])
+        try:
+            time.sleep(delay)
+            for match in matches(identifier)[:limit]:
+                if event.is_cancelled:
+                    yield 0xFE00, None
+                    return
+                match.QueryRetrieveLevel = level
+                yield 0xFF00, match
+        finally:
+            with lock:
+                state["active"][level] -= 1
+        yield 0x0000, None
+
+    port = free_port()
+    server = ae.start_server(("127.0.0.1", port), block=False, evt_handlers=[(evt.EVT_C_FIND, handle_find)])
+    try:
+        yield port, state
+    finally:
+        server.shutdown()
+        ae.shutdown()
+
+
+def _child(parent_uid, n, keyword, level):
+    ds = Dataset()
+    setattr(ds, keyword, f"{parent_uid}.{n + 1}")
+    if level == "IMAGE":
+        ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.2"
+        ds.InstanceNumber = n + 1
+    return ds
+
+
+def test_date_window_splits_days_then_times():
+    week = DateWindow(date(2024, 1, 1), date(2024, 1, 7))
+    first, second = week.split()
+    assert (first.study_date, second.study_date) == ("20240101-20240104", "20240105-20240107")
+
+    morning, evening = DateWindow(date(2024, 1, 1), date(2024, 1, 1)).split()
+    assert (morning.study_time, evening.study_time) == ("000000-115959", "120000-235959")
+    assert morning.key == "study:20240101-20240101:000000-115959"
+    assert DateWindow(date(2024, 1, 1), date(2024, 1, 1), 0, 20).split(min_minutes=15) == []
+    assert [w.study_date for w in date_windows(date(2024, 1, 1), date(2024, 1, 5), 2)] == [
+        "20240101-20240102", "20240103-20240104", "20240105-20240105"]
+
+
+def test_crawl_splits_windows_at_result_limit(tmp_path):
+    with archive_scp(limit=3) as (port, state), open_index(tmp_path / "inventory.sqlite") as index:
+        crawler = PacsCrawler("127.0.0.1", port, index=index, called_aet="ARCHIVE", depth="image", max_results=3,
+                              span_days=7, workers={"study": 2, "series": 3, "image": 3})
+        stats = crawler.crawl(date(2024, 1, 1), date(2024, 1, 7))
+        counts = index.counts()
+
+    assert stats["errors"] == 0 and stats["truncated"] == 0 and stats["splits"] >= 3
+    assert counts == {"study": 11, "series": 22, "image": 44}
+    assert stats["study"] == 11 and stats["image"] == 44
+    assert 1 < state["peak"]["SERIES"] <= 3 and state["peak"]["IMAGE"] <= 3
+    db = sqlite3.connect(tmp_path / "inventory.sqlite")
+    assert db.execute("SELECT ModalitiesInStudy FROM study WHERE StudyInstanceUID = '1.2.1.0'").fetchone() == (
+        "CT\\SR",)
+    assert db.execute("SELECT COUNT(*) FROM image WHERE StudyInstanceUID = '1.2.5.1'").fetchone() == (4,)
+
+
+@pytest.mark.parametrize("name", ["inventory.sqlite", "inventory.ndjson"])
+def test_crawl_resumes_from_index(tmp_path, name):
+    path = tmp_path / name
+    with archive_scp(limit=100, delay=0.0) as (port, state):
+        with open_index(path) as index:
+            PacsCrawler("127.0.0.1", port, index=index, called_aet="ARCHIVE", depth="study",
+                        span_days=3).crawl(date(2024, 1, 1), date(2024, 1, 7))
+        assert state["queries"] == Counter({"STUDY": 3})
+
+        # The next run only issues the child queries the first one never reached
+        with open_index(path) as index:
+            stats = PacsCrawler("127.0.0.1", port, index=index, called_aet="ARCHIVE", depth="series",
+                                span_days=3).crawl(date(2024, 1, 1), date(2024, 1, 7))
+            counts = index.counts()
+        assert state["queries"] == Counter({"STUDY": 3, "SERIES": 11})
+        assert stats["skipped"] == 3 and counts["series"] == 22
+
+        with open_index(path) as index:
+            stats = PacsCrawler("127.0.0.1", port, index=index, called_aet="ARCHIVE", depth="series",
+                                span_days=3).crawl(date(2024, 1, 1), date(2024, 1, 7))
+        assert stats["queries"] == 0 and state["queries"]["SERIES"] == 11
+
+    if name.endswith(".ndjson"):
+        entries = [json.loads(line) for line in path.read_text().splitlines()]
+        assert sum(1 for e in entries if e.get("level") == "series") == 22
+
+
+def test_resume_skips_split_windows(tmp_path):
+    path = tmp_path / "inventory.sqlite"
+    with archive_scp(limit=3, delay=0.0) as (port, state):
+        with open_index(path) as index:
+            PacsCrawler("127.0.0.1", port, index=index, called_aet="ARCHIVE", depth="study", max_results=3,
+                        span_days=7).crawl(date(2024, 1, 1), date(2024, 1, 7))
+        first_run = state["queries"]["STUDY"]
+
+        # Lose one leaf window, as if the run had been interrupted before it finished
+        db = sqlite3.connect(path)
+        with db:
+            db.execute("DELETE FROM done WHERE unit = 'study:20240103-20240104'")
+        db.close()
+
+        with open_index(path) as index:
+            stats = PacsCrawler("127.0.0.1", port, index=index, called_aet="ARCHIVE", depth="study",
+                                max_results=3, span_days=7).crawl(date(2024, 1, 1), date(2024, 1, 7))
+        assert state["queries"]["STUDY"] == first_run + 1
+        assert stats["queries"] == 1 and stats["splits"] == 0
+
+
+def test_unreachable_peer_leaves_units_pending(tmp_path):
+    with open_index(tmp_path / "inventory.sqlite") as index:
+        stats = PacsCrawler("127.0.0.1", free_port(), index=index, span_days=7).crawl(date(2024, 1, 1),
+                                                                                     date(2024, 1, 7))
+        assert stats["errors"] == 1 and index.done_units() == set()
@@ -0,0 +1,124 @@
+#
+# test_projection.py
+# Dicom-Tools-py
+#
+# Tests for MIP/MinIP/AvgIP projections: chunked reductions, sliding-slab
+# reuse, out-of-core inputs, and the project CLI subcommand.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+from argparse import Namespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from DICOM_reencoder import cli as cli_mod
+from DICOM_reencoder.chunked_volume import open_chunked, write_chunked
+from DICOM_reencoder.core import build_synthetic_series
+from DICOM_reencoder.mpr import Reslicer, orient_plane
+from DICOM_reencoder.projection import SlabProjector, normalize_mode, project, project_slabs
+
+REDUCERS = {"max": np.max, "min": np.min, "mean": np.mean}
+
+
+@pytest.fixture
+def volume():
+    return np.random.default_rng(11).integers(-1000, 3000, size=(14, 11, 9)).astype(np.int16)
+
+
+def _brute_slab(volume, axis, index, thickness, mode):
+    lo = max(0, index - thickness // 2)
+    hi = min(volume.shape[axis], index - thickness // 2 + thickness)
+    return REDUCERS[mode](np.take(volume, range(lo, hi), axis=axis), axis=axis)
+
+
+class TestProject:
+    """Test full-range projections."""
+
+    @pytest.mark.parametrize("mode", ["max", "min", "mean"])
+    @pytest.mark.parametrize("axis", [0, 1, 2])
+    def test_matches_numpy_with_tiny_chunks(self, volume, mode, axis):
+        result = project(volume, axis, mode, workers=3, chunk_bytes=64)
+
+        assert np.allclose(result, REDUCERS[mode](volume, axis=axis))
+
+    def test_sub_range_and_aliases(self, volume):
+        result = project(volume, "coronal", "mip", start=2, stop=5)
+
+        assert result.dtype == volume.dtype
+        assert np.array_equal(result, volume[:, 2:5, :].max(axis=1))
+        assert normalize_mode("MinIP") == "min"
+        with pytest.raises(ValueError):
+            normalize_mode("median")
+
+    def test_out_of_core_sources(self, volume, tmp_path):
+        np.save(tmp_path / "vol.npy", np.asfortranarray(volume))
+        memmap = np.load(tmp_path / "vol.npy", mmap_mode="r")
+        store = open_chunked(write_chunked(volume, tmp_path / "vol.chunks", chunk_shape=(4, 4, 4)))
+
+        assert np.array_equal(project(memmap, "axial", "max", chunk_bytes=100), volume.max(axis=2))
+        assert np.array_equal(project(store, "sagittal", "min", chunk_bytes=100), volume.min(axis=0))
+
+
+class TestSlabProjector:
+    """Test sliding slabs with reuse."""
+
+    @pytest.mark.parametrize("mode", ["max", "min", "mean"])
+    def test_forward_scroll_reads_each_plane_once(self, volume, mode):
+        projector = SlabProjector(volume, "axial", 4, mode)
+
+        for index in range(volume.shape[2]):
+            assert np.allclose(projector.slab(index), _brute_slab(volume, 2, index, 4, mode))
+
+        assert projector.planes_read == volume.shape[2]
+
+    def test_jumps_and_backward_moves_rebuild(self, volume):
+        projector = SlabProjector(volume, 0, 5, "max")
+
+        for index in (7, 3, 3, 12, 2, 13):
+            assert np.array_equal(projector.slab(index), _brute_slab(volume, 0, index, 5, "max"))
+
+    def test_result_is_not_shared_with_cache(self, volume):
+        projector = SlabProjector(volume, 1, 3, "max")
+        first = projector.slab(0)
+        first[...] = 0
+
+        assert np.array_equal(projector.slab(0), _brute_slab(volume, 1, 0, 3, "max"))
+
+    def test_project_slabs_in_strips(self, volume):
+        result = project_slabs(volume, "coronal", 3, "mip", step=2, workers=4, chunk_bytes=50)
+
+        expected = np.stack([_brute_slab(volume, 1, index, 3, "max") for index in range(0, 11, 2)])
+        assert np.array_equal(result, expected)
+
+
+def test_oblique_slab_modes_match_orthogonal():
+    volume = np.random.default_rng(5).normal(size=(8, 7, 6)).astype(np.float32)
+    reslicer = Reslicer(volume, np.eye(4))
+    center = np.array([3.5, 3.0, 2.0])
+
+    for mode in ("max", "min"):
+        image = reslicer.oblique((0, 0, 1), center=center, size=(7, 8), spacing=1.0, slab_mm=3.0, slab_mode=mode)
+        assert np.allclose(image, reslicer.orthogonal("axial", 2, slab=3, slab_mode=mode))
+
+
+def test_cli_project_image_and_slabs(tmp_path, capsys):
+    series_dir = tmp_path / "series"
+    build_synthetic_series(series_dir, slices=5)
+    volume_path = tmp_path / "vol.npy"
+    cli_mod.cmd_volume(Namespace(directory=str(series_dir), output=str(volume_path), metadata=None, preview=False))
+    volume = np.load(volume_path)
+
+    png = tmp_path / "mip.png"
+    cli_mod.cmd_project(Namespace(source=str(series_dir), output=str(png), mode="mip", plane="coronal",
+                                  window_center=None, window_width=None))
+    assert Image.open(png).size == (32, 5)
+
+    stack_path = tmp_path / "slabs.npy"
+    cli_mod.cmd_project(Namespace(source=str(volume_path), output=str(stack_path), mode="avgip", plane="sagittal",
+                                  slab=3, step=2))
+    stack = np.load(stack_path)
+    assert stack.shape == (16, 5, 32)
+    assert np.allclose(stack[3], orient_plane(_brute_slab(volume, 0, 6, 3, "mean"), "sagittal"))
+    assert "slabs of 3 planes" in capsys.readouterr().out
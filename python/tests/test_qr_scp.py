@@ -0,0 +1,137 @@
+#
+# test_qr_scp.py
+# Dicom-Tools-py
+#
+# Tests for the local Query/Retrieve SCP: header index, compiled matching, C-FIND/C-GET/C-MOVE.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import sys
+from pathlib import Path
+
+import pydicom
+import pytest
+from pydicom.dataset import Dataset
+
+from DICOM_reencoder.core import build_synthetic_series
+from DICOM_reencoder.dicom_query import create_patient_query, create_series_query, create_study_query, iter_query
+from DICOM_reencoder.dicom_retrieve import create_retrieve_query, retrieve_with_get, retrieve_with_move
+from DICOM_reencoder.qr_scp import HeaderIndex, QueryRetrieveSCP, compile_query
+
+sys.path.append(str(Path(__file__).parent))
+from pynetdicom_utils import store_scp  # type: ignore
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """A CT study from 2024-03-01 and an MR study from 2023-06-15 for a different patient."""
+    root = tmp_path / "archive"
+    ct = build_synthetic_series(root / "ct", slices=3)
+    mr = build_synthetic_series(root / "mr", slices=2)
+    for path in ct:
+        ds = pydicom.dcmread(path)
+        ds.StudyDate, ds.StudyTime = "20240301", "083000.25"
+        ds.save_as(path)
+    for path in mr:
+        ds = pydicom.dcmread(path)
+        ds.Modality, ds.PatientName, ds.PatientID = "MR", "Other^Person", "OTHER-9"
+        ds.StudyDate, ds.StudyTime = "20230615", "170000"
+        ds.save_as(path)
+    (root / "README.txt").write_text("not dicom")
+    return root, [pydicom.dcmread(p) for p in ct], [pydicom.dcmread(p) for p in mr]
+
+
+def _find(scp, query, model="StudyRoot"):
+    reports = []
+    results = list(iter_query("127.0.0.1", scp.port, "SCU", "DICOMTOOLS_QR", query, model, report=reports.append))
+    return results, reports[0]
+
+
+def _with(ds, **attributes):
+    for keyword, value in attributes.items():
+        setattr(ds, keyword, value)
+    return ds
+
+
+def test_compile_query_builds_matching_sql():
+    query = create_study_query(patient_name="Doe*", study_date="20240101-", modality="CT")
+    query.StudyTime = "-115959"
+    query.StudyInstanceUID = ["1.2.3", "1.2.4"]
+
+    compiled = compile_query(query)
+
+    assert "PatientName GLOB ?" in compiled.sql and "StudyDate >= ?" in compiled.sql
+    assert "substr(StudyTime, 1, 6) <= ?" in compiled.sql and "StudyInstanceUID IN (?, ?)" in compiled.sql
+    assert "Modality IN (?)" in compiled.sql and "GROUP BY StudyInstanceUID" in compiled.sql
+    assert compiled.params == ("20240101", "115959", "CT", "Doe*", "1.2.3", "1.2.4")
+    assert "ModalitiesInStudy" in compiled.return_keys
+    with pytest.raises(ValueError):
+        compile_query(Dataset())
+
+
+def test_header_index_refreshes_incrementally(archive, tmp_path):
+    root, ct, _ = archive
+    index = HeaderIndex(root, tmp_path / "index.sqlite")
+
+    assert index.refresh() == {"added": 5, "unchanged": 0, "removed": 0, "skipped": 1}
+    (root / "ct" / "slice_1.dcm").unlink()
+    assert index.refresh() == {"added": 0, "unchanged": 4, "removed": 1, "skipped": 1}
+    assert len(index) == 4
+    index.close()
+
+
+def test_find_matches_at_each_level(archive):
+    root, ct, mr = archive
+    with QueryRetrieveSCP(root, host="127.0.0.1") as scp:
+        studies, stats = _find(scp, create_study_query(study_date="20240101-20241231"))
+        by_name, _ = _find(scp, create_study_query(patient_name="Oth*"))
+        by_time, _ = _find(scp, _with(create_study_query(), StudyTime="080000-083000"))
+        by_modality, _ = _find(scp, create_study_query(modality="MR"))
+        series, _ = _find(scp, create_series_query(ct[0].StudyInstanceUID))
+        patients, _ = _find(scp, create_patient_query(), "PatientRoot")
+        _, rejected = _find(scp, create_patient_query())
+
+    assert stats.status == 0x0000 and len(studies) == 1
+    study = studies[0]
+    assert study.StudyInstanceUID == ct[0].StudyInstanceUID and study.QueryRetrieveLevel == "STUDY"
+    assert study.NumberOfStudyRelatedSeries == 1 and study.NumberOfStudyRelatedInstances == 3
+    assert study.ModalitiesInStudy == "CT" and study.PatientName == "Test^Patient"
+    assert [s.StudyInstanceUID for s in by_name] == [mr[0].StudyInstanceUID]
+    assert [s.StudyInstanceUID for s in by_time] == [ct[0].StudyInstanceUID]
+    assert [s.StudyInstanceUID for s in by_modality] == [mr[0].StudyInstanceUID]
+    assert [(s.SeriesInstanceUID, s.NumberOfSeriesRelatedInstances) for s in series] == [
+        (ct[0].SeriesInstanceUID, 3)]
+    assert sorted(p.PatientID for p in patients) == ["OTHER-9", "TEST-123"]
+    # PATIENT level is only part of the Patient Root model
+    assert rejected.status == 0xA900
+    assert scp.stats["find"] == 7
+
+
+def test_get_streams_instances_from_disk(archive, tmp_path):
+    root, ct, _ = archive
+    out = tmp_path / "out"
+    with QueryRetrieveSCP(root, host="127.0.0.1") as scp:
+        query = create_retrieve_query("SERIES", ct[0].StudyInstanceUID, ct[0].SeriesInstanceUID)
+        count = retrieve_with_get("127.0.0.1", scp.port, "SCU", "DICOMTOOLS_QR", str(out), query, fsync="none")
+        bad = Dataset()
+        bad.QueryRetrieveLevel = "FRAME"
+        assert retrieve_with_get("127.0.0.1", scp.port, "SCU", "DICOMTOOLS_QR", str(out), bad) == 0
+
+    assert count == 3 and scp.stats["sent"] == 3
+    for original in ct:
+        received = pydicom.dcmread(out / f"{original.SOPInstanceUID}.dcm")
+        assert received.PixelData == original.PixelData
+        assert received.file_meta.TransferSyntaxUID == original.file_meta.TransferSyntaxUID
+
+
+def test_move_sends_to_known_destinations(archive):
+    root, _, mr = archive
+    with store_scp() as (dest_host, dest_port, received):
+        known = {"STORE_SCP": (dest_host, dest_port)}
+        with QueryRetrieveSCP(root, host="127.0.0.1", known_aets=known) as scp:
+            query = create_retrieve_query("STUDY", mr[0].StudyInstanceUID)
+            moved = retrieve_with_move("127.0.0.1", scp.port, "SCU", "DICOMTOOLS_QR", "STORE_SCP", query)
+            unknown = retrieve_with_move("127.0.0.1", scp.port, "SCU", "DICOMTOOLS_QR", "NOBODY", query)
+
+    assert moved == 2 and unknown == 0
+    assert sorted(ds.SOPInstanceUID for ds in received) == sorted(ds.SOPInstanceUID for ds in mr)
@@ -0,0 +1,120 @@
+#
+# test_resample.py
+# Dicom-Tools-py
+#
+# Tests for separable isotropic resampling, block-mean pyramids, and the
+# volume --resample/--pyramid CLI options.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import json
+from argparse import Namespace
+
+import numpy as np
+import pytest
+
+from DICOM_reencoder import cli as cli_mod
+from DICOM_reencoder.core import build_synthetic_series
+from DICOM_reencoder.mpr import Reslicer
+from DICOM_reencoder.resample import build_pyramid, downsample, level_path, resample_isotropic, voxel_spacing
+
+
+def _linear_field(shape, affine):
+    """Voxel values equal to a linear function of world position, which linear interpolation reproduces."""
+    i, j, k = np.meshgrid(*(np.arange(n) for n in shape), indexing="ij")
+    world = np.einsum("ab,bijk->aijk", affine[:3, :3], np.stack([i, j, k])) + affine[:3, 3, None, None, None]
+    return (2 * world[0] - world[1] + 0.5 * world[2]).astype(np.float32)
+
+
+@pytest.fixture
+def oblique_affine():
+    affine = np.eye(4)
+    rotation = np.array([[0.0, 1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, -1.0]])
+    affine[:3, :3] = rotation * np.array([0.7, 0.7, 2.5])
+    affine[:3, 3] = (-10.0, 4.0, 30.0)
+    return affine
+
+
+class TestResample:
+    """Test separable linear resampling."""
+
+    def test_linear_field_is_reproduced_in_world_space(self, oblique_affine):
+        volume = _linear_field((20, 17, 6), oblique_affine)
+
+        result, affine = resample_isotropic(volume, oblique_affine, 1.0, workers=3, chunk_bytes=512)
+
+        assert result.shape == (14, 12, 13)
+        assert np.allclose(voxel_spacing(affine), 1.0)
+        assert np.allclose(affine[:3, 3], oblique_affine[:3, 3])
+        assert np.allclose(result, _linear_field(result.shape, affine), atol=1e-3)
+
+    def test_chunking_and_memmap_input_do_not_change_result(self, oblique_affine, tmp_path):
+        volume = np.random.default_rng(4).integers(0, 1000, size=(15, 13, 7)).astype(np.int16)
+        np.save(tmp_path / "vol.npy", volume)
+        memmap = np.load(tmp_path / "vol.npy", mmap_mode="r")
+
+        small, _ = resample_isotropic(memmap, oblique_affine, (0.5, 1.0, 1.5), chunk_bytes=64, workers=4)
+        whole, _ = resample_isotropic(volume, oblique_affine, (0.5, 1.0, 1.5), chunk_bytes=1 << 30, workers=1)
+
+        assert small.dtype == np.float32
+        assert np.array_equal(small, whole)
+
+    def test_matches_trilinear_reslicer(self):
+        volume = np.random.default_rng(8).normal(size=(9, 8, 5)).astype(np.float32)
+        affine = np.diag([1.0, 1.0, 3.0, 1.0])
+
+        result, new_affine = resample_isotropic(volume, affine, 1.0)
+
+        # Separable linear passes equal trilinear sampling at the new voxel centres
+        reslicer = Reslicer(volume, affine)
+        for k in (0, 4, 7, 12):
+            z = new_affine[2, 2] * k
+            image = reslicer.oblique((0, 0, 1), center=(4.0, 3.5, z), size=(8, 9), spacing=1.0)
+            assert np.allclose(result[:, :, k].T, image, atol=1e-4)
+
+    def test_rejects_non_positive_spacing(self):
+        with pytest.raises(ValueError):
+            resample_isotropic(np.zeros((2, 2, 2)), np.eye(4), 0.0)
+
+
+class TestPyramid:
+    """Test block-mean downsampling."""
+
+    def test_block_mean_with_partial_blocks(self):
+        volume = np.arange(5 * 4 * 3, dtype=np.int16).reshape(5, 4, 3)
+
+        result, _ = downsample(volume, np.eye(4), 2, chunk_bytes=16, workers=3)
+
+        assert result.shape == (3, 2, 2)
+        assert result[0, 0, 0] == pytest.approx(volume[0:2, 0:2, 0:2].mean())
+        assert result[2, 1, 1] == pytest.approx(volume[4:5, 2:4, 2:3].mean())
+
+    def test_levels_keep_world_alignment(self, oblique_affine):
+        volume = _linear_field((16, 16, 8), oblique_affine)
+
+        pyramid = build_pyramid(volume, oblique_affine, 3)
+
+        assert [level.shape for level, _ in pyramid] == [(16, 16, 8), (8, 8, 4), (4, 4, 2)]
+        for level, affine in pyramid[1:]:
+            # Means of a linear field sit on the field at block centres
+            assert np.allclose(level, _linear_field(level.shape, affine), atol=1e-3)
+        assert np.allclose(voxel_spacing(pyramid[2][1]), [2.8, 2.8, 10.0])
+
+
+def test_cli_volume_resample_and_pyramid(tmp_path, capsys):
+    series_dir = tmp_path / "series"
+    build_synthetic_series(series_dir, slices=6)
+    output = tmp_path / "vol.npy"
+
+    cli_mod.cmd_volume(Namespace(directory=str(series_dir), output=str(output), metadata=None, preview=False,
+                                 resample=1.0, pyramid=3))
+
+    base = np.load(output)
+    metadata = json.loads(output.with_suffix(".json").read_text())
+    assert base.shape == (22, 22, 6)
+    assert metadata["resampled_mm"] == 1.0
+    assert [entry["shape"] for entry in metadata["pyramid"]] == [[11, 11, 3], [6, 6, 2]]
+    level = np.load(level_path(output, 2))
+    assert level.shape == (6, 6, 2)
+    assert json.loads(level_path(output, 2).with_suffix(".json").read_text())["pyramid_level"] == 2
+    assert "Pyramid level 2" in capsys.readouterr().out
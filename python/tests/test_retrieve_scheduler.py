@@ -0,0 +1,154 @@
+#
+# test_retrieve_scheduler.py
+# Dicom-Tools-py
+#
+# Tests for the concurrent C-GET/C-MOVE scheduler: per-peer limits, retries and progress.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import sys
+from pathlib import Path
+
+import pytest
+from pydicom.dataset import Dataset
+
+from DICOM_reencoder.core import build_synthetic_series, load_dataset
+from DICOM_reencoder.retrieve_scheduler import (
+    Peer,
+    RetrieveScheduler,
+    is_retryable,
+    jobs_from_identifiers,
+    summarize,
+)
+
+sys.path.append(str(Path(__file__).parent))
+from pynetdicom_utils import move_scp, role_get_scp, store_scp  # type: ignore
+
+
+@pytest.fixture
+def study(tmp_path):
+    """Four two-slice series; returns (datasets, one SERIES-level identifier per series)."""
+    datasets, identifiers = [], []
+    for index in range(4):
+        series = [load_dataset(p) for p in build_synthetic_series(tmp_path / f"s{index}", slices=2)]
+        datasets += series
+        identifier = Dataset()
+        identifier.QueryRetrieveLevel = "SERIES"
+        identifier.StudyInstanceUID = series[0].StudyInstanceUID
+        identifier.SeriesInstanceUID = series[0].SeriesInstanceUID
+        identifiers.append(identifier)
+    return datasets, identifiers
+
+
+def test_jobs_from_identifiers_infer_level():
+    peer = Peer("127.0.0.1", 104)
+    study, image = Dataset(), Dataset()
+    study.StudyInstanceUID = "1.2"
+    image.StudyInstanceUID, image.SeriesInstanceUID, image.SOPInstanceUID = "1.2", "1.2.3", "1.2.3.4"
+
+    jobs = jobs_from_identifiers([study, image], peer)
+
+    assert [job.query.QueryRetrieveLevel for job in jobs] == ["STUDY", "IMAGE"]
+    assert [job.label for job in jobs] == ["1.2", "1.2.3.4"]
+    assert is_retryable(0xA702) and is_retryable(0xC001) and is_retryable(None)
+    assert not is_retryable(0xA900) and not is_retryable(0xB000)
+
+
+def test_get_runs_series_concurrently_within_peer_limit(study, tmp_path):
+    datasets, identifiers = study
+    snapshots = []
+
+    with role_get_scp(datasets, delay=0.2) as (host, port, state):
+        peer = Peer(host, port, called_aet="GET_SCP", max_associations=2)
+        scheduler = RetrieveScheduler(output_dir=str(tmp_path / "out"), workers=4, progress=snapshots.append)
+        results = scheduler.run(jobs_from_identifiers(identifiers, peer))
+
+    assert state["peak"] == 2
+    assert [r.ok for r in results] == [True] * 4
+    assert [r.completed for r in results] == [2] * 4
+    assert len(list((tmp_path / "out").glob("*.dcm"))) == len(datasets)
+    assert snapshots[-1] == {"jobs": 4, "jobs_done": 4, "completed": 8, "remaining": 0, "failed": 0, "warning": 0}
+    assert summarize(results)["instances"] == 8
+
+
+def test_retryable_statuses_are_retried_with_backoff(study, tmp_path):
+    datasets, identifiers = study
+    flaky, broken = identifiers[1].SeriesInstanceUID, identifiers[2].SeriesInstanceUID
+    failures = {flaky: [0xA702, 0xC000], broken: [0xA900]}
+
+    with role_get_scp(datasets, failures=failures) as (host, port, state):
+        peer = Peer(host, port, called_aet="GET_SCP")
+        scheduler = RetrieveScheduler(output_dir=str(tmp_path / "out"), retries=3, backoff=0.01)
+        results = scheduler.run(jobs_from_identifiers(identifiers, peer))
+
+    assert [r.attempts for r in results] == [1, 3, 1, 1]
+    assert results[1].ok and results[1].completed == 2
+    assert results[2].status == 0xA900 and not results[2].ok
+    assert len(state["requests"]) == 6
+    assert summarize(results)["retries"] == 2
+
+
+def test_retries_are_bounded(study, tmp_path):
+    datasets, identifiers = study
+    failures = {identifiers[0].SeriesInstanceUID: [0xA701] * 5}
+
+    with role_get_scp(datasets, failures=failures) as (host, port, _):
+        scheduler = RetrieveScheduler(output_dir=str(tmp_path / "out"), retries=2, backoff=0.01)
+        (result,) = scheduler.run(jobs_from_identifiers(identifiers[:1], Peer(host, port, called_aet="GET_SCP")))
+
+    assert result.attempts == 3 and result.status == 0xA701
+
+
+def test_unreachable_peer_reports_error(study, tmp_path):
+    from pynetdicom_utils import free_port  # type: ignore
+
+    _, identifiers = study
+    scheduler = RetrieveScheduler(output_dir=str(tmp_path), retries=1, backoff=0.01)
+    (result,) = scheduler.run(jobs_from_identifiers(identifiers[:1], Peer("127.0.0.1", free_port())))
+
+    assert result.attempts == 2 and result.status is None
+    assert "Association" in result.error
+
+
+def test_move_jobs_report_suboperations(study):
+    datasets, identifiers = study
+
+    with store_scp() as (dest_host, dest_port, received):
+        with move_scp(dest_host, dest_port, "STORE_SCP", datasets[:2]) as (host, port):
+            scheduler = RetrieveScheduler(method="MOVE", move_destination="STORE_SCP")
+            (result,) = scheduler.run(jobs_from_identifiers(identifiers[:1], Peer(host, port, called_aet="MOVE_SCP")))
+
+    assert result.ok and result.completed == 2
+    assert len(received) == 2
+
+
+def test_scheduler_validates_arguments():
+    with pytest.raises(ValueError):
+        RetrieveScheduler(method="MOVE")
+    with pytest.raises(ValueError):
+        RetrieveScheduler(method="FIND")
+    assert RetrieveScheduler(output_dir="out").run([]) == []
+
+
+def test_all_series_requires_study_uid(monkeypatch, capsys):
+    from DICOM_reencoder import dicom_retrieve
+
+    monkeypatch.setattr(sys, "argv", ["dicom-retrieve", "-H", "127.0.0.1", "-p", "1", "--study-uid", "",
+                                      "--all-series"])
+    assert dicom_retrieve.main() == 1
+    assert "--study-uid is required" in capsys.readouterr().out
+
+
+def test_unexpected_errors_fail_only_their_job(study, tmp_path):
+    datasets, identifiers = study
+
+    with role_get_scp(datasets) as (host, port, _):
+        peer = Peer(host, port, called_aet="GET_SCP")
+        jobs = jobs_from_identifiers(identifiers[:2], peer)
+        # pynetdicom raises ValueError when it cannot encode the identifier
+        jobs[0].query = "not a dataset"
+        scheduler = RetrieveScheduler(output_dir=str(tmp_path / "out"), workers=2, retries=0)
+        results = scheduler.run(jobs)
+
+    assert not results[0].ok and results[0].error
+    assert results[1].ok and results[1].completed == 2
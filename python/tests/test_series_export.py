@@ -0,0 +1,119 @@
+#
+# test_series_export.py
+# Dicom-Tools-py
+#
+# Tests for the one-pass series/stack grouping and concurrent multi-series export.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import json
+from argparse import Namespace
+
+import numpy as np
+import pydicom
+import pytest
+
+from DICOM_reencoder import cli as cli_mod
+from DICOM_reencoder.core import build_synthetic_series
+from DICOM_reencoder.series_export import MANIFEST_NAME, export_series, scan_series, select_stacks
+
+
+@pytest.fixture
+def study(tmp_path):
+    """Two series in nested folders; the second holds an extra coronal stack, plus a stray text file."""
+    root = tmp_path / "study"
+    axial = build_synthetic_series(root / "a", slices=4)
+    mixed = build_synthetic_series(root / "b" / "c", slices=5, shape=(16, 16))
+    for path in axial:
+        ds = pydicom.dcmread(path)
+        ds.SeriesDescription = "T1 axial"
+        ds.save_as(path)
+    for index, path in enumerate(mixed):
+        ds = pydicom.dcmread(path)
+        ds.SeriesNumber = 2
+        ds.SeriesDescription = "Localizer"
+        if index >= 3:
+            ds.ImageOrientationPatient = [1, 0, 0, 0, 0, -1]
+            ds.ImagePositionPatient = [0.0, float(index), 0.0]
+        ds.save_as(path)
+    (root / "notes.txt").write_text("not dicom", encoding="utf-8")
+    return root, axial, mixed
+
+
+def test_scan_groups_series_and_stacks(study):
+    root, axial, mixed = study
+
+    stacks, skipped = scan_series(root, workers=3)
+
+    assert [(s.name, s.instances) for s in stacks] == [("0001_T1_axial", 4), ("0002_Localizer", 3),
+                                                       ("0002_Localizer_stack1", 2)]
+    assert sorted(stacks[0].paths) == sorted(axial)
+    assert stacks[1].series_uid == stacks[2].series_uid
+    assert skipped == [root / "notes.txt"]
+    assert [s.name for s in select_stacks(stacks, match="*AXIAL*")] == ["0001_T1_axial"]
+    assert select_stacks(stacks, modalities=["mr"]) == []
+    assert len(select_stacks(stacks, series_uids=[stacks[1].series_uid], min_instances=3)) == 1
+
+
+def test_export_nifti_writes_every_stack_and_manifest(study, tmp_path):
+    sitk = pytest.importorskip("SimpleITK")
+    root, _, _ = study
+    out = tmp_path / "out"
+
+    manifest = export_series(root, out, jobs=3)
+
+    assert manifest["exported"] == 3 and manifest["failed"] == 0
+    assert json.loads((out / MANIFEST_NAME).read_text()) == manifest
+    shapes = {entry["name"]: entry["shape"] for entry in manifest["series"]}
+    assert shapes == {"0001_T1_axial": [32, 32, 4], "0002_Localizer": [16, 16, 3],
+                      "0002_Localizer_stack1": [16, 16, 2]}
+    image = sitk.ReadImage(str(out / "0002_Localizer_stack1.nii.gz"))
+    assert image.GetSize() == (16, 16, 2)
+
+
+def test_export_npy_with_filter_records_filtered(study, tmp_path):
+    root, axial, _ = study
+    out = tmp_path / "npy"
+
+    manifest = export_series(root, out, fmt="npy", modalities=["CT"], match="t1*")
+
+    statuses = {entry.get("name", entry["description"]): entry["status"] for entry in manifest["series"]}
+    assert statuses == {"0001_T1_axial": "exported", "Localizer": "filtered"}
+    volume = np.load(out / "0001_T1_axial.npy")
+    assert volume.shape == (32, 32, 4)
+    assert np.array_equal(volume[:, :, 0].T, pydicom.dcmread(axial[0]).pixel_array)
+    assert json.loads((out / "0001_T1_axial.json").read_text())["shape"] == [32, 32, 4]
+
+
+def test_failed_stack_does_not_abort_export(study, tmp_path, monkeypatch):
+    from DICOM_reencoder import series_export
+
+    root, _, _ = study
+    original = series_export._export_npy
+
+    def flaky(stack, *args):
+        if stack.stack:
+            raise RuntimeError("boom")
+        return original(stack, *args)
+
+    monkeypatch.setattr(series_export, "_export_npy", flaky)
+    manifest = export_series(root, tmp_path / "out", fmt="npy")
+
+    assert manifest["exported"] == 2 and manifest["failed"] == 1
+    assert [e["error"] for e in manifest["series"] if e["status"] == "failed"] == ["boom"]
+
+    with pytest.raises(SystemExit) as exit_info:
+        cli_mod.cmd_export(Namespace(directory=str(root), output=str(tmp_path / "cli"), format="npy",
+                                     series_uid=None, modality=None, match=None, jobs=1))
+    assert exit_info.value.code == 1
+
+
+def test_cli_export(study, tmp_path, capsys):
+    root, _, _ = study
+
+    cli_mod.cmd_export(Namespace(directory=str(root), output=str(tmp_path / "cli"), format="npy",
+                                 series_uid=None, modality=None, match="local*", jobs=2))
+
+    output = capsys.readouterr().out
+    assert "Exported 2 stack(s), 0 failed" in output
+    assert (tmp_path / "cli" / "0002_Localizer.npy").exists()
@@ -0,0 +1,115 @@
+#
+# test_storage_scp.py
+# Dicom-Tools-py
+#
+# Tests for the standalone Storage SCP: raw study/series layout, association limits,
+# transfer syntax configuration, per-association counters and hooks.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pydicom
+import pytest
+from pydicom.uid import ExplicitVRLittleEndian, JPEGBaseline8Bit
+from pynetdicom import AE
+from pynetdicom.sop_class import CTImageStorage, Verification
+
+from DICOM_reencoder.core.network import send_c_echo
+from DICOM_reencoder.storage_scp import StorageSCP, command_hook, resolve_transfer_syntaxes
+
+
+def _send(port, datasets, aet="SCU", hold=None):
+    ae = AE(ae_title=aet)
+    ae.add_requested_context(CTImageStorage, ExplicitVRLittleEndian)
+    assoc = ae.associate("127.0.0.1", port, ae_title="DICOMTOOLS_SCP")
+    if not assoc.is_established:
+        return None
+    try:
+        statuses = [assoc.send_c_store(ds).Status for ds in datasets]
+        if hold:
+            hold.wait(5)
+        return statuses
+    finally:
+        assoc.release()
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return predicate()
+
+
+def test_concurrent_associations_are_written_by_series_and_counted(synthetic_datasets, tmp_path):
+    with StorageSCP(tmp_path, host="127.0.0.1") as scp:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            statuses = list(pool.map(lambda aet: _send(scp.port, synthetic_datasets, aet), ["A", "B"]))
+        assert send_c_echo("127.0.0.1", scp.port, called_aet="DICOMTOOLS_SCP") == 0x0000
+        assert _wait_for(lambda: len(scp.stats()["finished"]) == 3)
+
+    stats = scp.stats()
+    assert statuses == [[0x0000] * len(synthetic_datasets)] * 2
+    assert stats["instances"] == 2 * len(synthetic_datasets) and stats["associations"] == 3
+    per_aet = {entry["calling_aet"]: entry for entry in stats["finished"]}
+    assert per_aet["A"]["instances"] == per_aet["B"]["instances"] == len(synthetic_datasets)
+    assert per_aet["A"]["bytes"] > 0 and per_aet["A"]["status"] == "released"
+    series_dir = tmp_path / synthetic_datasets[0].StudyInstanceUID / synthetic_datasets[0].SeriesInstanceUID
+    written = sorted(series_dir.glob("*.dcm"))
+    assert len(written) == len(synthetic_datasets)
+    assert pydicom.dcmread(written[0]).file_meta.TransferSyntaxUID == ExplicitVRLittleEndian
+
+
+def test_association_limit_rejects_extra_peers(synthetic_datasets, tmp_path):
+    hold = threading.Event()
+    with StorageSCP(tmp_path, host="127.0.0.1", max_associations=1) as scp:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            first = pool.submit(_send, scp.port, synthetic_datasets[:1], "FIRST", hold)
+            assert _wait_for(lambda: scp.stats()["active"])
+            assert _send(scp.port, synthetic_datasets[:1], "SECOND") is None
+            hold.set()
+            assert first.result() == [0x0000]
+
+
+def test_transfer_syntax_configuration(tmp_path):
+    assert resolve_transfer_syntaxes("1.2.840.10008.1.2.1, 1.2.840.10008.1.2") == ["1.2.840.10008.1.2.1",
+                                                                                 "1.2.840.10008.1.2"]
+    assert JPEGBaseline8Bit in resolve_transfer_syntaxes("all")
+    with pytest.raises(ValueError):
+        resolve_transfer_syntaxes("")
+
+    for spec, accepted in (("uncompressed", False), ("all", True)):
+        with StorageSCP(tmp_path, host="127.0.0.1", transfer_syntaxes=spec) as scp:
+            ae = AE()
+            ae.add_requested_context(CTImageStorage, JPEGBaseline8Bit)
+            ae.add_requested_context(Verification)
+            assoc = ae.associate("127.0.0.1", scp.port, ae_title="DICOMTOOLS_SCP")
+            assert any(cx.abstract_syntax == CTImageStorage for cx in assoc.accepted_contexts) is accepted
+            assoc.release()
+
+
+def test_hooks_receive_written_files(synthetic_datasets, tmp_path):
+    seen = []
+
+    def failing(path):
+        raise RuntimeError("downstream unavailable")
+
+    with StorageSCP(tmp_path / "in", host="127.0.0.1", hooks=[seen.append, failing], fsync="none") as scp:
+        _send(scp.port, synthetic_datasets)
+
+    assert sorted(p.name for p in seen) == sorted(f"{ds.SOPInstanceUID}.dcm" for ds in synthetic_datasets)
+    assert all(p.exists() for p in seen)
+    assert scp.stats()["hook_errors"] == len(synthetic_datasets)
+
+
+def test_command_hook_substitutes_path(tmp_path):
+    target = tmp_path / "file.dcm"
+    marker = tmp_path / "seen.txt"
+    script = f"import sys, pathlib; pathlib.Path(r'{marker}').write_text(sys.argv[1])"
+
+    command_hook(f'"{sys.executable}" -c "{script}" {{}}')(target)
+
+    assert marker.read_text() == str(target)
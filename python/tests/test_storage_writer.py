@@ -0,0 +1,173 @@
+#
+# test_storage_writer.py
+# Dicom-Tools-py
+#
+# Tests for the raw-write C-STORE handler, its writer thread and fsync policies.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import contextlib
+import copy
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import pydicom
+import pytest
+from pydicom.filebase import DicomBytesIO
+from pydicom.filewriter import write_dataset
+from pydicom.uid import DeflatedExplicitVRLittleEndian, ExplicitVRLittleEndian, ImplicitVRLittleEndian
+from pynetdicom import AE, evt
+from pynetdicom.sop_class import CTImageStorage
+
+from DICOM_reencoder.dicom_retrieve import create_retrieve_query, retrieve_with_get
+from DICOM_reencoder import storage_writer
+from DICOM_reencoder.storage_writer import StorageWriter, path_component, read_series_uids
+
+sys.path.append(str(Path(__file__).parent))
+from pynetdicom_utils import free_port, role_get_scp  # type: ignore
+
+
+@contextlib.contextmanager
+def writer_scp(writer):
+    ae = AE(ae_title="STORE_SCP")
+    ae.add_supported_context(CTImageStorage, [ExplicitVRLittleEndian, ImplicitVRLittleEndian])
+    port = free_port()
+    server = ae.start_server(("127.0.0.1", port), block=False,
+                             evt_handlers=[(evt.EVT_C_STORE, writer.handle_store)])
+    try:
+        yield port
+    finally:
+        server.shutdown()
+        ae.shutdown()
+
+
+def _send(port, datasets, transfer_syntax=ExplicitVRLittleEndian):
+    ae = AE(ae_title="STORE_SCU")
+    ae.add_requested_context(CTImageStorage, transfer_syntax)
+    assoc = ae.associate("127.0.0.1", port, ae_title="STORE_SCP")
+    assert assoc.is_established
+    try:
+        return [assoc.send_c_store(ds).Status for ds in datasets]
+    finally:
+        assoc.release()
+
+
+def _encode(ds, transfer_syntax):
+    buffer = DicomBytesIO()
+    buffer.is_little_endian = True
+    buffer.is_implicit_VR = transfer_syntax == ImplicitVRLittleEndian
+    write_dataset(buffer, ds)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("transfer_syntax", [ExplicitVRLittleEndian, ImplicitVRLittleEndian])
+def test_read_series_uids_from_raw_bytes(synthetic_datasets, transfer_syntax):
+    ds = synthetic_datasets[0]
+
+    uids = read_series_uids(_encode(ds, transfer_syntax), transfer_syntax)
+
+    assert uids == (ds.StudyInstanceUID, ds.SeriesInstanceUID)
+
+
+def test_read_series_uids_handles_deflate_and_garbage(synthetic_datasets):
+    ds = synthetic_datasets[0]
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(_encode(ds, ExplicitVRLittleEndian)) + compressor.flush()
+
+    assert read_series_uids(deflated, DeflatedExplicitVRLittleEndian)[1] == ds.SeriesInstanceUID
+    assert read_series_uids(b"\x01\x02", ExplicitVRLittleEndian) == ("unknown", "unknown")
+
+
+@pytest.mark.parametrize("fsync", ["none", "batch", "always"])
+def test_received_instances_keep_original_encoding(synthetic_datasets, tmp_path, fsync):
+    with StorageWriter(tmp_path, layout="series", fsync=fsync, fsync_every=3) as writer:
+        with writer_scp(writer) as port:
+            statuses = _send(port, synthetic_datasets, ImplicitVRLittleEndian)
+
+    assert statuses == [0x0000] * len(synthetic_datasets)
+    assert writer.stats["written"] == writer.stats["received"] == len(synthetic_datasets)
+    assert writer.stats["fsyncs"] == {"none": 0, "batch": 2, "always": 4}[fsync]
+    series_dir = tmp_path / synthetic_datasets[0].StudyInstanceUID / synthetic_datasets[0].SeriesInstanceUID
+    for original in synthetic_datasets:
+        written = pydicom.dcmread(series_dir / f"{original.SOPInstanceUID}.dcm")
+        assert written.file_meta.TransferSyntaxUID == ImplicitVRLittleEndian
+        assert written.PixelData == original.PixelData
+    assert not list(tmp_path.rglob("*.part"))
+
+
+def test_batch_interval_flushes_partial_batch(synthetic_datasets, tmp_path):
+    with StorageWriter(tmp_path, fsync="batch", fsync_every=100, fsync_interval=0.05) as writer:
+        with writer_scp(writer) as port:
+            _send(port, synthetic_datasets[:1])
+            deadline = time.monotonic() + 2
+            while writer.stats["fsyncs"] == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            # Written and synced by the interval, long before the batch of 100 fills up
+            assert writer.stats["written"] == 1 and writer.stats["fsyncs"] == 1
+
+
+def test_series_layout_keeps_hostile_uids_inside_output_dir(synthetic_datasets, tmp_path):
+    assert path_component("1.2.840.10008") == "1.2.840.10008" and path_component(None) == "unknown"
+    for hostile in ("..", "../../etc", "/tmp/x", "1.2\n", "1" * 65):
+        assert path_component(hostile).startswith("unknown-")
+
+    ds = copy.deepcopy(synthetic_datasets[0])
+    ds.StudyInstanceUID = ".."
+    ds.SeriesInstanceUID = "../../escaped"
+    ds.SOPInstanceUID = "../outside"
+    ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
+    output = tmp_path / "incoming"
+    with StorageWriter(output, layout="series", fsync="none") as writer:
+        with writer_scp(writer) as port:
+            assert _send(port, [ds]) == [0x0000]
+
+    written = [path.relative_to(output) for path in output.rglob("*.dcm")]
+    assert len(written) == 1 and all(part.startswith("unknown-") for part in written[0].parts)
+    assert not list(tmp_path.parent.rglob("outside.dcm")) and not list(tmp_path.parent.rglob("escaped"))
+
+
+def test_closed_writer_reports_out_of_resources(synthetic_datasets, tmp_path):
+    writer = StorageWriter(tmp_path)
+    with writer_scp(writer) as port:
+        writer.close()
+        assert _send(port, synthetic_datasets[:1]) == [0xA700]
+
+
+def test_failed_interval_sync_discards_batch_and_keeps_writing(synthetic_datasets, tmp_path, monkeypatch):
+    def broken_fsync(fd):
+        raise OSError("disk failure")
+
+    with StorageWriter(tmp_path, fsync="batch", fsync_every=100, fsync_interval=0.05) as writer:
+        with writer_scp(writer) as port:
+            monkeypatch.setattr(storage_writer.os, "fsync", broken_fsync)
+            assert _send(port, synthetic_datasets[:2]) == [0x0000, 0x0000]
+            deadline = time.monotonic() + 2
+            while writer.stats["errors"] < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            monkeypatch.undo()
+
+            assert writer.stats["errors"] == 2 and not list(tmp_path.rglob("*.part"))
+            assert _send(port, synthetic_datasets[2:3]) == [0x0000]
+    assert writer.stats["written"] == 1 and len(list(tmp_path.glob("*.dcm"))) == 1
+
+
+def test_dead_writer_thread_reports_out_of_resources(synthetic_datasets, tmp_path):
+    writer = StorageWriter(tmp_path)
+    # Stop the thread behind the writer's back, as an unexpected crash would
+    writer._queue.put(storage_writer._STOP)
+    writer._thread.join()
+    with writer_scp(writer) as port:
+        assert _send(port, synthetic_datasets[:1]) == [0xA700]
+
+
+def test_retrieve_with_get_writes_raw_files(synthetic_datasets, tmp_path):
+    query = create_retrieve_query("STUDY", study_uid=synthetic_datasets[0].StudyInstanceUID)
+    with role_get_scp(synthetic_datasets) as (host, port, _):
+        count = retrieve_with_get(host, port, "GET_SCU", "GET_SCP", str(tmp_path), query, fsync="none")
+
+    assert count == len(synthetic_datasets)
+    written = sorted(pydicom.dcmread(path).InstanceNumber for path in tmp_path.glob("*.dcm"))
+    assert written == sorted(ds.InstanceNumber for ds in synthetic_datasets)
@@ -0,0 +1,96 @@
+#
+# test_validate_dicom.py
+# Dicom-Tools-py
+#
+# Tests for DICOM validation levels: header-only Pixel Data checks versus full
+# decode, single file open, and encapsulated fragment structure.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import pydicom
+import pytest
+from pydicom.encaps import encapsulate
+from pydicom.uid import RLELossless
+
+from DICOM_reencoder.core import load_dataset, save_dataset
+from DICOM_reencoder.validate_dicom import DicomValidator
+
+
+def _pixel_messages(messages):
+    return [msg for msg in messages if "pixel" in msg.lower()]
+
+
+def _encapsulated(path, tmp_path, fragments, frames=1):
+    ds = load_dataset(path)
+    ds.PixelData = encapsulate(fragments) if len(fragments) > 1 else encapsulate(fragments, has_bot=False)
+    ds["PixelData"].VR = "OB"
+    ds.NumberOfFrames = frames
+    ds.file_meta.TransferSyntaxUID = RLELossless
+    return save_dataset(ds, tmp_path / "encapsulated.dcm")
+
+
+class TestValidationLevels:
+    """Test header-only and full validation."""
+
+    def test_header_level_accepts_valid_file(self, synthetic_dicom_path):
+        validator = DicomValidator(level="header")
+        validator.validate_file(synthetic_dicom_path, display=False)
+
+        assert _pixel_messages(validator.errors) == []
+        assert any("Pixel data length" in msg for msg in validator.info)
+
+    def test_header_level_does_not_decode(self, synthetic_dicom_path, monkeypatch):
+        def _fail(self):
+            raise AssertionError("pixel_array must not be decoded at header level")
+
+        monkeypatch.setattr(pydicom.dataset.Dataset, "pixel_array", property(_fail))
+
+        validator = DicomValidator(level="header")
+        validator.validate_file(synthetic_dicom_path, display=False)
+
+        assert _pixel_messages(validator.errors) == []
+
+    def test_preamble_checked_once(self, synthetic_dicom_path):
+        validator = DicomValidator()
+        validator.validate_file(synthetic_dicom_path, display=False)
+
+        assert validator.info.count("✓ Valid DICOM prefix found") == 1
+
+    def test_truncated_native_pixel_data(self, synthetic_dicom_path, tmp_path):
+        ds = load_dataset(synthetic_dicom_path)
+        ds.PixelData = ds.PixelData[:-64]
+        path = save_dataset(ds, tmp_path / "short.dcm")
+
+        validator = DicomValidator(level="header")
+
+        assert not validator.validate_file(path, display=False)
+        assert any("shorter than expected" in msg for msg in validator.errors)
+
+    def test_encapsulated_structure_checked_without_decoding(self, synthetic_dicom_path, tmp_path):
+        path = _encapsulated(synthetic_dicom_path, tmp_path, [b"\x01" * 10, b"\x02" * 6], frames=2)
+
+        validator = DicomValidator(level="header")
+        validator.validate_file(path, display=False)
+
+        assert _pixel_messages(validator.errors) == []
+        assert any("2 fragment(s) for 2 frame(s)" in msg for msg in validator.info)
+
+    def test_encapsulated_missing_fragments(self, synthetic_dicom_path, tmp_path):
+        path = _encapsulated(synthetic_dicom_path, tmp_path, [b"\x01" * 10], frames=3)
+
+        validator = DicomValidator(level="header")
+
+        assert not validator.validate_file(path, display=False)
+        assert any("fewer fragments (1) than frames (3)" in msg for msg in validator.errors)
+
+    def test_dataset_validation_uses_same_checks(self, synthetic_dicom_path):
+        ds = load_dataset(synthetic_dicom_path)
+        ds.PixelData = ds.PixelData[:-64]
+
+        validator = DicomValidator(level="header")
+
+        assert not validator.validate_dataset(ds, display=False)
+
+    def test_unknown_level_rejected(self):
+        with pytest.raises(ValueError):
+            DicomValidator(level="deep")
@@ -0,0 +1,124 @@
+#
+# test_validate_series.py
+# Dicom-Tools-py
+#
+# Tests for cross-instance series validation: structured header records,
+# duplicates, mixed geometry, slice gaps, and builder preflight.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import numpy as np
+import pytest
+
+from DICOM_reencoder.core import build_synthetic_series, load_dataset, save_dataset
+from DICOM_reencoder.validate_series import (
+    INSTANCE_DTYPE,
+    check_series,
+    collect_instance_records,
+    validate_series_files,
+)
+
+
+def _rewrite(path, **changes):
+    ds = load_dataset(path)
+    for keyword, value in changes.items():
+        setattr(ds, keyword, value)
+    save_dataset(ds, path)
+
+
+class TestInstanceRecords:
+    """Test the header pass."""
+
+    def test_records_are_structured(self, synthetic_series):
+        paths, originals = synthetic_series
+
+        table = collect_instance_records(paths, workers=2)
+
+        assert table.records.dtype == INSTANCE_DTYPE
+        assert len(table.records) == len(paths)
+        assert table.series_uids == [originals[0].SeriesInstanceUID]
+        assert np.allclose(table.records["position"][:, 2], [float(ds.ImagePositionPatient[2]) for ds in originals])
+
+    def test_unreadable_files_are_reported(self, synthetic_series, tmp_path):
+        paths, _ = synthetic_series
+        table = collect_instance_records(paths + [tmp_path / "missing.dcm"])
+
+        assert len(table.failures) == 1
+        assert len(table.records) == len(paths)
+
+
+class TestSeriesChecks:
+    """Test vectorized per-series checks."""
+
+    def test_consistent_series_passes(self, synthetic_series):
+        paths, _ = synthetic_series
+
+        reports = validate_series_files(paths)
+
+        assert len(reports) == 1
+        assert reports[0].ok, reports[0].errors
+        assert reports[0].slice_spacing == pytest.approx(1.0)
+
+    def test_missing_slice_detected(self, tmp_path):
+        paths = build_synthetic_series(tmp_path, slices=6)
+        paths[2].unlink()
+
+        report = validate_series_files([p for p in paths if p.exists()])[0]
+
+        assert not report.ok
+        assert any("~1 missing slice" in msg for msg in report.errors)
+
+    def test_duplicate_sop_instance_uid(self, synthetic_series):
+        paths, originals = synthetic_series
+        _rewrite(paths[1], SOPInstanceUID=originals[0].SOPInstanceUID)
+
+        report = validate_series_files(paths)[0]
+
+        assert any("Duplicate SOPInstanceUID" in msg for msg in report.errors)
+
+    def test_duplicate_position(self, synthetic_series):
+        paths, originals = synthetic_series
+        _rewrite(paths[1], ImagePositionPatient=list(originals[0].ImagePositionPatient))
+
+        report = validate_series_files(paths)[0]
+
+        assert any("Duplicate slice position" in msg for msg in report.errors)
+
+    def test_mixed_geometry_outliers(self, synthetic_series):
+        paths, _ = synthetic_series
+        _rewrite(paths[-1], PixelSpacing=[0.5, 0.5], ImageOrientationPatient=[0, 1, 0, 1, 0, 0])
+
+        report = validate_series_files(paths)[0]
+
+        assert any("Mixed PixelSpacing" in msg and paths[-1].name in msg for msg in report.errors)
+        assert any("Inconsistent ImageOrientationPatient" in msg for msg in report.errors)
+
+    def test_series_reported_separately(self, tmp_path):
+        first = build_synthetic_series(tmp_path / "a", slices=3)
+        second = build_synthetic_series(tmp_path / "b", slices=2)
+
+        reports = validate_series_files(first + second)
+
+        assert sorted(report.instances for report in reports) == [2, 3]
+        assert all(report.to_dict()["ok"] for report in reports)
+
+
+class TestPreflight:
+    """Test the builder-facing preflight helper."""
+
+    def test_check_series_raises_on_errors(self, tmp_path):
+        paths = build_synthetic_series(tmp_path, slices=5)
+        paths[1].unlink()
+
+        with pytest.raises(RuntimeError, match="missing slice"):
+            check_series([p for p in paths if p.exists()])
+
+    def test_check_series_filters_by_uid(self, tmp_path):
+        good = build_synthetic_series(tmp_path / "good", slices=3)
+        bad = build_synthetic_series(tmp_path / "bad", slices=5)
+        bad[2].unlink()
+        series_uid = load_dataset(good[0]).SeriesInstanceUID
+
+        reports = check_series(good + [p for p in bad if p.exists()], series_uid=series_uid)
+
+        assert [report.series_uid for report in reports] == [series_uid]
@@ -0,0 +1,120 @@
+#
+# test_validation_rules.py
+# Dicom-Tools-py
+#
+# Tests for the validation rule engine: declared tags, structured findings,
+# per-rule statistics, and declarative site profiles.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import json
+
+import pytest
+
+from DICOM_reencoder.core import load_dataset
+from DICOM_reencoder.validate_dicom import DicomValidator
+from DICOM_reencoder.validation_rules import (
+    DEFAULT_RULES,
+    Rule,
+    RuleEngine,
+    load_profile,
+    rule,
+    rules_from_profile,
+)
+
+
+def _modality_rule(registry):
+    @rule("site.modality-ct", tags=["Modality"], registry=registry)
+    def check(dataset, context):
+        if dataset.get("Modality") != "CT":
+            yield "warning", "Not a CT image", "Modality"
+    return registry
+
+
+class TestRuleEngine:
+    """Test compilation and evaluation."""
+
+    def test_specific_tags_are_union_of_rule_tags(self):
+        engine = RuleEngine(_modality_rule([]) + rules_from_profile(
+            [{"id": "site.accession", "tag": "AccessionNumber", "check": "required"}]
+        ))
+
+        assert engine.specific_tags == ["AccessionNumber", "Modality"]
+
+    def test_findings_carry_rule_id_severity_and_tag(self, synthetic_dicom_path):
+        ds = load_dataset(synthetic_dicom_path)
+        ds.Modality = "MR"
+
+        findings = RuleEngine(_modality_rule([])).evaluate(ds)
+
+        assert [f.to_dict() for f in findings] == [
+            {"rule_id": "site.modality-ct", "severity": "warning", "message": "Not a CT image", "tag": "Modality"}
+        ]
+
+    def test_stats_count_calls_and_hits(self, synthetic_datasets):
+        engine = RuleEngine(_modality_rule([]))
+        synthetic_datasets[0].Modality = "MR"
+
+        for ds in synthetic_datasets:
+            engine.evaluate(ds)
+
+        stats = engine.stats_dict()["site.modality-ct"]
+        assert stats["calls"] == len(synthetic_datasets)
+        assert stats["hits"] == 1
+        assert stats["seconds"] >= 0
+
+    def test_failing_rule_becomes_error_finding(self, synthetic_dicom_path):
+        def broken(dataset, context):
+            raise KeyError("boom")
+            yield  # pragma: no cover
+
+        findings = RuleEngine([Rule("broken", (), broken)]).evaluate(load_dataset(synthetic_dicom_path))
+
+        assert findings[0].severity == "error"
+        assert "broken" in findings[0].message
+
+    def test_duplicate_ids_and_unknown_tags_rejected(self):
+        with pytest.raises(ValueError):
+            RuleEngine(_modality_rule([]) + _modality_rule([]))
+        with pytest.raises(ValueError):
+            RuleEngine([Rule("bad", ("NotAKeyword",), lambda ds, ctx: [])])
+
+    def test_default_rules_have_unique_ids(self):
+        assert len({item.rule_id for item in DEFAULT_RULES}) == len(DEFAULT_RULES)
+
+
+class TestProfiles:
+    """Test declarative site profiles."""
+
+    def test_profile_checks(self, synthetic_dicom_path):
+        ds = load_dataset(synthetic_dicom_path)
+        ds.InstitutionName = "Elsewhere"
+        engine = RuleEngine(rules_from_profile([
+            {"id": "p.accession", "tag": "AccessionNumber", "check": "required", "severity": "warning"},
+            {"id": "p.modality", "tag": "Modality", "check": "one_of", "value": ["CT", "MR"]},
+            {"id": "p.institution", "tag": "InstitutionName", "check": "pattern", "value": "Site .*"},
+            {"id": "p.patient-id", "tag": "PatientID", "check": "max_length", "value": 2},
+        ]))
+
+        hits = {f.rule_id: f.severity for f in engine.evaluate(ds)}
+
+        assert hits == {"p.accession": "warning", "p.institution": "error", "p.patient-id": "error"}
+
+    def test_validator_uses_profile(self, synthetic_dicom_path, tmp_path):
+        profile = tmp_path / "profile.json"
+        profile.write_text(json.dumps({"rules": [
+            {"id": "site.accession", "tag": "AccessionNumber", "check": "required", "message": "Accession missing"}
+        ]}))
+
+        validator = DicomValidator(level="header", rules=load_profile(profile))
+        validator.validate_file(synthetic_dicom_path, display=False)
+
+        assert "Accession missing" in validator.errors
+        assert "AccessionNumber" in validator.engine.specific_tags
+        finding = next(f for f in validator.to_dict()["findings"] if f["rule_id"] == "site.accession")
+        assert finding == {"rule_id": "site.accession", "severity": "error", "message": "Accession missing",
+                           "tag": "AccessionNumber"}
+
+    def test_unknown_profile_check_rejected(self):
+        with pytest.raises(ValueError):
+            rules_from_profile([{"id": "x", "tag": "Modality", "check": "nope"}])
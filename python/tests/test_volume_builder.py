@@ -146,3 +146,137 @@ class TestBuildVolume:
         assert volume.ndim == 3
         assert volume.shape[2] == 1
 
+
+    def test_build_volume_preflight_rejects_gaps(self, tmp_path):
+        from DICOM_reencoder.core import build_synthetic_series
+
+        paths = build_synthetic_series(tmp_path / "gappy", slices=5)
+        paths[2].unlink()
+
+        with pytest.raises(RuntimeError, match="preflight"):
+            build_volume(paths[0].parent, preflight=True)
+
+
+class TestNativeAssembler:
+    """Test the parallel preallocated assembler against dicom-numpy."""
+
+    def _assert_same(self, dicom_dir, **kwargs):
+        native = build_volume(dicom_dir, engine="native", **kwargs)
+        reference = build_volume(dicom_dir, engine="dicom-numpy")
+
+        assert native[0].shape == reference[0].shape
+        assert native[0].dtype == reference[0].dtype
+        assert np.array_equal(native[0], reference[0])
+        assert np.array_equal(native[1], reference[1])
+        assert native[2] == reference[2]
+
+    def test_matches_dicom_numpy(self, synthetic_series):
+        paths, _ = synthetic_series
+        self._assert_same(Path(paths[0]).parent, workers=2)
+
+    def test_matches_dicom_numpy_with_rescale_and_shuffled_instances(self, tmp_path):
+        from DICOM_reencoder.core import build_synthetic_series, load_dataset, save_dataset
+
+        paths = build_synthetic_series(tmp_path / "rescaled", slices=5, shape=(12, 20))
+        ds = load_dataset(paths[2])
+        ds.InstanceNumber = 0
+        ds.RescaleSlope = 2
+        ds.RescaleIntercept = -1024
+        save_dataset(ds, paths[2])
+
+        self._assert_same(paths[0].parent)
+
+    def test_process_workers(self, synthetic_series):
+        paths, _ = synthetic_series
+        self._assert_same(Path(paths[0]).parent, workers=2, use_processes=True)
+
+    def test_volume_is_view_of_contiguous_planes(self, synthetic_series):
+        from DICOM_reencoder.volume_builder import assemble_volume
+
+        paths, _ = synthetic_series
+        volume, _, plan = assemble_volume(paths)
+
+        assert plan.shape == (len(paths),) + plan.plane_shape
+        assert volume.T.flags["C_CONTIGUOUS"]
+
+    def test_missing_slices_rejected(self, tmp_path):
+        from DICOM_reencoder.core import build_synthetic_series
+
+        paths = build_synthetic_series(tmp_path / "gap", slices=5)
+        paths[2].unlink()
+
+        with pytest.raises(RuntimeError, match="missing slices"):
+            build_volume(paths[0].parent)
+
+    @pytest.mark.parametrize("engine", ["native", "dicom-numpy"])
+    def test_mixed_series_rejected(self, tmp_path, engine):
+        from DICOM_reencoder.core import build_synthetic_series
+
+        build_synthetic_series(tmp_path / "study" / "a", slices=3)
+        build_synthetic_series(tmp_path / "study" / "b", slices=3)
+
+        with pytest.raises(RuntimeError, match="single series, found 2"):
+            build_volume(tmp_path / "study", engine=engine)
+
+    def test_unknown_engine_rejected(self, synthetic_series):
+        paths, _ = synthetic_series
+        with pytest.raises(ValueError):
+            build_volume(Path(paths[0]).parent, engine="other")
+
+
+class TestOutOfCore:
+    """Test memory-mapped .npy output."""
+
+    def test_memmap_output_matches_in_memory_volume(self, synthetic_series, tmp_path):
+        from DICOM_reencoder.volume_builder import build_volume_to_npy
+
+        paths, _ = synthetic_series
+        dicom_dir = Path(paths[0]).parent
+        expected, affine, metadata = build_volume(dicom_dir)
+
+        out = tmp_path / "volume.npy"
+        _, mm_affine, mm_metadata = build_volume_to_npy(dicom_dir, out, max_memory=1)
+
+        loaded = np.load(out)
+        assert loaded.shape == expected.shape
+        assert np.array_equal(loaded, expected)
+        assert np.array_equal(mm_affine, affine)
+        for key in ("min", "max", "mean", "std"):
+            assert mm_metadata["stats"][key] == pytest.approx(metadata["stats"][key], rel=1e-5)
+        assert {k: v for k, v in mm_metadata.items() if k != "stats"} == \
+            {k: v for k, v in metadata.items() if k != "stats"}
+
+    def test_export_volume_chunked_out_of_core_removes_scratch(self, synthetic_series, tmp_path):
+        from DICOM_reencoder.chunked_volume import open_chunked
+        from DICOM_reencoder.volume_builder import export_volume
+
+        paths, _ = synthetic_series
+        dicom_dir = Path(paths[0]).parent
+        expected, _, _ = build_volume(dicom_dir)
+
+        store = tmp_path / "vol.chunks"
+        result = export_volume(dicom_dir, output=str(store), fmt="chunked", max_memory=1, chunk_size=16)
+
+        assert result["output"] == store and result["metadata_path"] is None
+        assert np.array_equal(np.asarray(open_chunked(store)), expected)
+        assert not list(tmp_path.glob("*.tmp.npy"))
+
+    def test_running_stats_merge(self):
+        from DICOM_reencoder.volume_builder import RunningStats
+
+        data = np.random.default_rng(0).normal(10, 3, size=(5, 7, 9)).astype(np.float32)
+        stats = RunningStats()
+        for plane in data:
+            stats.update(plane)
+
+        result = stats.as_dict()
+        assert result["mean"] == pytest.approx(float(data.mean(dtype=np.float64)))
+        assert result["std"] == pytest.approx(float(data.std(dtype=np.float64)))
+        assert result["min"] == float(data.min())
+
+    @pytest.mark.parametrize("text,expected", [("1024", 1024), ("2K", 2048), ("1.5G", 3 * 1024 ** 3 // 2),
+                                               ("8GiB", 8 * 1024 ** 3), ("512mb", 512 * 1024 ** 2)])
+    def test_parse_size(self, text, expected):
+        from DICOM_reencoder.volume_builder import parse_size
+
+        assert parse_size(text) == expected
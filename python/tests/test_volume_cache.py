@@ -0,0 +1,159 @@
+#
+# test_volume_cache.py
+# Dicom-Tools-py
+#
+# Tests for the persistent volume cache: fingerprints, hits without decoding,
+# invalidation, LRU eviction, and the volume/nifti integrations.
+#
+# Thales Matheus Mendonça Santos - November 2025
+
+import os
+from argparse import Namespace
+
+import numpy as np
+import pytest
+
+from DICOM_reencoder import cli as cli_mod
+from DICOM_reencoder import volume_builder
+from DICOM_reencoder.core import build_synthetic_series
+from DICOM_reencoder.volume_builder import build_volume
+from DICOM_reencoder.volume_cache import VolumeCache, fingerprint_files
+
+
+def _forbid_assembly(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("volume should come from the cache")
+
+    monkeypatch.setattr(volume_builder, "assemble_volume", fail)
+
+
+class TestFingerprint:
+    """Test that file changes produce new keys."""
+
+    def test_stable_and_order_independent(self, synthetic_series):
+        paths, _ = synthetic_series
+
+        assert fingerprint_files(paths) == fingerprint_files(list(reversed(paths)))
+
+    def test_changes_with_mtime_and_membership(self, synthetic_series):
+        paths, _ = synthetic_series
+        original = fingerprint_files(paths)
+
+        assert fingerprint_files(paths[:-1]) != original
+        stat = paths[0].stat()
+        os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert fingerprint_files(paths) != original
+
+
+class TestBuildVolumeCache:
+    """Test build_volume against the cache."""
+
+    def test_hit_returns_memmap_without_decoding(self, tmp_path, monkeypatch):
+        series_dir = tmp_path / "series"
+        build_synthetic_series(series_dir)
+        cache = VolumeCache(tmp_path / "cache")
+
+        volume, affine, metadata = build_volume(series_dir, cache=cache)
+        _forbid_assembly(monkeypatch)
+        cached_volume, cached_affine, cached_metadata = build_volume(series_dir, cache=cache)
+
+        assert isinstance(cached_volume, np.memmap)
+        assert np.array_equal(cached_volume, volume)
+        assert cached_volume.shape == volume.shape
+        assert cached_affine.dtype == affine.dtype and np.array_equal(cached_affine, affine)
+        assert cached_metadata == metadata
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_refresh_and_modified_series_rebuild(self, tmp_path, monkeypatch):
+        series_dir = tmp_path / "series"
+        paths = build_synthetic_series(series_dir)
+        cache = VolumeCache(tmp_path / "cache")
+        build_volume(series_dir, cache=cache)
+
+        calls = []
+        assemble = volume_builder.assemble_volume
+        monkeypatch.setattr(volume_builder, "assemble_volume", lambda *a, **k: calls.append(1) or assemble(*a, **k))
+        build_volume(series_dir, cache=cache, refresh=True)
+        stat = paths[0].stat()
+        os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        build_volume(series_dir, cache=cache)
+
+        assert len(calls) == 2
+        assert len(cache.entries()) == 2
+
+    def test_lru_eviction_respects_budget(self, tmp_path):
+        first_dir, second_dir = tmp_path / "a", tmp_path / "b"
+        build_synthetic_series(first_dir)
+        build_synthetic_series(second_dir)
+        probe = VolumeCache(tmp_path / "probe")
+        build_volume(first_dir, cache=probe)
+        entry_bytes = probe.size_bytes()
+
+        cache = VolumeCache(tmp_path / "cache", max_bytes=int(entry_bytes * 1.5))
+        build_volume(first_dir, cache=cache)
+        build_volume(second_dir, cache=cache)
+
+        entries = cache.entries()
+        assert len(entries) == 1
+        assert cache.size_bytes() <= cache.max_bytes
+        build_volume(second_dir, cache=cache)
+        assert cache.hits == 1
+
+
+def test_nifti_cache_hit_skips_simpleitk(tmp_path, monkeypatch):
+    pytest.importorskip("SimpleITK")
+    from DICOM_reencoder import series_to_nifti
+
+    series_dir = tmp_path / "series"
+    build_synthetic_series(series_dir)
+    cache = VolumeCache(tmp_path / "cache")
+    first, meta = series_to_nifti.convert_series_to_nifti(series_dir, output=str(tmp_path / "a.nii.gz"), cache=cache)
+
+    monkeypatch.setattr(series_to_nifti, "_require_simpleitk", lambda: pytest.fail("SimpleITK should not be used"))
+    second, cached_meta = series_to_nifti.convert_series_to_nifti(series_dir, output=str(tmp_path / "b.nii.gz"),
+                                                                  cache=cache)
+
+    assert second.read_bytes() == first.read_bytes()
+    assert cached_meta["output"] == str(second)
+    assert cached_meta["series_uid"] == meta["series_uid"]
+
+
+def test_nifti_cache_is_per_backend(tmp_path, monkeypatch):
+    from DICOM_reencoder import series_to_nifti
+
+    series_dir = tmp_path / "series"
+    build_synthetic_series(series_dir)
+    cache = VolumeCache(tmp_path / "cache")
+    series_to_nifti.convert_series_to_nifti(series_dir, output=str(tmp_path / "a.nii.gz"), cache=cache)
+
+    converted = []
+
+    def convert(series_dir, series_uid, output, compress, preflight):
+        converted.append(output)
+        return series_to_nifti._convert_native(series_dir, series_uid, output, compress, preflight, 1, None)
+
+    monkeypatch.setattr(series_to_nifti, "_convert_simpleitk", convert)
+    series_to_nifti.convert_series_to_nifti(series_dir, output=str(tmp_path / "b.nii.gz"), cache=cache,
+                                            backend="simpleitk")
+
+    # The native entry must not be served for the SimpleITK backend
+    assert converted == [str(tmp_path / "b.nii.gz")]
+
+
+def test_cli_volume_uses_cache_unless_disabled(tmp_path, monkeypatch, capsys):
+    series_dir = tmp_path / "series"
+    build_synthetic_series(series_dir)
+    cache_dir = tmp_path / "cache"
+
+    def run(**flags):
+        cli_mod.cmd_volume(Namespace(directory=str(series_dir), output=str(tmp_path / "vol.npy"), metadata=None,
+                                     preview=False, cache_dir=str(cache_dir), **flags))
+
+    run(cache=False)
+    assert not cache_dir.exists()
+    run(cache=True)
+    _forbid_assembly(monkeypatch)
+    run(cache=True)
+
+    assert np.load(tmp_path / "vol.npy").shape == (32, 32, 4)
+    assert "Volume saved" in capsys.readouterr().out